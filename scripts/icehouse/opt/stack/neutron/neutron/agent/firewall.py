@@ -53,8 +53,13 @@ class FirewallDriver(object):
       if direction is egress:
         remote_group_id will be a list of dest_ip_prefix
       remote_group_id will also remaining membership update management
+      unless the driver uses_remote_group_members, in which case the
+      remote_group_id rules are kept, and the member IPs of the remote
+      groups are given to update_security_group_members.
     """
 
+    uses_remote_group_members = False
+
     def prepare_port_filter(self, port):
         """Prepare filters for the port.
 
@@ -85,6 +90,14 @@ class FirewallDriver(object):
         """Stop filtering port."""
         raise NotImplementedError()
 
+    def update_security_group_members(self, sg_id, member_ips):
+        """Update the member IPs of a remote security group.
+
+        member_ips is a dict of the IPs of the members by ethertype.
+        Only called if the driver uses_remote_group_members.
+        """
+        raise NotImplementedError()
+
     def filter_defer_apply_on(self):
         """Defer application of filtering rule."""
         pass
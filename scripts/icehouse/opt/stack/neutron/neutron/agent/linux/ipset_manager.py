@@ -0,0 +1,111 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Implements ipset sets using linux utilities."""
+
+from neutron.agent.linux import utils as linux_utils
+from neutron.openstack.common import excutils
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: ipset supports set names of up to 31 characters, and a set is
+# filled under its name with SWAP_SUFFIX before it is swapped in.
+SWAP_SUFFIX = '-n'
+MAX_SET_NAME_LENGTH = 31 - len(SWAP_SUFFIX)
+FAMILIES = {'IPv4': 'inet', 'IPv6': 'inet6'}
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    The members of the sets are kept once set, so that updating a set only
+    adds and deletes the members which changed.  The changes are made with
+    one ipset restore, or, while applying them is deferred, with one for
+    all the changes made until it is turned back off.
+
+    A set which is not known yet, e.g. left by a previous run of the agent,
+    is filled under another name and then swapped with it, so its members
+    are replaced atomically.
+
+    """
+
+    def __init__(self, _execute=None, root_helper=None):
+        if _execute:
+            self.execute = _execute
+        else:
+            self.execute = linux_utils.execute
+
+        self.root_helper = root_helper
+        self.sets = {}
+        self.pending_lines = []
+        self.ipset_apply_deferred = False
+
+    def set_members(self, name, ethertype, members):
+        """Set the members of the named set, creating it if need be.
+
+        The members are IP addresses or CIDRs of the ethertype.
+        """
+        members = set(members)
+        old_members = self.sets.get(name)
+        if old_members is None:
+            family = FAMILIES[ethertype]
+            swap_name = name + SWAP_SUFFIX
+            lines = ['create %s hash:net family %s' % (name, family),
+                     'create %s hash:net family %s' % (swap_name, family),
+                     'flush %s' % swap_name]
+            lines += ['add %s %s' % (swap_name, member)
+                      for member in sorted(members)]
+            lines += ['swap %s %s' % (swap_name, name),
+                      'destroy %s' % swap_name]
+        else:
+            lines = ['add %s %s' % (name, member)
+                     for member in sorted(members - old_members)]
+            lines += ['del %s %s' % (name, member)
+                      for member in sorted(old_members - members)]
+        self.sets[name] = members
+        self._run(lines)
+
+    def destroy_set(self, name):
+        """Destroy the named set, which must not be used by any rule."""
+        if self.sets.pop(name, None) is not None:
+            self._run(['destroy %s' % name])
+
+    def defer_apply_on(self):
+        self.ipset_apply_deferred = True
+
+    def defer_apply_off(self):
+        self.ipset_apply_deferred = False
+        self._apply()
+
+    def _run(self, lines):
+        self.pending_lines += lines
+        if not self.ipset_apply_deferred:
+            self._apply()
+
+    def _apply(self):
+        if not self.pending_lines:
+            return
+        lines, self.pending_lines = self.pending_lines, []
+        try:
+            self.execute(['ipset', 'restore', '-exist'],
+                         process_input='\n'.join(lines) + '\n',
+                         root_helper=self.root_helper)
+        except RuntimeError:
+            with excutils.save_and_reraise_exception():
+                # The sets are filled anew the next time they are set.
+                LOG.error(_("Failed to update the ipset sets, they will be "
+                            "refilled when next set"))
+                self.sets.clear()
@@ -19,12 +19,16 @@ import netaddr
 from oslo.config import cfg
 
 from neutron.agent import firewall
+from neutron.agent.linux import ipset_manager
 from neutron.agent.linux import iptables_manager
 from neutron.common import constants
 from neutron.common import ipv6_utils
 from neutron.openstack.common import log as logging
 
 
+cfg.CONF.import_opt('enable_ipset', 'neutron.agent.securitygroups_rpc',
+                    group='SECURITYGROUP')
+
 LOG = logging.getLogger(__name__)
 SG_CHAIN = 'sg-chain'
 INGRESS_DIRECTION = 'ingress'
@@ -34,6 +38,10 @@ CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o',
                      SPOOF_FILTER: 's'}
 LINUX_DEV_LEN = 14
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
+DIRECTION_IP_PREFIX = {INGRESS_DIRECTION: 'source_ip_prefix',
+                       EGRESS_DIRECTION: 'dest_ip_prefix'}
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -45,8 +53,13 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=cfg.CONF.AGENT.root_helper,
             use_ipv6=ipv6_utils.is_enabled())
+        self.ipset = ipset_manager.IpsetManager(
+            root_helper=cfg.CONF.AGENT.root_helper)
+        self.enable_ipset = cfg.CONF.SECURITYGROUP.enable_ipset
         # list of port which has security group
         self.filtered_ports = {}
+        # member ips of the remote security groups, by ethertype
+        self.sg_members = {}
         self._add_fallback_chain_v4v6()
         self._defer_apply = False
         self._pre_defer_filtered_ports = None
@@ -55,6 +68,37 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
     def ports(self):
         return self.filtered_ports
 
+    @property
+    def uses_remote_group_members(self):
+        return self.enable_ipset
+
+    def update_security_group_members(self, sg_id, member_ips):
+        LOG.debug(_("Updating security group (%s) members"), sg_id)
+        self.sg_members[sg_id] = member_ips
+        for ethertype in (constants.IPv4, constants.IPv6):
+            self.ipset.set_members(
+                self._security_group_set_name(sg_id, ethertype), ethertype,
+                member_ips.get(ethertype, []))
+
+    def _remove_unused_security_group_sets(self):
+        """Destroy the sets of the groups no filtered port refers to."""
+        if self._defer_apply or not self.sg_members:
+            return
+        sg_ids = set()
+        for port in self.filtered_ports.values():
+            sg_ids.update(rule['remote_group_id']
+                          for rule in port.get('security_group_rules', [])
+                          if rule.get('remote_group_id'))
+        for sg_id in set(self.sg_members) - sg_ids:
+            del self.sg_members[sg_id]
+            for ethertype in (constants.IPv4, constants.IPv6):
+                self.ipset.destroy_set(
+                    self._security_group_set_name(sg_id, ethertype))
+
+    def _security_group_set_name(self, sg_id, ethertype):
+        return ('%s%s' % (ethertype, sg_id))[
+            :ipset_manager.MAX_SET_NAME_LENGTH]
+
     def prepare_port_filter(self, port):
         LOG.debug(_("Preparing device (%s) filter"), port['device'])
         self._remove_chains()
@@ -62,6 +106,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         # each security group has it own chains
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_security_group_sets()
 
     def update_port_filter(self, port):
         LOG.debug(_("Updating device (%s) filter"), port['device'])
@@ -73,6 +118,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports[port['device']] = port
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_security_group_sets()
 
     def remove_port_filter(self, port):
         LOG.debug(_("Removing device (%s) filter"), port['device'])
@@ -84,6 +130,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports.pop(port['device'], None)
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_security_group_sets()
 
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
@@ -281,6 +328,13 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self._drop_invalid_packets(iptables_rules)
         self._allow_established(iptables_rules)
         for rule in security_group_rules:
+            if self._is_unknown_remote_group_rule(rule):
+                # NOTE: Without an ip prefix the rule would allow any
+                # address, so it is left out until the members of its
+                # remote group are known.
+                LOG.debug(_("Skipping rule of unknown remote group %s"),
+                          rule['remote_group_id'])
+                continue
             # These arguments MUST be in the format iptables-save will
             # display them: source/dest, protocol, sport, dport, target
             # Otherwise the iptables_manager code won't be able to find
@@ -298,6 +352,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                    rule.get('protocol'),
                                    rule.get('port_range_min'),
                                    rule.get('port_range_max'))
+            args += self._remote_group_arg(rule)
             args += ['-j RETURN']
             iptables_rules += [' '.join(args)]
 
@@ -352,6 +407,24 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             return ['-%s' % direction, ip_prefix]
         return []
 
+    def _is_unknown_remote_group_rule(self, rule):
+        remote_group_id = rule.get('remote_group_id')
+        return bool(remote_group_id and
+                    not rule.get(DIRECTION_IP_PREFIX[rule['direction']]) and
+                    remote_group_id not in self.sg_members)
+
+    def _remote_group_arg(self, rule):
+        # NOTE: The remote groups are only given member ips when the rules
+        # which refer to them are not converted to a rule per member ip.
+        remote_group_id = rule.get('remote_group_id')
+        if (remote_group_id not in self.sg_members or
+                rule.get(DIRECTION_IP_PREFIX[rule['direction']])):
+            return []
+        return ['-m set --match-set',
+                self._security_group_set_name(remote_group_id,
+                                              rule['ethertype']),
+                IPSET_DIRECTION[rule['direction']]]
+
     def _port_chain_name(self, port, direction):
         return iptables_manager.get_chain_name(
             '%s%s' % (CHAIN_NAME_PREFIX[direction], port['device'][3:]))
@@ -359,6 +432,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
     def filter_defer_apply_on(self):
         if not self._defer_apply:
             self.iptables.defer_apply_on()
+            self.ipset.defer_apply_on()
             self._pre_defer_filtered_ports = dict(self.filtered_ports)
             self._defer_apply = True
 
@@ -368,7 +442,12 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._remove_chains_apply(self._pre_defer_filtered_ports)
             self._pre_defer_filtered_ports = None
             self._setup_chains_apply(self.filtered_ports)
-            self.iptables.defer_apply_off()
+            # The sets are filled before the rules refer to them.
+            try:
+                self.ipset.defer_apply_off()
+            finally:
+                self.iptables.defer_apply_off()
+            self._remove_unused_security_group_sets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
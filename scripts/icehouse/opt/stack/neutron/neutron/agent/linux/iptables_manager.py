@@ -21,6 +21,7 @@
 
 """Implements iptables rules using linux utilities."""
 
+import hashlib
 import inspect
 import os
 
@@ -28,6 +29,7 @@ from neutron.agent.linux import utils as linux_utils
 from neutron.common import utils
 from neutron.openstack.common import lockutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 
@@ -47,6 +49,11 @@ binary_name = get_binary_name()
 MAX_CHAIN_LEN_WRAP = 11
 MAX_CHAIN_LEN_NOWRAP = 28
 
+# The tables are saved and restored as a whole at least this often, in
+# seconds, to undo the changes made to them by others when only the changed
+# chains are applied.
+FULL_APPLY_INTERVAL = 300
+
 
 def get_chain_name(chain_name, wrap=True):
     if wrap:
@@ -99,6 +106,10 @@ class IptablesTable(object):
         self.unwrapped_chains = set()
         self.remove_chains = set()
         self.wrap_name = binary_name[:16]
+        # The checksums of the unwrapped chains and rules, and of the rules
+        # of each wrapped chain, as last applied, or None if the table has
+        # not been applied as a whole yet.
+        self.applied_checksums = None
 
     def add_chain(self, name, wrap=True):
         """Adds a named chain to the table.
@@ -247,6 +258,35 @@ class IptablesTable(object):
         for rule in rules:
             self.rules.remove(rule)
 
+    def get_chain_rules(self):
+        """Return the rules of the wrapped chains, and the unwrapped ones.
+
+        The rules of each wrapped chain are given in the order they are
+        applied in, by chain name.  The unwrapped chains and rules are
+        given as one list.
+        """
+        chain_rules = dict((name, ([], [])) for name in self.chains)
+        unwrapped = sorted(':%s' % name for name in self.unwrapped_chains)
+        for rule in self.rules:
+            if rule.wrap:
+                top, bottom = chain_rules.setdefault(rule.chain, ([], []))
+                (top if rule.top else bottom).append(str(rule))
+            else:
+                unwrapped.append('%s %s' % (rule.top, rule))
+        return (dict((name, top + bottom)
+                     for name, (top, bottom) in chain_rules.iteritems()),
+                unwrapped)
+
+    def get_checksums(self, chain_rules, unwrapped):
+        """Return the checksums of the rules given by get_chain_rules."""
+        return (_checksum(unwrapped),
+                dict((name, _checksum(rules))
+                     for name, rules in chain_rules.iteritems()))
+
+
+def _checksum(lines):
+    return hashlib.md5('\n'.join(lines)).hexdigest()
+
 
 class IptablesManager(object):
     """Wrapper for iptables.
@@ -269,17 +309,28 @@ class IptablesManager(object):
     wrapped in the same was as the built-in filter chains. Additionally,
     there's a snat chain that is applied after the POSTROUTING chain.
 
+    Once applied, the tables are only saved and restored as a whole when
+    unwrapped chains or rules change, or full_apply_interval seconds after
+    they last were, unless incremental_apply is False.  The wrapped chains
+    whose rules changed are rewritten otherwise.
+
     """
 
     def __init__(self, _execute=None, state_less=False,
                  root_helper=None, use_ipv6=False, namespace=None,
-                 binary_name=binary_name):
+                 binary_name=binary_name, incremental_apply=True,
+                 full_apply_interval=FULL_APPLY_INTERVAL):
         if _execute:
             self.execute = _execute
         else:
             self.execute = linux_utils.execute
 
         self.use_ipv6 = use_ipv6
+        self.incremental_apply = incremental_apply
+        self.full_apply_interval = full_apply_interval
+        # When the tables were last saved and restored as a whole, by
+        # command.
+        self.full_applied_at = {}
         self.root_helper = root_helper
         self.namespace = namespace
         self.iptables_apply_deferred = False
@@ -377,28 +428,114 @@ class IptablesManager(object):
         same component of Nova, and replace them with our current set of
         rules. This happens atomically, thanks to iptables-restore.
 
+        Once the tables have been applied as a whole, only the wrapped
+        chains whose rules changed since are rewritten, without saving the
+        tables, as long as the unwrapped chains and rules are unchanged and
+        full_apply_interval seconds have not passed since, which bounds how
+        long changes made by others to our chains are left in place.
+
         """
         s = [('iptables', self.ipv4)]
         if self.use_ipv6:
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
-            args = ['%s-save' % (cmd,), '-c']
-            if self.namespace:
-                args = ['ip', 'netns', 'exec', self.namespace] + args
-            all_tables = self.execute(args, root_helper=self.root_helper)
-            all_lines = all_tables.split('\n')
-            for table_name, table in tables.iteritems():
-                start, end = self._find_table(all_lines, table_name)
-                all_lines[start:end] = self._modify_rules(
-                    all_lines[start:end], table, table_name)
-
-            args = ['%s-restore' % (cmd,), '-c']
+            if not self._apply_changed_chains(cmd, tables):
+                self._apply_tables(cmd, tables)
+        LOG.debug(_("IPTablesManager.apply completed with success"))
+
+    def _apply_tables(self, cmd, tables):
+        for table in tables.itervalues():
+            table.applied_checksums = None
+        args = ['%s-save' % (cmd,), '-c']
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        all_tables = self.execute(args, root_helper=self.root_helper)
+        all_lines = all_tables.split('\n')
+        for table_name, table in tables.iteritems():
+            start, end = self._find_table(all_lines, table_name)
+            all_lines[start:end] = self._modify_rules(
+                all_lines[start:end], table, table_name)
+
+        args = ['%s-restore' % (cmd,), '-c']
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        self.execute(args, process_input='\n'.join(all_lines),
+                     root_helper=self.root_helper)
+        if self.incremental_apply:
+            for table in tables.itervalues():
+                table.applied_checksums = table.get_checksums(
+                    *table.get_chain_rules())
+            self.full_applied_at[cmd] = timeutils.utcnow_ts()
+
+    def _apply_changed_chains(self, cmd, tables):
+        """Rewrite the wrapped chains whose rules changed since last applied.
+
+        Returns False if the tables have to be applied as a whole instead,
+        because they never were, or not for full_apply_interval seconds,
+        their unwrapped chains or rules changed or the changed chains could
+        not be applied.
+        """
+        if not self.incremental_apply or cmd not in self.full_applied_at:
+            return False
+        elapsed = timeutils.utcnow_ts() - self.full_applied_at[cmd]
+        if not 0 <= elapsed < self.full_apply_interval:
+            # Rules changed or removed by others are only undone by a
+            # full apply.
+            return False
+        lines = []
+        checksums = {}
+        for table_name, table in tables.iteritems():
+            if (table.applied_checksums is None or table.remove_chains or
+                    table.remove_rules):
+                return False
+            chain_rules, unwrapped = table.get_chain_rules()
+            checksums[table_name] = table.get_checksums(chain_rules,
+                                                        unwrapped)
+            applied_unwrapped, applied_chains = table.applied_checksums
+            unwrapped_checksum, chain_checksums = checksums[table_name]
+            if unwrapped_checksum != applied_unwrapped:
+                return False
+            changed = set(name for name, checksum in
+                          chain_checksums.iteritems()
+                          if applied_chains.get(name) != checksum)
+            removed = set(applied_chains) - set(chain_checksums)
+            lines += self._changed_chains_lines(table_name, chain_rules,
+                                                changed, removed)
+        if lines:
+            args = ['%s-restore' % (cmd,), '-c', '--noflush']
             if self.namespace:
                 args = ['ip', 'netns', 'exec', self.namespace] + args
-            self.execute(args, process_input='\n'.join(all_lines),
-                         root_helper=self.root_helper)
-        LOG.debug(_("IPTablesManager.apply completed with success"))
+            try:
+                self.execute(args, process_input='\n'.join(lines),
+                             root_helper=self.root_helper)
+            except RuntimeError:
+                LOG.warn(_('Failed to apply the changed %s chains, applying '
+                           'the whole tables'), cmd, exc_info=True)
+                return False
+        for table_name, table in tables.iteritems():
+            table.applied_checksums = checksums[table_name]
+        return True
+
+    def _changed_chains_lines(self, table_name, chain_rules, changed,
+                              removed):
+        """Return the iptables-restore --noflush input of the changes.
+
+        Declaring a chain flushes it, or creates it, so the changed chains
+        are declared and given all their rules, and the removed ones are
+        declared and deleted.
+        """
+        if not (changed or removed):
+            return []
+        lines = ['*%s' % table_name]
+        lines += [':%s-%s - [0:0]' % (self.wrap_name, name)
+                  for name in sorted(changed | removed)]
+        for name in sorted(changed):
+            lines += chain_rules[name]
+        lines += ['-X %s-%s' % (self.wrap_name, name)
+                  for name in sorted(removed)]
+        lines.append('COMMIT')
+        return lines
 
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
@@ -436,6 +573,15 @@ class IptablesManager(object):
             if match_str in s:
                 return s
 
+    def _entry_key(self, line):
+        # A chain is known by its name, a rule by the rule without its
+        # [packet:byte] counts.
+        if line.startswith(':'):
+            return line.split(' ', 1)[0]
+        elif line.startswith('['):
+            return line.split('] ', 1)[-1]
+        return line
+
     def _modify_rules(self, current_lines, table, table_name):
         unwrapped_chains = table.unwrapped_chains
         chains = table.chains
@@ -462,16 +608,22 @@ class IptablesManager(object):
         all_chains = [':%s' % name for name in unwrapped_chains]
         all_chains += [':%s-%s' % (self.wrap_name, name) for name in chains]
 
+        # The last entry of each chain and rule, which is the one kept by
+        # iptables-restore.  The entries we have are taken out of
+        # new_filter, and looked up only once there.
+        old_entries = dict((self._entry_key(s), s) for s in old_filter)
+        new_entries = dict((self._entry_key(s), s) for s in new_filter)
+        our_keys = set()
+
         # Iterate through all the chains, trying to find an existing
         # match.
         our_chains = []
         for chain in all_chains:
             chain_str = str(chain).strip()
 
-            old = self._find_last_entry(old_filter, chain_str)
-            if not old:
-                dup = self._find_last_entry(new_filter, chain_str)
-            new_filter = [s for s in new_filter if chain_str not in s.strip()]
+            old = old_entries.get(chain_str)
+            dup = new_entries.pop(chain_str, None)
+            our_keys.add(chain_str)
 
             # if no old or duplicates, use original chain
             if old or dup:
@@ -491,10 +643,9 @@ class IptablesManager(object):
             # Further down, we weed out duplicates from the bottom of the
             # list, so here we remove the dupes ahead of time.
 
-            old = self._find_last_entry(old_filter, rule_str)
-            if not old:
-                dup = self._find_last_entry(new_filter, rule_str)
-            new_filter = [s for s in new_filter if rule_str not in s.strip()]
+            old = old_entries.get(rule_str)
+            dup = new_entries.pop(rule_str, None)
+            our_keys.add(rule_str)
 
             # if no old or duplicates, use original rule
             if old or dup:
@@ -514,6 +665,8 @@ class IptablesManager(object):
 
         our_rules += bot_rules
 
+        new_filter = [s for s in new_filter
+                      if self._entry_key(s) not in our_keys]
         new_filter[rules_index:rules_index] = our_rules
         new_filter[rules_index:rules_index] = our_chains
 
@@ -556,21 +709,15 @@ class IptablesManager(object):
             # Leave it alone
             return True
 
+        remove_rule_strs = set(_strip_packets_bytes(str(rule))
+                               for rule in remove_rules)
+
         def _weed_out_removes(line):
             # We need to find exact matches here
             if line.startswith(':'):
-                line = _strip_packets_bytes(line)
-                for chain in remove_chains:
-                    if chain == line:
-                        remove_chains.remove(chain)
-                        return False
+                return _strip_packets_bytes(line) not in remove_chains
             elif line.startswith('['):
-                line = _strip_packets_bytes(line)
-                for rule in remove_rules:
-                    rule_str = _strip_packets_bytes(str(rule))
-                    if rule_str == line:
-                        remove_rules.remove(rule)
-                        return False
+                return _strip_packets_bytes(line) not in remove_rule_strs
 
             # Leave it alone
             return True
@@ -588,8 +735,7 @@ class IptablesManager(object):
 
         # flush lists, just in case we didn't find something
         remove_chains.clear()
-        for rule in remove_rules:
-            remove_rules.remove(rule)
+        del remove_rules[:]
 
         return new_filter
 
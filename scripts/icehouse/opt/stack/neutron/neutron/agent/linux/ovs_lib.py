@@ -108,6 +108,8 @@ class OVSBridge(BaseOVS):
         self.br_name = br_name
         self.defer_apply_flows = False
         self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        self.deferred_db_commands = []
+        self.db_read_cache = None
 
     def set_controller(self, controller_names):
         vsctl_command = ['--', 'set-controller', self.br_name]
@@ -150,16 +152,46 @@ class OVSBridge(BaseOVS):
         return self.get_port_ofport(port_name)
 
     def delete_port(self, port_name):
+        # NOTE: Ports are added and deleted right away even while applying
+        # changes is deferred, so that a port deleted and added again ends
+        # up added.
         self.run_vsctl(["--", "--if-exists", "del-port", self.br_name,
                         port_name])
 
     def set_db_attribute(self, table_name, record, column, value):
         args = ["set", table_name, record, "%s=%s" % (column, value)]
-        self.run_vsctl(args)
+        if self.defer_apply_flows:
+            self.deferred_db_commands.append(args)
+        else:
+            self.run_vsctl(args)
 
     def clear_db_attribute(self, table_name, record, column):
         args = ["clear", table_name, record, column]
-        self.run_vsctl(args)
+        if self.defer_apply_flows:
+            self.deferred_db_commands.append(args)
+        else:
+            self.run_vsctl(args)
+
+    def run_vsctl_cached(self, args):
+        """Run a read only ovs-vsctl command, once while caching reads.
+
+        The output is kept until cache_db_reads_off, so changes made to
+        the database in the meantime are not seen.
+        """
+        if self.db_read_cache is None:
+            return self.run_vsctl(args, check_error=True)
+        key = tuple(args)
+        if key not in self.db_read_cache:
+            self.db_read_cache[key] = self.run_vsctl(args, check_error=True)
+        return self.db_read_cache[key]
+
+    def cache_db_reads_on(self):
+        LOG.debug(_('cache_db_reads_on'))
+        self.db_read_cache = {}
+
+    def cache_db_reads_off(self):
+        LOG.debug(_('cache_db_reads_off'))
+        self.db_read_cache = None
 
     def run_ofctl(self, cmd, args, process_input=None):
         full_args = ["ovs-ofctl", cmd, self.br_name] + args
@@ -226,7 +258,11 @@ class OVSBridge(BaseOVS):
         stashed_deferred_flows, self.deferred_flows = (
             self.deferred_flows, {'add': '', 'mod': '', 'del': ''}
         )
+        stashed_db_commands, self.deferred_db_commands = (
+            self.deferred_db_commands, [])
         self.defer_apply_flows = False
+        if stashed_db_commands:
+            self._apply_db_commands(stashed_db_commands)
         for action, flows in stashed_deferred_flows.items():
             if flows:
                 LOG.debug(_('Applying following deferred flows '
@@ -236,6 +272,22 @@ class OVSBridge(BaseOVS):
                               {'action': action, 'flow': line})
                 self.run_ofctl('%s-flows' % action, ['-'], flows)
 
+    def _apply_db_commands(self, commands):
+        LOG.debug(_('Applying %(count)d deferred database commands to '
+                    'bridge %(br_name)s'),
+                  {'count': len(commands), 'br_name': self.br_name})
+        args = []
+        for command in commands:
+            args += ["--"] + command
+        try:
+            self.run_vsctl(args, check_error=True)
+        except RuntimeError:
+            # NOTE: The commands are run in one transaction, which fails as
+            # a whole if e.g. one of the ports is gone, so they are run one
+            # by one then.
+            for command in commands:
+                self.run_vsctl(["--"] + command)
+
     def add_tunnel_port(self, port_name, remote_ip, local_ip,
                         tunnel_type=p_const.TYPE_GRE,
                         vxlan_udp_port=constants.VXLAN_UDP_PORT):
@@ -283,7 +335,7 @@ class OVSBridge(BaseOVS):
         return ret
 
     def get_port_name_list(self):
-        res = self.run_vsctl(["list-ports", self.br_name], check_error=True)
+        res = self.run_vsctl_cached(["list-ports", self.br_name])
         if res:
             return res.strip().split("\n")
         return []
@@ -326,23 +378,26 @@ class OVSBridge(BaseOVS):
 
         return edge_ports
 
-    def get_vif_port_set(self):
-        port_names = self.get_port_name_list()
-        edge_ports = set()
+    def get_interfaces(self):
+        """Get the name, external_ids and ofport of all the interfaces."""
         args = ['--format=json', '--', '--columns=name,external_ids,ofport',
                 'list', 'Interface']
-        result = self.run_vsctl(args, check_error=True)
+        result = self.run_vsctl_cached(args)
         if not result:
-            return edge_ports
-        for row in jsonutils.loads(result)['data']:
-            name = row[0]
+            return []
+        return [(row[0], dict(row[1][1]), row[2])
+                for row in jsonutils.loads(result)['data']]
+
+    def get_vif_port_set(self):
+        port_names = set(self.get_port_name_list())
+        edge_ports = set()
+        for name, external_ids, ofport in self.get_interfaces():
             if name not in port_names:
                 continue
-            external_ids = dict(row[1][1])
+            row = [name, external_ids, ofport]
             # Do not consider VIFs which aren't yet ready
             # This can happen when ofport values are either [] or ["set", []]
             # We will therefore consider only integer values for ofport
-            ofport = row[2]
             try:
                 int_ofport = int(ofport)
             except (ValueError, TypeError):
@@ -379,7 +434,14 @@ class OVSBridge(BaseOVS):
         in the "Interface" table queried by the get_vif_port_set() method.
 
         """
-        port_names = self.get_port_name_list()
+        if self.db_read_cache is None:
+            return self._get_port_tag_dict()
+        if 'port_tag_dict' not in self.db_read_cache:
+            self.db_read_cache['port_tag_dict'] = self._get_port_tag_dict()
+        return dict(self.db_read_cache['port_tag_dict'])
+
+    def _get_port_tag_dict(self):
+        port_names = set(self.get_port_name_list())
         args = ['--format=json', '--', '--columns=name,tag', 'list', 'Port']
         result = self.run_vsctl(args, check_error=True)
         port_tag_dict = {}
@@ -437,6 +499,33 @@ class OVSBridge(BaseOVS):
             LOG.warn(_("Unable to parse interface details. Exception: %s"), e)
             return
 
+    def get_vifs_by_ids(self, port_ids):
+        """Get the VifPorts of a number of port ids, by port id.
+
+        Unlike get_vif_port_by_id, which runs ovs-vsctl twice for each port,
+        the ports and interfaces of the bridge are listed once.  The ports
+        not on this bridge, or without an ofport, are left out.
+        """
+        port_ids = set(port_ids)
+        port_names = set(self.get_port_name_list())
+        vifs = {}
+        for name, external_ids, ofport in self.get_interfaces():
+            port_id = external_ids.get('iface-id')
+            if port_id not in port_ids or name not in port_names:
+                continue
+            # ofport must be integer otherwise the port is left out
+            if not isinstance(ofport, int) or ofport == -1:
+                LOG.warn(_("ofport: %(ofport)s for VIF: %(vif)s is not a "
+                           "positive integer"), {'ofport': ofport,
+                                                 'vif': port_id})
+                continue
+            if 'attached-mac' not in external_ids:
+                LOG.warn(_("No attached-mac for VIF: %s"), port_id)
+                continue
+            vifs[port_id] = VifPort(name, ofport, port_id,
+                                    external_ids['attached-mac'], self)
+        return vifs
+
     def delete_ports(self, all_ports=False):
         if all_ports:
             port_names = self.get_port_name_list()
@@ -26,6 +26,7 @@ import tempfile
 
 from eventlet.green import subprocess
 from eventlet import greenthread
+from oslo.config import cfg
 
 from neutron.common import utils
 from neutron.openstack.common import excutils
@@ -34,6 +35,10 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# The rootwrap daemon clients by root helper daemon command, None for a
+# daemon which could not be used.
+_rootwrap_daemon_clients = {}
+
 
 def create_process(cmd, root_helper=None, addl_env=None):
     """Create a process object for the given command.
@@ -59,26 +64,107 @@ def create_process(cmd, root_helper=None, addl_env=None):
     return obj, cmd
 
 
+def _get_root_helper_daemon():
+    # NOTE: The AGENT options are registered by the agents, not by all the
+    # code which runs commands.
+    try:
+        return cfg.CONF.AGENT.root_helper_daemon
+    except cfg.NoSuchOptError:
+        return None
+
+
+def _get_rootwrap_daemon_client(root_helper_daemon):
+    if root_helper_daemon not in _rootwrap_daemon_clients:
+        client = None
+        try:
+            # NOTE: The rootwrap daemon needs oslo.rootwrap 1.3.0 or later,
+            # which is only imported when a daemon is configured.
+            from oslo.rootwrap import client as rootwrap_client
+            client = rootwrap_client.Client(shlex.split(root_helper_daemon))
+        except ImportError:
+            LOG.warn(_("The rootwrap daemon %s needs oslo.rootwrap 1.3.0 or "
+                       "later, running commands with the root helper "
+                       "instead"), root_helper_daemon)
+        _rootwrap_daemon_clients[root_helper_daemon] = client
+    return _rootwrap_daemon_clients[root_helper_daemon]
+
+
+def execute_rootwrap_daemon(cmd, process_input=None, addl_env=None):
+    """Run a command with the rootwrap daemon.
+
+    The daemon is started with the root_helper_daemon command the first
+    time.  The return value is a tuple of the exit code, the stdout and the
+    stderr of the command, or None if no daemon is configured or it could
+    not be started, in which case the command was not run.  RuntimeError is
+    raised if the command was sent but no result came back, as it may have
+    been run.
+    """
+    root_helper_daemon = _get_root_helper_daemon()
+    if not root_helper_daemon:
+        return
+    client = _get_rootwrap_daemon_client(root_helper_daemon)
+    if client is None:
+        return
+
+    try:
+        # NOTE: The daemon is started before the command is sent, so that
+        # the command is only run with the root helper instead when it is
+        # known not to have reached the daemon.  Client has no public way
+        # of doing so: _ensure_initialized() is the private method of
+        # oslo.rootwrap 1.3.0, which this is tested with.  Without it the
+        # daemon is started by the first command sent.
+        ensure_initialized = getattr(client, '_ensure_initialized', None)
+        if ensure_initialized is not None:
+            ensure_initialized()
+    except Exception:
+        LOG.exception(_("Unable to start the rootwrap daemon %s, running "
+                        "commands with the root helper instead"),
+                      root_helper_daemon)
+        _rootwrap_daemon_clients[root_helper_daemon] = None
+        return
+
+    LOG.debug(_("Running command (rootwrap daemon): %s"), cmd)
+    try:
+        return client.execute(cmd, addl_env, process_input)
+    except Exception as e:
+        if isinstance(e, (EOFError, IOError)):
+            LOG.error(_("Lost the connection to the rootwrap daemon %s, "
+                        "running commands with the root helper from now "
+                        "on"), root_helper_daemon)
+            _rootwrap_daemon_clients[root_helper_daemon] = None
+        raise RuntimeError(_("Command %(cmd)s sent to the rootwrap daemon "
+                             "may not have completed: %(error)s") %
+                           {'cmd': cmd, 'error': e})
+
+
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False, extra_ok_codes=None):
     try:
-        obj, cmd = create_process(cmd, root_helper=root_helper,
-                                  addl_env=addl_env)
-        _stdout, _stderr = (process_input and
-                            obj.communicate(process_input) or
-                            obj.communicate())
-        obj.stdin.close()
+        result = None
+        if root_helper:
+            cmd = map(str, cmd)
+            result = execute_rootwrap_daemon(cmd, process_input, addl_env)
+        if result is not None:
+            returncode, _stdout, _stderr = result
+        else:
+            obj, cmd = create_process(cmd, root_helper=root_helper,
+                                      addl_env=addl_env)
+            _stdout, _stderr = (process_input and
+                                obj.communicate(process_input) or
+                                obj.communicate())
+            obj.stdin.close()
+            returncode = obj.returncode
         m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)r\n"
-              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': obj.returncode,
+              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': returncode,
                                        'stdout': _stdout, 'stderr': _stderr}
 
         LOG.debug(m)
 
         extra_ok_codes = extra_ok_codes or []
-        if obj.returncode and obj.returncode in extra_ok_codes:
-            obj.returncode = None
+        if returncode and returncode in extra_ok_codes:
+            returncode = None
 
-        if obj.returncode and check_exit_code:
+        if returncode and check_exit_code:
             raise RuntimeError(m)
     finally:
         # NOTE(termie): this appears to be necessary to let the subprocess
@@ -21,12 +21,18 @@ from neutron.common import topics
 
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.openstack.common import timeutils
 
 
 LOG = logging.getLogger(__name__)
 
+# The plugin handles the devices of a device list call one by one, so the
+# devices are sent in chunks of this many for each call to be answered
+# within rpc_response_timeout.
+DEVICE_LIST_CHUNK_SIZE = 100
+
 
 def create_consumers(dispatcher, prefix, topic_details):
     """Create agent RPC consumers.
@@ -56,6 +62,21 @@ def create_consumers(dispatcher, prefix, topic_details):
     return connection
 
 
+def _chunks(items):
+    items = list(items)
+    return [items[i:i + DEVICE_LIST_CHUNK_SIZE]
+            for i in xrange(0, len(items), DEVICE_LIST_CHUNK_SIZE)]
+
+
+def is_unsupported_rpc_version(exc):
+    # NOTE: The exceptions of the rpc common module are not deserialized
+    # by the client, so an older server's refusal of a newer call comes
+    # back as a RemoteError.
+    return (isinstance(exc, rpc_common.UnsupportedRpcVersion) or
+            (isinstance(exc, rpc_common.RemoteError) and
+             exc.exc_type == 'UnsupportedRpcVersion'))
+
+
 class PluginReportStateAPI(proxy.RpcProxy):
     BASE_RPC_API_VERSION = '1.0'
 
@@ -79,6 +100,7 @@ class PluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.2 - Added get_devices_details_list and update_device_list.
 
     '''
 
@@ -94,6 +116,62 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def get_devices_details_list(self, context, devices, agent_id):
+        devices = list(devices)
+        details = []
+        for chunk in _chunks(devices):
+            try:
+                details += self.call(context,
+                                     self.make_msg('get_devices_details_list',
+                                                   devices=chunk,
+                                                   agent_id=agent_id),
+                                     topic=self.topic, version='1.2')
+                continue
+            except (rpc_common.RemoteError,
+                    rpc_common.UnsupportedRpcVersion) as e:
+                if not is_unsupported_rpc_version(e):
+                    raise
+            LOG.debug(_("get_devices_details_list not supported by the "
+                        "plugin, getting the details device by device"))
+            return [self.get_device_details(context, device, agent_id)
+                    for device in devices]
+        return details
+
+    def update_device_list(self, context, devices_up, devices_down,
+                           agent_id, host=None):
+        result = {'devices_up': [], 'devices_down': []}
+        # The devices up are reported before the devices down, like the
+        # plugin does with those of one call.
+        devices = ([(device, True) for device in devices_up] +
+                   [(device, False) for device in devices_down])
+        for chunk in _chunks(devices):
+            chunk_up = [device for device, up in chunk if up]
+            chunk_down = [device for device, up in chunk if not up]
+            try:
+                chunk_result = self.call(
+                    context,
+                    self.make_msg('update_device_list',
+                                  devices_up=chunk_up,
+                                  devices_down=chunk_down,
+                                  agent_id=agent_id, host=host),
+                    topic=self.topic, version='1.2')
+                result['devices_up'] += chunk_result['devices_up']
+                result['devices_down'] += chunk_result['devices_down']
+                continue
+            except (rpc_common.RemoteError,
+                    rpc_common.UnsupportedRpcVersion) as e:
+                if not is_unsupported_rpc_version(e):
+                    raise
+            LOG.debug(_("update_device_list not supported by the plugin, "
+                        "updating the devices one by one"))
+            for device in devices_up:
+                self.update_device_up(context, device, agent_id, host)
+            return {'devices_up': devices_up,
+                    'devices_down': [self.update_device_down(context, device,
+                                                             agent_id, host)
+                                     for device in devices_down]}
+        return result
+
     def update_device_down(self, context, device, agent_id, host=None):
         return self.call(context,
                          self.make_msg('update_device_down', device=device,
@@ -18,12 +18,15 @@
 
 from oslo.config import cfg
 
+from neutron.agent import rpc as agent_rpc
 from neutron.common import topics
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import common as rpc_common
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+SG_INFO_RPC_VERSION = "1.3"
 
 security_group_opts = [
     cfg.StrOpt(
@@ -36,7 +39,13 @@ security_group_opts = [
         help=_(
             'Controls whether the neutron security group API is enabled '
             'in the server. It should be false when using no security '
-            'groups or using the nova security group API.'))
+            'groups or using the nova security group API.')),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_('Use ipset sets of the member IPs of the remote security '
+               'groups in the rules of the iptables firewall drivers, '
+               'instead of a rule per member IP.'))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -85,6 +94,25 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        try:
+            return self.call(context,
+                             self.make_msg('security_group_info_for_devices',
+                                           devices=devices),
+                             version=SG_INFO_RPC_VERSION,
+                             topic=self.topic)
+        except (rpc_common.RemoteError,
+                rpc_common.UnsupportedRpcVersion) as e:
+            if not agent_rpc.is_unsupported_rpc_version(e):
+                raise
+        LOG.debug(_("security_group_info_for_devices not supported by the "
+                    "plugin, getting the rules converted by the plugin"))
+        return {'devices': self.security_group_rules_for_devices(context,
+                                                                 devices),
+                'sg_member_ips': {}}
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -157,12 +185,24 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices_info = self._security_group_info_for_devices(device_ids)
         with self.firewall.defer_apply():
-            for device in devices.values():
+            self._update_security_group_members(devices_info)
+            for device in devices_info['devices'].values():
                 self.firewall.prepare_port_filter(device)
 
+    def _security_group_info_for_devices(self, device_ids):
+        if self.firewall.uses_remote_group_members:
+            return self.plugin_rpc.security_group_info_for_devices(
+                self.context, list(device_ids))
+        devices = self.plugin_rpc.security_group_rules_for_devices(
+            self.context, list(device_ids))
+        return {'devices': devices, 'sg_member_ips': {}}
+
+    def _update_security_group_members(self, devices_info):
+        for sg_id, member_ips in devices_info['sg_member_ips'].iteritems():
+            self.firewall.update_security_group_members(sg_id, member_ips)
+
     def security_groups_rule_updated(self, security_groups):
         LOG.info(_("Security group "
                    "rule updated %r"), security_groups)
@@ -220,10 +260,10 @@ class SecurityGroupAgentRpcMixin(object):
             if not device_ids:
                 LOG.info(_("No ports here to refresh firewall"))
                 return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices_info = self._security_group_info_for_devices(device_ids)
         with self.firewall.defer_apply():
-            for device in devices.values():
+            self._update_security_group_members(devices_info)
+            for device in devices_info['devices'].values():
                 LOG.debug(_("Update port filter for %s"), device['device'])
                 self.firewall.update_port_filter(device)
 
@@ -138,7 +138,44 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_rules_for_ports(context, ports)
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return security group rules for each port, and remote members.
 
+        Unlike security_group_rules_for_devices, remote_group_id rules
+        are not converted to one rule per member IP. The member IPs of
+        the remote groups are returned once, by IP version, instead.
+
+        :params devices: list of devices
+        :returns: dict with the port correspond to the devices with
+                  security group rules as 'devices', and the member IPs
+                  of each remote group as 'sg_member_ips'
+        """
+        devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        self._select_security_group_rules_for_ports(context, ports)
+        remote_group_ids = self._select_remote_group_ids(ports)
+        for port in ports.values():
+            for rule in port.get('security_group_rules'):
+                remote_group_id = rule.get('remote_group_id')
+                if (remote_group_id and remote_group_id not in
+                        port['security_group_source_groups']):
+                    port['security_group_source_groups'].append(
+                        remote_group_id)
+        ips = self._select_ips_for_remote_group(context, remote_group_ids)
+        sg_member_ips = {}
+        for remote_group_id, member_ips in ips.iteritems():
+            sg_member_ips[remote_group_id] = {q_const.IPv4: [],
+                                              q_const.IPv6: []}
+            for ip in member_ips:
+                cidr = netaddr.IPNetwork(ip)
+                sg_member_ips[remote_group_id]['IPv%s' % cidr.version].append(
+                    str(cidr.cidr))
+        return {'devices': ports, 'sg_member_ips': sg_member_ips}
+
+    def _get_ports_for_devices(self, devices):
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
@@ -147,7 +184,7 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -289,6 +326,10 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_dhcp_rule(port, ips)
 
     def _security_group_rules_for_ports(self, context, ports):
+        self._select_security_group_rules_for_ports(context, ports)
+        return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _select_security_group_rules_for_ports(self, context, ports):
         rules_in_db = self._select_rules_for_ports(context, ports)
         for (binding, rule_in_db) in rules_in_db:
             port_id = binding['port_id']
@@ -309,4 +350,3 @@ class SecurityGroupServerRpcCallbackMixin(object):
                     rule_dict[key] = rule_in_db[key]
             port['security_group_rules'].append(rule_dict)
         self._apply_provider_rule(context, ports)
-        return self._convert_remote_group_id_to_ip_prefix(context, ports)
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from neutron.db import api as db_api
@@ -45,15 +46,32 @@ def add_network_segment(session, network_id, segment):
               'network_id': record.network_id})
 
 
+def _make_segment_dict(record):
+    return {api.ID: record.id,
+            api.NETWORK_TYPE: record.network_type,
+            api.PHYSICAL_NETWORK: record.physical_network,
+            api.SEGMENTATION_ID: record.segmentation_id}
+
+
 def get_network_segments(session, network_id):
     with session.begin(subtransactions=True):
         records = (session.query(models.NetworkSegment).
                    filter_by(network_id=network_id))
-        return [{api.ID: record.id,
-                 api.NETWORK_TYPE: record.network_type,
-                 api.PHYSICAL_NETWORK: record.physical_network,
-                 api.SEGMENTATION_ID: record.segmentation_id}
-                for record in records]
+        return [_make_segment_dict(record) for record in records]
+
+
+def get_networks_segments(session, network_ids):
+    """Get the segments of a number of networks, by network id."""
+
+    segments = dict((network_id, []) for network_id in network_ids)
+    if not segments:
+        return segments
+    with session.begin(subtransactions=True):
+        records = (session.query(models.NetworkSegment).
+                   filter(models.NetworkSegment.network_id.in_(segments)))
+        for record in records:
+            segments[record.network_id].append(_make_segment_dict(record))
+    return segments
 
 
 def ensure_port_binding(session, port_id):
@@ -70,6 +88,31 @@ def ensure_port_binding(session, port_id):
         return record
 
 
+def ensure_port_bindings(session, port_ids):
+    """Get the bindings of a number of ports, by port id.
+
+    The bindings missing are added unbound, the way ensure_port_binding
+    adds them.
+    """
+
+    bindings = {}
+    if not port_ids:
+        return bindings
+    with session.begin(subtransactions=True):
+        records = (session.query(models.PortBinding).
+                   filter(models.PortBinding.port_id.in_(port_ids)))
+        for record in records:
+            bindings[record.port_id] = record
+        for port_id in port_ids:
+            if port_id not in bindings:
+                record = models.PortBinding(
+                    port_id=port_id,
+                    vif_type=portbindings.VIF_TYPE_UNBOUND)
+                session.add(record)
+                bindings[port_id] = record
+    return bindings
+
+
 def get_port(session, port_id):
     """Get port record for update within transcation."""
 
@@ -87,6 +130,38 @@ def get_port(session, port_id):
             return
 
 
+def get_ports(session, port_ids):
+    """Get port records for update within transaction, by port id.
+
+    Like get_port, the port ids may be the start of the ids of the ports.
+    Those which match no port or several ports are left out.
+    """
+
+    ports = {}
+    if not port_ids:
+        return ports
+    port_ids = set(port_ids)
+    lengths = set(len(port_id) for port_id in port_ids)
+    multiple = set()
+    with session.begin(subtransactions=True):
+        records = (session.query(models_v2.Port).
+                   filter(sa.or_(*[models_v2.Port.id.startswith(port_id)
+                                   for port_id in port_ids])))
+        for record in records:
+            for length in lengths:
+                port_id = record.id[:length]
+                if port_id not in port_ids:
+                    continue
+                if port_id in ports:
+                    multiple.add(port_id)
+                ports[port_id] = record
+    for port_id in multiple:
+        LOG.error(_("Multiple ports have port_id starting with %s"),
+                  port_id)
+        del ports[port_id]
+    return ports
+
+
 def get_port_from_device_mac(device_mac):
     LOG.debug(_("get_port_from_device_mac() called for mac %s"), device_mac)
     session = db_api.get_session()
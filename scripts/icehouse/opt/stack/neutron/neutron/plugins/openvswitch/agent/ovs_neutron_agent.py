@@ -613,8 +613,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         lvm = self.local_vlan_map[net_uuid]
         lvm.vif_ports[port.vif_id] = port
         # Do not bind a port if it's already bound
-        cur_tag = self.int_br.db_get_val("Port", port.port_name, "tag")
-        if cur_tag != str(lvm.vlan):
+        cur_tag = self.int_br.get_port_tag_dict().get(port.port_name)
+        if cur_tag != lvm.vlan:
             self.int_br.set_db_attribute("Port", port.port_name, "tag",
                                          str(lvm.vlan))
             if port.ofport != -1:
@@ -649,8 +649,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         :param port: a ovs_lib.VifPort object.
         '''
         # Don't kill a port if it's already dead
-        cur_tag = self.int_br.db_get_val("Port", port.port_name, "tag")
-        if cur_tag != DEAD_VLAN_TAG:
+        cur_tag = self.int_br.get_port_tag_dict().get(port.port_name)
+        if str(cur_tag) != DEAD_VLAN_TAG:
             self.int_br.set_db_attribute("Port", port.port_name, "tag",
                                          DEAD_VLAN_TAG)
             self.int_br.add_flow(priority=2, in_port=port.ofport,
@@ -1007,124 +1007,131 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def treat_devices_added_or_updated(self, devices, ovs_restarted):
         skipped_devices = []
-        devices_details_list = []
-        for device in devices:
-            try:
-                # TODO(salv-orlando): Provide bulk API for retrieving
-                # details for all devices in one call
-                devices_details_list.append(
-                    self.plugin_rpc.get_device_details(
-                        self.context, device, self.agent_id))
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                raise DeviceListRetrievalError(devices=devices, error=e)
-
-        for details in devices_details_list:
-            device = details['device']
-            LOG.debug(_("Processing port %s"), device)
-            port = self.int_br.get_vif_port_by_id(device)
-            if not port:
-                # The port disappeared and cannot be processed
-                LOG.info(_("Port %s was not found on the integration bridge "
-                           "and will therefore not be processed"), device)
-                skipped_devices.append(device)
-                continue
-
-            if 'port_id' in details:
-                LOG.info(_("Port %(device)s updated. Details: %(details)s"),
-                         {'device': device, 'details': details})
-                self.treat_vif_port(port, details['port_id'],
-                                    details['network_id'],
-                                    details['network_type'],
-                                    details['physical_network'],
-                                    details['segmentation_id'],
-                                    details['admin_state_up'],
-                                    ovs_restarted)
-                # update plugin about port status
-                # FIXME(salv-orlando): Failures while updating device status
-                # must be handled appropriately. Otherwise this might prevent
-                # neutron server from sending network-vif-* events to the nova
-                # API server, thus possibly preventing instance spawn.
-                if details.get('admin_state_up'):
-                    LOG.debug(_("Setting status for %s to UP"), device)
-                    self.plugin_rpc.update_device_up(
-                        self.context, device, self.agent_id, cfg.CONF.host)
+        devices_up = []
+        devices_down = []
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            raise DeviceListRetrievalError(devices=devices, error=e)
+
+        vif_ports = self.int_br.get_vifs_by_ids(devices)
+        # The changes made to the ports of the integration bridge are applied
+        # with one ovs-vsctl and one ovs-ofctl per flow action, not a few per
+        # port, and before their status is reported.
+        self.int_br.defer_apply_on()
+        try:
+            for details in devices_details_list:
+                device = details['device']
+                LOG.debug(_("Processing port %s"), device)
+                port = vif_ports.get(device)
+                if not port:
+                    # The port disappeared and cannot be processed
+                    LOG.info(_("Port %s was not found on the integration "
+                               "bridge and will therefore not be processed"),
+                             device)
+                    skipped_devices.append(device)
+                    continue
+
+                if 'port_id' in details:
+                    LOG.info(_("Port %(device)s updated. "
+                               "Details: %(details)s"),
+                             {'device': device, 'details': details})
+                    self.treat_vif_port(port, details['port_id'],
+                                        details['network_id'],
+                                        details['network_type'],
+                                        details['physical_network'],
+                                        details['segmentation_id'],
+                                        details['admin_state_up'],
+                                        ovs_restarted)
+                    if details.get('admin_state_up'):
+                        LOG.debug(_("Setting status for %s to UP"), device)
+                        devices_up.append(device)
+                    else:
+                        LOG.debug(_("Setting status for %s to DOWN"), device)
+                        devices_down.append(device)
+                    LOG.info(_("Configuration for device %s completed."),
+                             device)
                 else:
-                    LOG.debug(_("Setting status for %s to DOWN"), device)
-                    self.plugin_rpc.update_device_down(
-                        self.context, device, self.agent_id, cfg.CONF.host)
-                LOG.info(_("Configuration for device %s completed."), device)
-            else:
-                LOG.warn(_("Device %s not defined on plugin"), device)
-                if (port and port.ofport != -1):
-                    self.port_dead(port)
+                    LOG.warn(_("Device %s not defined on plugin"), device)
+                    if (port and port.ofport != -1):
+                        self.port_dead(port)
+        finally:
+            self.int_br.defer_apply_off()
+        # update plugin about port status
+        # FIXME(salv-orlando): Failures while updating device status
+        # must be handled appropriately. Otherwise this might prevent
+        # neutron server from sending network-vif-* events to the nova
+        # API server, thus possibly preventing instance spawn.
+        if devices_up or devices_down:
+            self.plugin_rpc.update_device_list(self.context, devices_up,
+                                               devices_down, self.agent_id,
+                                               cfg.CONF.host)
         return skipped_devices
 
     def treat_ancillary_devices_added(self, devices):
-        devices_details_list = []
-        for device in devices:
-            try:
-                # TODO(salv-orlando): Provide bulk API for retrieving
-                # details for all devices in one call
-                devices_details_list.append(
-                    self.plugin_rpc.get_device_details(
-                        self.context, device, self.agent_id))
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                raise DeviceListRetrievalError(devices=devices, error=e)
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            raise DeviceListRetrievalError(devices=devices, error=e)
 
+        devices_up = []
         for details in devices_details_list:
             device = details['device']
             LOG.info(_("Ancillary Port %s added"), device)
+            devices_up.append(device)
 
-            # update plugin about port status
-            self.plugin_rpc.update_device_up(self.context,
-                                             device,
-                                             self.agent_id,
-                                             cfg.CONF.host)
+        # update plugin about port status
+        if devices_up:
+            self.plugin_rpc.update_device_list(self.context, devices_up, [],
+                                               self.agent_id, cfg.CONF.host)
 
     def treat_devices_removed(self, devices):
         resync = False
         self.sg_agent.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                self.plugin_rpc.update_device_down(self.context,
-                                                   device,
-                                                   self.agent_id,
-                                                   cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
-            self.port_unbound(device)
+        try:
+            self.plugin_rpc.update_device_list(self.context, [],
+                                               list(devices), self.agent_id,
+                                               cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            resync = True
+        self.int_br.defer_apply_on()
+        try:
+            for device in devices:
+                self.port_unbound(device)
+        finally:
+            self.int_br.defer_apply_off()
         return resync
 
     def treat_ancillary_devices_removed(self, devices):
-        resync = False
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            result = self.plugin_rpc.update_device_list(self.context, [],
+                                                        list(devices),
+                                                        self.agent_id,
+                                                        cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        for details in result['devices_down']:
             if details['exists']:
-                LOG.info(_("Port %s updated."), device)
+                LOG.info(_("Port %s updated."), details['device'])
                 # Nothing to do regarding local networking
             else:
-                LOG.debug(_("Device %s not defined on plugin"), device)
-        return resync
+                LOG.debug(_("Device %s not defined on plugin"),
+                          details['device'])
+        return False
 
     def process_network_ports(self, port_info, ovs_restarted):
         resync_a = False
@@ -1319,6 +1326,10 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     updated_ports_copy = self.updated_ports
                     self.updated_ports = set()
                     reg_ports = (set() if ovs_restarted else ports)
+                    # The ports and interfaces of the integration bridge
+                    # are listed once for the scan and the processing of
+                    # the ports of this iteration.
+                    self.int_br.cache_db_reads_on()
                     port_info = self.scan_ports(reg_ports, updated_ports_copy)
                     LOG.debug(_("Agent rpc_loop - iteration:%(iter_num)d - "
                                 "port information retrieved. "
@@ -1377,6 +1388,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     # Put the ports back in self.updated_port
                     self.updated_ports |= updated_ports_copy
                     sync = True
+                finally:
+                    self.int_br.cache_db_reads_off()
 
             # sleep till end of polling interval
             elapsed = (time.time() - start)
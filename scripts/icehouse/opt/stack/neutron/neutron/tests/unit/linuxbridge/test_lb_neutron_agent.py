@@ -160,6 +160,78 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                     agent.daemon_loop()
                 self.assertEqual(3, log.call_count)
 
+    def test_treat_devices_added(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        details = [{'device': 'tap1', 'port_id': 'port1',
+                    'network_id': 'net1', 'admin_state_up': True,
+                    'network_type': p_const.TYPE_LOCAL,
+                    'segmentation_id': None, 'physical_network': None},
+                   {'device': 'tap2', 'port_id': 'port2',
+                    'network_id': 'net1', 'admin_state_up': True,
+                    'network_type': p_const.TYPE_LOCAL,
+                    'segmentation_id': None, 'physical_network': None},
+                   {'device': 'tap3'}]
+        with contextlib.nested(
+            mock.patch.object(agent, 'prepare_devices_filter'),
+            mock.patch.object(agent.plugin_rpc, 'get_devices_details_list',
+                              return_value=details),
+            mock.patch.object(agent.plugin_rpc, 'update_device_list'),
+            mock.patch.object(agent.br_mgr, 'add_interface',
+                              side_effect=[True, False])
+        ) as (prepare_fn, get_details_fn, update_fn, add_if_fn):
+            self.assertFalse(agent.treat_devices_added(['tap1', 'tap2',
+                                                        'tap3']))
+            get_details_fn.assert_called_once_with(
+                agent.context, ['tap1', 'tap2', 'tap3'], agent.agent_id)
+            update_fn.assert_called_once_with(
+                agent.context, ['tap1'], ['tap2'], agent.agent_id,
+                cfg.CONF.host)
+
+    def test_treat_devices_added_details_failed(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        with contextlib.nested(
+            mock.patch.object(agent, 'prepare_devices_filter'),
+            mock.patch.object(agent.plugin_rpc, 'get_devices_details_list',
+                              side_effect=rpc_common.Timeout),
+            mock.patch.object(agent.plugin_rpc, 'update_device_list')
+        ) as (prepare_fn, get_details_fn, update_fn):
+            self.assertTrue(agent.treat_devices_added(['tap1']))
+            self.assertFalse(update_fn.called)
+
+    def test_treat_devices_removed(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        with contextlib.nested(
+            mock.patch.object(agent, 'remove_devices_filter'),
+            mock.patch.object(agent.plugin_rpc, 'update_device_list',
+                              return_value={'devices_up': [],
+                                            'devices_down': [
+                                                {'device': 'tap1',
+                                                 'exists': True}]}),
+            mock.patch.object(agent.br_mgr, 'remove_empty_bridges')
+        ) as (remove_filter_fn, update_fn, remove_bridges_fn):
+            self.assertFalse(agent.treat_devices_removed(['tap1']))
+            update_fn.assert_called_once_with(
+                agent.context, [], ['tap1'], agent.agent_id, cfg.CONF.host)
+            self.assertTrue(remove_bridges_fn.called)
+
+    def test_treat_devices_removed_failed(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        with contextlib.nested(
+            mock.patch.object(agent, 'remove_devices_filter'),
+            mock.patch.object(agent.plugin_rpc, 'update_device_list',
+                              side_effect=rpc_common.Timeout),
+            mock.patch.object(agent.br_mgr, 'remove_empty_bridges')
+        ) as (remove_filter_fn, update_fn, remove_bridges_fn):
+            self.assertTrue(agent.treat_devices_removed(['tap1']))
+
 
 class TestLinuxBridgeManager(base.BaseTestCase):
     def setUp(self):
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron import context
@@ -94,6 +96,31 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 portbindings.VIF_TYPE_OVS,
                                 True, True, 'ACTIVE')
 
+    def test_get_devices_details_list(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, arg_list=(portbindings.HOST_ID,),
+                          **host_arg),
+                self.port(subnet=subnet, arg_list=(portbindings.HOST_ID,),
+                          **host_arg),
+                self.port(subnet=subnet)
+            ) as (port1, port2, port3):
+                devices = [port1['port']['id'],
+                           'tap' + port2['port']['id'][:11],
+                           port3['port']['id'],
+                           'fake_device']
+                neutron_context = context.get_admin_context()
+                details = self.plugin.callbacks.get_devices_details_list(
+                    neutron_context, agent_id="theAgentId", devices=devices)
+        self.assertEqual(devices, [entry['device'] for entry in details])
+        self.assertEqual(port1['port']['id'], details[0]['port_id'])
+        self.assertEqual('local', details[0]['network_type'])
+        self.assertEqual(port2['port']['id'], details[1]['port_id'])
+        self.assertEqual('local', details[1]['network_type'])
+        self.assertNotIn('network_type', details[2])
+        self.assertNotIn('port_id', details[3])
+
     def _test_update_port_binding(self, host, new_host=None):
         with mock.patch.object(self.plugin,
                                '_notify_port_updated') as notify_mock:
@@ -415,11 +415,13 @@ class TestOFANeutronAgent(OFAAgentTestCase):
 
     def test_treat_devices_added_returns_true_for_missing_device(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
                               side_effect=Exception()),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=mock.Mock())):
-            self.assertTrue(self.agent.treat_devices_added_or_updated([{}]))
+            self.assertTrue(
+                self.agent.treat_devices_added_or_updated(['xxx']))
 
     def _mock_treat_devices_added_updated(self, details, port, func_name):
         """Mock treat devices added or updated.
@@ -429,16 +431,18 @@ class TestOFANeutronAgent(OFAAgentTestCase):
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
+        details.__getitem__.return_value = 'xxx'
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=port),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, func_name)
-        ) as (get_dev_fn, get_vif_func, upd_dev_up, upd_dev_down, func):
-            self.assertFalse(self.agent.treat_devices_added_or_updated([{}]))
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, func):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
         return func.called
 
     def test_treat_devices_added_updated_ignores_invalid_ofport(self):
@@ -455,10 +459,13 @@ class TestOFANeutronAgent(OFAAgentTestCase):
 
     def test_treat_devices_added_does_not_process_missing_port(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list'),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=None)
         ) as (get_dev_fn, get_vif_func):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
             self.assertFalse(get_dev_fn.called)
 
     def test_treat_devices_added_updated_updates_known_port(self):
@@ -476,28 +483,41 @@ class TestOFANeutronAgent(OFAAgentTestCase):
                              'segmentation_id': 'bar',
                              'network_type': 'baz'}
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=fake_details_dict),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=mock.MagicMock()),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, 'treat_vif_port')
-        ) as (get_dev_fn, get_vif_func, upd_dev_up,
-              upd_dev_down, treat_vif_port):
-            self.assertFalse(self.agent.treat_devices_added_or_updated([{}]))
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, treat_vif_port):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
             self.assertTrue(treat_vif_port.called)
-            self.assertTrue(upd_dev_down.called)
+            upd_dev_list.assert_called_once_with(
+                self.agent.context, [], ['xxx'], self.agent.agent_id,
+                cfg.CONF.host)
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
+    def test_treat_devices_removed_unbinds_ports_when_rpc_fails(self):
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                              side_effect=Exception()),
+            mock.patch.object(self.agent, 'port_unbound')
+        ) as (upd_dev_list, port_unbound):
+            self.assertTrue(self.agent.treat_devices_removed(['dev1',
+                                                              'dev2']))
+        port_unbound.assert_has_calls([mock.call('dev1'), mock.call('dev2')])
+
     def _mock_treat_devices_removed(self, port_exists):
         details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                               return_value={'devices_up': [],
+                                             'devices_down': [details]}):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
                 self.assertFalse(self.agent.treat_devices_removed([{}]))
         self.assertTrue(port_unbound.called)
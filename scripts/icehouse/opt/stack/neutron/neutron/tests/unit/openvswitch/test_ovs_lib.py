@@ -479,6 +479,57 @@ class OVS_Lib_Test(base.BaseTestCase):
             mock.call('mod-flows', ['-'], 'modified_flow_2\n')
         ])
 
+    def test_defer_apply_db_commands(self):
+        self.br.defer_apply_on()
+        self.br.set_db_attribute("Port", "tap1", "tag", "1")
+        self.br.clear_db_attribute("Port", "tap2", "tag")
+        self.assertFalse(self.execute.called)
+        self.br.defer_apply_off()
+
+        self.execute.assert_called_once_with(
+            ["ovs-vsctl", self.TO,
+             "--", "set", "Port", "tap1", "tag=1",
+             "--", "clear", "Port", "tap2", "tag"],
+            root_helper=self.root_helper)
+        self.assertEqual([], self.br.deferred_db_commands)
+
+    def test_defer_apply_delete_port(self):
+        # A port is deleted right away, so that adding it back is not undone
+        # when the deferred commands are applied.
+        self.br.defer_apply_on()
+        self.br.delete_port("tap3")
+        self.execute.assert_called_once_with(
+            ["ovs-vsctl", self.TO,
+             "--", "--if-exists", "del-port", self.BR_NAME, "tap3"],
+            root_helper=self.root_helper)
+        self.br.defer_apply_off()
+        self.assertEqual(1, self.execute.call_count)
+
+    def test_defer_apply_db_commands_one_by_one_on_error(self):
+        expected_calls_and_values = [
+            (mock.call(["ovs-vsctl", self.TO,
+                        "--", "set", "Port", "tap1", "tag=1",
+                        "--", "set", "Port", "tap2", "tag=1"],
+                       root_helper=self.root_helper),
+             RuntimeError()),
+            (mock.call(["ovs-vsctl", self.TO,
+                        "--", "set", "Port", "tap1", "tag=1"],
+                       root_helper=self.root_helper),
+             RuntimeError()),
+            (mock.call(["ovs-vsctl", self.TO,
+                        "--", "set", "Port", "tap2", "tag=1"],
+                       root_helper=self.root_helper),
+             None),
+        ]
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+
+        self.br.defer_apply_on()
+        self.br.set_db_attribute("Port", "tap1", "tag", "1")
+        self.br.set_db_attribute("Port", "tap2", "tag", "1")
+        self.br.defer_apply_off()
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+
     def test_add_tunnel_port(self):
         pname = "tap99"
         local_ip = "1.1.1.1"
@@ -882,6 +933,74 @@ class OVS_Lib_Test(base.BaseTestCase):
         self.assertIsNone(self._test_get_vif_port_by_id('tap99id', data,
                                                         "br-ext"))
 
+    def _expected_list_calls(self, data):
+        headings = ['name', 'external_ids', 'ofport']
+        return [
+            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
+                       root_helper=self.root_helper),
+             'tap99\ntap98\ntap97\ntap96'),
+            (mock.call(["ovs-vsctl", self.TO, "--format=json",
+                        "--", "--columns=name,external_ids,ofport",
+                        "list", "Interface"],
+                       root_helper=self.root_helper),
+             self._encode_ovs_json(headings, data)),
+        ]
+
+    def test_get_vifs_by_ids(self):
+        data = [
+            # A vif port on this bridge:
+            ['tap99', {'iface-id': 'tap99id', 'attached-mac': 'tap99mac'}, 1],
+            # A vif port not asked for:
+            ['tap98', {'iface-id': 'tap98id', 'attached-mac': 'tap98mac'}, 2],
+            # A vif port not yet configured:
+            ['tap97', {'iface-id': 'tap97id', 'attached-mac': 'tap97mac'},
+             ['set', []]],
+            # A vif port without mac:
+            ['tap96', {'iface-id': 'tap96id'}, 3],
+            # A vif port on another bridge:
+            ['tap88', {'iface-id': 'tap88id', 'attached-mac': 'tap88mac'}, 4],
+        ]
+        expected_calls_and_values = self._expected_list_calls(data)
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+
+        vifs = self.br.get_vifs_by_ids(['tap99id', 'tap97id', 'tap96id',
+                                        'tap88id', 'tap87id'])
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertEqual(['tap99id'], vifs.keys())
+        vif_port = vifs['tap99id']
+        self.assertEqual('tap99', vif_port.port_name)
+        self.assertEqual(1, vif_port.ofport)
+        self.assertEqual('tap99mac', vif_port.vif_mac)
+        self.assertEqual(self.br, vif_port.switch)
+
+    def test_cache_db_reads(self):
+        data = [
+            ['tap99', {'iface-id': 'tap99id', 'attached-mac': 'tap99mac'}, 1],
+        ]
+        # The ports, interfaces and tags are listed once while caching reads.
+        expected_calls_and_values = self._expected_list_calls(data)
+        expected_calls_and_values += [
+            (mock.call(["ovs-vsctl", self.TO, "--format=json",
+                        "--", "--columns=name,tag", "list", "Port"],
+                       root_helper=self.root_helper),
+             self._encode_ovs_json(['name', 'tag'], [['tap99', 1]])),
+            expected_calls_and_values[0],
+        ]
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+
+        self.br.cache_db_reads_on()
+        self.assertEqual(set(['tap99id']), self.br.get_vif_port_set())
+        self.assertEqual(['tap99id'],
+                         self.br.get_vifs_by_ids(['tap99id']).keys())
+        self.assertEqual({'tap99': 1}, self.br.get_port_tag_dict())
+        self.assertEqual({'tap99': 1}, self.br.get_port_tag_dict())
+        self.br.cache_db_reads_off()
+        self.br.get_port_name_list()
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertEqual(4, self.execute.call_count)
+
     def _check_ovs_vxlan_version(self, installed_usr_version,
                                  installed_klm_version,
                                  installed_kernel_version,
@@ -134,19 +134,21 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         port = mock.Mock()
         port.ofport = ofport
         net_uuid = 'my-net-uuid'
+        port_tags = {}
         if old_local_vlan is not None:
             self.agent.local_vlan_map[net_uuid] = (
                 ovs_neutron_agent.LocalVLANMapping(
                     old_local_vlan, None, None, None))
+            port_tags[port.port_name] = old_local_vlan
         with contextlib.nested(
             mock.patch('neutron.agent.linux.ovs_lib.OVSBridge.'
                        'set_db_attribute', return_value=True),
             mock.patch('neutron.agent.linux.ovs_lib.OVSBridge.'
-                       'db_get_val', return_value=str(old_local_vlan)),
+                       'get_port_tag_dict', return_value=port_tags),
             mock.patch.object(self.agent.int_br, 'delete_flows')
-        ) as (set_ovs_db_func, get_ovs_db_func, delete_flows_func):
+        ) as (set_ovs_db_func, get_port_tags_func, delete_flows_func):
             self.agent.port_bound(port, net_uuid, 'local', None, None, False)
-        get_ovs_db_func.assert_called_once_with("Port", mock.ANY, "tag")
+        get_port_tags_func.assert_called_once_with()
         if new_local_vlan != old_local_vlan:
             set_ovs_db_func.assert_called_once_with(
                 "Port", mock.ANY, "tag", str(new_local_vlan))
@@ -170,16 +172,19 @@ class TestOvsNeutronAgent(base.BaseTestCase):
     def _test_port_dead(self, cur_tag=None):
         port = mock.Mock()
         port.ofport = 1
+        port_tags = {}
+        if cur_tag is not None:
+            port_tags[port.port_name] = cur_tag
         with contextlib.nested(
             mock.patch('neutron.agent.linux.ovs_lib.OVSBridge.'
                        'set_db_attribute', return_value=True),
             mock.patch('neutron.agent.linux.ovs_lib.OVSBridge.'
-                       'db_get_val', return_value=cur_tag),
+                       'get_port_tag_dict', return_value=port_tags),
             mock.patch.object(self.agent.int_br, 'add_flow')
-        ) as (set_ovs_db_func, get_ovs_db_func, add_flow_func):
+        ) as (set_ovs_db_func, get_port_tags_func, add_flow_func):
             self.agent.port_dead(port)
-        get_ovs_db_func.assert_called_once_with("Port", mock.ANY, "tag")
-        if cur_tag == ovs_neutron_agent.DEAD_VLAN_TAG:
+        get_port_tags_func.assert_called_once_with()
+        if cur_tag == int(ovs_neutron_agent.DEAD_VLAN_TAG):
             self.assertFalse(set_ovs_db_func.called)
             self.assertFalse(add_flow_func.called)
         else:
@@ -192,7 +197,7 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         self._test_port_dead()
 
     def test_port_dead_with_port_already_dead(self):
-        self._test_port_dead(ovs_neutron_agent.DEAD_VLAN_TAG)
+        self._test_port_dead(int(ovs_neutron_agent.DEAD_VLAN_TAG))
 
     def mock_scan_ports(self, vif_port_set=None, registered_ports=None,
                         updated_ports=None, port_tags_dict=None):
@@ -277,10 +282,11 @@ class TestOvsNeutronAgent(base.BaseTestCase):
 
     def test_treat_devices_added_returns_raises_for_missing_device(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
                               side_effect=Exception()),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=mock.Mock())):
+            mock.patch.object(self.agent.int_br, 'get_vifs_by_ids',
+                              return_value={})):
             self.assertRaises(
                 ovs_neutron_agent.DeviceListRetrievalError,
                 self.agent.treat_devices_added_or_updated, [{}], False)
@@ -289,19 +295,19 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         """Mock treat devices added or updated.
 
         :param details: the details to return for the device
-        :param port: the port that get_vif_port_by_id should return
+        :param port: the port that get_vifs_by_ids should return
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=port),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
+            mock.patch.object(self.agent.int_br, 'get_vifs_by_ids',
+                              return_value={details['device']: port}),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, func_name)
-        ) as (get_dev_fn, get_vif_func, upd_dev_up, upd_dev_down, func):
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, func):
             skip_devs = self.agent.treat_devices_added_or_updated([{}], False)
             # The function should not raise
             self.assertFalse(skip_devs)
@@ -321,9 +327,10 @@ class TestOvsNeutronAgent(base.BaseTestCase):
 
     def test_treat_devices_added_does_not_process_missing_port(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details'),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=None)
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list'),
+            mock.patch.object(self.agent.int_br, 'get_vifs_by_ids',
+                              return_value={})
         ) as (get_dev_fn, get_vif_func):
             self.assertFalse(get_dev_fn.called)
 
@@ -338,22 +345,19 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         dev_mock.__getitem__.return_value = 'the_skipped_one'
         with contextlib.nested(
             mock.patch.object(self.agent.plugin_rpc,
-                              'get_device_details',
-                              return_value=dev_mock),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=None),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+                              'get_devices_details_list',
+                              return_value=[dev_mock]),
+            mock.patch.object(self.agent.int_br, 'get_vifs_by_ids',
+                              return_value={}),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, 'treat_vif_port')
-        ) as (get_dev_fn, get_vif_func, upd_dev_up,
-              upd_dev_down, treat_vif_port):
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, treat_vif_port):
             skip_devs = self.agent.treat_devices_added_or_updated([{}], False)
             # The function should return False for resync and no device
             # processed
             self.assertEqual(['the_skipped_one'], skip_devs)
             self.assertFalse(treat_vif_port.called)
-            self.assertFalse(upd_dev_down.called)
-            self.assertFalse(upd_dev_up.called)
+            self.assertFalse(upd_dev_list.called)
 
     def test_treat_devices_added_updated_put_port_down(self):
         fake_details_dict = {'admin_state_up': False,
@@ -364,30 +368,74 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                              'segmentation_id': 'bar',
                              'network_type': 'baz'}
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=fake_details_dict),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=mock.MagicMock()),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
+            mock.patch.object(self.agent.int_br, 'get_vifs_by_ids',
+                              return_value={'xxx': mock.MagicMock()}),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, 'treat_vif_port')
-        ) as (get_dev_fn, get_vif_func, upd_dev_up,
-              upd_dev_down, treat_vif_port):
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, treat_vif_port):
             skip_devs = self.agent.treat_devices_added_or_updated([{}], False)
             # The function should return False for resync
             self.assertFalse(skip_devs)
             self.assertTrue(treat_vif_port.called)
-            self.assertTrue(upd_dev_down.called)
+            upd_dev_list.assert_called_once_with(
+                self.agent.context, [], ['xxx'], self.agent.agent_id,
+                cfg.CONF.host)
+
+    def test_treat_devices_added_updated_reports_status_once_applied(self):
+        fake_details_dict = {'admin_state_up': True,
+                             'port_id': 'xxx',
+                             'device': 'xxx',
+                             'network_id': 'yyy',
+                             'physical_network': 'foo',
+                             'segmentation_id': 'bar',
+                             'network_type': 'baz'}
+        manager = mock.Mock()
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
+            mock.patch.object(self.agent.int_br, 'get_vifs_by_ids',
+                              return_value={'xxx': mock.MagicMock()}),
+            mock.patch.object(self.agent.int_br, 'defer_apply_on'),
+            mock.patch.object(self.agent.int_br, 'defer_apply_off'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
+            mock.patch.object(self.agent, 'treat_vif_port')
+        ) as (get_dev_fn, get_vif_func, defer_apply_on, defer_apply_off,
+              upd_dev_list, treat_vif_port):
+            manager.attach_mock(defer_apply_on, 'defer_apply_on')
+            manager.attach_mock(defer_apply_off, 'defer_apply_off')
+            manager.attach_mock(upd_dev_list, 'update_device_list')
+            manager.attach_mock(treat_vif_port, 'treat_vif_port')
+            self.agent.treat_devices_added_or_updated([{}], False)
+        # The port is only reported up once its tag and flows are applied.
+        self.assertEqual(
+            ['defer_apply_on', 'treat_vif_port', 'defer_apply_off',
+             'update_device_list'],
+            [name for name, args, kwargs in manager.mock_calls])
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
+    def test_treat_devices_removed_unbinds_ports_when_rpc_fails(self):
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                              side_effect=Exception()),
+            mock.patch.object(self.agent, 'port_unbound')
+        ) as (upd_dev_list, port_unbound):
+            self.assertTrue(self.agent.treat_devices_removed(['dev1',
+                                                              'dev2']))
+        port_unbound.assert_has_calls([mock.call('dev1'), mock.call('dev2')])
+
     def _mock_treat_devices_removed(self, port_exists):
         details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                               return_value={'devices_up': [],
+                                             'devices_down': [details]}):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
                 self.assertFalse(self.agent.treat_devices_removed([{}]))
         self.assertTrue(port_unbound.called)
@@ -427,7 +427,8 @@ class TunnelTest(base.BaseTestCase):
 
     def test_port_bound(self):
         self.mock_int_bridge_expected += [
-            mock.call.db_get_val('Port', VIF_PORT.port_name, 'tag'),
+            mock.call.get_port_tag_dict(),
+            mock.call.get_port_tag_dict().get(VIF_PORT.port_name),
             mock.call.set_db_attribute('Port', VIF_PORT.port_name,
                                        'tag', str(LVM.vlan)),
             mock.call.delete_flows(in_port=VIF_PORT.ofport)
@@ -458,7 +459,8 @@ class TunnelTest(base.BaseTestCase):
 
     def test_port_dead(self):
         self.mock_int_bridge_expected += [
-            mock.call.db_get_val('Port', VIF_PORT.port_name, 'tag'),
+            mock.call.get_port_tag_dict(),
+            mock.call.get_port_tag_dict().get(VIF_PORT.port_name),
             mock.call.set_db_attribute(
                 'Port', VIF_PORT.port_name,
                 'tag', ovs_neutron_agent.DEAD_VLAN_TAG),
@@ -517,7 +519,11 @@ class TunnelTest(base.BaseTestCase):
 
         self.mock_int_bridge_expected += [
             mock.call.dump_flows_for_table(constants.CANARY_TABLE),
-            mock.call.dump_flows_for_table(constants.CANARY_TABLE)
+            mock.call.cache_db_reads_on(),
+            mock.call.cache_db_reads_off(),
+            mock.call.dump_flows_for_table(constants.CANARY_TABLE),
+            mock.call.cache_db_reads_on(),
+            mock.call.cache_db_reads_off()
         ]
 
         with contextlib.nested(
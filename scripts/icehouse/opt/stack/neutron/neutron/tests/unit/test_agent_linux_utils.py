@@ -12,10 +12,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sys
+
 import fixtures
 import mock
+from oslo.config import cfg
 import testtools
 
+from neutron.agent.common import config
 from neutron.agent.linux import utils
 from neutron.tests import base
 
@@ -77,6 +81,108 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
         self.assertEqual(result, expected)
 
 
+class AgentUtilsExecuteRootwrapDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsExecuteRootwrapDaemonTest, self).setUp()
+        config.register_root_helper(cfg.CONF)
+        cfg.CONF.set_override('root_helper_daemon',
+                              'sudo neutron-rootwrap-daemon rootwrap.conf',
+                              'AGENT')
+        self.useFixture(fixtures.MonkeyPatch(
+            'neutron.agent.linux.utils._rootwrap_daemon_clients', {}))
+        # The client module is faked, so that the tests do not depend on
+        # the version of oslo.rootwrap installed.
+        self.client = mock.Mock()
+        rootwrap = mock.Mock()
+        self.client_cls = rootwrap.client.Client
+        self.client_cls.return_value = self.client
+        modules_patch = mock.patch.dict(
+            sys.modules, {'oslo.rootwrap': rootwrap,
+                          'oslo.rootwrap.client': rootwrap.client})
+        modules_patch.start()
+        self.addCleanup(modules_patch.stop)
+        self.create_process = self.useFixture(fixtures.MonkeyPatch(
+            'neutron.agent.linux.utils.create_process', mock.Mock())).new_value
+
+    def test_execute_with_daemon(self):
+        self.client.execute.return_value = (0, 'out', '')
+        self.assertEqual('out', utils.execute(['ls', 1], 'sudo',
+                                              process_input='in',
+                                              addl_env={'foo': 'bar'}))
+        self.client_cls.assert_called_once_with(
+            ['sudo', 'neutron-rootwrap-daemon', 'rootwrap.conf'])
+        self.client.execute.assert_called_once_with(['ls', '1'],
+                                                    {'foo': 'bar'}, 'in')
+        self.assertFalse(self.create_process.called)
+
+    def test_execute_with_daemon_exit_code(self):
+        self.client.execute.return_value = (1, '', 'error')
+        self.assertRaises(RuntimeError, utils.execute, ['ls'], 'sudo')
+        self.assertEqual('', utils.execute(['ls'], 'sudo',
+                                           extra_ok_codes=[1]))
+
+    def test_execute_without_root_helper(self):
+        self.create_process.return_value = (mock.Mock(returncode=0), ['ls'])
+        self.create_process.return_value[0].communicate.return_value = (
+            'out', '')
+        self.assertEqual('out', utils.execute(['ls']))
+        self.assertFalse(self.client.execute.called)
+
+    def _mock_root_helper(self):
+        self.create_process.return_value = (mock.Mock(returncode=0), ['ls'])
+        self.create_process.return_value[0].communicate.return_value = (
+            'out', '')
+
+    def test_execute_falls_back_to_root_helper(self):
+        self.client._ensure_initialized.side_effect = Exception()
+        self._mock_root_helper()
+        self.assertEqual('out', utils.execute(['ls'], 'sudo'))
+        self.assertEqual('out', utils.execute(['ls'], 'sudo'))
+        # The daemon is not tried again once it failed to start.
+        self.assertEqual(1, self.client._ensure_initialized.call_count)
+        self.assertFalse(self.client.execute.called)
+        self.assertEqual(2, self.create_process.call_count)
+
+    def test_execute_without_ensure_initialized(self):
+        self.client_cls.return_value = mock.Mock(spec=['execute'])
+        self.client_cls.return_value.execute.return_value = (0, 'out', '')
+        self.assertEqual('out', utils.execute(['ls'], 'sudo'))
+        self.assertFalse(self.create_process.called)
+
+    def test_execute_without_daemon_support(self):
+        real_import = __import__
+
+        def fake_import(name, *args):
+            if name == 'oslo.rootwrap':
+                raise ImportError()
+            return real_import(name, *args)
+
+        self._mock_root_helper()
+        with mock.patch('__builtin__.__import__', side_effect=fake_import):
+            self.assertEqual('out', utils.execute(['ls'], 'sudo'))
+        self.assertFalse(self.client_cls.called)
+        self.assertEqual(1, self.create_process.call_count)
+
+    def test_execute_daemon_connection_lost(self):
+        self.client.execute.side_effect = EOFError()
+        self._mock_root_helper()
+        # The command may have been run, so it is not run again.
+        self.assertRaises(RuntimeError, utils.execute, ['ls'], 'sudo')
+        self.assertFalse(self.create_process.called)
+        self.assertEqual('out', utils.execute(['ls'], 'sudo'))
+        self.assertEqual(1, self.client.execute.call_count)
+        self.assertEqual(1, self.create_process.call_count)
+
+    def test_execute_daemon_error(self):
+        self.client.execute.side_effect = [ValueError(), (0, 'out', '')]
+        self.assertRaises(RuntimeError, utils.execute, ['ls'], 'sudo')
+        # The daemon is still used after an error other than a lost
+        # connection.
+        self.assertEqual('out', utils.execute(['ls'], 'sudo'))
+        self.assertEqual(2, self.client.execute.call_count)
+        self.assertFalse(self.create_process.called)
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
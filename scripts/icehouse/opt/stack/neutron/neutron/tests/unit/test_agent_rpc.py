@@ -15,10 +15,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron.agent import rpc
 from neutron.openstack.common import context
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.tests import base
 
 
@@ -45,6 +48,118 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def test_get_devices_details_list(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as call:
+            call.return_value = [{'device': 'fake_device'}]
+            self.assertEqual(
+                [{'device': 'fake_device'}],
+                agent.get_devices_details_list(ctxt, ['fake_device'],
+                                               'fake_agent_id'))
+        self.assertEqual('get_devices_details_list',
+                         call.call_args[0][1]['method'])
+        self.assertEqual('1.2', call.call_args[1]['version'])
+
+    def test_get_devices_details_list_chunks(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with contextlib.nested(
+            mock.patch.object(rpc, 'DEVICE_LIST_CHUNK_SIZE', new=2),
+            mock.patch.object(agent, 'call')
+        ) as (chunk_size, call):
+            call.side_effect = [[{'device': 'dev1'}, {'device': 'dev2'}],
+                                [{'device': 'dev3'}]]
+            self.assertEqual(
+                [{'device': 'dev1'}, {'device': 'dev2'}, {'device': 'dev3'}],
+                agent.get_devices_details_list(ctxt, ['dev1', 'dev2', 'dev3'],
+                                               'fake_agent_id'))
+        self.assertEqual([['dev1', 'dev2'], ['dev3']],
+                         [args[0][1]['args']['devices']
+                          for args in call.call_args_list])
+
+    def test_get_devices_details_list_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as call:
+            call.side_effect = [
+                rpc_common.RemoteError('UnsupportedRpcVersion'),
+                {'device': 'dev1'}, {'device': 'dev2'}]
+            self.assertEqual(
+                [{'device': 'dev1'}, {'device': 'dev2'}],
+                agent.get_devices_details_list(ctxt, ['dev1', 'dev2'],
+                                               'fake_agent_id'))
+        self.assertEqual(['get_devices_details_list', 'get_device_details',
+                          'get_device_details'],
+                         [args[0][1]['method']
+                          for args in call.call_args_list])
+
+    def test_get_devices_details_list_remote_error(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as call:
+            call.side_effect = rpc_common.RemoteError('ValueError')
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.get_devices_details_list,
+                              ctxt, ['dev1'], 'fake_agent_id')
+        self.assertEqual(1, call.call_count)
+
+    def test_update_device_list(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        expect_val = {'devices_up': ['dev1'],
+                      'devices_down': [{'device': 'dev2', 'exists': True}]}
+        with mock.patch.object(agent, 'call') as call:
+            call.return_value = expect_val
+            self.assertEqual(expect_val,
+                             agent.update_device_list(ctxt, ['dev1'],
+                                                      ['dev2'],
+                                                      'fake_agent_id',
+                                                      'fake_host'))
+        self.assertEqual('update_device_list',
+                         call.call_args[0][1]['method'])
+        self.assertEqual('1.2', call.call_args[1]['version'])
+
+    def test_update_device_list_chunks(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with contextlib.nested(
+            mock.patch.object(rpc, 'DEVICE_LIST_CHUNK_SIZE', new=2),
+            mock.patch.object(agent, 'call')
+        ) as (chunk_size, call):
+            call.side_effect = [
+                {'devices_up': ['dev1'],
+                 'devices_down': [{'device': 'dev2', 'exists': True}]},
+                {'devices_up': [],
+                 'devices_down': [{'device': 'dev3', 'exists': False}]}]
+            self.assertEqual(
+                {'devices_up': ['dev1'],
+                 'devices_down': [{'device': 'dev2', 'exists': True},
+                                  {'device': 'dev3', 'exists': False}]},
+                agent.update_device_list(ctxt, ['dev1'], ['dev2', 'dev3'],
+                                         'fake_agent_id', 'fake_host'))
+        self.assertEqual([(['dev1'], ['dev2']), ([], ['dev3'])],
+                         [(args[0][1]['args']['devices_up'],
+                           args[0][1]['args']['devices_down'])
+                          for args in call.call_args_list])
+
+    def test_update_device_list_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as call:
+            call.side_effect = [
+                rpc_common.UnsupportedRpcVersion(version='1.2'),
+                None, {'device': 'dev2', 'exists': False}]
+            self.assertEqual(
+                {'devices_up': ['dev1'],
+                 'devices_down': [{'device': 'dev2', 'exists': False}]},
+                agent.update_device_list(ctxt, ['dev1'], ['dev2'],
+                                         'fake_agent_id', 'fake_host'))
+        self.assertEqual(['update_device_list', 'update_device_up',
+                          'update_device_down'],
+                         [args[0][1]['method']
+                          for args in call.call_args_list])
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state_use_call(self):
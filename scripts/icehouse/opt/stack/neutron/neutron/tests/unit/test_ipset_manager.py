@@ -0,0 +1,98 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.agent.linux import ipset_manager
+from neutron.tests import base
+
+RESTORE = ['ipset', 'restore', '-exist']
+
+CREATE_SG1 = ('create IPv4sg1 hash:net family inet\n'
+              'create IPv4sg1-n hash:net family inet\n'
+              'flush IPv4sg1-n\n'
+              'add IPv4sg1-n 10.0.0.2/32\n'
+              'add IPv4sg1-n 10.0.0.3/32\n'
+              'swap IPv4sg1-n IPv4sg1\n'
+              'destroy IPv4sg1-n\n')
+
+
+class IpsetManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IpsetManagerTestCase, self).setUp()
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(self.execute,
+                                                root_helper='sudo')
+
+    def _assert_restored(self, *inputs):
+        self.assertEqual(
+            [mock.call(RESTORE, process_input=process_input,
+                       root_helper='sudo') for process_input in inputs],
+            self.execute.call_args_list)
+
+    def test_set_members_new_set(self):
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.3/32', '10.0.0.2/32'])
+        self._assert_restored(CREATE_SG1)
+
+    def test_set_members_new_ipv6_set(self):
+        self.ipset.set_members('IPv6sg1', 'IPv6', [])
+        self._assert_restored('create IPv6sg1 hash:net family inet6\n'
+                              'create IPv6sg1-n hash:net family inet6\n'
+                              'flush IPv6sg1-n\n'
+                              'swap IPv6sg1-n IPv6sg1\n'
+                              'destroy IPv6sg1-n\n')
+
+    def test_set_members_changed(self):
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.2/32', '10.0.0.3/32'])
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.3/32', '10.0.0.4/32'])
+        self._assert_restored(CREATE_SG1,
+                              'add IPv4sg1 10.0.0.4/32\n'
+                              'del IPv4sg1 10.0.0.2/32\n')
+
+    def test_set_members_unchanged(self):
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.2/32', '10.0.0.3/32'])
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.3/32', '10.0.0.2/32'])
+        self._assert_restored(CREATE_SG1)
+
+    def test_destroy_set(self):
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.2/32', '10.0.0.3/32'])
+        self.ipset.destroy_set('IPv4sg1')
+        self.ipset.destroy_set('IPv4sg2')
+        self._assert_restored(CREATE_SG1, 'destroy IPv4sg1\n')
+
+    def test_defer_apply(self):
+        self.ipset.defer_apply_on()
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.2/32', '10.0.0.3/32'])
+        self.ipset.set_members('IPv4sg1', 'IPv4', ['10.0.0.3/32'])
+        self.assertFalse(self.execute.called)
+        self.ipset.defer_apply_off()
+        self._assert_restored(CREATE_SG1 + 'del IPv4sg1 10.0.0.2/32\n')
+
+    def test_set_members_failed(self):
+        self.execute.side_effect = [RuntimeError(), '']
+        self.assertRaises(RuntimeError, self.ipset.set_members,
+                          'IPv4sg1', 'IPv4', ['10.0.0.2/32', '10.0.0.3/32'])
+        # The set is filled anew.
+        self.ipset.set_members('IPv4sg1', 'IPv4',
+                               ['10.0.0.2/32', '10.0.0.3/32'])
+        self._assert_restored(CREATE_SG1, CREATE_SG1)
@@ -796,6 +796,107 @@ class IptablesFirewallTestCase(base.BaseTestCase):
         ingress = None
         self._test_prepare_port_filter(rule, ingress, egress)
 
+    def test_filter_ipv4_ingress_remote_group(self):
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.3/32'], 'IPv6': []})
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'protocol': 'tcp',
+                'port_range_min': 22,
+                'port_range_max': 22,
+                'remote_group_id': 'fake_sgid'}
+        ingress = call.add_rule('ifake_dev',
+                                '-p tcp -m tcp --dport 22 '
+                                '-m set --match-set IPv4fake_sgid src '
+                                '-j RETURN')
+        egress = None
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_filter_ipv6_egress_remote_group(self):
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': [], 'IPv6': ['fe80::3/128']})
+        rule = {'ethertype': 'IPv6',
+                'direction': 'egress',
+                'remote_group_id': 'fake_sgid'}
+        egress = call.add_rule('ofake_dev',
+                               '-m set --match-set IPv6fake_sgid dst '
+                               '-j RETURN')
+        ingress = None
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_filter_ipv4_ingress_unknown_remote_group(self):
+        # A rule of a remote group without members must not allow any
+        # address.
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'protocol': 'tcp',
+                'remote_group_id': 'fake_sgid'}
+        self._test_prepare_port_filter(rule, None, None)
+
+    def test_filter_ipv4_ingress_remote_group_converted(self):
+        # The rules are converted to a rule per member ip when the remote
+        # group is not given members.
+        prefix = FAKE_PREFIX['IPv4']
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'source_ip_prefix': prefix,
+                'remote_group_id': 'fake_sgid'}
+        ingress = call.add_rule('ifake_dev', '-s %s -j RETURN' % prefix)
+        egress = None
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_update_security_group_members(self):
+        self.firewall.ipset = mock.Mock()
+        member_ips = {'IPv4': ['10.0.0.3/32'], 'IPv6': []}
+        self.firewall.update_security_group_members('fake_sgid', member_ips)
+        self.firewall.ipset.assert_has_calls(
+            [call.set_members('IPv4fake_sgid', 'IPv4', ['10.0.0.3/32']),
+             call.set_members('IPv6fake_sgid', 'IPv6', [])])
+        self.assertEqual(self.firewall.sg_members, {'fake_sgid': member_ips})
+
+    def test_remove_unused_security_group_sets(self):
+        self.firewall.ipset = mock.Mock()
+        port = self._fake_port()
+        port['security_group_rules'] = [{'ethertype': 'IPv4',
+                                         'direction': 'ingress',
+                                         'remote_group_id': 'fake_sgid1'}]
+        long_sgid = _uuid()
+        for sg_id in ('fake_sgid1', 'fake_sgid2', long_sgid):
+            self.firewall.update_security_group_members(
+                sg_id, {'IPv4': [], 'IPv6': []})
+        self.firewall.prepare_port_filter(port)
+        self.assertEqual(self.firewall.sg_members.keys(), ['fake_sgid1'])
+        self.firewall.ipset.destroy_set.assert_has_calls(
+            [call('IPv4fake_sgid2'), call('IPv6fake_sgid2'),
+             call(('IPv4' + long_sgid)[:29]), call(('IPv6' + long_sgid)[:29])],
+            any_order=True)
+        self.assertEqual(self.firewall.ipset.destroy_set.call_count, 4)
+
+        self.firewall.ipset.reset_mock()
+        self.firewall.remove_port_filter(port)
+        self.assertEqual(self.firewall.sg_members, {})
+        self.firewall.ipset.destroy_set.assert_has_calls(
+            [call('IPv4fake_sgid1'), call('IPv6fake_sgid1')])
+
+    def test_defer_apply_sets_before_rules(self):
+        manager = mock.Mock()
+        manager.attach_mock(self.iptables_inst, 'iptables')
+        self.firewall.ipset = manager.ipset
+        with self.firewall.defer_apply():
+            pass
+        manager.assert_has_calls([call.iptables.defer_apply_on(),
+                                  call.ipset.defer_apply_on(),
+                                  call.ipset.defer_apply_off(),
+                                  call.iptables.defer_apply_off()])
+
+    def test_defer_apply_ipset_failed(self):
+        self.firewall.ipset = mock.Mock()
+        self.firewall.ipset.defer_apply_off.side_effect = RuntimeError()
+        self.firewall.filter_defer_apply_on()
+        self.assertRaises(RuntimeError, self.firewall.filter_defer_apply_off)
+        self.iptables_inst.assert_has_calls([call.defer_apply_on(),
+                                             call.defer_apply_off()])
+
     def _test_prepare_port_filter(self,
                                   rule,
                                   ingress_expected_call=None,
@@ -23,6 +23,7 @@ import os
 import mock
 
 from neutron.agent.linux import iptables_manager
+from neutron.openstack.common import timeutils
 from neutron.tests import base
 from neutron.tests import tools
 
@@ -70,7 +71,8 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
         super(IptablesManagerStateFulTestCase, self).setUp()
         self.root_helper = 'sudo'
         self.iptables = iptables_manager.IptablesManager(
-            root_helper=self.root_helper)
+            root_helper=self.root_helper,
+            incremental_apply=False)
         self.execute = mock.patch.object(self.iptables, "execute").start()
 
     def test_binary_name(self):
@@ -111,6 +113,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
 
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             binary_name=bn,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
@@ -228,6 +231,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
 
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             binary_name=bn,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
@@ -328,6 +332,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def _test_add_and_remove_chain_helper(self, use_ipv6):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
 
@@ -388,6 +393,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def _test_add_filter_rule_helper(self, use_ipv6):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
 
@@ -462,6 +468,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def _test_rule_with_wrap_target_helper(self, use_ipv6):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
 
@@ -538,6 +545,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def _test_add_nat_rule_helper(self, use_ipv6):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
 
@@ -664,6 +672,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def _test_get_traffic_counters_helper(self, use_ipv6):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
         exp_packets = 800
@@ -714,6 +723,7 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def _test_get_traffic_counters_with_zero_helper(self, use_ipv6):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
+            incremental_apply=False,
             use_ipv6=use_ipv6)
         self.execute = mock.patch.object(self.iptables, "execute").start()
         exp_packets = 800
@@ -786,6 +796,161 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
         self.assertIsNone(ret_str)
 
 
+class IptablesManagerIncrementalApplyTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesManagerIncrementalApplyTestCase, self).setUp()
+        self.root_helper = 'sudo'
+        self.iptables = iptables_manager.IptablesManager(
+            root_helper=self.root_helper)
+        self.execute = mock.patch.object(self.iptables, "execute").start()
+
+    def _apply_and_reset(self):
+        self.execute.side_effect = ['', None]
+        self.iptables.apply()
+        self.execute.reset_mock()
+        self.execute.side_effect = None
+
+    def test_apply_unchanged_tables(self):
+        self._apply_and_reset()
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP')
+        self.iptables.ipv4['filter'].remove_rule('INPUT', '-j DROP')
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_apply_changed_chains(self):
+        self.iptables = iptables_manager.IptablesManager(
+            root_helper=self.root_helper, namespace='qrouter-1')
+        self.execute = mock.patch.object(self.iptables, "execute").start()
+        self._apply_and_reset()
+
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-s 0/0 -j $filter')
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j ACCEPT', top=True)
+        self.iptables.apply()
+
+        filter_changes = ('*filter\n'
+                          ':%(bn)s-INPUT - [0:0]\n'
+                          ':%(bn)s-filter - [0:0]\n'
+                          '-A %(bn)s-INPUT -j ACCEPT\n'
+                          '-A %(bn)s-INPUT -s 0/0 -j %(bn)s-filter\n'
+                          '-A %(bn)s-filter -j DROP\n'
+                          'COMMIT' % IPTABLES_ARG)
+        self.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'qrouter-1',
+             'iptables-restore', '-c', '--noflush'],
+            process_input=filter_changes, root_helper=self.root_helper)
+
+    def test_apply_changed_unwrapped_rules(self):
+        self._apply_and_reset()
+        self.iptables.ipv4['filter'].add_rule('FORWARD', '-j DROP',
+                                              wrap=False)
+        self.execute.side_effect = ['', None]
+        self.iptables.apply()
+
+        self.assertEqual(
+            [mock.call(['iptables-save', '-c'],
+                       root_helper=self.root_helper),
+             mock.call(['iptables-restore', '-c'], process_input=mock.ANY,
+                       root_helper=self.root_helper)],
+            self.execute.mock_calls)
+
+    def test_apply_removed_chain(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self._apply_and_reset()
+        self.iptables.ipv4['filter'].remove_chain('filter')
+        self.iptables.apply()
+
+        filter_changes = ('*filter\n'
+                          ':%(bn)s-filter - [0:0]\n'
+                          '-X %(bn)s-filter\n'
+                          'COMMIT' % IPTABLES_ARG)
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '-c', '--noflush'],
+            process_input=filter_changes, root_helper=self.root_helper)
+
+    def test_apply_whole_tables_periodically(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self._apply_and_reset()
+
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP')
+        timeutils.advance_time_seconds(
+            iptables_manager.FULL_APPLY_INTERVAL - 1)
+        self.iptables.apply()
+        self.assertEqual(
+            [mock.call(['iptables-restore', '-c', '--noflush'],
+                       process_input=mock.ANY,
+                       root_helper=self.root_helper)],
+            self.execute.mock_calls)
+
+        # Even unchanged, the tables are applied as a whole to undo the
+        # changes made to them by others.
+        self.execute.reset_mock()
+        timeutils.advance_time_seconds(1)
+        self.execute.side_effect = ['', None]
+        self.iptables.apply()
+        self.assertEqual(
+            [mock.call(['iptables-save', '-c'],
+                       root_helper=self.root_helper),
+             mock.call(['iptables-restore', '-c'], process_input=mock.ANY,
+                       root_helper=self.root_helper)],
+            self.execute.mock_calls)
+
+        self.execute.reset_mock()
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_apply_changed_chains_failed(self):
+        self._apply_and_reset()
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP')
+        self.execute.side_effect = [RuntimeError(), '', None, None]
+        self.iptables.apply()
+
+        self.assertEqual(
+            [mock.call(['iptables-restore', '-c', '--noflush'],
+                       process_input=mock.ANY,
+                       root_helper=self.root_helper),
+             mock.call(['iptables-save', '-c'],
+                       root_helper=self.root_helper),
+             mock.call(['iptables-restore', '-c'], process_input=mock.ANY,
+                       root_helper=self.root_helper)],
+            self.execute.mock_calls)
+        # The tables are known to be applied again.
+        self.iptables.apply()
+        self.assertEqual(3, self.execute.call_count)
+
+    def test_apply_keeps_counters_of_saved_rules(self):
+        saved = ('# Generated by iptables-save\n'
+                 '*filter\n'
+                 ':INPUT ACCEPT [10:1000]\n'
+                 ':neutron-filter-top - [1:2]\n'
+                 ':%(bn)s-INPUT - [3:4]\n'
+                 ':other - [0:0]\n'
+                 '[5:6] -A INPUT -j %(bn)s-INPUT\n'
+                 '[5:6] -A INPUT -j %(bn)s-INPUT\n'
+                 '[7:8] -A FORWARD -j neutron-filter-top\n'
+                 '[9:9] -A other -j DROP\n'
+                 'COMMIT\n'
+                 '# Completed by iptables-save\n' % IPTABLES_ARG)
+        self.execute.side_effect = [saved, None]
+        self.iptables.ipv4 = {'filter': self.iptables.ipv4['filter']}
+        self.iptables.apply()
+
+        restored = self.execute.call_args[1]['process_input'].split('\n')
+        self.assertIn(':INPUT ACCEPT [10:1000]', restored)
+        self.assertIn(':neutron-filter-top - [1:2]', restored)
+        self.assertIn(':%(bn)s-INPUT - [3:4]' % IPTABLES_ARG, restored)
+        self.assertIn('[9:9] -A other -j DROP', restored)
+        self.assertEqual(
+            ['[5:6] -A INPUT -j %(bn)s-INPUT' % IPTABLES_ARG],
+            [line for line in restored
+             if line.endswith('-A INPUT -j %(bn)s-INPUT' % IPTABLES_ARG)])
+        self.assertIn('[7:8] -A FORWARD -j neutron-filter-top', restored)
+
+
 class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def setUp(self):
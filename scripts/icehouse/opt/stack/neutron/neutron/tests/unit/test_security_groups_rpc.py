@@ -35,6 +35,7 @@ from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import allowedaddresspairs as addr_pair
 from neutron.extensions import securitygroup as ext_sg
 from neutron.manager import NeutronManager
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.tests import base
 from neutron.tests.unit import test_extension_security_group as test_sg
@@ -290,6 +291,71 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_info_for_devices_ipv4_source_group(self):
+
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', const.PROTO_NAME_TCP, '24',
+                    '25', remote_group_id=sg2['security_group']['id'])
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id,
+                                     sg2_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+                devices = [port_id1, 'no_exist_device']
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                ctx = context.get_admin_context()
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices)
+                port_rpc = info['devices'][port_id1]
+                expected = [{'direction': 'egress', 'ethertype': const.IPv4,
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': const.IPv6,
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': const.IPv4,
+                             'security_group_id': sg2_id},
+                            {'direction': 'egress', 'ethertype': const.IPv6,
+                             'security_group_id': sg2_id},
+                            {'direction': u'ingress',
+                             'protocol': const.PROTO_NAME_TCP,
+                             'ethertype': const.IPv4,
+                             'port_range_max': 25, 'port_range_min': 24,
+                             'remote_group_id': sg2_id,
+                             'security_group_id': sg1_id},
+                            ]
+                self.assertEqual(port_rpc['security_group_rules'],
+                                 expected)
+                self.assertEqual(port_rpc['security_group_source_groups'],
+                                 [sg2_id])
+                self.assertEqual(info['sg_member_ips'].keys(), [sg2_id])
+                member_ips = info['sg_member_ips'][sg2_id]
+                self.assertEqual(sorted(member_ips[const.IPv4]),
+                                 [u'10.0.0.2/32', u'10.0.0.3/32'])
+                self.assertEqual(member_ips[const.IPv6], [])
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
     def test_security_group_rules_for_devices_ipv6_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX[const.IPv6]
         with self.network() as n:
@@ -530,6 +596,7 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.firewall = mock.Mock()
         firewall_object = firewall_base.FirewallDriver()
         self.firewall.defer_apply.side_effect = firewall_object.defer_apply
+        self.firewall.uses_remote_group_members = False
         self.agent.firewall = self.firewall
         rpc = mock.Mock()
         self.agent.plugin_rpc = rpc
@@ -610,6 +677,26 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.refresh_firewall([])
         self.firewall.assert_has_calls([])
 
+    def test_refresh_firewall_with_remote_group_members(self):
+        self.firewall.uses_remote_group_members = True
+        member_ips = {const.IPv4: ['10.0.0.3/32'], const.IPv6: []}
+        self.agent.plugin_rpc.security_group_info_for_devices.return_value = {
+            'devices': self.firewall.ports,
+            'sg_member_ips': {'fake_sgid2': member_ips}}
+        self.agent.prepare_devices_filter(['fake_port_id'])
+        self.agent.refresh_firewall()
+        calls = [call.defer_apply(),
+                 call.update_security_group_members('fake_sgid2',
+                                                    member_ips),
+                 call.prepare_port_filter(self.fake_device),
+                 call.defer_apply(),
+                 call.update_security_group_members('fake_sgid2',
+                                                    member_ips),
+                 call.update_port_filter(self.fake_device)]
+        self.firewall.assert_has_calls(calls)
+        self.assertFalse(
+            self.agent.plugin_rpc.security_group_rules_for_devices.called)
+
 
 class SecurityGroupAgentRpcWithDeferredRefreshTestCase(
     SecurityGroupAgentRpcTestCase):
@@ -835,6 +922,27 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'devices': ['fake_device']},
+              'method': 'security_group_info_for_devices',
+              'namespace': None},
+             version=sg_rpc.SG_INFO_RPC_VERSION,
+             topic='fake_topic')])
+
+    def test_security_group_info_for_devices_unsupported(self):
+        devices = {'fake_device': {'device': 'fake_device'}}
+        self.rpc.call.side_effect = [
+            rpc_common.UnsupportedRpcVersion(version='1.3'), devices]
+        info = self.rpc.security_group_info_for_devices(None,
+                                                        ['fake_device'])
+        self.assertEqual(info, {'devices': devices, 'sg_member_ips': {}})
+        self.assertEqual(self.rpc.call.call_args[0][1]['method'],
+                         'security_group_rules_for_devices')
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -1267,6 +1375,25 @@ COMMIT
 # Completed by iptables_manager
 """ % IPTABLES_ARG
 
+IPTABLES_FILTER_2_3_CHANGES = """*filter
+:%(bn)s-i_port1 - [0:0]
+:%(bn)s-i_port2 - [0:0]
+-A %(bn)s-i_port1 -m state --state INVALID -j DROP
+-A %(bn)s-i_port1 -m state --state RELATED,ESTABLISHED -j RETURN
+-A %(bn)s-i_port1 -s 10.0.0.2 -p udp -m udp --sport 67 --dport 68 -j RETURN
+-A %(bn)s-i_port1 -p tcp -m tcp --dport 22 -j RETURN
+-A %(bn)s-i_port1 -s 10.0.0.4 -j RETURN
+-A %(bn)s-i_port1 -p icmp -j RETURN
+-A %(bn)s-i_port1 -j %(bn)s-sg-fallback
+-A %(bn)s-i_port2 -m state --state INVALID -j DROP
+-A %(bn)s-i_port2 -m state --state RELATED,ESTABLISHED -j RETURN
+-A %(bn)s-i_port2 -s 10.0.0.2 -p udp -m udp --sport 67 --dport 68 -j RETURN
+-A %(bn)s-i_port2 -p tcp -m tcp --dport 22 -j RETURN
+-A %(bn)s-i_port2 -s 10.0.0.3 -j RETURN
+-A %(bn)s-i_port2 -p icmp -j RETURN
+-A %(bn)s-i_port2 -j %(bn)s-sg-fallback
+COMMIT""" % IPTABLES_ARG
+
 
 IPTABLES_ARG['chains'] = CHAINS_EMPTY
 IPTABLES_FILTER_EMPTY = """# Generated by iptables_manager
@@ -1470,6 +1597,8 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
         # TODO(jlibosva) Get rid of mocking iptables execute and mock out
         # firewall instead
         self.iptables.use_ipv6 = True
+        # The whole tables are checked after each apply.
+        self.iptables.incremental_apply = False
         self.iptables_execute = mock.patch.object(self.iptables,
                                                   "execute").start()
         self.iptables_execute_return_values = []
@@ -1639,6 +1768,23 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
 
         self._verify_mock_calls()
 
+    def test_security_group_rule_updated_changed_chains(self):
+        self.iptables.incremental_apply = True
+        self.rpc.security_group_rules_for_devices.return_value = self.devices2
+        self._replay_iptables(IPTABLES_FILTER_2, IPTABLES_FILTER_V6_2)
+        # Only the ingress chains of the ports are rewritten.
+        self._register_mock_call(
+            ['iptables-restore', '-c', '--noflush'],
+            process_input=self._regex(IPTABLES_FILTER_2_3_CHANGES),
+            root_helper=self.root_helper,
+            return_value='')
+
+        self.agent.prepare_devices_filter(['tap_port1', 'tap_port3'])
+        self.rpc.security_group_rules_for_devices.return_value = self.devices3
+        self.agent.security_groups_rule_updated(['security_group1'])
+
+        self._verify_mock_calls()
+
 
 class SGNotificationTestMixin():
     def test_security_group_rule_updated(self):
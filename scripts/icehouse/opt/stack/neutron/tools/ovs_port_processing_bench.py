@@ -0,0 +1,190 @@
+"""
+Benchmark of the ovs-vsctl and ovs-ofctl commands the OVS agent runs to
+process port changes.
+
+The commands are run by a fake execute which keeps the ports of the
+integration bridge in memory, the way OVSDB would.  A number of VIF ports
+are plugged into the bridge and processed by the agent, then unplugged and
+processed again, once with each ovs_lib call run on its own and once the
+way the agent runs them, with the bridge reads cached for the iteration by
+rpc_loop and the writes deferred while the ports are processed.  The
+commands run per program and the time taken are reported.  Each command
+can be made to take some time, e.g. that of a command run with
+neutron-rootwrap.
+
+Examples:
+
+    python tools/ovs_port_processing_bench.py --ports 500
+    python tools/ovs_port_processing_bench.py --ports 500 --command-ms 70
+"""
+import argparse
+import collections
+import sys
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.linux import ovs_lib
+from neutron.openstack.common import jsonutils
+from neutron.plugins.common import constants as p_const
+from neutron.plugins.openvswitch.agent import ovs_neutron_agent
+
+CONF = cfg.CONF
+
+BRIDGE = 'br-int'
+PORTS_PER_NETWORK = 10
+
+
+class FakeOVS(object):
+    """The ports of a bridge, listed and changed by ovs-vsctl."""
+
+    def __init__(self, command_time):
+        self.ports = collections.OrderedDict()
+        self.command_time = command_time
+        self.commands = collections.Counter()
+
+    def plug(self, i):
+        self.ports['tap%d' % i] = {'iface-id': 'port-%d' % i,
+                                   'attached-mac': 'fa:16:3e:00:%02x:%02x' % (
+                                       i / 256 % 256, i % 256),
+                                   'ofport': i + 1, 'tag': ['set', []]}
+
+    def list_table(self, table):
+        if table == 'Interface':
+            data = [[name, ['map', [[key, port[key]] for key in
+                                    ('iface-id', 'attached-mac')]],
+                     port['ofport']] for name, port in self.ports.iteritems()]
+        else:
+            data = [[name, port['tag']]
+                    for name, port in self.ports.iteritems()]
+        return jsonutils.dumps({'data': data})
+
+    def vsctl(self, args):
+        # The options and commands are separated by --.
+        commands = [[]]
+        for arg in args:
+            if arg == '--':
+                commands.append([])
+            elif not arg.startswith('--'):
+                commands[-1].append(arg)
+        output = ''
+        for command in filter(None, commands):
+            if command[0] == 'list-ports':
+                output = '\n'.join(self.ports)
+            elif command[0] == 'list':
+                output = self.list_table(command[1])
+            elif command[0] == 'set':
+                column, value = command[3].split('=')
+                self.ports[command[2]][column] = int(value)
+            elif command[0] == 'clear':
+                self.ports[command[2]][command[3]] = ['set', []]
+            elif command[0] == 'del-port':
+                self.ports.pop(command[2], None)
+            else:
+                raise Exception('Unsupported command %r' % command)
+        return output
+
+    def execute(self, cmd, root_helper=None, process_input=None):
+        self.commands[cmd[0]] += 1
+        time.sleep(self.command_time)
+        if cmd[0] == 'ovs-vsctl':
+            return self.vsctl(cmd[1:])
+        return ''
+
+
+class FakePluginApi(object):
+
+    def get_devices_details_list(self, context, devices, agent_id):
+        return [{'device': device, 'port_id': device,
+                 'network_id': 'net-%d' % (int(device.split('-')[1]) /
+                                           PORTS_PER_NETWORK),
+                 'network_type': p_const.TYPE_LOCAL,
+                 'physical_network': None, 'segmentation_id': None,
+                 'admin_state_up': True} for device in devices]
+
+    def update_device_list(self, context, devices_up, devices_down,
+                           agent_id, host=None):
+        return {'devices_up': devices_up, 'devices_down': []}
+
+
+class FakeSecurityGroupAgent(object):
+
+    def setup_port_filters(self, new_devices, updated_devices):
+        pass
+
+    def remove_devices_filter(self, device_ids):
+        pass
+
+
+def make_agent(batched):
+    # NOTE: Only the parts of the agent which process the ports of the
+    # integration bridge are set up.
+    agent = ovs_neutron_agent.OVSNeutronAgent.__new__(
+        ovs_neutron_agent.OVSNeutronAgent)
+    agent.int_br = ovs_lib.OVSBridge(BRIDGE, 'sudo')
+    if not batched:
+        agent.int_br.defer_apply_on = agent.int_br.defer_apply_off = (
+            lambda: None)
+    agent.local_vlan_map = {}
+    agent.available_local_vlans = set(xrange(1, 4095))
+    agent.plugin_rpc = FakePluginApi()
+    agent.sg_agent = FakeSecurityGroupAgent()
+    agent.context = None
+    agent.agent_id = 'bench'
+    agent.iter_num = 0
+    return agent
+
+
+def iteration(agent, ports, batched):
+    if batched:
+        agent.int_br.cache_db_reads_on()
+    try:
+        port_info = agent.scan_ports(ports, set())
+        resync = agent.process_network_ports(port_info, False)
+        assert not resync, 'The ports were not processed'
+    finally:
+        if batched:
+            agent.int_br.cache_db_reads_off()
+    return port_info['current']
+
+
+def run(args, batched):
+    ovs = FakeOVS(args.command_ms / 1000.0)
+    ovs_lib.utils.execute = ovs.execute
+    agent = make_agent(batched)
+    ports = set()
+    for name, change in (('plugged', ovs.plug), ('unplugged', None)):
+        if change:
+            for i in xrange(args.ports):
+                change(i)
+        else:
+            ovs.ports.clear()
+        ovs.commands.clear()
+        started = time.time()
+        ports = iteration(agent, ports, batched)
+        elapsed = time.time() - started
+        if change:
+            assert all(port['tag'] != ['set', []]
+                       for port in ovs.ports.itervalues()), 'Ports not bound'
+        print('%-8s %d ports %-9s %5d commands %8.1f ms  %s' % (
+              'batched' if batched else 'per call', args.ports, name,
+              sum(ovs.commands.values()), elapsed * 1000,
+              ', '.join('%s %d' % (program, count)
+                        for program, count in sorted(
+                            ovs.commands.iteritems()))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ports', type=int, default=500)
+    parser.add_argument('--command-ms', type=float, default=0,
+                        help='Time taken by each command, in milliseconds')
+    args = parser.parse_args()
+
+    CONF([], project='neutron')
+    for batched in (False, True):
+        run(args, batched)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
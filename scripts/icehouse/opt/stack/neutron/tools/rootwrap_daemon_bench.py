@@ -0,0 +1,107 @@
+"""
+Benchmark of the agent commands run with neutron-rootwrap and with the
+rootwrap daemon.
+
+A rootwrap configuration is generated with filters for true and echo, which
+stand in for the ip, ovs-vsctl and iptables commands of the agents, and the
+commands are run with neutron.agent.linux.utils.execute, first with
+neutron-rootwrap as the root helper, started for each command, then with
+neutron-rootwrap-daemon as the root helper daemon.  The time per command is
+reported.
+
+sudo is left out of the root helpers unless --sudo is given, in which case
+it must not ask for a password.
+
+Examples:
+
+    python tools/rootwrap_daemon_bench.py --commands 1000
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.common import config
+from neutron.agent.linux import utils
+
+CONF = cfg.CONF
+
+ROOTWRAP_CONF = """[DEFAULT]
+filters_path=%s
+exec_dirs=/sbin,/usr/sbin,/bin,/usr/bin
+use_syslog=False
+"""
+
+FILTERS = """[Filters]
+true: CommandFilter, true, root
+echo: CommandFilter, echo, root
+"""
+
+
+def make_rootwrap_conf(temp_dir):
+    filters_path = os.path.join(temp_dir, 'rootwrap.d')
+    os.mkdir(filters_path)
+    with open(os.path.join(filters_path, 'bench.filters'), 'w') as f:
+        f.write(FILTERS)
+    rootwrap_conf = os.path.join(temp_dir, 'rootwrap.conf')
+    with open(rootwrap_conf, 'w') as f:
+        f.write(ROOTWRAP_CONF % filters_path)
+    return rootwrap_conf
+
+
+def rootwrap_command(args, rootwrap_conf, function):
+    command = '%s -c "from oslo.rootwrap import cmd; cmd.%s()" %s' % (
+        sys.executable, function, rootwrap_conf)
+    return 'sudo %s' % command if args.sudo else command
+
+
+def run(name, args, root_helper):
+    latencies = []
+    for i in xrange(args.commands):
+        if i % 2:
+            cmd, expected = ['echo', 'port-%d' % i], 'port-%d\n' % i
+        else:
+            cmd, expected = ['true'], ''
+        started = time.time()
+        out = utils.execute(cmd, root_helper=root_helper)
+        latencies.append(time.time() - started)
+        assert out == expected, 'Unexpected output %r' % out
+    latencies.sort()
+    print('%-26s %8.2f ms per command  median %6.2f ms  max %8.2f ms  '
+          'total %6.2f s' % (name, sum(latencies) * 1000 / len(latencies),
+                             latencies[len(latencies) / 2] * 1000,
+                             latencies[-1] * 1000, sum(latencies)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--commands', type=int, default=1000)
+    parser.add_argument('--sudo', action='store_true',
+                        help='Run the root helpers with sudo')
+    args = parser.parse_args()
+
+    CONF([], project='neutron')
+    config.register_root_helper(CONF)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        rootwrap_conf = make_rootwrap_conf(temp_dir)
+        root_helper = rootwrap_command(args, rootwrap_conf, 'main')
+        print('%d commands, true and echo in turn' % args.commands)
+        run('neutron-rootwrap', args, root_helper)
+        CONF.set_override('root_helper_daemon',
+                          rootwrap_command(args, rootwrap_conf, 'daemon'),
+                          'AGENT')
+        run('neutron-rootwrap-daemon', args, root_helper)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
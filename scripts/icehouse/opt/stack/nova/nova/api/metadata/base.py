@@ -17,6 +17,7 @@
 """Instance Metadata information."""
 
 import base64
+import hashlib
 import json
 import os
 import posixpath
@@ -24,6 +25,7 @@ import posixpath
 from oslo.config import cfg
 
 from nova.api.ec2 import ec2utils
+from nova.api.metadata import cache as metadata_cache
 from nova.api.metadata import password
 from nova import block_device
 from nova.compute import flavors
@@ -195,6 +197,13 @@ class InstanceMetadata():
 
         self.route_configuration = None
 
+        # Generation of the instance's metadata this was built at, see
+        # nova.api.metadata.cache.
+        self.cache_generation = None
+
+        # Rendered response bodies and their ETags, by path.
+        self._rendered = {}
+
     def _route_configuration(self):
         if self.route_configuration:
             return self.route_configuration
@@ -366,23 +375,15 @@ class InstanceMetadata():
                            '.' if CONF.dhcp_domain else '',
                            CONF.dhcp_domain)
 
-    def lookup(self, path):
-        if path == "" or path[0] != "/":
-            path = posixpath.normpath("/" + path)
-        else:
-            path = posixpath.normpath(path)
-
-        # fix up requests, prepending /ec2 to anything that does not match
-        path_tokens = path.split('/')[1:]
-        if path_tokens[0] not in ("ec2", "openstack"):
-            if path_tokens[0] == "":
-                # request for /
-                path_tokens = ["ec2"]
-            else:
-                path_tokens = ["ec2"] + path_tokens
-            path = "/" + "/".join(path_tokens)
+    def _has_random_seed(self, path_tokens):
+        if (len(path_tokens) != 3 or path_tokens[0] != "openstack" or
+                path_tokens[2] != MD_JSON_NAME):
+            return False
+        version = self._route_configuration()._version(path_tokens[1])
+        return self._check_os_version(GRIZZLY, version)
 
-        # all values of 'path' input starts with '/' and have no trailing /
+    def lookup(self, path):
+        path, path_tokens = _normalize_path(path)
 
         # specifically handle the top level request
         if len(path_tokens) == 1:
@@ -409,6 +410,33 @@ class InstanceMetadata():
 
         return data
 
+    def render(self, path):
+        """Return the response body of a metadata path and its ETag.
+
+        Bodies are rendered as UTF-8 once and kept, so metadata served from
+        the cache is not rendered again.  Callable handlers are returned as
+        they are, and the documents carrying a random seed are rendered
+        on every call with an ETag of None.
+        """
+        path, path_tokens = _normalize_path(path)
+        rendered = self._rendered.get(path)
+        if rendered is not None:
+            return rendered
+
+        data = self.lookup(path)
+        if callable(data):
+            return data
+
+        body = ec2_md_print(data)
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        if self._has_random_seed(path_tokens):
+            return body, None
+
+        rendered = (body, hashlib.md5(body).hexdigest())
+        self._rendered[path] = rendered
+        return rendered
+
     def metadata_for_config_drive(self):
         """Yields (path, value) tuples for metadata elements."""
         # EC2 style metadata
@@ -505,8 +533,41 @@ def get_metadata_by_address(conductor_api, address):
 def get_metadata_by_instance_id(conductor_api, instance_id, address,
                                 ctxt=None):
     ctxt = ctxt or context.get_admin_context()
+    # Read before the instance, so a change made in between is not missed.
+    generation = metadata_cache.get_generation(instance_id)
     instance = instance_obj.Instance.get_by_uuid(ctxt, instance_id)
-    return InstanceMetadata(instance, address)
+    meta_data = InstanceMetadata(instance, address)
+    meta_data.cache_generation = generation
+    return meta_data
+
+
+def get_metadata_by_reservation(conductor_api, instance, limit,
+                                ctxt=None):
+    """Yield the metadata of the other instances booted with instance.
+
+    The instances are read in one query, and each is given the address of
+    its first fixed IP.  At most limit instances are returned.
+    """
+    ctxt = ctxt or context.get_admin_context()
+    instances = instance_obj.InstanceList.get_by_filters(
+        ctxt, {'reservation_id': instance['reservation_id'],
+               'deleted': False},
+        sort_key='launch_index', sort_dir='asc', limit=limit + 1,
+        expected_attrs=['metadata', 'system_metadata', 'info_cache'])
+    for other in instances:
+        if other.uuid == instance['uuid']:
+            continue
+        if limit <= 0:
+            break
+        limit -= 1
+        generation = metadata_cache.get_generation(other.uuid)
+        ip_info = ec2utils.get_ip_info_for_instance_from_nw_info(
+            other.info_cache.network_info)
+        address = (ip_info['fixed_ips'] or [None])[0]
+        meta_data = InstanceMetadata(other, address,
+                                     conductor_api=conductor_api)
+        meta_data.cache_generation = generation
+        yield meta_data
 
 
 def _format_instance_mapping(ctxt, instance):
@@ -515,6 +576,26 @@ def _format_instance_mapping(ctxt, instance):
     return block_device.instance_block_mapping(instance, bdms)
 
 
+def _normalize_path(path):
+    if path == "" or path[0] != "/":
+        path = posixpath.normpath("/" + path)
+    else:
+        path = posixpath.normpath(path)
+
+    # fix up requests, prepending /ec2 to anything that does not match
+    path_tokens = path.split('/')[1:]
+    if path_tokens[0] not in ("ec2", "openstack"):
+        if path_tokens[0] == "":
+            # request for /
+            path_tokens = ["ec2"]
+        else:
+            path_tokens = ["ec2"] + path_tokens
+        path = "/" + "/".join(path_tokens)
+
+    # all values of 'path' input starts with '/' and have no trailing /
+    return path, path_tokens
+
+
 def ec2_md_print(data):
     if isinstance(data, dict):
         output = ''
@@ -0,0 +1,71 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Invalidation of the instance metadata cached by the metadata API.
+
+Every instance has a generation token in the cache.  The metadata API
+records the generation an instance's metadata was built at and rebuilds it
+when the token has changed.  The services changing an instance's metadata
+or network info set a new token with invalidate().
+
+The tokens are kept in memcached_servers, so they reach metadata API
+workers in other processes only when memcached is used.  Otherwise they
+only reach a metadata API running in the same process, and the other
+workers pick the change up when the cached metadata expires.
+"""
+
+import uuid
+
+from oslo.config import cfg
+
+from nova.openstack.common import memorycache
+
+cache_opts = [
+    cfg.IntOpt('metadata_cache_expiration',
+               default=15,
+               help='Time in seconds to cache the metadata of an instance.  '
+                    '0 disables the cache.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(cache_opts)
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = memorycache.get_client()
+    return _client
+
+
+def _generation_key(instance_uuid):
+    return 'metadata-generation-%s' % instance_uuid
+
+
+def get_generation(instance_uuid):
+    """Return the current generation of an instance's metadata."""
+    return _get_client().get(_generation_key(instance_uuid))
+
+
+def invalidate(instance_uuid):
+    """Drop the cached metadata of an instance."""
+    if not CONF.metadata_cache_expiration:
+        return
+    # The token only has to outlive the metadata cached before it was set.
+    _get_client().set(_generation_key(instance_uuid), uuid.uuid4().hex,
+                      time=CONF.metadata_cache_expiration)
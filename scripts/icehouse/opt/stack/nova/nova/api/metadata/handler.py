@@ -25,6 +25,7 @@ import webob.dec
 import webob.exc
 
 from nova.api.metadata import base
+from nova.api.metadata import cache as metadata_cache
 from nova import conductor
 from nova import exception
 from nova.openstack.common.gettextutils import _
@@ -33,8 +34,6 @@ from nova.openstack.common import memorycache
 from nova import utils
 from nova import wsgi
 
-CACHE_EXPIRATION = 15  # in seconds
-
 CONF = cfg.CONF
 CONF.import_opt('use_forwarded_for', 'nova.api.auth')
 
@@ -50,7 +49,16 @@ metadata_proxy_opts = [
          help='Shared secret to validate proxies Neutron metadata requests')
 ]
 
+metadata_prefetch_opts = [
+    cfg.IntOpt('metadata_cache_prefetch',
+               default=0,
+               help='Number of the other instances of a multi-instance boot '
+                    'whose metadata is cached when the first of them asks '
+                    'for its metadata.  0 disables prefetching.'),
+]
+
 CONF.register_opts(metadata_proxy_opts)
+CONF.register_opts(metadata_prefetch_opts)
 
 LOG = logging.getLogger(__name__)
 
@@ -62,12 +70,53 @@ class MetadataRequestHandler(wsgi.Application):
         self._cache = memorycache.get_client()
         self.conductor_api = conductor.API()
 
+    def _cache_get(self, cache_key):
+        if not CONF.metadata_cache_expiration:
+            return None
+        data = self._cache.get(cache_key)
+        if data and (data.cache_generation !=
+                     metadata_cache.get_generation(data.uuid)):
+            return None
+        return data
+
+    def _cache_set(self, cache_key, data):
+        if not CONF.metadata_cache_expiration:
+            return
+        self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+        if CONF.metadata_cache_prefetch > 0:
+            self._prefetch(data)
+
+    def _prefetch(self, data):
+        """Cache the metadata of the instances booted along with data's
+        instance, which usually ask for it at about the same time.
+        """
+        reservation_id = data.instance['reservation_id']
+        # Only one request of the reservation prefetches.
+        if not self._cache.add('metadata-prefetch-%s' % reservation_id, '1',
+                               CONF.metadata_cache_expiration):
+            return
+        utils.spawn_n(self._prefetch_reservation, data.instance)
+
+    def _prefetch_reservation(self, instance):
+        try:
+            for data in base.get_metadata_by_reservation(
+                    self.conductor_api, instance,
+                    CONF.metadata_cache_prefetch):
+                expiration = CONF.metadata_cache_expiration
+                self._cache.set('metadata-%s' % data.uuid, data, expiration)
+                if data.address:
+                    self._cache.set('metadata-%s' % data.address, data,
+                                    expiration)
+        except Exception:
+            LOG.exception(_('Failed to prefetch metadata for reservation '
+                            '%s'), instance['reservation_id'])
+
     def get_metadata_by_remote_address(self, address):
         if not address:
             raise exception.FixedIpNotFoundForAddress(address=address)
 
         cache_key = 'metadata-%s' % address
-        data = self._cache.get(cache_key)
+        data = self._cache_get(cache_key)
         if data:
             return data
 
@@ -76,13 +125,13 @@ class MetadataRequestHandler(wsgi.Application):
         except exception.NotFound:
             return None
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
+        self._cache_set(cache_key, data)
 
         return data
 
     def get_metadata_by_instance_id(self, instance_id, address):
         cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
+        data = self._cache_get(cache_key)
         if data:
             return data
 
@@ -92,7 +141,7 @@ class MetadataRequestHandler(wsgi.Application):
         except exception.NotFound:
             return None
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
+        self._cache_set(cache_key, data)
 
         return data
 
@@ -115,14 +164,19 @@ class MetadataRequestHandler(wsgi.Application):
             raise webob.exc.HTTPNotFound()
 
         try:
-            data = meta_data.lookup(req.path_info)
+            data = meta_data.render(req.path_info)
         except base.InvalidMetadataPath:
             raise webob.exc.HTTPNotFound()
 
         if callable(data):
             return data(req, meta_data)
 
-        return base.ec2_md_print(data)
+        body, etag = data
+        if etag is not None:
+            if etag in req.if_none_match:
+                return webob.exc.HTTPNotModified(etag=etag)
+            req.response.etag = etag
+        return body
 
     def _handle_remote_ip_request(self, req):
         remote_address = req.remote_addr
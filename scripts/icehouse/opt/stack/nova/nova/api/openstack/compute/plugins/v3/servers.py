@@ -276,7 +276,8 @@ class ServersController(wsgi.Controller):
         try:
             instance_list = self.compute_api.get_all(context,
                     search_opts=search_opts, limit=limit, marker=marker,
-                    want_objects=True, expected_attrs=['pci_devices'])
+                    want_objects=True, expected_attrs=['pci_devices'],
+                    brief=not is_detail)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
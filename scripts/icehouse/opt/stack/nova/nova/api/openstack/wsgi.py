@@ -20,6 +20,7 @@ import time
 from xml.dom import minidom
 
 from lxml import etree
+from oslo.config import cfg
 import six
 import webob
 
@@ -38,8 +39,23 @@ XMLNS_V11 = 'http://docs.openstack.org/compute/api/v1.1'
 
 XMLNS_ATOM = 'http://www.w3.org/2005/Atom'
 
+wsgi_opts = [
+    cfg.IntOpt('osapi_json_stream_threshold',
+               default=100,
+               help='JSON responses holding a list of at least this many '
+                    'items, such as servers/detail, are sent in chunks as '
+                    'they are serialized instead of as one string.  0 '
+                    'disables streaming.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(wsgi_opts)
+
 LOG = logging.getLogger(__name__)
 
+# Approximate size in bytes of the chunks of a streamed JSON response.
+_STREAM_CHUNK_SIZE = 65536
+
 SUPPORTED_CONTENT_TYPES = (
     'application/json',
     'application/vnd.openstack.compute+json',
@@ -349,6 +365,54 @@ class JSONDictSerializer(DictSerializer):
     def default(self, data):
         return jsonutils.dumps(data)
 
+    def should_stream(self, data):
+        """Return True if data holds a list long enough to be streamed."""
+        threshold = CONF.osapi_json_stream_threshold
+        if not threshold or not isinstance(data, dict):
+            return False
+        # json converts other keys to strings, which is left to dumps().
+        if not all(isinstance(key, six.string_types) for key in data):
+            return False
+        return any(isinstance(value, (list, tuple)) and len(value) >= threshold
+                   for value in data.itervalues())
+
+    def iterserialize(self, data):
+        """Serialize a dict as an iterator of JSON strings.
+
+        The items of the lists under the top level keys are serialized one
+        by one and sent in chunks of about _STREAM_CHUNK_SIZE bytes, so the
+        document is never built as a whole.  The chunks joined are what
+        default() returns.
+        """
+        chunk = []
+        size = 0
+        for part in self._iter_parts(data):
+            chunk.append(part)
+            size += len(part)
+            if size >= _STREAM_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk)
+
+    def _iter_parts(self, data):
+        yield '{'
+        for index, (key, value) in enumerate(data.iteritems()):
+            if index:
+                yield ', '
+            yield jsonutils.dumps(key) + ': '
+            if isinstance(value, (list, tuple)):
+                yield '['
+                for item_index, item in enumerate(value):
+                    if item_index:
+                        yield ', '
+                    yield jsonutils.dumps(item)
+                yield ']'
+            else:
+                yield jsonutils.dumps(value)
+        yield '}'
+
 
 class XMLDictSerializer(DictSerializer):
 
@@ -620,7 +684,11 @@ class ResponseObject(object):
             response.headers[hdr] = utils.utf8(str(value))
         response.headers['Content-Type'] = utils.utf8(content_type)
         if self.obj is not None:
-            response.body = serializer.serialize(self.obj)
+            if (isinstance(serializer, JSONDictSerializer) and
+                    serializer.should_stream(self.obj)):
+                response.app_iter = serializer.iterserialize(self.obj)
+            else:
+                response.body = serializer.serialize(self.obj)
 
         return response
 
@@ -41,6 +41,7 @@ class BaseAPI(object):
 
         1.0 - Initial version.
         1.1 - Add get_backdoor_port
+        1.2 - Add get_periodic_task_stats
     """
 
     VERSION_ALIASES = {
@@ -65,15 +66,20 @@ class BaseAPI(object):
         cctxt = self.client.prepare(server=host, version='1.1')
         return cctxt.call(context, 'get_backdoor_port')
 
+    def get_periodic_task_stats(self, context, host):
+        cctxt = self.client.prepare(server=host, version='1.2')
+        return cctxt.call(context, 'get_periodic_task_stats')
+
 
 class BaseRPCAPI(object):
     """Server side of the base RPC API."""
 
-    target = messaging.Target(namespace=_NAMESPACE, version='1.1')
+    target = messaging.Target(namespace=_NAMESPACE, version='1.2')
 
-    def __init__(self, service_name, backdoor_port):
+    def __init__(self, service_name, backdoor_port, manager=None):
         self.service_name = service_name
         self.backdoor_port = backdoor_port
+        self.manager = manager
 
     def ping(self, context, arg):
         resp = {'service': self.service_name, 'arg': arg}
@@ -81,3 +87,11 @@ class BaseRPCAPI(object):
 
     def get_backdoor_port(self, context):
         return self.backdoor_port
+
+    def get_periodic_task_stats(self, context):
+        """Return the schedule and run statistics of the periodic tasks of
+        the service's manager, see PeriodicTasks.get_periodic_task_stats.
+        """
+        if self.manager is None:
+            return {}
+        return self.manager.get_periodic_task_stats()
@@ -64,6 +64,7 @@ import six
 
 from nova.api.ec2 import ec2utils
 from nova import availability_zones
+from nova import baserpc
 from nova.compute import flavors
 from nova import config
 from nova import context
@@ -77,6 +78,7 @@ from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
 from nova import quota
 from nova import rpc
+from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import servicegroup
 from nova import version
 
@@ -736,6 +738,39 @@ class ServiceCommands(object):
         print((_("Service %(service)s on host %(host)s disabled.") %
                {'service': service, 'host': host}))
 
+    @args('--host', metavar='<host>', help='Host')
+    @args('--service', metavar='<service>', help='Nova service')
+    def periodic_tasks(self, host, service):
+        """Show the schedule and run times of the periodic tasks of a
+        service, slowest first.
+        """
+        ctxt = context.get_admin_context()
+        try:
+            svc = db.service_get_by_args(ctxt, host, service)
+        except exception.NotFound as ex:
+            print(_("error: %s") % ex)
+            return(2)
+        stats = baserpc.BaseAPI(svc['topic']).get_periodic_task_stats(
+            ctxt, host)
+
+        fmt = "%-40s %8s %6s %6s %8s %9s %8s %8s  %-26s"
+        print(fmt % (_('Task'), _('Spacing'), _('Runs'), _('Errors'),
+                     _('Overruns'), _('Deferrals'), _('Avg s'), _('Max s'),
+                     _('Next run')))
+        entries = sorted(stats.items(),
+                         key=lambda item: item[1]['max_duration'],
+                         reverse=True)
+        for name, entry in entries:
+            avg = '-'
+            if entry['runs']:
+                avg = '%.2f' % (entry['total_duration'] / entry['runs'])
+            print(fmt % (name,
+                         entry['spacing'] or '-',
+                         entry['runs'], entry['errors'], entry['overruns'],
+                         entry['deferrals'], avg,
+                         '%.2f' % entry['max_duration'],
+                         entry['next_run'] or _('every pass')))
+
     def _show_host_resources(self, context, host):
         """Shows the physical/usage resource given by hosts.
 
@@ -1242,6 +1277,66 @@ class CellCommands(object):
                 '-' * 5, '-' * 10))
 
 
+class SchedulerCommands(object):
+    """Show what the scheduler filters and weighers are doing."""
+
+    @staticmethod
+    def _time_labels(buckets):
+        return (['<=%sms' % bound for bound in buckets] +
+                ['>%sms' % buckets[-1]])
+
+    @staticmethod
+    def _reject_labels(buckets):
+        return (['0%'] + ['<=%d%%' % bound for bound in buckets[1:-1]] +
+                ['<100%', '100%'])
+
+    @args('--host', metavar='<host>',
+          help='Scheduler host, any scheduler if not set')
+    @args('--reset', action='store_true',
+          help='Start a new recording period after showing the statistics')
+    def stats(self, host=None, reset=False):
+        """Show the run time of the scheduler filters and weighers and the
+        number of hosts each filter rejected, slowest first.
+        """
+        ctxt = context.get_admin_context()
+        stats = scheduler_rpcapi.SchedulerAPI().get_scheduler_stats(ctxt,
+                host=host, reset=reset)
+        print(_("Runs sampled at a rate of %(rate)s since %(since)s") %
+              {'rate': stats['sample_rate'], 'since': stats['since']})
+
+        time_labels = self._time_labels(stats['time_buckets'])
+        reject_labels = self._reject_labels(stats['reject_buckets'])
+        for kind, title in (('filters', _('Filter')),
+                            ('weighers', _('Weigher'))):
+            entries = sorted(stats[kind].items(),
+                             key=lambda item: item[1]['time'], reverse=True)
+            print()
+            fmt = "%-32s %8s %10s %10s %10s %10s"
+            print(fmt % (title, _('Runs'), _('Avg ms'), _('Max ms'),
+                         _('Avg in'), _('Avg out')))
+            for name, entry in entries:
+                runs = float(entry['runs'])
+                print(fmt % (name, entry['runs'],
+                             '%.2f' % (entry['time'] * 1000 / runs),
+                             '%.2f' % (entry['max_time'] * 1000),
+                             '%.1f' % (entry['objects_in'] / runs),
+                             '%.1f' % (entry['objects_out'] / runs)
+                             if 'objects_out' in entry else '-'))
+
+            print()
+            fmt = "%-32s" + " %8s" * len(time_labels)
+            print(fmt % tuple([_('Run time')] + time_labels))
+            for name, entry in entries:
+                print(fmt % tuple([name] + entry['time_histogram']))
+
+        if stats['filters']:
+            print()
+            fmt = "%-32s" + " %8s" * len(reject_labels)
+            print(fmt % tuple([_('Hosts rejected')] + reject_labels))
+            for name, entry in sorted(stats['filters'].items()):
+                print(fmt % tuple([name] + entry['reject_histogram']))
+
+
 CATEGORIES = {
     'account': AccountCommands,
     'agent': AgentBuildCommands,
@@ -1254,6 +1349,7 @@ CATEGORIES = {
     'logs': GetLogCommands,
     'network': NetworkCommands,
     'project': ProjectCommands,
+    'scheduler': SchedulerCommands,
     'service': ServiceCommands,
     'shell': ShellCommands,
     'vm': VmCommands,
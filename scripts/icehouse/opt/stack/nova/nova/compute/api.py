@@ -28,6 +28,7 @@ import uuid
 from oslo.config import cfg
 import six
 
+from nova.api.metadata import cache as metadata_cache
 from nova import availability_zones
 from nova import block_device
 from nova.cells import opts as cells_opts
@@ -1810,7 +1811,7 @@ class API(base.Base):
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
                 sort_dir='desc', limit=None, marker=None, want_objects=False,
-                expected_attrs=None):
+                expected_attrs=None, brief=False):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1822,6 +1823,10 @@ class API(base.Base):
         The results will be returned sorted in the order specified by the
         'sort_dir' parameter using the key specified in the 'sort_key'
         parameter.
+
+        If brief is True only the instances' own fields and the
+        expected_attrs are loaded, not their metadata, system metadata,
+        info cache and security groups.
         """
 
         #TODO(bcwaldon): determine the best argument for target here
@@ -1883,7 +1888,7 @@ class API(base.Base):
 
         inst_models = self._get_instances_by_filters(context, filters,
                 sort_key, sort_dir, limit=limit, marker=marker,
-                expected_attrs=expected_attrs)
+                expected_attrs=expected_attrs, brief=brief)
 
         if want_objects:
             return inst_models
@@ -1898,7 +1903,8 @@ class API(base.Base):
     def _get_instances_by_filters(self, context, filters,
                                   sort_key, sort_dir,
                                   limit=None,
-                                  marker=None, expected_attrs=None):
+                                  marker=None, expected_attrs=None,
+                                  brief=False):
         if 'ip6' in filters or 'ip' in filters:
             res = self.network_api.get_instance_uuids_by_ip_filter(context,
                                                                    filters)
@@ -1907,8 +1913,11 @@ class API(base.Base):
             uuids = set([r['instance_uuid'] for r in res])
             filters['uuid'] = uuids
 
-        fields = ['metadata', 'system_metadata', 'info_cache',
-                  'security_groups']
+        if brief:
+            fields = []
+        else:
+            fields = ['metadata', 'system_metadata', 'info_cache',
+                      'security_groups']
         if expected_attrs:
             fields.extend(expected_attrs)
         return instance_obj.InstanceList.get_by_filters(
@@ -2944,6 +2953,7 @@ class API(base.Base):
     def delete_instance_metadata(self, context, instance, key):
         """Delete the given metadata item from an instance."""
         instance.delete_metadata_key(key)
+        metadata_cache.invalidate(instance.uuid)
         self.compute_rpcapi.change_instance_metadata(context,
                                                      instance=instance,
                                                      diff={key: ['-']})
@@ -2971,6 +2981,7 @@ class API(base.Base):
         self._check_metadata_properties_quota(context, _metadata)
         instance.metadata = _metadata
         instance.save()
+        metadata_cache.invalidate(instance.uuid)
         diff = _diff_dict(orig, instance.metadata)
         self.compute_rpcapi.change_instance_metadata(context,
                                                      instance=instance,
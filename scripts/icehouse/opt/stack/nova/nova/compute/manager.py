@@ -135,6 +135,14 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance info_cache self "
                     "healing updates"),
+    cfg.BoolOpt("heal_instance_info_cache_bulk",
+                default=False,
+                help="Refresh the info_cache of all the instances on the "
+                     "host on every heal instead of one instance at a "
+                     "time, saving only the ones which changed.  The "
+                     "neutron network API looks all the instances up in a "
+                     "few calls, the nova-network one makes one call per "
+                     "instance."),
     cfg.IntOpt('reclaim_instance_interval',
                default=0,
                help='Interval in seconds for reclaiming deleted instances'),
@@ -417,6 +425,27 @@ def _get_image_meta(context, image_ref):
     return image_service.show(context, image_id)
 
 
+def _power_state_in_sync(instance, vm_power_state):
+    """Return True if _sync_instance_power_state() would leave an instance
+    with this vm_power_state on the hypervisor unchanged and quiet.
+    """
+    if instance.power_state != vm_power_state:
+        return False
+    if instance.vm_state == vm_states.ACTIVE:
+        return vm_power_state == power_state.RUNNING
+    elif instance.vm_state == vm_states.STOPPED:
+        return vm_power_state in (power_state.NOSTATE,
+                                  power_state.SHUTDOWN,
+                                  power_state.CRASHED)
+    elif instance.vm_state == vm_states.PAUSED:
+        return vm_power_state not in (power_state.SHUTDOWN,
+                                      power_state.CRASHED)
+    elif instance.vm_state in (vm_states.SOFT_DELETED, vm_states.DELETED):
+        return vm_power_state in (power_state.NOSTATE,
+                                  power_state.SHUTDOWN)
+    return True
+
+
 class InstanceEvents(object):
     def __init__(self):
         self._events = {}
@@ -618,13 +647,16 @@ class ComputeManager(manager.Manager):
         instance_ref = self.conductor_api.instance_update(context,
                                                           instance_uuid,
                                                           **kwargs)
-        if (instance_ref['host'] == self.host and
-                self.driver.node_is_available(instance_ref['node'])):
-            rt = self._get_resource_tracker(instance_ref.get('node'))
-            rt.update_usage(context, instance_ref)
-
+        self._update_resource_tracker(context, instance_ref)
         return instance_ref
 
+    def _update_resource_tracker(self, context, instance):
+        """Let the resource tracker know that an instance has changed."""
+        if (instance['host'] == self.host and
+                self.driver.node_is_available(instance['node'])):
+            rt = self._get_resource_tracker(instance.get('node'))
+            rt.update_usage(context, instance)
+
     def _set_instance_error_state(self, context, instance_uuid):
         try:
             self._instance_update(context, instance_uuid,
@@ -1481,11 +1513,20 @@ class ComputeManager(manager.Manager):
         building_insts = instance_obj.InstanceList.get_by_filters(context,
                            filters, expected_attrs=[], use_subordinate=True)
 
-        for instance in building_insts:
-            if timeutils.is_older_than(instance['created_at'], timeout):
-                self._set_instance_error_state(context, instance['uuid'])
-                LOG.warn(_("Instance build timed out. Set to error state."),
-                         instance=instance)
+        timed_out = [instance for instance in building_insts
+                     if timeutils.is_older_than(instance['created_at'],
+                                                timeout)]
+        if not timed_out:
+            return
+
+        updated = self.conductor_api.instance_update_many(context,
+                dict((instance['uuid'], {'vm_state': vm_states.ERROR})
+                     for instance in timed_out))
+        for instance in timed_out:
+            LOG.warn(_("Instance build timed out. Set to error state."),
+                     instance=instance)
+        for instance_ref in updated:
+            self._update_resource_tracker(context, instance_ref)
 
     def _check_instance_exists(self, context, instance):
         """Ensure an instance with the same name is not already present."""
@@ -2247,6 +2288,9 @@ class ComputeManager(manager.Manager):
             with excutils.save_and_reraise_exception():
                 quotas.rollback()
 
+        # Free the resources of the instance now rather than at the next
+        # audit of the resource tracker.
+        self._update_resource_tracker(context, instance)
         self._complete_deletion(context,
                                 instance,
                                 bdms,
@@ -4836,6 +4880,10 @@ class ComputeManager(manager.Manager):
         if not heal_interval:
             return
 
+        if CONF.heal_instance_info_cache_bulk:
+            self._heal_instance_info_caches(context)
+            return
+
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
         instance = None
 
@@ -4908,6 +4956,41 @@ class ComputeManager(manager.Manager):
             LOG.debug(_("Didn't find any instances for network info cache "
                         "update."))
 
+    def _heal_instance_info_caches(self, context):
+        """Refresh the info caches of all the instances on this host at
+        once, saving only those which changed.
+        """
+        LOG.debug(_('Starting bulk heal of instance info caches'))
+        instances = []
+        db_instances = instance_obj.InstanceList.get_by_host(
+            context, self.host, expected_attrs=['system_metadata',
+                                                'info_cache'],
+            use_subordinate=True)
+        for inst in db_instances:
+            if inst.vm_state == vm_states.BUILDING:
+                LOG.debug(_('Skipping network cache update for instance '
+                            'because it is Building.'), instance=inst)
+            elif inst.task_state == task_states.DELETING:
+                LOG.debug(_('Skipping network cache update for instance '
+                            'because it is being deleted.'), instance=inst)
+            else:
+                instances.append(inst)
+
+        if not instances:
+            LOG.debug(_("Didn't find any instances for network info cache "
+                        "update."))
+            return
+        try:
+            updated = self.network_api.heal_instance_info_caches(context,
+                                                                 instances)
+        except Exception:
+            LOG.error(_('An error occurred while refreshing the network '
+                        'caches.'), exc_info=True)
+            return
+        LOG.debug(_('Refreshed the network info_cache of %(count)d '
+                    'instances, %(updated)d of them had changed'),
+                  {'count': len(instances), 'updated': len(updated)})
+
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
         if CONF.reboot_timeout > 0:
@@ -5125,29 +5208,33 @@ class ComputeManager(manager.Manager):
                 return
 
             refreshed = timeutils.utcnow()
+            keys = [(bw_ctr['uuid'], bw_ctr['mac_address'])
+                    for bw_ctr in bw_counters]
+            # NOTE: The usages of the current period are read, the missing
+            # ones are read from the previous period and all the counters
+            # are written back, in three conductor calls for all the
+            # instances of the host.
+            current = self._get_bw_usages(context, start_time, keys)
+            missing = [key for key in keys if key not in current]
+            previous = {}
+            if missing:
+                previous = self._get_bw_usages(context, prev_time, missing)
+
+            usages = []
             for bw_ctr in bw_counters:
-                # Allow switching of greenthreads between queries.
-                greenthread.sleep(0)
+                key = (bw_ctr['uuid'], bw_ctr['mac_address'])
                 bw_in = 0
                 bw_out = 0
                 last_ctr_in = None
                 last_ctr_out = None
-                # TODO(geekinutah): Once bw_usage_cache object is created
-                #                   need to revisit this and subordinateify.
-                usage = self.conductor_api.bw_usage_get(context,
-                                                        bw_ctr['uuid'],
-                                                        start_time,
-                                                        bw_ctr['mac_address'])
+                usage = current.get(key)
                 if usage:
                     bw_in = usage['bw_in']
                     bw_out = usage['bw_out']
                     last_ctr_in = usage['last_ctr_in']
                     last_ctr_out = usage['last_ctr_out']
                 else:
-                    # TODO(geekinutah): Same here, pls subordinateify
-                    usage = self.conductor_api.bw_usage_get(
-                        context, bw_ctr['uuid'], prev_time,
-                        bw_ctr['mac_address'])
+                    usage = previous.get(key)
                     if usage:
                         last_ctr_in = usage['last_ctr_in']
                         last_ctr_out = usage['last_ctr_out']
@@ -5166,16 +5253,26 @@ class ComputeManager(manager.Manager):
                     else:
                         bw_out += (bw_ctr['bw_out'] - last_ctr_out)
 
-                self.conductor_api.bw_usage_update(context,
-                                                   bw_ctr['uuid'],
-                                                   bw_ctr['mac_address'],
-                                                   start_time,
-                                                   bw_in,
-                                                   bw_out,
-                                                   bw_ctr['bw_in'],
-                                                   bw_ctr['bw_out'],
-                                                   last_refreshed=refreshed,
-                                                   update_cells=update_cells)
+                usages.append({'uuid': bw_ctr['uuid'],
+                               'mac': bw_ctr['mac_address'],
+                               'bw_in': bw_in,
+                               'bw_out': bw_out,
+                               'last_ctr_in': bw_ctr['bw_in'],
+                               'last_ctr_out': bw_ctr['bw_out']})
+
+            if usages:
+                self.conductor_api.bw_usage_update_many(
+                    context, start_time, usages, last_refreshed=refreshed,
+                    update_cells=update_cells)
+
+    def _get_bw_usages(self, context, start_period, keys):
+        """Return the bandwidth usages of a period by (uuid, mac)."""
+        # TODO(geekinutah): Once bw_usage_cache object is created
+        #                   need to revisit this and subordinateify.
+        usages = self.conductor_api.bw_usage_get_many(context, start_period,
+                                                      keys)
+        return dict(((usage['uuid'], usage['mac']), usage)
+                    for usage in usages)
 
     def _get_host_volume_bdms(self, context):
         """Return all block device mappings on a compute host."""
@@ -5193,15 +5290,16 @@ class ComputeManager(manager.Manager):
 
     def _update_volume_usage_cache(self, context, vol_usages):
         """Updates the volume usage cache table with a list of stats."""
-        for usage in vol_usages:
-            # Allow switching of greenthreads between queries.
-            greenthread.sleep(0)
-            self.conductor_api.vol_usage_update(context, usage['volume'],
-                                                usage['rd_req'],
-                                                usage['rd_bytes'],
-                                                usage['wr_req'],
-                                                usage['wr_bytes'],
-                                                usage['instance'])
+        if not vol_usages:
+            return
+        self.conductor_api.vol_usage_update_many(context, [
+            {'vol_id': usage['volume'],
+             'rd_req': usage['rd_req'],
+             'rd_bytes': usage['rd_bytes'],
+             'wr_req': usage['wr_req'],
+             'wr_bytes': usage['wr_bytes'],
+             'instance': usage['instance']}
+            for usage in vol_usages])
 
     @periodic_task.periodic_task(spacing=CONF.volume_usage_poll_interval)
     def _poll_volume_usage(self, context, start_time=None):
@@ -5229,17 +5327,24 @@ class ComputeManager(manager.Manager):
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
-        To sync power state data we make a DB call to get the number of
-        virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database.
+        If the driver can list the power states of all its instances at
+        once, they are compared with the database records read in one query
+        and only the instances whose states do not agree are synced, one at
+        a time.  Other drivers are asked for the power state of every
+        instance in a lazy loop, one database record at a time.  Between
+        runs, the lifecycle events of drivers emitting them keep the power
+        states in sync.
         """
         db_instances = instance_obj.InstanceList.get_by_host(context,
                                                              self.host,
                                                              use_subordinate=True)
 
-        num_vm_instances = self.driver.get_num_instances()
+        try:
+            vm_power_states = self.driver.list_instance_power_states()
+            num_vm_instances = len(vm_power_states)
+        except NotImplementedError:
+            vm_power_states = None
+            num_vm_instances = self.driver.get_num_instances()
         num_db_instances = len(db_instances)
 
         if num_vm_instances != num_db_instances:
@@ -5257,11 +5362,17 @@ class ComputeManager(manager.Manager):
                 continue
             # No pending tasks. Now try to figure out the real vm_power_state.
             try:
-                try:
-                    vm_instance = self.driver.get_info(db_instance)
-                    vm_power_state = vm_instance['state']
-                except exception.InstanceNotFound:
-                    vm_power_state = power_state.NOSTATE
+                if vm_power_states is not None:
+                    vm_power_state = vm_power_states.get(db_instance.uuid,
+                                                         power_state.NOSTATE)
+                    if _power_state_in_sync(db_instance, vm_power_state):
+                        continue
+                else:
+                    try:
+                        vm_instance = self.driver.get_info(db_instance)
+                        vm_power_state = vm_instance['state']
+                    except exception.InstanceNotFound:
+                        vm_power_state = power_state.NOSTATE
                 # Note(maoy): the above get_info call might take a long time,
                 # for example, because of a broken libvirt driver.
                 try:
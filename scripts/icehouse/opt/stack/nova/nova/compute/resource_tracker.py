@@ -19,6 +19,8 @@ scheduler with useful information about availability through the ComputeNode
 model.
 """
 
+import time
+
 from oslo.config import cfg
 
 from nova.compute import claims
@@ -48,7 +50,14 @@ resource_tracker_opts = [
                help='Amount of memory in MB to reserve for the host'),
     cfg.StrOpt('compute_stats_class',
                default='nova.compute.stats.Stats',
-               help='Class that will manage stats for the local compute host')
+               help='Class that will manage stats for the local compute host'),
+    cfg.IntOpt('resource_tracker_audit_interval', default=0,
+               help='Interval in seconds between the audits of the usage '
+                    'of all the instances and migrations of a compute node. '
+                    'In between, the periodic update of the available '
+                    'resources keeps the usage tracked from the resource '
+                    'claims and only updates the compute node record when '
+                    'it changed. 0 audits on every update.'),
 ]
 
 CONF = cfg.CONF
@@ -74,6 +83,9 @@ class ResourceTracker(object):
         self.stats = importutils.import_object(CONF.compute_stats_class)
         self.tracked_instances = {}
         self.tracked_migrations = {}
+        self.last_audit = None
+        # The compute node values last sent to the conductor:
+        self._reported_values = {}
         self.conductor_api = conductor.API()
         monitor_handler = monitors.ResourceMonitorHandler()
         self.monitors = monitor_handler.choose_monitors(self)
@@ -288,6 +300,10 @@ class ResourceTracker(object):
         Add in resource claims in progress to account for operations that have
         declared a need for resources, but not necessarily retrieved them from
         the hypervisor layer yet.
+
+        The usage of the instances and migrations is only audited every
+        resource_tracker_audit_interval seconds.  In between, the usage
+        tracked from the resource claims is kept.
         """
         LOG.audit(_("Auditing locally available compute resources"))
         resources = self.driver.get_available_resource(self.nodename)
@@ -297,6 +313,7 @@ class ResourceTracker(object):
             LOG.audit(_("Virt driver does not support "
                  "'get_available_resource'  Compute tracking is disabled."))
             self.compute_node = None
+            self._reported_values = {}
             return
         resources['host_ip'] = CONF.my_ip
 
@@ -310,6 +327,15 @@ class ResourceTracker(object):
             self.pci_tracker.set_hvdevs(jsonutils.loads(resources.pop(
                 'pci_passthrough_devices')))
 
+        if not self._audit_due():
+            LOG.debug(_("Keeping the tracked usage until the next audit"))
+            self._update_usage_from_tracked(resources)
+            self._report_final_resource_view(resources)
+            metrics = self._get_host_metrics(context, self.nodename)
+            resources['metrics'] = jsonutils.dumps(metrics)
+            self._update(context, resources, skip_unchanged=True)
+            return
+
         # Grab all instances assigned to this node:
         instances = instance_obj.InstanceList.get_by_host_and_node(
             context, self.host, self.nodename)
@@ -344,6 +370,32 @@ class ResourceTracker(object):
         metrics = self._get_host_metrics(context, self.nodename)
         resources['metrics'] = jsonutils.dumps(metrics)
         self._sync_compute_node(context, resources)
+        self.last_audit = time.time()
+
+    def _audit_due(self):
+        interval = CONF.resource_tracker_audit_interval
+        return (not interval or self.compute_node is None or
+                self.last_audit is None or
+                time.time() - self.last_audit >= interval)
+
+    def _update_usage_from_tracked(self, resources):
+        """Take the usage of the instances and migrations tracked since the
+        last audit, on top of the resources reported by the hypervisor.
+        """
+        resources['memory_mb_used'] = self.compute_node['memory_mb_used']
+        resources['local_gb_used'] = self.compute_node['local_gb_used']
+        resources['free_ram_mb'] = (resources['memory_mb'] -
+                                    resources['memory_mb_used'])
+        resources['free_disk_gb'] = (resources['local_gb'] -
+                                     resources['local_gb_used'])
+        resources['running_vms'] = self.stats.num_instances
+        resources['vcpus_used'] = self.stats.num_vcpus_used
+        resources['current_workload'] = self.stats.calculate_workload()
+        resources['stats'] = jsonutils.dumps(self.stats)
+        if self.pci_tracker:
+            resources['pci_stats'] = jsonutils.dumps(self.pci_tracker.stats)
+        else:
+            resources['pci_stats'] = jsonutils.dumps([])
 
     def _sync_compute_node(self, context, resources):
         """Create or update the compute node DB record."""
@@ -383,6 +435,7 @@ class ResourceTracker(object):
         # initialize load stats from existing instances:
         self.compute_node = self.conductor_api.compute_node_create(context,
                                                                    values)
+        self._reported_values = dict(values)
 
     def _get_service(self, context):
         try:
@@ -441,12 +494,22 @@ class ResourceTracker(object):
         if 'pci_devices' in resources:
             LOG.audit(_("Free PCI devices: %s") % resources['pci_devices'])
 
-    def _update(self, context, values):
-        """Persist the compute node updates to the DB."""
+    def _update(self, context, values, skip_unchanged=False):
+        """Persist the compute node updates to the DB.
+
+        Only the values which changed since they were last persisted are
+        sent.  If none did and skip_unchanged is True, the compute node is
+        not updated at all.
+        """
         if "service" in self.compute_node:
             del self.compute_node['service']
-        self.compute_node = self.conductor_api.compute_node_update(
-            context, self.compute_node, values)
+        changes = dict((key, value) for key, value in values.iteritems()
+                       if key not in self._reported_values or
+                       self._reported_values[key] != value)
+        if changes or not skip_unchanged:
+            self.compute_node = self.conductor_api.compute_node_update(
+                context, self.compute_node, dict(changes))
+            self._reported_values.update(changes)
         if self.pci_tracker:
             self.pci_tracker.save(context)
 
@@ -614,6 +677,7 @@ class ResourceTracker(object):
                                      resources['local_gb_used'])
         resources['current_workload'] = 0
         resources['running_vms'] = 0
+        resources['stats'] = jsonutils.dumps(self.stats)
 
         for instance in instances:
             if instance['vm_state'] == vm_states.DELETED:
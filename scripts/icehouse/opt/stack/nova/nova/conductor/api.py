@@ -66,6 +66,13 @@ class LocalAPI(object):
         return self._manager.instance_update(context, instance_uuid,
                                              updates, 'compute')
 
+    def instance_update_many(self, context, updates):
+        """Perform the updates of many instances, a dict of updates by
+        instance uuid, in the database.
+        """
+        return self._manager.instance_update_many(context, updates,
+                                                  'compute')
+
     def instance_get_by_uuid(self, context, instance_uuid,
                              columns_to_join=None):
         return self._manager.instance_get_by_uuid(context, instance_uuid,
@@ -131,6 +138,15 @@ class LocalAPI(object):
                                              last_refreshed,
                                              update_cells=update_cells)
 
+    def bw_usage_get_many(self, context, start_period, keys):
+        return self._manager.bw_usage_get_many(context, start_period, keys)
+
+    def bw_usage_update_many(self, context, start_period, usages,
+                             last_refreshed=None, update_cells=True):
+        return self._manager.bw_usage_update_many(context, start_period,
+                                                  usages, last_refreshed,
+                                                  update_cells=update_cells)
+
     def provider_fw_rule_get_all(self, context):
         return self._manager.provider_fw_rule_get_all(context)
 
@@ -170,6 +186,10 @@ class LocalAPI(object):
                                               instance, last_refreshed,
                                               update_totals)
 
+    def vol_usage_update_many(self, context, usages, update_totals=False):
+        return self._manager.vol_usage_update_many(context, usages,
+                                                   update_totals)
+
     def service_get_all(self, context):
         return self._manager.service_get_all_by(context)
 
@@ -363,6 +383,13 @@ class API(LocalAPI):
         return self._manager.instance_update(context, instance_uuid,
                                              updates, 'conductor')
 
+    def instance_update_many(self, context, updates):
+        """Perform the updates of many instances, a dict of updates by
+        instance uuid, in the database.
+        """
+        return self._manager.instance_update_many(context, updates,
+                                                  'conductor')
+
 
 class ComputeTaskAPI(object):
     """ComputeTask API that queues up compute tasks for nova-conductor."""
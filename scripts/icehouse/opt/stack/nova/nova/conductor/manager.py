@@ -117,6 +117,10 @@ class ConductorManager(manager.Manager):
                                    exception.UnexpectedTaskStateError)
     def instance_update(self, context, instance_uuid,
                         updates, service=None):
+        return self._instance_update(context, instance_uuid, updates,
+                                     service)
+
+    def _instance_update(self, context, instance_uuid, updates, service):
         for key, value in updates.iteritems():
             if key not in allowed_updates:
                 LOG.error(_("Instance update attempted for "
@@ -131,6 +135,25 @@ class ConductorManager(manager.Manager):
         notifications.send_update(context, old_ref, instance_ref, service)
         return jsonutils.to_primitive(instance_ref)
 
+    @messaging.expected_exceptions(KeyError, ValueError,
+                                   exception.InvalidUUID,
+                                   exception.UnexpectedTaskStateError)
+    def instance_update_many(self, context, updates, service=None):
+        """Apply a dict of updates by instance uuid, skipping the instances
+        which no longer exist.
+        """
+        instances = []
+        for instance_uuid, instance_updates in updates.iteritems():
+            try:
+                instances.append(self._instance_update(context,
+                                                       instance_uuid,
+                                                       instance_updates,
+                                                       service))
+            except exception.InstanceNotFound:
+                LOG.debug(_("Instance %s was deleted before it could be "
+                            "updated"), instance_uuid)
+        return instances
+
     # NOTE(russellb): This method is now deprecated and can be removed in
     # version 2.0 of the RPC API
     @messaging.expected_exceptions(exception.InstanceNotFound)
@@ -259,6 +282,29 @@ class ConductorManager(manager.Manager):
         usage = self.db.bw_usage_get(context, uuid, start_period, mac)
         return jsonutils.to_primitive(usage)
 
+    def bw_usage_get_many(self, context, start_period, keys):
+        """Return the usages of a list of (uuid, mac) pairs which have
+        one in the period.
+        """
+        if isinstance(start_period, six.string_types):
+            start_period = timeutils.parse_strtime(start_period)
+        keys = set(tuple(key) for key in keys)
+        usages = self.db.bw_usage_get_by_uuids(
+            context, list(set(uuid for uuid, mac in keys)), start_period)
+        return jsonutils.to_primitive([usage for usage in usages
+                                       if (usage['uuid'], usage['mac'])
+                                       in keys])
+
+    def bw_usage_update_many(self, context, start_period, usages,
+                             last_refreshed=None, update_cells=True):
+        if isinstance(start_period, six.string_types):
+            start_period = timeutils.parse_strtime(start_period)
+        if isinstance(last_refreshed, six.string_types):
+            last_refreshed = timeutils.parse_strtime(last_refreshed)
+        self.db.bw_usage_update_many(context, start_period, usages,
+                                     last_refreshed,
+                                     update_cells=update_cells)
+
     # NOTE(russellb) This method can be removed in 2.0 of this API.  It is
     # deprecated in favor of the method in the base API.
     def get_backdoor_port(self, context):
@@ -424,6 +470,23 @@ class ConductorManager(manager.Manager):
         self.notifier.info(context, 'volume.usage',
                            compute_utils.usage_volume_info(vol_usage))
 
+    def vol_usage_update_many(self, context, usages, update_totals=False):
+        vol_usages = self.db.vol_usage_update_many(context, [
+            {'id': usage['vol_id'],
+             'rd_req': usage['rd_req'],
+             'rd_bytes': usage['rd_bytes'],
+             'wr_req': usage['wr_req'],
+             'wr_bytes': usage['wr_bytes'],
+             'instance_id': usage['instance']['uuid'],
+             'project_id': usage['instance']['project_id'],
+             'user_id': usage['instance']['user_id'],
+             'availability_zone': usage['instance']['availability_zone']}
+            for usage in usages], update_totals)
+
+        for vol_usage in vol_usages:
+            self.notifier.info(context, 'volume.usage',
+                               compute_utils.usage_volume_info(vol_usage))
+
     @messaging.expected_exceptions(exception.ComputeHostNotFound,
                                    exception.HostBinaryNotFound)
     def service_get_all_by(self, context, topic=None, host=None, binary=None):
@@ -876,7 +939,7 @@ class ComputeTaskManager(base.Base):
 
 class _ConductorManagerV2Proxy(object):
 
-    target = messaging.Target(version='2.0')
+    target = messaging.Target(version='2.1')
 
     def __init__(self, manager):
         self.manager = manager
@@ -886,6 +949,9 @@ class _ConductorManagerV2Proxy(object):
         return self.manager.instance_update(context, instance_uuid, updates,
                 service)
 
+    def instance_update_many(self, context, updates, service):
+        return self.manager.instance_update_many(context, updates, service)
+
     def instance_get_by_uuid(self, context, instance_uuid,
                              columns_to_join):
         return self.manager.instance_get_by_uuid(context, instance_uuid,
@@ -912,6 +978,14 @@ class _ConductorManagerV2Proxy(object):
                 bw_in, bw_out, last_ctr_in, last_ctr_out, last_refreshed,
                 update_cells)
 
+    def bw_usage_get_many(self, context, start_period, keys):
+        return self.manager.bw_usage_get_many(context, start_period, keys)
+
+    def bw_usage_update_many(self, context, start_period, usages,
+                             last_refreshed, update_cells):
+        return self.manager.bw_usage_update_many(context, start_period,
+                usages, last_refreshed, update_cells)
+
     def provider_fw_rule_get_all(self, context):
         return self.manager.provider_fw_rule_get_all(context)
 
@@ -952,6 +1026,10 @@ class _ConductorManagerV2Proxy(object):
         return self.manager.vol_usage_update(context, vol_id, rd_req, rd_bytes,
                 wr_req, wr_bytes, instance, last_refreshed, update_totals)
 
+    def vol_usage_update_many(self, context, usages, update_totals):
+        return self.manager.vol_usage_update_many(context, usages,
+                update_totals)
+
     def service_get_all_by(self, context, topic, host, binary):
         return self.manager.service_get_all_by(context, topic, host, binary)
 
@@ -18,6 +18,7 @@
 from oslo.config import cfg
 from oslo import messaging
 
+from nova import exception
 from nova.objects import base as objects_base
 from nova.openstack.common import jsonutils
 from nova import rpc
@@ -133,6 +134,8 @@ class ConductorAPI(object):
     ...  - Remove block_device_mapping_destroy()
 
     2.0  - Drop backwards compatibility
+    2.1  - Added instance_update_many, bw_usage_get_many,
+           bw_usage_update_many and vol_usage_update_many
     """
 
     VERSION_ALIASES = {
@@ -160,6 +163,21 @@ class ConductorAPI(object):
                           updates=updates_p,
                           service=service)
 
+    def instance_update_many(self, context, updates, service=None):
+        if not self.client.can_send_version('2.1'):
+            instances = []
+            for instance_uuid, instance_updates in updates.iteritems():
+                try:
+                    instances.append(self.instance_update(context,
+                            instance_uuid, instance_updates, service))
+                except exception.InstanceNotFound:
+                    pass
+            return instances
+        updates_p = jsonutils.to_primitive(updates)
+        cctxt = self.client.prepare(version='2.1')
+        return cctxt.call(context, 'instance_update_many',
+                          updates=updates_p, service=service)
+
     def instance_get_by_uuid(self, context, instance_uuid,
                              columns_to_join=None):
         kwargs = {'instance_uuid': instance_uuid,
@@ -207,6 +225,35 @@ class ConductorAPI(object):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'bw_usage_update', **msg_kwargs)
 
+    def bw_usage_get_many(self, context, start_period, keys):
+        if not self.client.can_send_version('2.1'):
+            usages = [self.bw_usage_update(context, uuid, mac, start_period)
+                      for uuid, mac in keys]
+            return [usage for usage in usages if usage]
+        start_period_p = jsonutils.to_primitive(start_period)
+        cctxt = self.client.prepare(version='2.1')
+        return cctxt.call(context, 'bw_usage_get_many',
+                          start_period=start_period_p, keys=keys)
+
+    def bw_usage_update_many(self, context, start_period, usages,
+                             last_refreshed=None, update_cells=True):
+        if not self.client.can_send_version('2.1'):
+            for usage in usages:
+                self.bw_usage_update(context, usage['uuid'], usage['mac'],
+                                     start_period, usage['bw_in'],
+                                     usage['bw_out'], usage['last_ctr_in'],
+                                     usage['last_ctr_out'],
+                                     last_refreshed=last_refreshed,
+                                     update_cells=update_cells)
+            return
+        start_period_p = jsonutils.to_primitive(start_period)
+        last_refreshed_p = jsonutils.to_primitive(last_refreshed)
+        cctxt = self.client.prepare(version='2.1')
+        cctxt.call(context, 'bw_usage_update_many',
+                   start_period=start_period_p, usages=usages,
+                   last_refreshed=last_refreshed_p,
+                   update_cells=update_cells)
+
     def provider_fw_rule_get_all(self, context):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'provider_fw_rule_get_all')
@@ -274,6 +321,20 @@ class ConductorAPI(object):
                           instance=instance_p, last_refreshed=last_refreshed,
                           update_totals=update_totals)
 
+    def vol_usage_update_many(self, context, usages, update_totals=False):
+        if not self.client.can_send_version('2.1'):
+            for usage in usages:
+                self.vol_usage_update(context, usage['vol_id'],
+                                      usage['rd_req'], usage['rd_bytes'],
+                                      usage['wr_req'], usage['wr_bytes'],
+                                      usage['instance'],
+                                      update_totals=update_totals)
+            return
+        usages_p = jsonutils.to_primitive(usages)
+        cctxt = self.client.prepare(version='2.1')
+        cctxt.call(context, 'vol_usage_update_many',
+                   usages=usages_p, update_totals=update_totals)
+
     def service_get_all_by(self, context, topic=None, host=None, binary=None):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'service_get_all_by',
@@ -194,6 +194,22 @@ def compute_node_get_all(context, no_date_fields=False):
     return IMPL.compute_node_get_all(context, no_date_fields)
 
 
+def compute_node_get_all_changed_since(context, changed_since):
+    """Get computeNodes created, updated or deleted since a point in time.
+
+    :param context: The security context
+    :param changed_since: Datetime; nodes whose 'created_at', 'updated_at'
+                          or 'deleted_at' is at or after this are returned
+
+    :returns: Tuple of (compute_nodes, services). compute_nodes is a list of
+              dictionaries each containing compute node properties,
+              including corresponding service; deleted nodes are included
+              and have a non-zero 'deleted' field. services is a list of
+              dictionaries of all live nova-compute services, changed or not.
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changed_since)
+
+
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     """Get compute nodes by hypervisor hostname.
 
@@ -1105,6 +1121,19 @@ def quota_reserve(context, resources, quotas, user_quotas, deltas, expire,
                               project_id=project_id, user_id=user_id)
 
 
+def quota_reserve_compare_and_swap(context, resources, quotas, user_quotas,
+                                   deltas, expire, until_refresh, max_age,
+                                   project_id=None, user_id=None):
+    """Check quotas and create appropriate reservations, without locking
+    all the usages of the project.
+    """
+    return IMPL.quota_reserve_compare_and_swap(context, resources, quotas,
+                                               user_quotas, deltas, expire,
+                                               until_refresh, max_age,
+                                               project_id=project_id,
+                                               user_id=user_id)
+
+
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1648,6 +1677,29 @@ def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
     return rv
 
 
+def bw_usage_update_many(context, start_period, usages, last_refreshed=None,
+                         update_cells=True):
+    """Update the cached bandwidth usage of many networks of instances at
+    once.
+
+    Each usage is a dict with the uuid, mac, bw_in, bw_out, last_ctr_in
+    and last_ctr_out arguments of bw_usage_update().
+    """
+    IMPL.bw_usage_update_many(context, start_period, usages,
+                              last_refreshed=last_refreshed)
+    if update_cells:
+        cells_api = cells_rpcapi.CellsAPI()
+        for usage in usages:
+            try:
+                cells_api.bw_usage_update_at_top(context,
+                        usage['uuid'], usage['mac'], start_period,
+                        usage['bw_in'], usage['bw_out'],
+                        usage['last_ctr_in'], usage['last_ctr_out'],
+                        last_refreshed)
+            except Exception:
+                LOG.exception(_("Failed to notify cells of bw_usage update"))
+
+
 ###################
 
 
@@ -1669,6 +1721,17 @@ def vol_usage_update(context, id, rd_req, rd_bytes, wr_req, wr_bytes,
                                  update_totals=update_totals)
 
 
+def vol_usage_update_many(context, usages, update_totals=False):
+    """Update the cached usage of many volumes at once.
+
+    Each usage is a dict with the id, rd_req, rd_bytes, wr_req, wr_bytes,
+    instance_id, project_id, user_id and availability_zone arguments of
+    vol_usage_update().  Returns the updated usages in the same order.
+    """
+    return IMPL.vol_usage_update_many(context, usages,
+                                      update_totals=update_totals)
+
+
 ###################
 
 
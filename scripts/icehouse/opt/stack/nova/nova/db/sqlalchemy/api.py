@@ -39,6 +39,7 @@ from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
 from sqlalchemy.orm import noload
+from sqlalchemy.orm import subqueryload
 from sqlalchemy.schema import Table
 from sqlalchemy.sql.expression import asc
 from sqlalchemy.sql.expression import desc
@@ -61,6 +62,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
 from nova import quota
+from nova import utils
 
 db_opts = [
     cfg.StrOpt('osapi_compute_unique_server_name_scope',
@@ -125,6 +127,9 @@ def get_session(use_subordinate=False, **kwargs):
 
 _SHADOW_TABLE_PREFIX = 'shadow_'
 _DEFAULT_QUOTA_NAME = 'default'
+# Largest number of values bound to a single IN clause.  SQLite refuses
+# statements with more than 999 parameters.
+_IN_BATCH_SIZE = 500
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
 
 
@@ -612,6 +617,41 @@ def compute_node_get_all(context, no_date_fields):
     return compute_nodes
 
 
+@require_admin_context
+def compute_node_get_all_changed_since(context, changed_since):
+    engine = get_engine()
+
+    compute_node = models.ComputeNode.__table__
+    service = models.Service.__table__
+
+    with engine.begin() as conn:
+        changed = or_(compute_node.c.created_at >= changed_since,
+                      compute_node.c.updated_at >= changed_since,
+                      compute_node.c.deleted_at >= changed_since)
+        compute_node_query = select([compute_node]).\
+                                where(changed).\
+                                order_by(compute_node.c.service_id)
+        compute_node_rows = conn.execute(compute_node_query).fetchall()
+
+        service_query = select([service]).\
+                            where((service.c.deleted == 0) &
+                                  (service.c.binary == 'nova-compute')).\
+                            order_by(service.c.id)
+        service_rows = conn.execute(service_query).fetchall()
+
+    services = {}
+    for proxy in service_rows:
+        services[proxy['id']] = dict(proxy.items())
+
+    compute_nodes = []
+    for proxy in compute_node_rows:
+        node = dict(proxy.items())
+        node['service'] = services.get(proxy['service_id'])
+        compute_nodes.append(node)
+
+    return compute_nodes, services.values()
+
+
 @require_admin_context
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -1851,9 +1891,14 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
         'soft_deleted' - modify behavior of 'deleted' to either
                          include or exclude instances whose
                          vm_state is SOFT_DELETED.
-    """
 
-    sort_fn = {'desc': desc, 'asc': asc}
+    Regular expressions anchored with ^ and otherwise made of literal
+    characters, such as '^web-' or '^web-1$', are also matched on the
+    prefix or the whole value, so an index on the column can be used.
+
+    Pages are read after the marker instance on the sort key, then on
+    created_at and id.
+    """
 
     if CONF.database.subordinate_connection == '':
         use_subordinate = False
@@ -1868,10 +1913,14 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
 
     query_prefix = session.query(models.Instance)
     for column in columns_to_join:
-        query_prefix = query_prefix.options(joinedload(column))
-
-    query_prefix = query_prefix.order_by(sort_fn[sort_dir](
-            getattr(models.Instance, sort_key)))
+        if column == 'security_groups':
+            # NOTE: Joining security groups in the query nests the
+            # association table in a derived table, which some databases
+            # read whole for every listing.  They are read in a second
+            # query on the instances of the page instead.
+            query_prefix = query_prefix.options(subqueryload(column))
+        else:
+            query_prefix = query_prefix.options(joinedload(column))
 
     # Make a copy of the filters dictionary to use going forward, as we'll
     # be modifying it and we shouldn't affect the caller's use of it.
@@ -1939,14 +1988,31 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                               filters)
 
     # paginate query
+    sort_keys = [sort_key] + [key for key in ('created_at', 'id')
+                              if key != sort_key]
     if marker is not None:
-        try:
-            marker = _instance_get_by_uuid(context, marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
+        # Only the sort keys of the marker are needed, so none of its
+        # relationships are loaded.
+        marker_uuid = marker
+        marker = model_query(context, models.Instance, session=session,
+                             project_only=True).\
+                        filter_by(uuid=marker_uuid).\
+                        first()
+        if not marker:
+            raise exception.MarkerNotFound(marker_uuid)
+        # NOTE: paginate_query() ORs the conditions on every sort key,
+        # which databases do not use an index for.  This condition they
+        # can, and it doesn't change the rows returned.
+        marker_value = getattr(marker, sort_key)
+        if marker_value is not None:
+            sort_column = getattr(models.Instance, sort_key)
+            if sort_dir == 'desc':
+                query_prefix = query_prefix.filter(sort_column <= marker_value)
+            else:
+                query_prefix = query_prefix.filter(sort_column >= marker_value)
     query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                            models.Instance, limit,
-                           [sort_key, 'created_at', 'id'],
+                           sort_keys,
                            marker=marker,
                            sort_dir=sort_dir)
 
@@ -2039,11 +2105,35 @@ def regex_filter(query, model, filters):
             query = query.filter(column_attr.op(db_regexp_op)(
                                  '%' + str(filters[filter_name]) + '%'))
         else:
-            query = query.filter(column_attr.op(db_regexp_op)(
-                                 str(filters[filter_name])))
+            value = str(filters[filter_name])
+            prefix = utils.regex_prefix(value)
+            if prefix is not None:
+                query = query.filter(_prefix_filter(column_attr, db_string,
+                                                    *prefix))
+            query = query.filter(column_attr.op(db_regexp_op)(value))
     return query
 
 
+def _prefix_filter(column_attr, db_string, prefix, exact):
+    """Return a condition matching at least the values of column_attr
+    starting with prefix, or equal to it if exact is True, for which an
+    index on the column can be used.
+    """
+    if exact:
+        return column_attr == prefix
+    if db_string == 'sqlite':
+        # SQLite only uses an index for LIKE when it is case sensitive,
+        # but it does for a range of the column's binary collation.
+        condition = column_attr >= prefix
+        if prefix[-1] < '\x7f':
+            condition = and_(condition, column_attr <
+                             prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return condition
+    for char in ('\\', '%', '_'):
+        prefix = prefix.replace(char, '\\' + char)
+    return column_attr.like(prefix + '%', escape='\\')
+
+
 @require_context
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None):
@@ -2991,12 +3081,17 @@ def quota_usage_update(context, project_id, user_id, resource, **kwargs):
         if key in kwargs:
             updates[key] = kwargs[key]
 
-    result = model_query(context, models.QuotaUsage, read_deleted="no").\
-                     filter_by(project_id=project_id).\
-                     filter_by(resource=resource).\
-                     filter(or_(models.QuotaUsage.user_id == user_id,
-                                models.QuotaUsage.user_id == None)).\
-                     update(updates)
+    session = get_session()
+    with session.begin():
+        result = model_query(context, models.QuotaUsage, read_deleted="no",
+                             session=session).\
+                         filter_by(project_id=project_id).\
+                         filter_by(resource=resource).\
+                         filter(or_(models.QuotaUsage.user_id == user_id,
+                                    models.QuotaUsage.user_id == None)).\
+                         update(updates)
+        if result:
+            _project_quota_usages_destroy(context, session, project_id)
 
     if not result:
         raise exception.QuotaUsageNotFound(project_id=project_id)
@@ -3049,6 +3144,112 @@ def _get_project_user_quota_usages(context, session, project_id,
     return proj_result, user_result
 
 
+# NOTE: The project quota usages hold the sums of the quota usages of their
+# project, so that quota_reserve_compare_and_swap() can check the project
+# quotas without reading the usages of the other users.  They are locked
+# after the quota usages, in the order of their ids, and rebuilt by
+# quota_reserve() when they are missing.
+
+def _project_quota_usages_get(context, session, project_id):
+    """Return the project usages of a project, by resource.
+
+    A resource with more than one project usage, left by reservations which
+    created the first usages of the project at the same time, maps to None.
+    """
+    query = model_query(context, models.ProjectQuotaUsage,
+                        read_deleted="no", session=session).\
+                    filter_by(project_id=project_id).\
+                    order_by(models.ProjectQuotaUsage.id)
+    result = {}
+    for row in query.all():
+        result[row.resource] = None if row.resource in result else row
+    return result
+
+
+def _project_quota_usages_sync(context, session, project_id):
+    """Set the project usages of a project to the sums of its quota usages,
+    which the caller has locked.
+    """
+    session.flush()
+    sums = model_query(context, models.QuotaUsage.resource,
+                       func.sum(models.QuotaUsage.in_use),
+                       func.sum(models.QuotaUsage.reserved),
+                       base_model=models.QuotaUsage, read_deleted="no",
+                       session=session).\
+                   filter_by(project_id=project_id).\
+                   group_by(models.QuotaUsage.resource).\
+                   all()
+    rows = model_query(context, models.ProjectQuotaUsage,
+                       read_deleted="no", session=session).\
+                   filter_by(project_id=project_id).\
+                   order_by(models.ProjectQuotaUsage.id).\
+                   with_lockmode('update').\
+                   all()
+    totals = {}
+    for row in rows:
+        if row.resource in totals:
+            row.soft_delete(session=session)
+        else:
+            totals[row.resource] = row
+    for resource, in_use, reserved in sums:
+        total = totals.pop(resource, None)
+        if total is None:
+            total = models.ProjectQuotaUsage()
+            total.project_id = project_id
+            total.resource = resource
+        total.in_use = int(in_use)
+        total.reserved = int(reserved)
+        session.add(total)
+    for total in totals.values():
+        total.soft_delete(session=session)
+
+
+def _project_quota_usages_update(context, session, changes):
+    """Add to the project usages the changes of their quota usages.
+
+    changes maps (project_id, resource) to the (in_use, reserved) deltas.
+    """
+    for project_id in sorted(set(key[0] for key in changes)):
+        resources = [key[1] for key in changes if key[0] == project_id]
+        rows = model_query(context, models.ProjectQuotaUsage.id,
+                           models.ProjectQuotaUsage.resource,
+                           base_model=models.ProjectQuotaUsage,
+                           read_deleted="no", session=session).\
+                       filter_by(project_id=project_id).\
+                       filter(models.ProjectQuotaUsage.resource.in_(
+                           resources)).\
+                       order_by(models.ProjectQuotaUsage.id).\
+                       with_lockmode('update').\
+                       all()
+        for row_id, resource in rows:
+            in_use, reserved = changes[(project_id, resource)]
+            model_query(context, models.ProjectQuotaUsage,
+                        read_deleted="no", session=session).\
+                    filter_by(id=row_id).\
+                    update({'in_use': models.ProjectQuotaUsage.in_use +
+                                      in_use,
+                            'reserved': models.ProjectQuotaUsage.reserved +
+                                        reserved},
+                           synchronize_session=False)
+
+
+def _project_quota_usages_add_change(changes, usage, in_use, reserved):
+    """Add the in_use and reserved deltas of a quota usage to changes."""
+    key = (usage.project_id, usage.resource)
+    old_in_use, old_reserved = changes.get(key, (0, 0))
+    changes[key] = (old_in_use + in_use, old_reserved + reserved)
+
+
+def _project_quota_usages_destroy(context, session, project_id):
+    """Drop the project usages of a project, for quota_reserve() to rebuild
+    them from its quota usages.
+    """
+    model_query(context, models.ProjectQuotaUsage, session=session,
+                read_deleted="no").\
+            filter_by(project_id=project_id).\
+            soft_delete(synchronize_session=False)
+
+
 @require_context
 @_retry_on_deadlock
 def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
@@ -3220,41 +3421,227 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
         # Apply updates to the usages table
         for usage_ref in user_usages.values():
             session.add(usage_ref)
+        _project_quota_usages_sync(elevated, session, project_id)
 
     if unders:
         LOG.warning(_("Change will make usage less than 0 for the following "
                       "resources: %s"), unders)
     if overs:
-        if project_quotas == user_quotas:
-            usages = project_usages
+        raise _over_quota(overs, deltas, project_quotas, user_quotas,
+                          project_usages, user_usages)
+
+    return reservations
+
+
+def _over_quota(overs, deltas, project_quotas, user_quotas, project_usages,
+                user_usages):
+    """Build the OverQuota exception for the resources in overs."""
+    if project_quotas == user_quotas:
+        usages = project_usages
+    else:
+        usages = user_usages
+    usages = dict((k, dict(in_use=v['in_use'], reserved=v['reserved']))
+                  for k, v in usages.items())
+    headroom = dict((res, user_quotas[res] -
+                         (usages[res]['in_use'] + usages[res]['reserved']))
+                    for res in user_quotas.keys())
+
+    # If quota_cores is unlimited [-1]:
+    # - set cores headroom based on instances headroom:
+    if user_quotas.get('cores') == -1:
+        if deltas['cores']:
+            hc = headroom['instances'] * deltas['cores']
+            headroom['cores'] = hc / deltas['instances']
         else:
-            usages = user_usages
-        usages = dict((k, dict(in_use=v['in_use'], reserved=v['reserved']))
-                      for k, v in usages.items())
-        headroom = dict((res, user_quotas[res] -
-                             (usages[res]['in_use'] + usages[res]['reserved']))
-                        for res in user_quotas.keys())
-
-        # If quota_cores is unlimited [-1]:
-        # - set cores headroom based on instances headroom:
-        if user_quotas.get('cores') == -1:
-            if deltas['cores']:
-                hc = headroom['instances'] * deltas['cores']
-                headroom['cores'] = hc / deltas['instances']
-            else:
-                headroom['cores'] = headroom['instances']
-
-        # If quota_ram is unlimited [-1]:
-        # - set ram headroom based on instances headroom:
-        if user_quotas.get('ram') == -1:
-            if deltas['ram']:
-                hr = headroom['instances'] * deltas['ram']
-                headroom['ram'] = hr / deltas['instances']
-            else:
-                headroom['ram'] = headroom['instances']
-        raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
-                                  usages=usages, headroom=headroom)
+            headroom['cores'] = headroom['instances']
+
+    # If quota_ram is unlimited [-1]:
+    # - set ram headroom based on instances headroom:
+    if user_quotas.get('ram') == -1:
+        if deltas['ram']:
+            hr = headroom['instances'] * deltas['ram']
+            headroom['ram'] = hr / deltas['instances']
+        else:
+            headroom['ram'] = headroom['instances']
+    return exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                               usages=usages, headroom=headroom)
+
+
+def _quota_usage_is_current(usage, max_age):
+    """Whether a usage can be used by a reservation without a refresh."""
+    if usage is None or usage.in_use < 0 or usage.until_refresh is not None:
+        return False
+    return not (max_age and (usage.updated_at -
+                             timeutils.utcnow()).seconds >= max_age)
+
 
+def _quota_usages_expire_reservations(context, session, usage_query):
+    """Roll back the expired reservations of the quota usages of a query.
+
+    Returns whether there were any to roll back.
+    """
+    usages = usage_query.order_by(models.QuotaUsage.id).\
+                         with_lockmode('update').\
+                         all()
+    if not usages:
+        return False
+    usages = dict((usage.id, usage) for usage in usages)
+    reservation_query = model_query(context, models.Reservation,
+                                    read_deleted="no", session=session).\
+                        filter(models.Reservation.usage_id.in_(
+                            usages.keys())).\
+                        filter(models.Reservation.expire <
+                               timeutils.utcnow()).\
+                        with_lockmode('update')
+    reservations = reservation_query.all()
+    released = collections.defaultdict(int)
+    for reservation in reservations:
+        if reservation.delta >= 0:
+            released[reservation.usage_id] += reservation.delta
+    changes = {}
+    for usage_id, delta in sorted(released.items()):
+        if not delta:
+            continue
+        # NOTE: The usages read by the caller may be in the session, so
+        # they are updated in SQL rather than through their attributes.
+        model_query(context, models.QuotaUsage, read_deleted="no",
+                    session=session).\
+                filter_by(id=usage_id).\
+                update({'reserved': models.QuotaUsage.reserved - delta},
+                       synchronize_session=False)
+        _project_quota_usages_add_change(changes, usages[usage_id], 0,
+                                         -delta)
+    _project_quota_usages_update(context, session, changes)
+    reservation_query.soft_delete(synchronize_session=False)
+    return bool(reservations)
+
+
+def _quota_usage_reserve(context, session, model, row_id, delta, limit,
+                         usage_query):
+    """Add delta to the reserved count of a quota usage or project usage,
+    if in_use and reserved stay within limit.  None is no limit.
+
+    When it is at its limit the expired reservations of the quota usages of
+    usage_query, which it counts, are rolled back before trying again.
+    Returns whether it was updated.
+    """
+    query = model_query(context, model, read_deleted="no",
+                        session=session).\
+                    filter_by(id=row_id)
+    if limit is not None:
+        query = query.filter(model.in_use + model.reserved + delta <= limit)
+    updates = {'reserved': model.reserved + delta}
+    if query.update(updates, synchronize_session=False):
+        return True
+    if (limit is not None and
+            _quota_usages_expire_reservations(context, session,
+                                              usage_query)):
+        return bool(query.update(updates, synchronize_session=False))
+    return False
+
+
+@require_context
+@_retry_on_deadlock
+def quota_reserve_compare_and_swap(context, resources, project_quotas,
+                                   user_quotas, deltas, expire,
+                                   until_refresh, max_age, project_id=None,
+                                   user_id=None):
+    """Check quotas and create reservations like quota_reserve(), without
+    locking the usages of the project.
+
+    Only the usages of the user and the project usages are read, without
+    locks.  The usage of the user and the project usage of each resource
+    are then raised by updates conditional on their in_use and reserved
+    counts staying within the user and project quotas, so concurrent
+    reservations of a project only wait for each other on the rows they
+    both change.
+
+    Reservations which need a usage created or refreshed, or the project
+    usages rebuilt, are made by quota_reserve().
+    """
+    elevated = context.elevated()
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.QuotaUsage, read_deleted="no",
+                           session=session).\
+                       filter_by(project_id=project_id).\
+                       filter(or_(models.QuotaUsage.user_id == user_id,
+                                  models.QuotaUsage.user_id == None)).\
+                       all()
+        user_usages = dict((row.resource, row) for row in rows)
+        project_totals = _project_quota_usages_get(context, session,
+                                                   project_id)
+        current = all(_quota_usage_is_current(user_usages.get(res), max_age)
+                      and project_totals.get(res) is not None
+                      for res in deltas)
+        if current:
+            project_usages = dict(
+                    (res, dict(in_use=row.in_use, reserved=row.reserved,
+                               total=row.in_use + row.reserved))
+                    for res, row in project_totals.items()
+                    if row is not None)
+            unders = [res for res, delta in deltas.items()
+                      if delta < 0 and
+                      delta + user_usages[res].in_use < 0]
+
+            # NOTE: As in quota_reserve(), only positive deltas are checked
+            # and reserved, and only against a user quota which is not
+            # unlimited.  The usages are updated before the project usages,
+            # each in the order of their ids, the order the locks are taken
+            # in by quota_reserve(), to avoid deadlocks.
+            reserving = [res for res, delta in deltas.items() if delta > 0]
+            project_query = model_query(elevated, models.QuotaUsage,
+                                        read_deleted="no",
+                                        session=session).\
+                                filter_by(project_id=project_id)
+            overs = []
+            for model, rows, quotas in (
+                    (models.QuotaUsage, user_usages, user_quotas),
+                    (models.ProjectQuotaUsage, project_totals,
+                     project_quotas)):
+                for res in sorted(reserving, key=lambda res: rows[res].id):
+                    limit = None
+                    if user_quotas[res] >= 0:
+                        limit = quotas[res]
+                    if model is models.QuotaUsage:
+                        usage_query = project_query.filter_by(
+                                id=user_usages[res].id)
+                    else:
+                        usage_query = project_query.filter_by(resource=res)
+                    if not _quota_usage_reserve(context, session, model,
+                                                rows[res].id, deltas[res],
+                                                limit, usage_query):
+                        overs.append(res)
+                if overs:
+                    # Raising in the transaction rolls back the rows which
+                    # were raised.
+                    raise _over_quota(overs, deltas, project_quotas,
+                                      user_quotas, project_usages,
+                                      user_usages)
+
+            reservations = []
+            for res, delta in deltas.items():
+                reservation = _reservation_create(elevated,
+                                                 str(uuid.uuid4()),
+                                                 user_usages[res],
+                                                 project_id,
+                                                 user_id,
+                                                 res, delta, expire,
+                                                 session=session)
+                reservations.append(reservation.uuid)
+
+    if not current:
+        return quota_reserve(context, resources, project_quotas, user_quotas,
+                             deltas, expire, until_refresh, max_age,
+                             project_id=project_id, user_id=user_id)
+    if unders:
+        LOG.warning(_("Change will make usage less than 0 for the following "
+                      "resources: %s"), unders)
     return reservations
 
 
@@ -3269,21 +3656,41 @@ def _quota_reservations_query(session, context, reservations):
                    with_lockmode('update')
 
 
+def _quota_reservations_usages(session, context, reservations):
+    """Return the usages of the reservations, locked, by id."""
+    usage_ids = model_query(context, models.Reservation.usage_id,
+                            base_model=models.Reservation,
+                            read_deleted="no", session=session).\
+                    filter(models.Reservation.uuid.in_(reservations)).\
+                    subquery()
+    rows = model_query(context, models.QuotaUsage, read_deleted="no",
+                       session=session).\
+                   filter(models.QuotaUsage.id.in_(usage_ids)).\
+                   with_lockmode('update').\
+                   all()
+    return dict((row.id, row) for row in rows)
+
+
 @require_context
 @_retry_on_deadlock
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     session = get_session()
     with session.begin():
-        _project_usages, user_usages = _get_project_user_quota_usages(
-                context, session, project_id, user_id)
+        usages = _quota_reservations_usages(session, context, reservations)
         reservation_query = _quota_reservations_query(session, context,
                                                       reservations)
+        changes = {}
         for reservation in reservation_query.all():
-            usage = user_usages[reservation.resource]
+            usage = usages[reservation.usage_id]
+            released = 0
             if reservation.delta >= 0:
-                usage.reserved -= reservation.delta
+                released = reservation.delta
+                usage.reserved -= released
             usage.in_use += reservation.delta
+            _project_quota_usages_add_change(changes, usage,
+                                             reservation.delta, -released)
         reservation_query.soft_delete(synchronize_session=False)
+        _project_quota_usages_update(context, session, changes)
 
 
 @require_context
@@ -3291,15 +3698,18 @@ def reservation_commit(context, reservations, project_id=None, user_id=None):
 def reservation_rollback(context, reservations, project_id=None, user_id=None):
     session = get_session()
     with session.begin():
-        _project_usages, user_usages = _get_project_user_quota_usages(
-                context, session, project_id, user_id)
+        usages = _quota_reservations_usages(session, context, reservations)
         reservation_query = _quota_reservations_query(session, context,
                                                       reservations)
+        changes = {}
         for reservation in reservation_query.all():
-            usage = user_usages[reservation.resource]
+            usage = usages[reservation.usage_id]
             if reservation.delta >= 0:
                 usage.reserved -= reservation.delta
+                _project_quota_usages_add_change(changes, usage, 0,
+                                                 -reservation.delta)
         reservation_query.soft_delete(synchronize_session=False)
+        _project_quota_usages_update(context, session, changes)
 
 
 @require_admin_context
@@ -3317,6 +3727,7 @@ def quota_destroy_all_by_project_and_user(context, project_id, user_id):
                 filter_by(project_id=project_id).\
                 filter_by(user_id=user_id).\
                 soft_delete(synchronize_session=False)
+        _project_quota_usages_destroy(context, session, project_id)
 
         model_query(context, models.Reservation,
                     session=session, read_deleted="no").\
@@ -3343,6 +3754,7 @@ def quota_destroy_all_by_project(context, project_id):
                     session=session, read_deleted="no").\
                 filter_by(project_id=project_id).\
                 soft_delete(synchronize_session=False)
+        _project_quota_usages_destroy(context, session, project_id)
 
         model_query(context, models.Reservation,
                     session=session, read_deleted="no").\
@@ -3360,12 +3772,16 @@ def reservation_expire(context):
                                         session=session, read_deleted="no").\
                             filter(models.Reservation.expire < current_time)
 
+        changes = {}
         for reservation in reservation_query.join(models.QuotaUsage).all():
             if reservation.delta >= 0:
                 reservation.usage.reserved -= reservation.delta
                 session.add(reservation.usage)
+                _project_quota_usages_add_change(changes, reservation.usage,
+                                                 0, -reservation.delta)
 
         reservation_query.soft_delete(synchronize_session=False)
+        _project_quota_usages_update(context, session, changes)
 
 
 ###################
@@ -4576,14 +4992,33 @@ def cell_get_all(context):
 ########################
 # User-provided metadata
 
+def _metadata_get_multi(context, model, instance_uuids, session=None,
+                        use_subordinate=False):
+    """Return the metadata rows of many instances as dicts.
+
+    Only the columns used to build the metadata of an instance are
+    selected, so the rows are not hydrated into model objects, and the
+    uuids are queried in batches of _IN_BATCH_SIZE.
+    """
+    rows = []
+    for start in xrange(0, len(instance_uuids), _IN_BATCH_SIZE):
+        batch = instance_uuids[start:start + _IN_BATCH_SIZE]
+        query = model_query(context, model.instance_uuid, model.key,
+                            model.value, model.deleted, base_model=model,
+                            session=session,
+                            use_subordinate=use_subordinate).\
+                        filter(model.instance_uuid.in_(batch))
+        rows.extend({'instance_uuid': instance_uuid, 'key': key,
+                     'value': value, 'deleted': deleted}
+                    for instance_uuid, key, value, deleted in query)
+    return rows
+
+
 def _instance_metadata_get_multi(context, instance_uuids,
                                  session=None, use_subordinate=False):
-    if not instance_uuids:
-        return []
-    return model_query(context, models.InstanceMetadata,
-                       session=session, use_subordinate=use_subordinate).\
-                    filter(
-            models.InstanceMetadata.instance_uuid.in_(instance_uuids))
+    return _metadata_get_multi(context, models.InstanceMetadata,
+                               instance_uuids, session=session,
+                               use_subordinate=use_subordinate)
 
 
 def _instance_metadata_get_query(context, instance_uuid, session=None):
@@ -4644,12 +5079,9 @@ def instance_metadata_update(context, instance_uuid, metadata, delete):
 
 def _instance_system_metadata_get_multi(context, instance_uuids,
                                         session=None, use_subordinate=False):
-    if not instance_uuids:
-        return []
-    return model_query(context, models.InstanceSystemMetadata,
-                       session=session, use_subordinate=use_subordinate).\
-                    filter(
-            models.InstanceSystemMetadata.instance_uuid.in_(instance_uuids))
+    return _metadata_get_multi(context, models.InstanceSystemMetadata,
+                               instance_uuids, session=session,
+                               use_subordinate=use_subordinate)
 
 
 def _instance_system_metadata_get_query(context, instance_uuid, session=None):
@@ -4767,6 +5199,42 @@ def bw_usage_get_by_uuids(context, uuids, start_period):
                    all()
 
 
+def _bw_usage_update(context, session, uuid, mac, start_period, bw_in, bw_out,
+                     last_ctr_in, last_ctr_out, last_refreshed):
+    # NOTE(comstud): More often than not, we'll be updating records vs
+    # creating records.  Optimize accordingly, trying to update existing
+    # records.  Fall back to creation when no rows are updated.
+    values = {'last_refreshed': last_refreshed,
+              'last_ctr_in': last_ctr_in,
+              'last_ctr_out': last_ctr_out,
+              'bw_in': bw_in,
+              'bw_out': bw_out}
+    rows = model_query(context, models.BandwidthUsage,
+                          session=session, read_deleted="yes").\
+                  filter_by(start_period=start_period).\
+                  filter_by(uuid=uuid).\
+                  filter_by(mac=mac).\
+                  update(values, synchronize_session=False)
+    if rows:
+        return
+
+    bwusage = models.BandwidthUsage()
+    bwusage.start_period = start_period
+    bwusage.uuid = uuid
+    bwusage.mac = mac
+    bwusage.last_refreshed = last_refreshed
+    bwusage.bw_in = bw_in
+    bwusage.bw_out = bw_out
+    bwusage.last_ctr_in = last_ctr_in
+    bwusage.last_ctr_out = last_ctr_out
+    try:
+        bwusage.save(session=session)
+    except db_exc.DBDuplicateEntry:
+        # NOTE(sirp): Possible race if two greenthreads attempt to create
+        # the usage entry at the same time. First one wins.
+        pass
+
+
 @require_context
 @_retry_on_deadlock
 def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
@@ -4777,39 +5245,25 @@ def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
     if last_refreshed is None:
         last_refreshed = timeutils.utcnow()
 
-    # NOTE(comstud): More often than not, we'll be updating records vs
-    # creating records.  Optimize accordingly, trying to update existing
-    # records.  Fall back to creation when no rows are updated.
     with session.begin():
-        values = {'last_refreshed': last_refreshed,
-                  'last_ctr_in': last_ctr_in,
-                  'last_ctr_out': last_ctr_out,
-                  'bw_in': bw_in,
-                  'bw_out': bw_out}
-        rows = model_query(context, models.BandwidthUsage,
-                              session=session, read_deleted="yes").\
-                      filter_by(start_period=start_period).\
-                      filter_by(uuid=uuid).\
-                      filter_by(mac=mac).\
-                      update(values, synchronize_session=False)
-        if rows:
-            return
-
-        bwusage = models.BandwidthUsage()
-        bwusage.start_period = start_period
-        bwusage.uuid = uuid
-        bwusage.mac = mac
-        bwusage.last_refreshed = last_refreshed
-        bwusage.bw_in = bw_in
-        bwusage.bw_out = bw_out
-        bwusage.last_ctr_in = last_ctr_in
-        bwusage.last_ctr_out = last_ctr_out
-        try:
-            bwusage.save(session=session)
-        except db_exc.DBDuplicateEntry:
-            # NOTE(sirp): Possible race if two greenthreads attempt to create
-            # the usage entry at the same time. First one wins.
-            pass
+        _bw_usage_update(context, session, uuid, mac, start_period, bw_in,
+                         bw_out, last_ctr_in, last_ctr_out, last_refreshed)
+
+
+@require_context
+@_retry_on_deadlock
+def bw_usage_update_many(context, start_period, usages, last_refreshed=None):
+    session = get_session()
+
+    if last_refreshed is None:
+        last_refreshed = timeutils.utcnow()
+
+    with session.begin():
+        for usage in usages:
+            _bw_usage_update(context, session, usage['uuid'], usage['mac'],
+                             start_period, usage['bw_in'], usage['bw_out'],
+                             usage['last_ctr_in'], usage['last_ctr_out'],
+                             last_refreshed)
 
 
 ####################
@@ -4827,6 +5281,106 @@ def vol_get_usage_by_time(context, begin):
                               all()
 
 
+def _vol_usage_update(context, session, refreshed, id, rd_req, rd_bytes,
+                      wr_req, wr_bytes, instance_id, project_id, user_id,
+                      availability_zone, update_totals):
+    values = {}
+    # NOTE(dricco): We will be mostly updating current usage records vs
+    # updating total or creating records. Optimize accordingly.
+    if not update_totals:
+        values = {'curr_last_refreshed': refreshed,
+                  'curr_reads': rd_req,
+                  'curr_read_bytes': rd_bytes,
+                  'curr_writes': wr_req,
+                  'curr_write_bytes': wr_bytes,
+                  'instance_uuid': instance_id,
+                  'project_id': project_id,
+                  'user_id': user_id,
+                  'availability_zone': availability_zone}
+    else:
+        values = {'tot_last_refreshed': refreshed,
+                  'tot_reads': models.VolumeUsage.tot_reads + rd_req,
+                  'tot_read_bytes': models.VolumeUsage.tot_read_bytes +
+                                    rd_bytes,
+                  'tot_writes': models.VolumeUsage.tot_writes + wr_req,
+                  'tot_write_bytes': models.VolumeUsage.tot_write_bytes +
+                                     wr_bytes,
+                  'curr_reads': 0,
+                  'curr_read_bytes': 0,
+                  'curr_writes': 0,
+                  'curr_write_bytes': 0,
+                  'instance_uuid': instance_id,
+                  'project_id': project_id,
+                  'user_id': user_id,
+                  'availability_zone': availability_zone}
+
+    current_usage = model_query(context, models.VolumeUsage,
+                        session=session, read_deleted="yes").\
+                        filter_by(volume_id=id).\
+                        first()
+    if current_usage:
+        if (rd_req < current_usage['curr_reads'] or
+            rd_bytes < current_usage['curr_read_bytes'] or
+            wr_req < current_usage['curr_writes'] or
+                wr_bytes < current_usage['curr_write_bytes']):
+            LOG.info(_("Volume(%s) has lower stats then what is in "
+                       "the database. Instance must have been rebooted "
+                       "or crashed. Updating totals.") % id)
+            if not update_totals:
+                values['tot_reads'] = (models.VolumeUsage.tot_reads +
+                                       current_usage['curr_reads'])
+                values['tot_read_bytes'] = (
+                    models.VolumeUsage.tot_read_bytes +
+                    current_usage['curr_read_bytes'])
+                values['tot_writes'] = (models.VolumeUsage.tot_writes +
+                                        current_usage['curr_writes'])
+                values['tot_write_bytes'] = (
+                    models.VolumeUsage.tot_write_bytes +
+                    current_usage['curr_write_bytes'])
+            else:
+                values['tot_reads'] = (models.VolumeUsage.tot_reads +
+                                       current_usage['curr_reads'] +
+                                       rd_req)
+                values['tot_read_bytes'] = (
+                    models.VolumeUsage.tot_read_bytes +
+                    current_usage['curr_read_bytes'] + rd_bytes)
+                values['tot_writes'] = (models.VolumeUsage.tot_writes +
+                                        current_usage['curr_writes'] +
+                                        wr_req)
+                values['tot_write_bytes'] = (
+                    models.VolumeUsage.tot_write_bytes +
+                    current_usage['curr_write_bytes'] + wr_bytes)
+
+        current_usage.update(values)
+        current_usage.save(session=session)
+        session.refresh(current_usage)
+        return current_usage
+
+    vol_usage = models.VolumeUsage()
+    vol_usage.volume_id = id
+    vol_usage.instance_uuid = instance_id
+    vol_usage.project_id = project_id
+    vol_usage.user_id = user_id
+    vol_usage.availability_zone = availability_zone
+
+    if not update_totals:
+        vol_usage.curr_last_refreshed = refreshed
+        vol_usage.curr_reads = rd_req
+        vol_usage.curr_read_bytes = rd_bytes
+        vol_usage.curr_writes = wr_req
+        vol_usage.curr_write_bytes = wr_bytes
+    else:
+        vol_usage.tot_last_refreshed = refreshed
+        vol_usage.tot_reads = rd_req
+        vol_usage.tot_read_bytes = rd_bytes
+        vol_usage.tot_writes = wr_req
+        vol_usage.tot_write_bytes = wr_bytes
+
+    vol_usage.save(session=session)
+
+    return vol_usage
+
+
 @require_context
 def vol_usage_update(context, id, rd_req, rd_bytes, wr_req, wr_bytes,
                      instance_id, project_id, user_id, availability_zone,
@@ -4836,101 +5390,27 @@ def vol_usage_update(context, id, rd_req, rd_bytes, wr_req, wr_bytes,
     refreshed = timeutils.utcnow()
 
     with session.begin():
-        values = {}
-        # NOTE(dricco): We will be mostly updating current usage records vs
-        # updating total or creating records. Optimize accordingly.
-        if not update_totals:
-            values = {'curr_last_refreshed': refreshed,
-                      'curr_reads': rd_req,
-                      'curr_read_bytes': rd_bytes,
-                      'curr_writes': wr_req,
-                      'curr_write_bytes': wr_bytes,
-                      'instance_uuid': instance_id,
-                      'project_id': project_id,
-                      'user_id': user_id,
-                      'availability_zone': availability_zone}
-        else:
-            values = {'tot_last_refreshed': refreshed,
-                      'tot_reads': models.VolumeUsage.tot_reads + rd_req,
-                      'tot_read_bytes': models.VolumeUsage.tot_read_bytes +
-                                        rd_bytes,
-                      'tot_writes': models.VolumeUsage.tot_writes + wr_req,
-                      'tot_write_bytes': models.VolumeUsage.tot_write_bytes +
-                                         wr_bytes,
-                      'curr_reads': 0,
-                      'curr_read_bytes': 0,
-                      'curr_writes': 0,
-                      'curr_write_bytes': 0,
-                      'instance_uuid': instance_id,
-                      'project_id': project_id,
-                      'user_id': user_id,
-                      'availability_zone': availability_zone}
-
-        current_usage = model_query(context, models.VolumeUsage,
-                            session=session, read_deleted="yes").\
-                            filter_by(volume_id=id).\
-                            first()
-        if current_usage:
-            if (rd_req < current_usage['curr_reads'] or
-                rd_bytes < current_usage['curr_read_bytes'] or
-                wr_req < current_usage['curr_writes'] or
-                    wr_bytes < current_usage['curr_write_bytes']):
-                LOG.info(_("Volume(%s) has lower stats then what is in "
-                           "the database. Instance must have been rebooted "
-                           "or crashed. Updating totals.") % id)
-                if not update_totals:
-                    values['tot_reads'] = (models.VolumeUsage.tot_reads +
-                                           current_usage['curr_reads'])
-                    values['tot_read_bytes'] = (
-                        models.VolumeUsage.tot_read_bytes +
-                        current_usage['curr_read_bytes'])
-                    values['tot_writes'] = (models.VolumeUsage.tot_writes +
-                                            current_usage['curr_writes'])
-                    values['tot_write_bytes'] = (
-                        models.VolumeUsage.tot_write_bytes +
-                        current_usage['curr_write_bytes'])
-                else:
-                    values['tot_reads'] = (models.VolumeUsage.tot_reads +
-                                           current_usage['curr_reads'] +
-                                           rd_req)
-                    values['tot_read_bytes'] = (
-                        models.VolumeUsage.tot_read_bytes +
-                        current_usage['curr_read_bytes'] + rd_bytes)
-                    values['tot_writes'] = (models.VolumeUsage.tot_writes +
-                                            current_usage['curr_writes'] +
-                                            wr_req)
-                    values['tot_write_bytes'] = (
-                        models.VolumeUsage.tot_write_bytes +
-                        current_usage['curr_write_bytes'] + wr_bytes)
-
-            current_usage.update(values)
-            current_usage.save(session=session)
-            session.refresh(current_usage)
-            return current_usage
-
-        vol_usage = models.VolumeUsage()
-        vol_usage.volume_id = id
-        vol_usage.instance_uuid = instance_id
-        vol_usage.project_id = project_id
-        vol_usage.user_id = user_id
-        vol_usage.availability_zone = availability_zone
-
-        if not update_totals:
-            vol_usage.curr_last_refreshed = refreshed
-            vol_usage.curr_reads = rd_req
-            vol_usage.curr_read_bytes = rd_bytes
-            vol_usage.curr_writes = wr_req
-            vol_usage.curr_write_bytes = wr_bytes
-        else:
-            vol_usage.tot_last_refreshed = refreshed
-            vol_usage.tot_reads = rd_req
-            vol_usage.tot_read_bytes = rd_bytes
-            vol_usage.tot_writes = wr_req
-            vol_usage.tot_write_bytes = wr_bytes
+        return _vol_usage_update(context, session, refreshed, id,
+                                 rd_req, rd_bytes, wr_req, wr_bytes,
+                                 instance_id, project_id, user_id,
+                                 availability_zone, update_totals)
+
 
-        vol_usage.save(session=session)
+@require_context
+def vol_usage_update_many(context, usages, update_totals=False):
+    session = get_session()
 
-        return vol_usage
+    refreshed = timeutils.utcnow()
+
+    with session.begin():
+        return [_vol_usage_update(context, session, refreshed, usage['id'],
+                                  usage['rd_req'], usage['rd_bytes'],
+                                  usage['wr_req'], usage['wr_bytes'],
+                                  usage['instance_id'], usage['project_id'],
+                                  usage['user_id'],
+                                  usage['availability_zone'],
+                                  update_totals)
+                for usage in usages]
 
 
 ####################
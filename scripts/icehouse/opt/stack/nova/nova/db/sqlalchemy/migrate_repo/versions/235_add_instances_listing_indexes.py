@@ -0,0 +1,71 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Based on the instance_get_all_by_filters query, which lists the instances
+# that are not deleted, of a project or all of them, newest first, filters
+# them on display_name and reads the system metadata of the page.  MySQL
+# already has an index on instance_system_metadata.instance_uuid, created
+# for its foreign key.
+INDEXES = [
+    ('instances', 'instances_deleted_created_at_idx',
+     ['deleted', 'created_at']),
+    ('instances', 'instances_project_id_deleted_created_at_idx',
+     ['project_id', 'deleted', 'created_at']),
+    ('instances', 'instances_deleted_display_name_idx',
+     ['deleted', 'display_name']),
+    ('instance_system_metadata',
+     'instance_system_metadata_instance_uuid_idx', ['instance_uuid']),
+]
+
+
+def _get_index(table, members):
+    for idx in table.indexes:
+        if idx.columns.keys() == members:
+            return idx
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, name, members in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        if _get_index(table, members):
+            LOG.info(_('Skipped adding %s because an equivalent index '
+                       'already exists.'), name)
+            continue
+        index = Index(name, *[table.c[column] for column in members])
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, name, members in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        index = _get_index(table, members)
+        if index is not None and index.name == name:
+            index.drop(migrate_engine)
+        else:
+            LOG.info(_('Skipped removing %s because index does not '
+                       'exist.'), name)
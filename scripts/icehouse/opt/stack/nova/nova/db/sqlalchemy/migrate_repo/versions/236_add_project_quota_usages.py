@@ -0,0 +1,50 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String
+from sqlalchemy import Table
+
+from nova.db.sqlalchemy import utils
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    # The rows are built by the next reservation of each project.
+    project_quota_usages = Table('project_quota_usages', meta,
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime),
+        Column('deleted_at', DateTime),
+        Column('id', Integer, primary_key=True, nullable=False),
+        Column('project_id', String(length=255)),
+        Column('resource', String(length=255), nullable=False),
+        Column('in_use', Integer, nullable=False),
+        Column('reserved', Integer, nullable=False),
+        Column('deleted', Integer),
+        Index('ix_project_quota_usages_project_id', 'project_id'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+    project_quota_usages.create()
+    utils.create_shadow_table(migrate_engine, table=project_quota_usages)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name in ('shadow_project_quota_usages', 'project_quota_usages'):
+        Table(table_name, meta, autoload=True).drop()
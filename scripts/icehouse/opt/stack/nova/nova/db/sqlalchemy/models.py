@@ -166,6 +166,12 @@ class Instance(BASE, NovaBase):
               'host', 'node', 'deleted'),
         Index('instances_host_deleted_cleaned_idx',
               'host', 'deleted', 'cleaned'),
+        Index('instances_deleted_created_at_idx',
+              'deleted', 'created_at'),
+        Index('instances_project_id_deleted_created_at_idx',
+              'project_id', 'deleted', 'created_at'),
+        Index('instances_deleted_display_name_idx',
+              'deleted', 'display_name'),
     )
     injected_files = []
 
@@ -471,6 +477,26 @@ class QuotaUsage(BASE, NovaBase):
     until_refresh = Column(Integer)
 
 
+class ProjectQuotaUsage(BASE, NovaBase):
+    """Represents the sum of the usages of a resource by a project.
+
+    It is kept along with the quota usages, so that a reservation can check
+    the project quota with one conditional update.
+    """
+
+    __tablename__ = 'project_quota_usages'
+    __table_args__ = (
+        Index('ix_project_quota_usages_project_id', 'project_id'),
+    )
+    id = Column(Integer, primary_key=True)
+
+    project_id = Column(String(255))
+    resource = Column(String(255), nullable=False)
+
+    in_use = Column(Integer, nullable=False)
+    reserved = Column(Integer, nullable=False)
+
+
 class Reservation(BASE, NovaBase):
     """Represents a resource reservation for quotas."""
 
@@ -954,7 +980,10 @@ class InstanceMetadata(BASE, NovaBase):
 class InstanceSystemMetadata(BASE, NovaBase):
     """Represents a system-owned metadata key/value pair for an instance."""
     __tablename__ = 'instance_system_metadata'
-    __table_args__ = ()
+    __table_args__ = (
+        Index('instance_system_metadata_instance_uuid_idx',
+              'instance_uuid'),
+    )
     id = Column(Integer, primary_key=True)
     key = Column(String(255), nullable=False)
     value = Column(String(255))
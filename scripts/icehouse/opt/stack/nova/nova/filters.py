@@ -17,9 +17,12 @@
 Filter support
 """
 
+import time
+
 from nova import loadables
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
+from nova import stats
 
 LOG = logging.getLogger(__name__)
 
@@ -68,13 +71,24 @@ class BaseFilterHandler(loadables.BaseLoader):
             filter_properties, index=0):
         list_objs = list(objs)
         LOG.debug(_("Starting with %d host(s)"), len(list_objs))
+        sampled = stats.should_sample()
         for filter_cls in filter_classes:
             cls_name = filter_cls.__name__
             filter = filter_cls()
 
             if filter.run_filter_for_index(index):
+                if sampled:
+                    started = time.time()
+                    num_in = len(list_objs)
                 objs = filter.filter_all(list_objs,
                                                filter_properties)
+                if sampled:
+                    # filter_all() is usually a generator, so it only runs
+                    # while its result is turned into a list.
+                    if objs is not None:
+                        objs = list(objs)
+                    stats.record_filter(cls_name, time.time() - started,
+                                        num_in, len(objs or ()))
                 if objs is None:
                     LOG.debug(_("Filter %(cls_name)s says to stop filtering"),
                           {'cls_name': cls_name})
@@ -18,6 +18,8 @@
 from __future__ import absolute_import
 
 import copy
+import hashlib
+import httplib
 import itertools
 import json
 import random
@@ -325,25 +327,73 @@ class GlanceImageService(object):
                     except Exception as ex:
                         LOG.exception(ex)
 
+        if data is None and dst_path:
+            self._download_to_file(context, image_id, dst_path)
+            return
+
         try:
             image_chunks = self._client.call(context, 1, 'data', image_id)
         except Exception:
             _reraise_translated_image_exception(image_id)
 
-        close_file = False
-        if data is None and dst_path:
-            data = open(dst_path, 'wb')
-            close_file = True
-
         if data is None:
             return image_chunks
         else:
-            try:
-                for chunk in image_chunks:
-                    data.write(chunk)
-            finally:
-                if close_file:
-                    data.close()
+            for chunk in image_chunks:
+                data.write(chunk)
+
+    def _download_to_file(self, context, image_id, dst_path):
+        """Writes the data of an image to a file, checksumming it as it is
+        written.  A transfer broken off is resumed where it stopped, up to
+        CONF.glance_num_retries times.
+        """
+        try:
+            image = self._client.call(context, 1, 'get', image_id)
+        except Exception:
+            _reraise_translated_image_exception(image_id)
+        expected_checksum = getattr(image, 'checksum', None)
+
+        checksum = hashlib.md5()
+        written = 0
+        num_attempts = 1 + CONF.glance_num_retries
+        with open(dst_path, 'wb') as data:
+            for attempt in xrange(1, num_attempts + 1):
+                try:
+                    image_chunks = self._client.call(context, 1, 'data',
+                                                     image_id)
+                except Exception:
+                    _reraise_translated_image_exception(image_id)
+
+                # NOTE: glance does not serve byte ranges, so the data
+                # already written is skipped rather than written again.
+                skip = written
+                try:
+                    for chunk in image_chunks:
+                        if skip:
+                            if len(chunk) <= skip:
+                                skip -= len(chunk)
+                                continue
+                            chunk = chunk[skip:]
+                            skip = 0
+                        data.write(chunk)
+                        checksum.update(chunk)
+                        written += len(chunk)
+                    break
+                except (IOError, httplib.HTTPException) as e:
+                    if attempt == num_attempts:
+                        raise
+                    LOG.warn(_("Transfer of image %(image_id)s broken off "
+                               "after %(written)d bytes, resuming: %(e)s"),
+                             {'image_id': image_id, 'written': written,
+                              'e': e})
+
+        if expected_checksum and checksum.hexdigest() != expected_checksum:
+            raise exception.ImageUnacceptable(
+                image_id=image_id,
+                reason=_("checksum %(checksum)s of the downloaded data does "
+                         "not match %(expected)s") %
+                       {'checksum': checksum.hexdigest(),
+                        'expected': expected_checksum})
 
     def create(self, context, image_meta, data=None):
         """Store the image data and return the new image object."""
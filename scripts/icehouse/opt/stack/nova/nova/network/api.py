@@ -21,7 +21,9 @@ import inspect
 
 from oslo.config import cfg
 
+from nova.api.metadata import cache as metadata_cache
 from nova.compute import flavors
+from nova.compute import utils as compute_utils
 from nova.db import base
 from nova import exception
 from nova.network import floating_ips
@@ -32,6 +34,7 @@ from nova.objects import instance as instance_obj
 from nova.objects import instance_info_cache as info_cache_obj
 from nova.openstack.common import excutils
 from nova.openstack.common.gettextutils import _
+from nova.openstack.common import jsonutils
 from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
 from nova import policy
@@ -86,11 +89,66 @@ def update_instance_cache_with_nw_info(api, context, instance, nw_info=None,
                                                   instance['uuid'])
         ic.network_info = nw_info
         ic.save(update_cells=update_cells)
+        metadata_cache.invalidate(instance['uuid'])
     except Exception:
         with excutils.save_and_reraise_exception():
             LOG.exception(_('Failed storing info cache'), instance=instance)
 
 
+def update_instance_caches_if_changed(api, context, instances, nw_infos):
+    """Store the network info of instances whose info cache differs.
+
+    nw_infos maps instance uuids to the network info built for them from
+    the info caches the instances were loaded with.  An info cache which
+    has been updated since is left alone for the next refresh.  Returns the
+    uuids of the instances whose info cache was updated.
+    """
+    updated = []
+    for instance in instances:
+        nw_info = nw_infos.get(instance['uuid'])
+        if nw_info is None:
+            continue
+        cached = compute_utils.get_nw_info_for_instance(instance)
+        if not _nw_info_changed(cached, nw_info):
+            continue
+        try:
+            if _update_instance_cache_if_unchanged(api, context, instance,
+                                                   cached, nw_info):
+                updated.append(instance['uuid'])
+        except Exception:
+            # NOTE: The other instances are still refreshed, this one is
+            # refreshed again next time.
+            LOG.exception(_('Failed to refresh the info cache'),
+                          instance=instance)
+    return updated
+
+
+def _update_instance_cache_if_unchanged(api, context, instance, cached,
+                                        nw_info):
+    with lockutils.lock('refresh_cache-%s' % instance['uuid']):
+        try:
+            info_cache = info_cache_obj.InstanceInfoCache.\
+                get_by_instance_uuid(context, instance['uuid'])
+            current = info_cache.network_info
+        except exception.InstanceInfoCacheNotFound:
+            current = network_model.NetworkInfo()
+        if _nw_info_changed(cached, current):
+            LOG.debug(_('Info cache changed while it was refreshed, '
+                        'skipping it'), instance=instance)
+            return False
+        update_instance_cache_with_nw_info(api, context, instance,
+                                           nw_info=nw_info,
+                                           update_cells=False)
+        return True
+
+
+def _nw_info_changed(old, new):
+    # NOTE: The network model compares IPs by address only, compare what
+    # is stored in the info cache instead.
+    return (jsonutils.loads((old or network_model.NetworkInfo()).json()) !=
+            jsonutils.loads((new or network_model.NetworkInfo()).json()))
+
+
 def wrap_check_policy(func):
     """Check policy corresponding to the wrapped methods prior to execution."""
 
@@ -428,6 +486,23 @@ class API(base.Base):
                                            result, update_cells=False)
         return result
 
+    def heal_instance_info_caches(self, context, instances):
+        """Refresh the info caches of instances, one network call each.
+
+        Only the info caches which changed are saved.  Returns the uuids of
+        the instances whose info cache was updated.
+        """
+        nw_infos = {}
+        for instance in instances:
+            try:
+                nw_infos[instance['uuid']] = self._get_instance_nw_info(
+                    context, instance)
+            except Exception:
+                LOG.exception(_('Failed to get network info'),
+                              instance=instance)
+        return update_instance_caches_if_changed(self, context, instances,
+                                                 nw_infos)
+
     def _get_instance_nw_info(self, context, instance):
         """Returns all network info related to an instance."""
         flavor = flavors.extract_flavor(instance)
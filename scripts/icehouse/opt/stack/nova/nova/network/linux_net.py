@@ -122,6 +122,13 @@ linux_net_opts = [
                default='DROP',
                help=('The table that iptables to jump to when a packet is '
                      'to be dropped.')),
+    cfg.BoolOpt('iptables_incremental_apply',
+                default=True,
+                help='Apply the changes to the rules of the wrapped chains '
+                     'since the last apply only, instead of saving and '
+                     'restoring the whole iptables tables.  Changes to '
+                     'unwrapped chains, and the top and bottom regexes, '
+                     'still need the whole tables.'),
     cfg.IntOpt('ovs_vsctl_timeout',
                default=120,
                help='Amount of time, in seconds, that ovs_vsctl should wait '
@@ -192,6 +199,26 @@ class IptablesTable(object):
         self.remove_chains = set()
         self.dirty = True
 
+        # The wrapped chains changed or removed since the last apply.  An
+        # apply which only has to rewrite those chains does not need to
+        # save and restore the whole table.
+        self.changed_chains = set()
+        self.removed_chains = set()
+        self.needs_full_apply = True
+
+    def _chain_changed(self, name, wrap=True):
+        if not wrap:
+            self.needs_full_apply = True
+        elif name in self.chains:
+            self.changed_chains.add(name)
+
+    def clear_changes(self):
+        """Forget the changes made since the last apply."""
+        self.dirty = False
+        self.changed_chains.clear()
+        self.removed_chains.clear()
+        self.needs_full_apply = False
+
     def has_chain(self, name, wrap=True):
         if wrap:
             return name in self.chains
@@ -212,8 +239,10 @@ class IptablesTable(object):
         """
         if wrap:
             self.chains.add(name)
+            self.removed_chains.discard(name)
         else:
             self.unwrapped_chains.add(name)
+        self._chain_changed(name, wrap)
         self.dirty = True
 
     def remove_chain(self, name, wrap=True):
@@ -240,6 +269,9 @@ class IptablesTable(object):
         # so we keep a list of them to be iterated over in apply()
         if not wrap:
             self.remove_chains.add(name)
+        else:
+            self.changed_chains.discard(name)
+            self.removed_chains.add(name)
         chain_set.remove(name)
         if not wrap:
             self.remove_rules += filter(lambda r: r.chain == name, self.rules)
@@ -253,6 +285,9 @@ class IptablesTable(object):
         if not wrap:
             self.remove_rules += filter(lambda r: jump_snippet in r.rule,
                                         self.rules)
+        for rule in self.rules:
+            if jump_snippet in rule.rule:
+                self._chain_changed(rule.chain, rule.wrap)
         self.rules = filter(lambda r: jump_snippet not in r.rule, self.rules)
 
     def add_rule(self, chain, rule, wrap=True, top=False):
@@ -277,6 +312,7 @@ class IptablesTable(object):
             LOG.debug(_("Skipping duplicate iptables rule addition"))
         else:
             self.rules.append(IptablesRule(chain, rule, wrap, top))
+            self._chain_changed(chain, wrap)
             self.dirty = True
 
     def _wrap_target_chain(self, s):
@@ -296,6 +332,7 @@ class IptablesTable(object):
             self.rules.remove(IptablesRule(chain, rule, wrap, top))
             if not wrap:
                 self.remove_rules.append(IptablesRule(chain, rule, wrap, top))
+            self._chain_changed(chain, wrap)
             self.dirty = True
         except ValueError:
             LOG.warn(_('Tried to remove rule that was not there:'
@@ -307,18 +344,20 @@ class IptablesTable(object):
         """Remove all rules matching regex."""
         if isinstance(regex, six.string_types):
             regex = re.compile(regex)
-        num_rules = len(self.rules)
-        self.rules = filter(lambda r: not regex.match(str(r)), self.rules)
-        removed = num_rules - len(self.rules)
-        if removed > 0:
+        removed = filter(lambda r: regex.match(str(r)), self.rules)
+        if removed:
+            self.rules = filter(lambda r: not regex.match(str(r)), self.rules)
+            for rule in removed:
+                self._chain_changed(rule.chain, rule.wrap)
             self.dirty = True
-        return removed
+        return len(removed)
 
     def empty_chain(self, chain, wrap=True):
         """Remove all rules from a chain."""
         chained_rules = [rule for rule in self.rules
                               if rule.chain == chain and rule.wrap == wrap]
         if chained_rules:
+            self._chain_changed(chain, wrap)
             self.dirty = True
         for rule in chained_rules:
             self.rules.remove(rule)
@@ -443,26 +482,89 @@ class IptablesManager(object):
         same component of Nova, and replace them with our current set of
         rules. This happens atomically, thanks to iptables-restore.
 
+        When only the rules of wrapped chains have changed since the last
+        apply, only those chains are rewritten, without flushing the rest
+        of the tables.
+
         """
         s = [('iptables', self.ipv4)]
         if CONF.use_ipv6:
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
-            all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
-                                                run_as_root=True,
-                                                attempts=5)
-            all_lines = all_tables.split('\n')
-            for table_name, table in tables.iteritems():
-                start, end = self._find_table(all_lines, table_name)
-                all_lines[start:end] = self._modify_rules(
-                        all_lines[start:end], table, table_name)
-                table.dirty = False
-            self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
-                         process_input='\n'.join(all_lines),
-                         attempts=5)
+            if not (self._can_apply_changes(tables) and
+                    self._apply_changes(cmd, tables)):
+                self._apply_tables(cmd, tables)
+            for table in tables.itervalues():
+                table.clear_changes()
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    def _apply_tables(self, cmd, tables):
+        all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
+                                            run_as_root=True,
+                                            attempts=5)
+        all_lines = all_tables.split('\n')
+        for table_name, table in tables.iteritems():
+            start, end = self._find_table(all_lines, table_name)
+            all_lines[start:end] = self._modify_rules(
+                    all_lines[start:end], table, table_name)
+        self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
+                     process_input='\n'.join(all_lines),
+                     attempts=5)
+
+    def _can_apply_changes(self, tables):
+        if not CONF.iptables_incremental_apply:
+            return False
+        # The rules matched by these regexes are moved around in chains
+        # which are not ours, which needs the whole table.
+        if CONF.iptables_top_regex or CONF.iptables_bottom_regex:
+            return False
+        return not any(table.needs_full_apply
+                       for table in tables.itervalues())
+
+    def _apply_changes(self, cmd, tables):
+        """Rewrite the wrapped chains changed since the last apply.
+
+        Returns False if the changes could not be applied, in which case
+        the whole tables have to be.
+        """
+        lines = []
+        for table_name, table in tables.iteritems():
+            lines += self._changed_rules(table, table_name)
+        if not lines:
+            return True
+        try:
+            self.execute('%s-restore' % (cmd,), '-c', '--noflush',
+                         run_as_root=True, process_input='\n'.join(lines),
+                         attempts=5)
+        except Exception:
+            LOG.warn(_('Failed to apply the changed %s chains, applying '
+                       'the whole tables'), cmd, exc_info=True)
+            return False
+        return True
+
+    def _changed_rules(self, table, table_name):
+        """Return the iptables-restore --noflush input of the changes.
+
+        Declaring a chain flushes it, or creates it, so the changed chains
+        are declared and then given all their rules, and the removed ones
+        are declared and deleted.
+        """
+        changed = table.changed_chains
+        removed = table.removed_chains
+        if not (changed or removed):
+            return []
+        lines = ['*%s' % table_name]
+        lines += [':%s-%s - [0:0]' % (binary_name, name)
+                  for name in sorted(changed | removed)]
+        rules = [rule for rule in table.rules
+                 if rule.wrap and rule.chain in changed]
+        lines += [str(rule) for rule in rules if rule.top]
+        lines += [str(rule) for rule in rules if not rule.top]
+        lines += ['-X %s-%s' % (binary_name, name) for name in sorted(removed)]
+        lines.append('COMMIT')
+        return lines
+
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
             # length only <2 when fake iptables
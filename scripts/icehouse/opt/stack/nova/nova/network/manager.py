@@ -65,6 +65,7 @@ from nova.network import rpcapi as network_rpcapi
 from nova.objects import base as obj_base
 from nova.objects import dns_domain as dns_domain_obj
 from nova.objects import fixed_ip as fixed_ip_obj
+from nova.objects import floating_ip as floating_ip_obj
 from nova.objects import instance as instance_obj
 from nova.objects import instance_info_cache as info_cache_obj
 from nova.objects import network as network_obj
@@ -410,6 +411,13 @@ class NetworkManager(manager.Manager):
 
     def get_instance_uuids_by_ip_filter(self, context, filters):
         fixed_ip_filter = filters.get('fixed_ip')
+        ip_prefix = utils.regex_prefix(filters.get('ip'))
+        if (ip_prefix and ip_prefix[1] and not fixed_ip_filter and
+                not filters.get('ip6')):
+            # The filter only matches one address, look it up instead of
+            # going through every virtual interface.
+            return self._get_instance_uuids_by_ip(context, ip_prefix[0])
+
         ip_filter = re.compile(str(filters.get('ip')))
         ipv6_filter = re.compile(str(filters.get('ip6')))
 
@@ -458,6 +466,32 @@ class NetworkManager(manager.Manager):
 
         return results
 
+    def _get_instance_uuids_by_ip(self, context, address):
+        """Return the instance with the fixed IP address, or with the fixed
+        IP the floating IP address is associated to.
+        """
+        context = context.elevated()
+        try:
+            fixed_ip = fixed_ip_obj.FixedIP.get_by_address(context, address)
+            floating_ip = None
+        except (exception.FixedIpNotFoundForAddress, exception.Invalid):
+            fixed_ip = None
+            try:
+                floating_ip = floating_ip_obj.FloatingIP.get_by_address(
+                    context, address)
+            except (exception.FloatingIpNotFoundForAddress,
+                    exception.Invalid):
+                return []
+            if floating_ip.fixed_ip_id is not None:
+                fixed_ip = fixed_ip_obj.FixedIP.get_by_id(
+                    context, floating_ip.fixed_ip_id)
+
+        if (not fixed_ip or fixed_ip.instance_uuid is None or
+                fixed_ip.virtual_interface_id is None):
+            return []
+        ip = floating_ip.address if floating_ip else fixed_ip.address
+        return [{'instance_uuid': fixed_ip.instance_uuid, 'ip': ip}]
+
     def _get_networks_for_instance(self, context, instance_id, project_id,
                                    requested_networks=None):
         """Determine & return which networks an instance should connect to."""
@@ -80,6 +80,11 @@ neutron_opts = [
     cfg.StrOpt('neutron_ca_certificates_file',
                 help='Location of CA certificates file to use for '
                      'neutron client requests.'),
+    cfg.IntOpt('neutron_max_ids_per_query',
+               default=100,
+               help='Maximum number of ids sent in one neutron list query '
+                    'when looking up the ports, networks and subnets of '
+                    'several instances together'),
    ]
 
 CONF = cfg.CONF
@@ -1050,16 +1055,20 @@ class API(base.Base):
     def _nw_info_get_ips(self, client, port):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
-            fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
             floats = self._get_floating_ips_by_fixed_and_port(
                 client, fixed_ip['ip_address'], port['id'])
-            for ip in floats:
-                fip = network_model.IP(address=ip['floating_ip_address'],
-                                       type='floating')
-                fixed.add_floating_ip(fip)
-            network_IPs.append(fixed)
+            network_IPs.append(self._nw_info_build_fixed_ip(fixed_ip,
+                                                            floats))
         return network_IPs
 
+    def _nw_info_build_fixed_ip(self, fixed_ip, floats):
+        fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
+        for ip in floats:
+            fip = network_model.IP(address=ip['floating_ip_address'],
+                                   type='floating')
+            fixed.add_floating_ip(fip)
+        return fixed
+
     def _nw_info_get_subnets(self, context, port, network_IPs):
         subnets = self._get_subnets_from_port(context, port)
         for subnet in subnets:
@@ -1149,35 +1158,142 @@ class API(base.Base):
         for port_id in port_ids:
             current_neutron_port = current_neutron_port_map.get(port_id)
             if current_neutron_port:
-                vif_active = False
-                if (current_neutron_port['admin_state_up'] is False
-                    or current_neutron_port['status'] == 'ACTIVE'):
-                    vif_active = True
-
                 network_IPs = self._nw_info_get_ips(client,
                                                     current_neutron_port)
                 subnets = self._nw_info_get_subnets(context,
                                                     current_neutron_port,
                                                     network_IPs)
+                nw_info.append(self._nw_info_build_vif(current_neutron_port,
+                                                       networks, subnets))
 
-                devname = "tap" + current_neutron_port['id']
-                devname = devname[:network_model.NIC_NAME_LEN]
+        return nw_info
 
-                network, ovs_interfaceid = (
-                    self._nw_info_build_network(current_neutron_port,
-                                                networks, subnets))
+    def _nw_info_build_vif(self, port, networks, subnets):
+        vif_active = False
+        if (port['admin_state_up'] is False
+            or port['status'] == 'ACTIVE'):
+            vif_active = True
+
+        devname = "tap" + port['id']
+        devname = devname[:network_model.NIC_NAME_LEN]
+
+        network, ovs_interfaceid = self._nw_info_build_network(port,
+                                                               networks,
+                                                               subnets)
+
+        return network_model.VIF(
+            id=port['id'],
+            address=port['mac_address'],
+            network=network,
+            type=port.get('binding:vif_type'),
+            details=port.get('binding:vif_details'),
+            ovs_interfaceid=ovs_interfaceid,
+            devname=devname,
+            active=vif_active)
+
+    def _list_by_ids(self, list_func, resource, field, ids, **search_opts):
+        """Return the resources whose field is one of ids.
+
+        The ids are sent neutron_max_ids_per_query at a time so the request
+        URIs stay short enough for the neutron server.
+        """
+        ids = sorted(set(ids))
+        resources = []
+        for start in xrange(0, len(ids), CONF.neutron_max_ids_per_query):
+            search_opts[field] = ids[start:start +
+                                     CONF.neutron_max_ids_per_query]
+            resources.extend(list_func(**search_opts).get(resource, []))
+        return resources
+
+    def _list_floating_ips_by_ports(self, client, port_ids):
+        try:
+            return self._list_by_ids(client.list_floatingips, 'floatingips',
+                                     'port_id', port_ids)
+        # If a neutron plugin does not implement the L3 API a 404 from
+        # list_floatingips will be raised.
+        except neutronv2.exceptions.NeutronClientException as e:
+            if e.status_code == 404:
+                return []
+            raise
 
-                nw_info.append(network_model.VIF(
-                    id=current_neutron_port['id'],
-                    address=current_neutron_port['mac_address'],
-                    network=network,
-                    type=current_neutron_port.get('binding:vif_type'),
-                    details=current_neutron_port.get('binding:vif_details'),
-                    ovs_interfaceid=ovs_interfaceid,
-                    devname=devname,
-                    active=vif_active))
+    def get_instance_nw_info_many(self, context, instances):
+        """Return the network info of instances by their uuid.
 
-        return nw_info
+        This builds the same network info as _get_instance_nw_info() does
+        for the ports in the info cache of every instance, but looks the
+        ports, networks, subnets, DHCP ports and floating IPs of all the
+        instances up together, in a few neutron calls.  The info caches
+        are not updated.
+        """
+        client = neutronv2.get_client(context, admin=True)
+        neutron = neutronv2.get_client(context)
+
+        port_ids = {}
+        net_ids = set()
+        for instance in instances:
+            ifaces = compute_utils.get_nw_info_for_instance(instance)
+            port_ids[instance['uuid']] = [iface['id'] for iface in ifaces]
+            net_ids.update(iface['network']['id'] for iface in ifaces)
+
+        project_ids = dict((instance['uuid'], instance['project_id'])
+                           for instance in instances)
+        ports = {}
+        for port in self._list_by_ids(client.list_ports, 'ports',
+                                      'device_id', project_ids):
+            if project_ids.get(port['device_id']) == port['tenant_id']:
+                ports[port['id']] = port
+
+        networks = self._list_by_ids(neutron.list_networks, 'networks', 'id',
+                                     net_ids)
+
+        subnet_ids = set(ip['subnet_id'] for port in ports.itervalues()
+                         for ip in port['fixed_ips'])
+        ipam_subnets = self._list_by_ids(neutron.list_subnets, 'subnets',
+                                         'id', subnet_ids)
+        dhcp_ports = self._list_by_ids(
+            neutron.list_ports, 'ports', 'network_id',
+            [subnet['network_id'] for subnet in ipam_subnets],
+            device_owner='network:dhcp')
+
+        floats = {}
+        for fip in self._list_floating_ips_by_ports(client, ports):
+            floats.setdefault((fip['port_id'], fip['fixed_ip_address']),
+                              []).append(fip)
+
+        nw_infos = {}
+        for instance in instances:
+            nw_info = network_model.NetworkInfo()
+            for port_id in port_ids[instance['uuid']]:
+                port = ports.get(port_id)
+                if not port:
+                    continue
+                network_IPs = [
+                    self._nw_info_build_fixed_ip(
+                        fixed_ip, floats.get((port['id'],
+                                              fixed_ip['ip_address']), []))
+                    for fixed_ip in port['fixed_ips']]
+                port_subnet_ids = set(ip['subnet_id']
+                                      for ip in port['fixed_ips'])
+                subnets = [self._nw_info_build_subnet(subnet, dhcp_ports)
+                           for subnet in ipam_subnets
+                           if subnet['id'] in port_subnet_ids]
+                for subnet in subnets:
+                    subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
+                                     if fixed_ip.is_in_subnet(subnet)]
+                nw_info.append(self._nw_info_build_vif(port, networks,
+                                                       subnets))
+            nw_infos[instance['uuid']] = nw_info
+        return nw_infos
+
+    def heal_instance_info_caches(self, context, instances):
+        """Refresh the info caches of instances from neutron.
+
+        Only the info caches which changed are saved.  Returns the uuids of
+        the instances whose info cache was updated.
+        """
+        nw_infos = self.get_instance_nw_info_many(context, instances)
+        return network_api.update_instance_caches_if_changed(
+            self, context, instances, nw_infos)
 
     def _get_subnets_from_port(self, context, port):
         """Return the subnets for a given port."""
@@ -1196,32 +1312,35 @@ class API(base.Base):
         subnets = []
 
         for subnet in ipam_subnets:
-            subnet_dict = {'cidr': subnet['cidr'],
-                           'gateway': network_model.IP(
-                                address=subnet['gateway_ip'],
-                                type='gateway'),
-            }
-
             # attempt to populate DHCP server field
             search_opts = {'network_id': subnet['network_id'],
                            'device_owner': 'network:dhcp'}
             data = neutronv2.get_client(context).list_ports(**search_opts)
             dhcp_ports = data.get('ports', [])
-            for p in dhcp_ports:
-                for ip_pair in p['fixed_ips']:
-                    if ip_pair['subnet_id'] == subnet['id']:
-                        subnet_dict['dhcp_server'] = ip_pair['ip_address']
-                        break
-
-            subnet_object = network_model.Subnet(**subnet_dict)
-            for dns in subnet.get('dns_nameservers', []):
-                subnet_object.add_dns(
-                    network_model.IP(address=dns, type='dns'))
-
-            # TODO(gongysh) get the routes for this subnet
-            subnets.append(subnet_object)
+            subnets.append(self._nw_info_build_subnet(subnet, dhcp_ports))
         return subnets
 
+    def _nw_info_build_subnet(self, subnet, dhcp_ports):
+        subnet_dict = {'cidr': subnet['cidr'],
+                       'gateway': network_model.IP(
+                            address=subnet['gateway_ip'],
+                            type='gateway'),
+        }
+
+        for p in dhcp_ports:
+            for ip_pair in p['fixed_ips']:
+                if ip_pair['subnet_id'] == subnet['id']:
+                    subnet_dict['dhcp_server'] = ip_pair['ip_address']
+                    break
+
+        subnet_object = network_model.Subnet(**subnet_dict)
+        for dns in subnet.get('dns_nameservers', []):
+            subnet_object.add_dns(
+                network_model.IP(address=dns, type='dns'))
+
+        # TODO(gongysh) get the routes for this subnet
+        return subnet_object
+
     def get_dns_domains(self, context):
         """Return a list of available dns domains.
 
@@ -19,6 +19,7 @@ import copy
 import functools
 
 import netaddr
+from oslo.config import cfg
 from oslo import messaging
 import six
 
@@ -30,8 +31,31 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import versionutils
 
 
+object_opts = [
+    cfg.StrOpt('object_wire_format',
+               default='1.0',
+               help='Version of the format objects are sent over RPC in.  '
+                    '1.0 is the format every service understands, 1.1 a '
+                    'compact format which only services of this release '
+                    'or later can read.  Set it to 1.1 once all the '
+                    'services have been upgraded.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(object_opts)
+
 LOG = logging.getLogger('object')
 
+# The versions of the wire format of objects.  1.0 is the dict built by
+# obj_to_primitive() and 1.1 the compact format of obj_to_compact_primitive().
+WIRE_FORMAT_VERSION = '1.0'
+COMPACT_WIRE_FORMAT_VERSION = '1.1'
+
+# The kinds of fields in the field table of a class.
+FIELD_KIND_VALUE = '-'
+FIELD_KIND_OBJECT = 'o'
+FIELD_KIND_OBJECT_LIST = 'l'
+
 
 class NotSpecifiedSentinel:
     pass
@@ -42,6 +66,16 @@ def get_attrname(name):
     return '_%s' % name
 
 
+def _field_kind(field):
+    field_type = getattr(field, '_type', None)
+    if isinstance(field_type, fields.Object):
+        return FIELD_KIND_OBJECT
+    if (isinstance(field_type, fields.List) and
+            isinstance(field_type._element_type._type, fields.Object)):
+        return FIELD_KIND_OBJECT_LIST
+    return FIELD_KIND_VALUE
+
+
 def make_class_properties(cls):
     # NOTE(danms/comstud): Inherit fields from super classes.
     # mro() returns the current class first and returns 'object' last, so
@@ -76,6 +110,14 @@ def make_class_properties(cls):
 
         setattr(cls, name, property(getter, setter))
 
+    # NOTE: The field tables save looking the fields, their storage and
+    # their kinds up every time an object is serialized.
+    cls._obj_field_table = [(name, get_attrname(name), field,
+                             _field_kind(field))
+                            for name, field in sorted(cls.fields.items())]
+    cls._obj_field_names = frozenset(cls.fields) | frozenset(
+        getattr(cls, 'obj_extra_fields', []))
+
 
 class NovaObjectMetaclass(type):
     """Metaclass that allows tracking of object classes."""
@@ -179,6 +221,10 @@ class NovaObject(object):
     fields = {}
     obj_extra_fields = []
 
+    # Precomputed by make_class_properties() for every subclass.
+    _obj_field_table = []
+    _obj_field_names = frozenset()
+
     def __init__(self, context=None, **kwargs):
         self._changed_fields = set()
         self._context = context
@@ -230,10 +276,18 @@ class NovaObject(object):
         self.VERSION = objver
         objdata = primitive['nova_object.data']
         changes = primitive.get('nova_object.changes', [])
-        for name, field in self.fields.items():
+        for name, attrname, field, kind in self._obj_field_table:
             if name in objdata:
-                setattr(self, name, field.from_primitive(self, name,
-                                                         objdata[name]))
+                # NOTE: This is what the field property setter does, minus
+                # the change tracking which is replaced below.
+                value = field.from_primitive(self, name, objdata[name])
+                try:
+                    setattr(self, attrname, field.coerce(self, name, value))
+                except Exception:
+                    LOG.exception(_('Error setting %(attr)s') %
+                                  {'attr': '%s.%s' % (self.obj_name(),
+                                                      name)})
+                    raise
         self._changed_fields = set([x for x in changes if x in self.fields])
         return self
 
@@ -295,20 +349,43 @@ class NovaObject(object):
         This calls to_primitive() for each item in fields.
         """
         primitive = dict()
-        for name, field in self.fields.items():
-            if self.obj_attr_is_set(name):
+        for name, attrname, field, kind in self._obj_field_table:
+            if hasattr(self, attrname):
                 primitive[name] = field.to_primitive(self, name,
-                                                     getattr(self, name))
+                                                     getattr(self, attrname))
         if target_version:
             self.obj_make_compatible(primitive, target_version)
         obj = {'nova_object.name': self.obj_name(),
                'nova_object.namespace': 'nova',
                'nova_object.version': target_version or self.VERSION,
                'nova_object.data': primitive}
-        if self.obj_what_changed():
-            obj['nova_object.changes'] = list(self.obj_what_changed())
+        changes = self.obj_what_changed()
+        if changes:
+            obj['nova_object.changes'] = list(changes)
         return obj
 
+    def obj_to_compact_primitive(self):
+        """Dehydration to the compact wire format.
+
+        Rather than a dict per object, every object becomes a list of its
+        class' index in a table of classes and of the values of the fields
+        listed there, plus the changed fields if there are any:
+
+          {'nova_object.format': '1.1',
+           'nova_object.classes': [[name, version, field names,
+                                    field kinds], ...],
+           'nova_object.object': [class index, [values...], [changes]]}
+
+        The objects in object fields are in the same format, so the classes
+        of a list of objects are only listed once.  See
+        obj_from_compact_primitive().
+        """
+        encoder = _CompactEncoder()
+        encoded = encoder.encode(self)
+        return {'nova_object.format': COMPACT_WIRE_FORMAT_VERSION,
+                'nova_object.classes': encoder.classes,
+                'nova_object.object': encoded}
+
     def obj_load_attr(self, attrname):
         """Load an additional attribute from the real object.
 
@@ -329,11 +406,13 @@ class NovaObject(object):
     def obj_what_changed(self):
         """Returns a set of fields that have been modified."""
         changes = set(self._changed_fields)
-        for field in self.fields:
-            if (self.obj_attr_is_set(field) and
-                    isinstance(self[field], NovaObject) and
-                    self[field].obj_what_changed()):
-                changes.add(field)
+        for name, attrname, field, kind in self._obj_field_table:
+            if kind != FIELD_KIND_OBJECT:
+                continue
+            value = getattr(self, attrname, None)
+            if (isinstance(value, NovaObject) and
+                    value.obj_what_changed()):
+                changes.add(name)
         return changes
 
     def obj_get_changes(self):
@@ -360,7 +439,7 @@ class NovaObject(object):
         False if not. Raises AttributeError if attrname is not
         a valid attribute for this object.
         """
-        if attrname not in self.obj_fields:
+        if attrname not in self._obj_field_names:
             raise AttributeError(
                 _("%(objname)s object has no attribute '%(attrname)s'") %
                 {'objname': self.obj_name(), 'attrname': attrname})
@@ -567,18 +646,100 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
                                             entity)
         elif (hasattr(entity, 'obj_to_primitive') and
               callable(entity.obj_to_primitive)):
-            entity = entity.obj_to_primitive()
+            if (isinstance(entity, NovaObject) and
+                    CONF.object_wire_format == COMPACT_WIRE_FORMAT_VERSION):
+                entity = entity.obj_to_compact_primitive()
+            else:
+                entity = entity.obj_to_primitive()
         return entity
 
     def deserialize_entity(self, context, entity):
         if isinstance(entity, dict) and 'nova_object.name' in entity:
             entity = self._process_object(context, entity)
+        elif isinstance(entity, dict) and 'nova_object.format' in entity:
+            entity = self._process_object(
+                context, obj_from_compact_primitive(entity))
         elif isinstance(entity, (tuple, list, set)):
             entity = self._process_iterable(context, self.deserialize_entity,
                                             entity)
         return entity
 
 
+class _CompactEncoder(object):
+    """Encodes objects to the compact wire format, interning their classes
+    and the fields set on them.
+    """
+
+    def __init__(self):
+        self.classes = []
+        self._class_index = {}
+
+    def encode(self, obj):
+        attrs = obj.__dict__
+        table = [entry for entry in obj._obj_field_table
+                 if entry[1] in attrs]
+        values = []
+        for name, attrname, field, kind in table:
+            value = attrs[attrname]
+            if value is None:
+                values.append(None)
+            elif kind == FIELD_KIND_OBJECT:
+                values.append(self.encode(value))
+            elif kind == FIELD_KIND_OBJECT_LIST:
+                values.append([self.encode(item) for item in value])
+            else:
+                values.append(field.to_primitive(obj, name, value))
+        names = tuple(entry[0] for entry in table)
+        key = (obj.obj_name(), obj.VERSION, names)
+        index = self._class_index.get(key)
+        if index is None:
+            index = self._class_index[key] = len(self.classes)
+            self.classes.append([key[0], key[1], list(names),
+                                 ''.join(entry[3] for entry in table)])
+        encoded = [index, values]
+        changes = obj.obj_what_changed()
+        if changes:
+            encoded.append(sorted(changes))
+        return encoded
+
+
+def _compact_to_primitive(classes, encoded):
+    name, version, names, kinds = classes[encoded[0]]
+    data = dict(zip(names, encoded[1]))
+    for field_name, kind in zip(names, kinds):
+        value = data[field_name]
+        if value is None:
+            continue
+        if kind == FIELD_KIND_OBJECT:
+            data[field_name] = _compact_to_primitive(classes, value)
+        elif kind == FIELD_KIND_OBJECT_LIST:
+            data[field_name] = [_compact_to_primitive(classes, item)
+                                for item in value]
+    primitive = {'nova_object.name': name,
+                 'nova_object.namespace': 'nova',
+                 'nova_object.version': version,
+                 'nova_object.data': data}
+    if len(encoded) > 2:
+        primitive['nova_object.changes'] = encoded[2]
+    return primitive
+
+
+def obj_from_compact_primitive(compact):
+    """Turn the compact wire format of an object back into the primitive
+    obj_to_primitive() returns.
+
+    :param:compact: The result of NovaObject.obj_to_compact_primitive()
+    :returns: A primitive for NovaObject.obj_from_primitive()
+    :raises: UnsupportedObjectError if the format is not understood
+    """
+    wire_format = compact['nova_object.format']
+    if wire_format != COMPACT_WIRE_FORMAT_VERSION:
+        raise exception.UnsupportedObjectError(
+            objtype='wire format %s' % wire_format)
+    return _compact_to_primitive(compact['nova_object.classes'],
+                                 compact['nova_object.object'])
+
+
 def obj_to_primitive(obj):
     """Recursively turn an object into a python primitive.
 
@@ -18,6 +18,10 @@
 
 """Super simple fake memcache client."""
 
+import collections
+import heapq
+import threading
+
 from oslo.config import cfg
 
 from nova.openstack.common import timeutils
@@ -26,6 +30,11 @@ memcache_opts = [
     cfg.ListOpt('memcached_servers',
                 default=None,
                 help='Memcached servers or None for in process cache.'),
+    cfg.IntOpt('memorycache_max_entries',
+               default=0,
+               help='Maximum number of entries of the in process cache, '
+                    'the least recently used ones are evicted first. '
+                    '0 means no limit.'),
 ]
 
 CONF = cfg.CONF
@@ -48,50 +57,137 @@ def get_client(memcached_servers=None):
 
 
 class Client(object):
-    """Replicates a tiny subset of memcached client interface."""
+    """Replicates a tiny subset of memcached client interface.
+
+    The expiry times of the entries are kept in a heap so that expired
+    entries are dropped without scanning the whole cache, and, when the
+    cache is bounded, their uses in a queue so that the least recently
+    used entry is found without scanning either.  Every method holds a
+    lock, so a client can be shared between threads.
+    """
 
     def __init__(self, *args, **kwargs):
-        """Ignores the passed in args."""
+        """Ignores the passed in args, except for max_entries."""
+        self.max_entries = kwargs.get('max_entries')
+        if self.max_entries is None:
+            self.max_entries = CONF.memorycache_max_entries
+        # key -> [timeout, value, last use]
         self.cache = {}
+        # (timeout, key) of the entries which expire, may be stale
+        self._timeouts = []
+        # (use, key) in the order of use when bounded, may be stale
+        self._uses = collections.deque()
+        self._use = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expire(self, now=None):
+        if now is None:
+            now = timeutils.utcnow_ts()
+        timeouts = self._timeouts
+        while timeouts and now >= timeouts[0][0]:
+            timeout, key = heapq.heappop(timeouts)
+            entry = self.cache.get(key)
+            # The key may have been set again since
+            if entry is not None and entry[0] == timeout:
+                del self.cache[key]
+
+    def _touch(self, key, entry):
+        if not self.max_entries:
+            return
+        self._use += 1
+        entry[2] = self._use
+        self._uses.append((self._use, key))
+        if len(self._uses) > 2 * len(self.cache) + 64:
+            # Drop the uses of entries used again or deleted
+            self._uses = collections.deque(sorted(
+                (e[2], k) for k, e in self.cache.iteritems()))
+
+    def _store(self, key, timeout, value):
+        entry = [timeout, value, 0]
+        self.cache[key] = entry
+        self._touch(key, entry)
+        if timeout:
+            heapq.heappush(self._timeouts, (timeout, key))
+            if len(self._timeouts) > 2 * len(self.cache) + 64:
+                # Drop the timeouts of entries set again or deleted
+                self._timeouts = [(e[0], k)
+                                  for k, e in self.cache.iteritems()
+                                  if e[0]]
+                heapq.heapify(self._timeouts)
+        while self.max_entries and len(self.cache) > self.max_entries:
+            use, lru_key = self._uses.popleft()
+            entry = self.cache.get(lru_key)
+            # The key may have been used again since
+            if entry is not None and entry[2] == use:
+                del self.cache[lru_key]
+                self.evictions += 1
 
     def get(self, key):
         """Retrieves the value for a key or None.
 
         This expunges expired keys during each get.
         """
-
-        now = timeutils.utcnow_ts()
-        for k in self.cache.keys():
-            (timeout, _value) = self.cache[k]
-            if timeout and now >= timeout:
-                del self.cache[k]
-
-        return self.cache.get(key, (0, None))[1]
+        with self._lock:
+            self._expire()
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._touch(key, entry)
+            self.hits += 1
+            return entry[1]
 
     def set(self, key, value, time=0, min_compress_len=0):
         """Sets the value for a key."""
+        now = timeutils.utcnow_ts()
         timeout = 0
         if time != 0:
-            timeout = timeutils.utcnow_ts() + time
-        self.cache[key] = (timeout, value)
+            timeout = now + time
+        with self._lock:
+            self._expire(now)
+            self._store(key, timeout, value)
         return True
 
     def add(self, key, value, time=0, min_compress_len=0):
         """Sets the value for a key if it doesn't exist."""
-        if self.get(key) is not None:
-            return False
-        return self.set(key, value, time, min_compress_len)
+        now = timeutils.utcnow_ts()
+        timeout = 0
+        if time != 0:
+            timeout = now + time
+        with self._lock:
+            self._expire(now)
+            entry = self.cache.get(key)
+            # A key set to None does not exist, as far as get() tells
+            if entry is not None and entry[1] is not None:
+                return False
+            self._store(key, timeout, value)
+        return True
 
     def incr(self, key, delta=1):
         """Increments the value for a key."""
-        value = self.get(key)
-        if value is None:
-            return None
-        new_value = int(value) + delta
-        self.cache[key] = (self.cache[key][0], str(new_value))
-        return new_value
+        with self._lock:
+            self._expire()
+            entry = self.cache.get(key)
+            if entry is None or entry[1] is None:
+                return None
+            new_value = int(entry[1]) + delta
+            entry[1] = str(new_value)
+            self._touch(key, entry)
+            return new_value
 
     def delete(self, key, time=0):
         """Deletes the value associated with a key."""
-        if key in self.cache:
-            del self.cache[key]
+        with self._lock:
+            self.cache.pop(key, None)
+
+    def get_stats(self):
+        """Returns statistics named like those of memcached."""
+        with self._lock:
+            self._expire()
+            return [('memorycache', {'curr_items': len(self.cache),
+                                     'get_hits': self.hits,
+                                     'get_misses': self.misses,
+                                     'evictions': self.evictions})]
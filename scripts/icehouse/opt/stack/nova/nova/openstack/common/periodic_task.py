@@ -14,6 +14,7 @@
 #    under the License.
 
 import datetime
+import random
 import time
 
 from oslo.config import cfg
@@ -29,6 +30,22 @@ periodic_opts = [
                 default=True,
                 help=('Some periodic tasks can be run in a separate process. '
                       'Should we run them here?')),
+    cfg.BoolOpt('periodic_task_initial_spread',
+                default=True,
+                help=('Run each periodic task for the first time at a random '
+                      'point of its interval, so that services started '
+                      'together do not run their tasks together. Tasks '
+                      'which run immediately are not delayed.')),
+    cfg.FloatOpt('periodic_task_jitter',
+                 default=0.1,
+                 help=('Fraction of its interval by which each run of a '
+                       'periodic task is randomly moved earlier or later.')),
+    cfg.IntOpt('periodic_task_pass_budget',
+               default=0,
+               help=('Seconds a pass of the periodic tasks may take. The '
+                     'tasks left when it is used up are run first in the '
+                     'next pass, which starts once other work had a chance '
+                     'to run. 0 means no budget.')),
 ]
 
 CONF = cfg.CONF
@@ -60,6 +77,10 @@ def periodic_task(*args, **kwargs):
            run_immediately is omitted or set to 'False', the first time the
            task runs will be approximately N seconds after the task scheduler
            starts.
+
+    The budget argument is the number of seconds a run of the task is
+    expected to take at most, its spacing or DEFAULT_INTERVAL if it is not
+    given.  Longer runs are logged and counted as overruns.
     """
     def decorator(f):
         # Test for old style invocation
@@ -77,6 +98,7 @@ def periodic_task(*args, **kwargs):
         # Control frequency
         f._periodic_spacing = kwargs.pop('spacing', 0)
         f._periodic_immediate = kwargs.pop('run_immediately', False)
+        f._periodic_budget = kwargs.pop('budget', None)
         if f._periodic_immediate:
             f._periodic_last_run = None
         else:
@@ -125,6 +147,11 @@ class _PeriodicTasksMeta(type):
         except AttributeError:
             cls._periodic_spacing = {}
 
+        try:
+            cls._periodic_budget = cls._periodic_budget.copy()
+        except AttributeError:
+            cls._periodic_budget = {}
+
         for value in cls.__dict__.values():
             if getattr(value, '_periodic_task', False):
                 task = value
@@ -149,42 +176,160 @@ class _PeriodicTasksMeta(type):
                 cls._periodic_tasks.append((name, task))
                 cls._periodic_spacing[name] = task._periodic_spacing
                 cls._periodic_last_run[name] = task._periodic_last_run
+                cls._periodic_budget[name] = (task._periodic_budget or
+                                              task._periodic_spacing or
+                                              DEFAULT_INTERVAL)
 
 
 @six.add_metaclass(_PeriodicTasksMeta)
 class PeriodicTasks(object):
 
+    def _periodic_task_state(self):
+        """Return the schedule and run statistics of the tasks of this
+        object, by task name.
+        """
+        state = getattr(self, '_periodic_state', None)
+        if state is not None:
+            return state
+
+        state = self._periodic_state = {}
+        now = timeutils.utcnow()
+        for task_name, task in self._periodic_tasks:
+            spacing = self._periodic_spacing[task_name]
+            last_run = self._periodic_last_run[task_name]
+            next_run = None
+            if spacing is not None and last_run is not None:
+                if CONF.periodic_task_initial_spread:
+                    next_run = now + datetime.timedelta(
+                        seconds=random.uniform(0, spacing))
+                else:
+                    next_run = last_run + datetime.timedelta(seconds=spacing)
+            state[task_name] = {'spacing': spacing,
+                                'budget': self._periodic_budget[task_name],
+                                'next_run': next_run,
+                                'deferred': False,
+                                'runs': 0,
+                                'errors': 0,
+                                'overruns': 0,
+                                'deferrals': 0,
+                                'last_run': None,
+                                'last_duration': None,
+                                'max_duration': 0.0,
+                                'total_duration': 0.0}
+        return state
+
+    def _schedule_next_run(self, task_state, started_at):
+        spacing = task_state['spacing']
+        if spacing is None:
+            return
+        jitter = CONF.periodic_task_jitter
+        if jitter:
+            spacing *= 1 + random.uniform(-jitter, jitter)
+        task_state['next_run'] = started_at + datetime.timedelta(
+            seconds=spacing)
+
+    def get_periodic_task_stats(self):
+        """Return the schedule and run statistics of the periodic tasks as
+        a dict of primitives by task name.
+        """
+        stats = {}
+        for task_name, task_state in self._periodic_task_state().items():
+            entry = dict(task_state)
+            for key in ('next_run', 'last_run'):
+                if entry[key] is not None:
+                    entry[key] = timeutils.strtime(entry[key])
+            stats[task_name] = entry
+        return stats
+
     def run_periodic_tasks(self, context, raise_on_error=False):
         """Tasks to be run at a periodic interval."""
         idle_for = DEFAULT_INTERVAL
-        for task_name, task in self._periodic_tasks:
+        state = self._periodic_task_state()
+        pass_started = time.time()
+
+        # Tasks left over by the last pass go first.  Tasks which run on
+        # every pass already ran in it, so they wait for the next full pass.
+        resuming = any(task_state['deferred']
+                       for task_state in state.values())
+        tasks = sorted(self._periodic_tasks,
+                       key=lambda task: not state[task[0]]['deferred'])
+
+        for index, (task_name, task) in enumerate(tasks):
             full_task_name = '.'.join([self.__class__.__name__, task_name])
+            task_state = state[task_name]
 
             now = timeutils.utcnow()
-            spacing = self._periodic_spacing[task_name]
-            last_run = self._periodic_last_run[task_name]
+            spacing = task_state['spacing']
+            next_run = task_state['next_run']
+
+            if resuming and not task_state['deferred'] and spacing is None:
+                # It ran in the pass which was cut short, and is due again
+                # the default interval after that.
+                if task_state['last_run'] is not None:
+                    since = timeutils.delta_seconds(task_state['last_run'],
+                                                    now)
+                    idle_for = min(idle_for,
+                                   max(0, DEFAULT_INTERVAL - since))
+                continue
 
             # If a periodic task is _nearly_ due, then we'll run it early
-            if spacing is not None and last_run is not None:
-                due = last_run + datetime.timedelta(seconds=spacing)
-                if not timeutils.is_soon(due, 0.2):
-                    idle_for = min(idle_for, timeutils.delta_seconds(now, due))
+            if next_run is not None:
+                if not timeutils.is_soon(next_run, 0.2):
+                    idle_for = min(idle_for,
+                                   timeutils.delta_seconds(now, next_run))
                     continue
 
+            budget = CONF.periodic_task_pass_budget
+            if budget and time.time() - pass_started >= budget:
+                # Let other work run and come back for the rest right away.
+                for deferred_name, deferred_task in tasks[index:]:
+                    deferred_state = state[deferred_name]
+                    if (deferred_state['next_run'] is None or
+                            timeutils.is_soon(deferred_state['next_run'],
+                                              0.2)):
+                        deferred_state['deferred'] = True
+                        deferred_state['deferrals'] += 1
+                LOG.debug(_("Periodic tasks used up their budget of "
+                            "%(budget)s seconds, deferring "
+                            "%(full_task_name)s and the tasks after it"),
+                          {'budget': budget,
+                           'full_task_name': full_task_name})
+                return 0
+
             if spacing is not None:
                 idle_for = min(idle_for, spacing)
 
             LOG.debug(_("Running periodic task %(full_task_name)s"),
                       {"full_task_name": full_task_name})
-            self._periodic_last_run[task_name] = timeutils.utcnow()
+            self._periodic_last_run[task_name] = now
+            task_state['deferred'] = False
+            task_state['last_run'] = now
+            self._schedule_next_run(task_state, now)
+            started = time.time()
 
             try:
                 task(self, context)
             except Exception as e:
+                task_state['errors'] += 1
                 if raise_on_error:
                     raise
                 LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
                               {"full_task_name": full_task_name, "e": e})
+            finally:
+                duration = time.time() - started
+                task_state['runs'] += 1
+                task_state['last_duration'] = duration
+                task_state['max_duration'] = max(task_state['max_duration'],
+                                                 duration)
+                task_state['total_duration'] += duration
+                if duration > task_state['budget']:
+                    task_state['overruns'] += 1
+                    LOG.warn(_("Periodic task %(full_task_name)s took "
+                               "%(duration).1f seconds, more than its budget "
+                               "of %(budget)s seconds"),
+                             {'full_task_name': full_task_name,
+                              'duration': duration,
+                              'budget': task_state['budget']})
             time.sleep(0)
 
         return idle_for
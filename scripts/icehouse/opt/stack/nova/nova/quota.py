@@ -81,6 +81,13 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
                help='Default driver to use for quota checks'),
+    cfg.BoolOpt('quota_compare_and_swap',
+                default=False,
+                help='Reserve quota by conditionally updating the usage '
+                     'of the user and the usage of the project of each '
+                     'resource instead of locking all the usages of the '
+                     'project. Usages which have to be created or '
+                     'refreshed still lock the usages of the project'),
     ]
 
 CONF = cfg.CONF
@@ -507,10 +514,14 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
-        return db.quota_reserve(context, resources, quotas, user_quotas,
-                                deltas, expire,
-                                CONF.until_refresh, CONF.max_age,
-                                project_id=project_id, user_id=user_id)
+        if CONF.quota_compare_and_swap:
+            quota_reserve = db.quota_reserve_compare_and_swap
+        else:
+            quota_reserve = db.quota_reserve
+        return quota_reserve(context, resources, quotas, user_quotas,
+                             deltas, expire,
+                             CONF.until_refresh, CONF.max_age,
+                             project_id=project_id, user_id=user_id)
 
     def commit(self, context, reservations, project_id=None, user_id=None):
         """Commit reservations.
@@ -0,0 +1,136 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of HostStates for vectorized filtering and weighing.
+
+Filters and weighers whose logic is plain arithmetic on numeric HostState
+fields can evaluate every host at once on NumPy arrays instead of calling
+host_passes() or _weigh_object() per host.  Filters declare this by setting
+``vectorized = True`` and implementing ``hosts_pass_mask()``; weighers by
+setting ``vectorized = True`` and implementing ``weigh_columns()``.  Any
+other filter or weigher still runs per host in Python.
+"""
+
+import itertools
+import operator
+
+try:
+    import numpy
+except ImportError:
+    # numpy is optional, the columnar engine is disabled without it
+    numpy = None
+
+from oslo.config import cfg
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+
+columnar_opts = [
+    cfg.BoolOpt('scheduler_columnar_engine',
+                default=False,
+                help='Evaluate filters and weighers which support it on '
+                     'NumPy arrays of host state values instead of one host '
+                     'at a time.  Requires numpy; ignored when it is not '
+                     'installed.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(columnar_opts)
+
+LOG = logging.getLogger(__name__)
+
+_warned_no_numpy = False
+
+
+def is_enabled():
+    """Return True if the columnar engine should be used."""
+    global _warned_no_numpy
+    if not CONF.scheduler_columnar_engine:
+        return False
+    if numpy is None:
+        if not _warned_no_numpy:
+            LOG.warn(_("scheduler_columnar_engine is set but numpy is not "
+                       "installed, filtering and weighing hosts one at a "
+                       "time"))
+            _warned_no_numpy = True
+        return False
+    return True
+
+
+class HostColumns(object):
+    """Numeric HostState fields packed into arrays, one row per host.
+
+    Columns are packed lazily on first access, so only the fields used by
+    the filters and weighers of a request are ever read.
+    """
+
+    def __init__(self, hosts, columns=None):
+        self.hosts = hosts
+        self._columns = columns or {}
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def __getitem__(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            column = numpy.fromiter(itertools.imap(
+                                        operator.attrgetter(field),
+                                        self.hosts),
+                                    dtype=numpy.float64,
+                                    count=len(self.hosts))
+            self._columns[field] = column
+        return column
+
+    def metric(self, name):
+        """Return the values of a metric, NaN where a host lacks it."""
+        key = ('metric', name)
+        column = self._columns.get(key)
+        if column is None:
+            nan = float('nan')
+            column = numpy.array([host.metrics[name].value
+                                  if name in host.metrics else nan
+                                  for host in self.hosts],
+                                 dtype=numpy.float64)
+            self._columns[key] = column
+        return column
+
+    def _take(self, indices):
+        hosts = [self.hosts[i] for i in indices.tolist()]
+        columns = dict((field, column[indices])
+                       for field, column in self._columns.iteritems())
+        return HostColumns(hosts, columns)
+
+    def select(self, mask):
+        """Return the rows for which mask is True."""
+        return self._take(numpy.flatnonzero(mask))
+
+    def select_hosts(self, hosts):
+        """Return the rows of hosts, a subset of self.hosts in order."""
+        positions = dict((id(host), i) for i, host in enumerate(self.hosts))
+        indices = numpy.array([positions[id(host)] for host in hosts],
+                              dtype=numpy.intp)
+        return self._take(indices)
+
+    def set_limits(self, key, values, mask=None):
+        """Store values[i] in hosts[i].limits[key] where mask is True."""
+        if mask is None:
+            hosts = self.hosts
+        else:
+            hosts = itertools.compress(self.hosts, mask.tolist())
+            values = values[mask]
+        for host, value in itertools.izip(hosts, values.tolist()):
+            host.limits[key] = value
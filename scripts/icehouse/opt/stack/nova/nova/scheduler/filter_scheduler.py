@@ -19,6 +19,8 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
+import itertools
 import random
 
 from oslo.config import cfg
@@ -32,6 +34,7 @@ from nova.pci import pci_request
 from nova import rpc
 from nova.scheduler import driver
 from nova.scheduler import scheduler_options
+from nova.scheduler import sharding
 from nova.scheduler import utils as scheduler_utils
 
 
@@ -48,7 +51,15 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_batch_placement',
+                default=False,
+                help='Filter and weigh hosts only once for requests of '
+                     'more than one instance, then place the instances '
+                     'from a priority queue of the weighed hosts.  Only '
+                     'the hosts taken from the queue are filtered again '
+                     'and only the host receiving an instance is weighed '
+                     'again.'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -61,6 +72,8 @@ class FilterScheduler(driver.Scheduler):
         self.options = scheduler_options.SchedulerOptions()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.notifier = rpc.get_notifier('scheduler')
+        self.host_partitioner = sharding.get_partitioner()
+        self.claim_ledger = sharding.get_claim_ledger()
 
     def schedule_run_instance(self, context, request_spec,
                               admin_password, injected_files,
@@ -316,11 +329,39 @@ class FilterScheduler(driver.Scheduler):
         # are being scanned in a filter or weighing function.
         hosts = self._get_all_host_states(elevated)
 
-        selected_hosts = []
         if instance_uuids:
             num_instances = len(instance_uuids)
         else:
             num_instances = request_spec.get('num_instances', 1)
+
+        # With partitioned hosts, try the hosts of this scheduler first and
+        # only look at the hosts of the other schedulers when ours can't
+        # take the whole request.
+        other_hosts = []
+        if self.host_partitioner is not None:
+            hosts, other_hosts = self.host_partitioner.split(hosts)
+
+        selected_hosts = self._select_hosts(hosts, filter_properties,
+                instance_properties, num_instances, update_group_hosts)
+        if len(selected_hosts) < num_instances and other_hosts:
+            LOG.debug(_("Partition %(index)d placed %(placed)d of "
+                        "%(num)d instances, trying the other partitions"),
+                      {'index': self.host_partitioner.index,
+                       'placed': len(selected_hosts), 'num': num_instances})
+            selected_hosts.extend(self._select_hosts(other_hosts,
+                    filter_properties, instance_properties,
+                    num_instances - len(selected_hosts), update_group_hosts))
+        return selected_hosts
+
+    def _select_hosts(self, hosts, filter_properties, instance_properties,
+                      num_instances, update_group_hosts):
+        """Returns a list of hosts for num_instances instances."""
+        if CONF.scheduler_batch_placement and num_instances > 1:
+            return self._schedule_batch(hosts, filter_properties,
+                                        instance_properties, num_instances,
+                                        update_group_hosts)
+
+        selected_hosts = []
         for num in xrange(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
@@ -336,14 +377,11 @@ class FilterScheduler(driver.Scheduler):
 
             LOG.debug(_("Weighed %(hosts)s"), {'hosts': weighed_hosts})
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
-
-            chosen_host = random.choice(
-                weighed_hosts[0:scheduler_host_subset_size])
+            chosen_host = self._choose_host(weighed_hosts,
+                    filter_properties, instance_properties, num)
+            if chosen_host is None:
+                # Every host was taken by other schedulers.
+                break
             selected_hosts.append(chosen_host)
 
             # Now consume the resources so the filter/weights
@@ -353,6 +391,114 @@ class FilterScheduler(driver.Scheduler):
                 filter_properties['group_hosts'].add(chosen_host.obj.host)
         return selected_hosts
 
+    def _schedule_batch(self, hosts, filter_properties, instance_properties,
+                        num_instances, update_group_hosts):
+        """Returns a list of hosts for num_instances instances, filtering
+        and weighing all hosts only once.
+
+        The weighed hosts are kept in a heap.  A host taken from the heap
+        for any instance after the first is filtered again, so hosts which
+        no longer pass because of earlier choices (resources consumed,
+        affinity or anti-affinity group hosts) are dropped for good.  Only
+        the chosen host is weighed again before going back into the heap.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties, index=0)
+        if not hosts:
+            return []
+
+        LOG.debug(_("Filtered %(hosts)s"), {'hosts': hosts})
+
+        weighers = self.host_manager.get_weighers()
+        weighed_hosts = self.host_manager.weigh_hosts(weighers, hosts,
+                filter_properties)
+        # Heap entries sort by weight (highest first), then by the order
+        # the hosts were weighed in, like the sorted list of weighed hosts.
+        heap = [(-weighed_host.weight, order, weighed_host)
+                for order, weighed_host in enumerate(weighed_hosts)]
+        heapq.heapify(heap)
+        order = itertools.count(len(heap))
+        scheduler_host_subset_size = self._host_subset_size(len(heap))
+
+        selected_hosts = []
+        for num in xrange(num_instances):
+            chosen = None
+            while chosen is None:
+                candidates = []
+                while heap and len(candidates) < scheduler_host_subset_size:
+                    entry = heapq.heappop(heap)
+                    if num == 0 or self.host_manager.get_filtered_hosts(
+                            [entry[2].obj], filter_properties, index=num):
+                        candidates.append(entry)
+                if not candidates:
+                    break
+
+                chosen = random.choice(candidates)
+                candidates.remove(chosen)
+                for entry in candidates:
+                    heapq.heappush(heap, entry)
+                if not self._claim_host(chosen[2].obj, filter_properties,
+                                        instance_properties, num):
+                    # Taken by another scheduler, drop it for good.
+                    chosen = None
+            if chosen is None:
+                # Can't get any more locally.
+                break
+            chosen_host = chosen[2]
+            selected_hosts.append(chosen_host)
+
+            # Now consume the resources so the filters and weights of this
+            # host will change for the next instance.
+            chosen_host.obj.consume_from_instance(instance_properties)
+            if update_group_hosts is True:
+                filter_properties['group_hosts'].add(chosen_host.obj.host)
+            reweighed_host = self.host_manager.reweigh_host(weighers,
+                    chosen_host.obj, filter_properties)
+            heapq.heappush(heap, (-reweighed_host.weight, next(order),
+                                  reweighed_host))
+        return selected_hosts
+
+    def _choose_host(self, weighed_hosts, filter_properties,
+                     instance_properties, index):
+        """Returns one of the best weighed hosts, or None if every host
+        was taken by other schedulers.
+        """
+        while weighed_hosts:
+            scheduler_host_subset_size = self._host_subset_size(
+                    len(weighed_hosts))
+            chosen_host = random.choice(
+                weighed_hosts[0:scheduler_host_subset_size])
+            if self._claim_host(chosen_host.obj, filter_properties,
+                                instance_properties, index):
+                return chosen_host
+            weighed_hosts = [weighed_host for weighed_host in weighed_hosts
+                             if weighed_host is not chosen_host]
+        return None
+
+    def _claim_host(self, host_state, filter_properties, instance_properties,
+                    index):
+        """Claims host_state in the claim ledger, if there is one.
+
+        Returns False if the host no longer passes the filters once the
+        claims of the other schedulers are applied to it.
+        """
+        if self.claim_ledger is None:
+            return True
+
+        def check():
+            return self.host_manager.get_filtered_hosts([host_state],
+                    filter_properties, index=index)
+
+        return self.claim_ledger.claim(host_state, instance_properties, check)
+
+    def _host_subset_size(self, num_hosts):
+        scheduler_host_subset_size = CONF.scheduler_host_subset_size
+        if scheduler_host_subset_size > num_hosts:
+            scheduler_host_subset_size = num_hosts
+        if scheduler_host_subset_size < 1:
+            scheduler_host_subset_size = 1
+        return scheduler_host_subset_size
+
     def _get_all_host_states(self, context):
         """Template method, so a subclass can implement caching."""
         return self.host_manager.get_all_host_states(context)
@@ -17,11 +17,23 @@
 Scheduler host filters
 """
 
+import time
+
 from nova import filters
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from nova.scheduler import columnar
+from nova import stats
+
+LOG = logging.getLogger(__name__)
 
 
 class BaseHostFilter(filters.BaseFilter):
     """Base class for host filters."""
+
+    # Set to True in a subclass that implements hosts_pass_mask()
+    vectorized = False
+
     def _filter_one(self, obj, filter_properties):
         """Return True if the object passes the filter, otherwise False."""
         return self.host_passes(obj, filter_properties)
@@ -32,11 +44,57 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def hosts_pass_mask(self, columns, filter_properties):
+        """Return a boolean array, True for each host of a
+        columnar.HostColumns which passes the filter.  Only used when
+        vectorized is True, and must agree with host_passes().
+        """
+        raise NotImplementedError()
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_filtered_objects(self, filter_classes, objs,
+            filter_properties, index=0):
+        if not columnar.is_enabled():
+            return super(HostFilterHandler, self).get_filtered_objects(
+                    filter_classes, objs, filter_properties, index)
+
+        columns = columnar.HostColumns(list(objs))
+        LOG.debug(_("Starting with %d host(s)"), len(columns))
+        sampled = stats.should_sample()
+        for filter_cls in filter_classes:
+            cls_name = filter_cls.__name__
+            filter = filter_cls()
+
+            if not filter.run_filter_for_index(index):
+                continue
+            if sampled:
+                started = time.time()
+                num_in = len(columns)
+            if filter.vectorized:
+                columns = columns.select(
+                        filter.hosts_pass_mask(columns, filter_properties))
+            else:
+                objs = filter.filter_all(columns.hosts, filter_properties)
+                if objs is None:
+                    LOG.debug(_("Filter %(cls_name)s says to stop filtering"),
+                          {'cls_name': cls_name})
+                    return
+                columns = columns.select_hosts(list(objs))
+            if sampled:
+                stats.record_filter(cls_name, time.time() - started,
+                                    num_in, len(columns))
+            if not len(columns):
+                LOG.info(_("Filter %s returned 0 hosts"), cls_name)
+                break
+            LOG.debug(_("Filter %(cls_name)s returned "
+                        "%(obj_len)d host(s)"),
+                      {'cls_name': cls_name, 'obj_len': len(columns)})
+        return columns.hosts
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
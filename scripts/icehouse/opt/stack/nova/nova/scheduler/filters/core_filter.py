@@ -20,6 +20,7 @@ from oslo.config import cfg
 from nova import db
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
+from nova.scheduler import columnar
 from nova.scheduler import filters
 
 LOG = logging.getLogger(__name__)
@@ -67,9 +68,30 @@ class BaseCoreFilter(filters.BaseHostFilter):
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
 
+    vectorized = True
+
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return CONF.cpu_allocation_ratio
 
+    def hosts_pass_mask(self, columns, filter_properties):
+        """Return True for hosts with sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return columnar.numpy.ones(len(columns), dtype=bool)
+
+        vcpus_total = columns['vcpus_total']
+
+        # Hosts which do not report VCPUs pass, see host_passes()
+        unset = vcpus_total == 0
+        if unset.any():
+            LOG.warning(_("VCPUs not set; assuming CPU collection broken"))
+
+        vcpus_total = vcpus_total * CONF.cpu_allocation_ratio
+        columns.set_limits('vcpu', vcpus_total, vcpus_total > 0)
+
+        return unset | (vcpus_total - columns['vcpus_used'] >=
+                        instance_type['vcpus'])
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -58,6 +58,25 @@ host_manager_opts = [
     cfg.ListOpt('scheduler_weight_classes',
                 default=['nova.scheduler.weights.all_weighers'],
                 help='Which weight class names to use for weighing hosts'),
+    cfg.BoolOpt('scheduler_incremental_host_state',
+                default=False,
+                help='Keep host states in memory between scheduling '
+                     'requests and only apply the compute nodes that were '
+                     'created, updated or deleted since the last sync, '
+                     'instead of rebuilding every host state from the '
+                     'database on each request.'),
+    cfg.IntOpt('scheduler_host_state_max_staleness',
+               default=0,
+               help='When scheduler_incremental_host_state is enabled, the '
+                    'number of seconds host states may be served from '
+                    'memory before changed compute nodes are fetched '
+                    'again.  0 fetches changes on every request.'),
+    cfg.IntOpt('scheduler_host_state_full_sync_interval',
+               default=600,
+               help='When scheduler_incremental_host_state is enabled, the '
+                    'number of seconds between full reloads of all compute '
+                    'nodes, which bounds any drift of the incremental '
+                    'host states.'),
     ]
 
 CONF = cfg.CONF
@@ -148,6 +167,11 @@ class HostState(object):
 
         self.updated = None
 
+        # Claims of other scheduler workers consumed since the compute node
+        # last reported, see nova.scheduler.sharding.ClaimLedger
+        self.compute_updated = None
+        self.claims_applied = set()
+
     def update_capabilities(self, capabilities=None, service=None):
         # Read-only capability dicts
 
@@ -207,6 +231,8 @@ class HostState(object):
         self.vcpus_total = compute['vcpus']
         self.vcpus_used = compute['vcpus_used']
         self.updated = compute['updated_at']
+        self.compute_updated = compute['updated_at']
+        self.claims_applied = set()
         if 'pci_stats' in compute:
             self.pci_stats = pci_stats.PciDeviceStats(compute['pci_stats'])
         else:
@@ -337,6 +363,12 @@ class HostManager(object):
         self.weight_handler = weights.HostWeightHandler()
         self.weight_classes = self.weight_handler.get_matching_classes(
                 CONF.scheduler_weight_classes)
+        # Incremental host state bookkeeping: the newest compute node
+        # timestamp applied so far, and when the last full and delta syncs
+        # happened.
+        self._compute_node_watermark = None
+        self._last_full_sync = None
+        self._last_delta_sync = None
 
     def _choose_host_filters(self, filter_cls_names):
         """Since the caller may specify which filters to use we need
@@ -440,11 +472,79 @@ class HostManager(object):
         return self.weight_handler.get_weighed_objects(self.weight_classes,
                 hosts, weight_properties)
 
+    def get_weighers(self):
+        """Return weigher instances for weigh_hosts() and reweigh_host()."""
+        return [weigher_cls() for weigher_cls in self.weight_classes]
+
+    def weigh_hosts(self, weighers, hosts, weight_properties):
+        """Weigh the hosts, leaving them unsorted."""
+        return self.weight_handler.weigh_objects(weighers, hosts,
+                weight_properties)
+
+    def reweigh_host(self, weighers, host, weight_properties):
+        """Weigh again a host that was weighed by weigh_hosts()."""
+        return self.weight_handler.reweigh_object(weighers, host,
+                weight_properties)
+
+    def _update_host_state(self, compute, service):
+        """Create or update the HostState for a compute node."""
+        host = service['host']
+        node = compute.get('hypervisor_hostname')
+        state_key = (host, node)
+        capabilities = self.service_states.get(state_key, None)
+        host_state = self.host_state_map.get(state_key)
+        if host_state:
+            host_state.update_capabilities(capabilities,
+                                           dict(service.iteritems()))
+        else:
+            host_state = self.host_state_cls(host, node,
+                    capabilities=capabilities,
+                    service=dict(service.iteritems()))
+            self.host_state_map[state_key] = host_state
+        host_state.update_from_compute_node(compute)
+        return state_key
+
+    def _advance_watermark(self, compute_nodes):
+        """Move the watermark to the newest timestamp of compute_nodes."""
+        for compute in compute_nodes:
+            for key in ('created_at', 'updated_at', 'deleted_at'):
+                stamp = compute.get(key)
+                if stamp and (self._compute_node_watermark is None or
+                              stamp > self._compute_node_watermark):
+                    self._compute_node_watermark = stamp
+
+    def _remove_host_state(self, state_key):
+        host, node = state_key
+        LOG.info(_("Removing dead compute node %(host)s:%(node)s "
+                   "from scheduler") % {'host': host, 'node': node})
+        del self.host_state_map[state_key]
+
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
         the HostManager knows about. Also, each of the consumable resources
         in HostState are pre-populated and adjusted based on data in the db.
         """
+        if not CONF.scheduler_incremental_host_state:
+            self._sync_all_host_states(context)
+            return self.host_state_map.itervalues()
+
+        if (self._last_full_sync is None or
+                timeutils.is_older_than(self._last_full_sync,
+                        CONF.scheduler_host_state_full_sync_interval)):
+            sync_started = timeutils.utcnow()
+            self._sync_all_host_states(context)
+            self._last_full_sync = sync_started
+            self._last_delta_sync = sync_started
+        elif timeutils.is_older_than(self._last_delta_sync,
+                CONF.scheduler_host_state_max_staleness):
+            sync_started = timeutils.utcnow()
+            self._sync_changed_host_states(context)
+            self._last_delta_sync = sync_started
+        return self.host_state_map.itervalues()
+
+    def _sync_all_host_states(self, context):
+        """Rebuild host states from every compute node in the db."""
+        self._compute_node_watermark = None
 
         # Get resource usage across the available compute nodes:
         compute_nodes = db.compute_node_get_all(context)
@@ -454,28 +554,61 @@ class HostManager(object):
             if not service:
                 LOG.warn(_("No service for compute ID %s") % compute['id'])
                 continue
-            host = service['host']
-            node = compute.get('hypervisor_hostname')
-            state_key = (host, node)
-            capabilities = self.service_states.get(state_key, None)
-            host_state = self.host_state_map.get(state_key)
-            if host_state:
-                host_state.update_capabilities(capabilities,
-                                               dict(service.iteritems()))
-            else:
-                host_state = self.host_state_cls(host, node,
-                        capabilities=capabilities,
-                        service=dict(service.iteritems()))
-                self.host_state_map[state_key] = host_state
-            host_state.update_from_compute_node(compute)
-            seen_nodes.add(state_key)
+            seen_nodes.add(self._update_host_state(compute, service))
 
         # remove compute nodes from host_state_map if they are not active
         dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
-            host, node = state_key
-            LOG.info(_("Removing dead compute node %(host)s:%(node)s "
-                       "from scheduler") % {'host': host, 'node': node})
-            del self.host_state_map[state_key]
+            self._remove_host_state(state_key)
 
-        return self.host_state_map.itervalues()
+        self._advance_watermark(compute_nodes)
+
+    def _sync_changed_host_states(self, context):
+        """Apply compute nodes changed since the last sync to host states.
+
+        Nodes that did not change keep their in-memory HostState, including
+        any resources consumed by this scheduler through
+        consume_from_instance(); update_from_compute_node() only overrides
+        those once the compute node has reported after the claim.
+        """
+        if self._compute_node_watermark is None:
+            # Nothing carried a timestamp on the last sync, so there is no
+            # safe point to ask for changes from.
+            self._sync_all_host_states(context)
+            return
+
+        compute_nodes, services = db.compute_node_get_all_changed_since(
+                context, self._compute_node_watermark)
+
+        # Refresh service records (liveness, disabled flag) of every host,
+        # and forget hosts whose compute service went away.
+        services_by_host = dict((service['host'], service)
+                                for service in services)
+        for state_key, host_state in self.host_state_map.items():
+            service = services_by_host.get(state_key[0])
+            if service is None:
+                self._remove_host_state(state_key)
+            else:
+                host_state.update_capabilities(
+                        self.service_states.get(state_key, None),
+                        dict(service.iteritems()))
+
+        # Apply deletions first so a node recreated within the same window
+        # ends up present.
+        for compute in compute_nodes:
+            if not compute['deleted'] or not compute['service']:
+                continue
+            state_key = (compute['service']['host'],
+                         compute.get('hypervisor_hostname'))
+            if state_key in self.host_state_map:
+                self._remove_host_state(state_key)
+        for compute in compute_nodes:
+            if compute['deleted']:
+                continue
+            service = compute['service']
+            if not service:
+                LOG.warn(_("No service for compute ID %s") % compute['id'])
+                continue
+            self._update_host_state(compute, service)
+
+        self._advance_watermark(compute_nodes)
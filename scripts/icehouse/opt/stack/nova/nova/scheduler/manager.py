@@ -38,6 +38,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import periodic_task
 from nova import quota
 from nova.scheduler import utils as scheduler_utils
+from nova import stats
 
 
 LOG = logging.getLogger(__name__)
@@ -298,10 +299,16 @@ class SchedulerManager(manager.Manager):
             filter_properties)
         return jsonutils.to_primitive(dests)
 
+    def get_scheduler_stats(self, context, reset=False):
+        """Returns the filter and weigher statistics of this scheduler,
+        see nova.stats.
+        """
+        return stats.get_stats(reset=reset)
+
 
 class _SchedulerManagerV3Proxy(object):
 
-    target = messaging.Target(version='3.0')
+    target = messaging.Target(version='3.1')
 
     def __init__(self, manager):
         self.manager = manager
@@ -326,3 +333,6 @@ class _SchedulerManagerV3Proxy(object):
                 instance_type=instance_type, image=image,
                 request_spec=request_spec, filter_properties=filter_properties,
                 reservations=reservations)
+
+    def get_scheduler_stats(self, ctxt, reset):
+        return self.manager.get_scheduler_stats(ctxt, reset=reset)
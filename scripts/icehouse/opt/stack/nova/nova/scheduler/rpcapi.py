@@ -80,6 +80,7 @@ class SchedulerAPI(object):
         ... - Deprecated select_hosts()
 
         3.0 - Removed backwards compat
+        3.1 - Added get_scheduler_stats()
     '''
 
     VERSION_ALIASES = {
@@ -102,6 +103,10 @@ class SchedulerAPI(object):
         return cctxt.call(ctxt, 'select_destinations',
             request_spec=request_spec, filter_properties=filter_properties)
 
+    def get_scheduler_stats(self, ctxt, host=None, reset=False):
+        cctxt = self.client.prepare(server=host, version='3.1')
+        return cctxt.call(ctxt, 'get_scheduler_stats', reset=reset)
+
     def run_instance(self, ctxt, request_spec, admin_password,
             injected_files, requested_networks, is_first_time,
             filter_properties, legacy_bdm_in_spec=True):
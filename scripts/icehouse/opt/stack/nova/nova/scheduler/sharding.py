@@ -0,0 +1,243 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Coordination between several nova-scheduler workers.
+
+Every scheduler worker has its own view of the compute hosts, so workers
+running side by side pick the same hosts and the losers of the race are
+only found out by the compute host claim, which sends the request back
+through the RetryFilter.  Two ways of coordinating the workers are offered:
+
+* HostPartitioner splits the hosts between the workers with a consistent
+  hash ring on the host name, so each worker places instances on its own
+  hosts first and only falls back to the other hosts when its own hosts
+  cannot take the request.
+
+* ClaimLedger records every placement in a store shared by the workers
+  (memcached when memcached_servers is set, an in-process dict otherwise).
+  Before a host is handed out, the claims of the other workers which the
+  compute node has not reported yet are applied to the host state and the
+  host is filtered again.  A host lost to another worker is skipped for the
+  next best one instead of failing on the compute host.
+"""
+
+import bisect
+import hashlib
+import time
+import uuid
+
+from oslo.config import cfg
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
+
+sharding_opts = [
+    cfg.IntOpt('scheduler_shard_count',
+               default=1,
+               help='Number of scheduler workers the compute hosts are '
+                    'partitioned between.  A value of 1 disables '
+                    'partitioning.'),
+    cfg.IntOpt('scheduler_shard_index',
+               default=0,
+               help='Partition of the compute hosts owned by this scheduler '
+                    'worker, from 0 to scheduler_shard_count - 1.'),
+    cfg.IntOpt('scheduler_shard_replicas',
+               default=100,
+               help='Number of points each partition gets on the hash ring. '
+                    'More points spread the hosts more evenly.'),
+    cfg.BoolOpt('scheduler_claim_ledger',
+                default=False,
+                help='Record the placements of every scheduler worker in a '
+                     'shared ledger and check it before choosing a host.  '
+                     'The ledger is kept in memcached_servers, or in '
+                     'process memory when that is not set.'),
+    cfg.IntOpt('scheduler_claim_ttl',
+               default=120,
+               help='Seconds a claim stays in the ledger.  It should be '
+                    'longer than it takes a compute node to report an '
+                    'instance scheduled to it.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(sharding_opts)
+
+LOG = logging.getLogger(__name__)
+
+# Seconds a worker may hold the ledger lock of a host.
+LOCK_TIMEOUT = 5
+# Attempts at taking the ledger lock of a host, and seconds between them.
+LOCK_ATTEMPTS = 5
+LOCK_RETRY_INTERVAL = 0.01
+
+
+class HostPartitioner(object):
+    """Consistent hash ring assigning host names to partitions."""
+
+    def __init__(self, count, index, replicas=100):
+        if not 0 <= index < count:
+            raise ValueError(_("Shard index %(index)s is not in the range "
+                               "0 to %(last)s") %
+                             {'index': index, 'last': count - 1})
+        self.count = count
+        self.index = index
+        ring = []
+        for partition in xrange(count):
+            for replica in xrange(replicas):
+                ring.append((self._hash('%d-%d' % (partition, replica)),
+                             partition))
+        ring.sort()
+        self._keys = [key for key, _partition in ring]
+        self._partitions = [partition for _key, partition in ring]
+        self._cache = {}
+
+    @staticmethod
+    def _hash(value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        return int(hashlib.md5(value).hexdigest()[:8], 16)
+
+    def get_partition(self, host):
+        """Return the partition owning host."""
+        partition = self._cache.get(host)
+        if partition is None:
+            pos = bisect.bisect(self._keys, self._hash(host))
+            partition = self._partitions[pos % len(self._keys)]
+            self._cache[host] = partition
+        return partition
+
+    def split(self, host_states):
+        """Return a tuple of the host states owned by this partition and
+        the host states owned by the other partitions.
+        """
+        own, others = [], []
+        for host_state in host_states:
+            if self.get_partition(host_state.host) == self.index:
+                own.append(host_state)
+            else:
+                others.append(host_state)
+        return own, others
+
+
+def get_partitioner():
+    """Return the HostPartitioner for this worker, or None."""
+    if CONF.scheduler_shard_count <= 1:
+        return None
+    return HostPartitioner(CONF.scheduler_shard_count,
+                           CONF.scheduler_shard_index,
+                           CONF.scheduler_shard_replicas)
+
+
+class ClaimLedger(object):
+    """Placements shared by scheduler workers until compute nodes report
+    them.
+    """
+
+    # Instance fields kept in a claim, enough for consume_from_instance()
+    claim_fields = ('memory_mb', 'root_gb', 'ephemeral_gb', 'vcpus',
+                    'project_id', 'os_type', 'vm_state', 'task_state')
+
+    def __init__(self, client=None, ttl=None):
+        self.client = client or memorycache.get_client()
+        self.ttl = ttl if ttl is not None else CONF.scheduler_claim_ttl
+
+    @staticmethod
+    def _key(host_state):
+        name = u'%s/%s' % (host_state.host, host_state.nodename)
+        return 'scheduler-claims-%s' % hashlib.md5(
+            name.encode('utf-8')).hexdigest()
+
+    def apply_claims(self, host_state):
+        """Consume the claims of other workers on host_state which the
+        compute node has not reported yet.
+        """
+        for claim_id, claimed_at, instance in (
+                self.client.get(self._key(host_state)) or []):
+            if claim_id in host_state.claims_applied:
+                continue
+            if (host_state.compute_updated and
+                    claimed_at <= host_state.compute_updated):
+                continue
+            host_state.consume_from_instance(instance)
+            host_state.claims_applied.add(claim_id)
+
+    def claim(self, host_state, instance, check):
+        """Try to claim host_state for instance.
+
+        The claims of other workers are applied to host_state and check()
+        is called to tell if the host still fits.  Returns True if it does.
+        The caller still has to consume the instance from host_state.
+
+        The ledger of the host is locked while it is read and written.  If
+        the lock is still held by another worker after a few attempts, the
+        host is handed out without recording the claim, which would
+        overwrite the claim the other worker is recording.  A race with
+        that claim is then caught by the compute host, as it would be
+        without the ledger, and the instance is sent through the
+        RetryFilter.
+        """
+        key = self._key(host_state)
+        lock_key = key + '-lock'
+        locked = self._lock(lock_key)
+        try:
+            self.apply_claims(host_state)
+            if not check():
+                LOG.debug(_("Host %s no longer fits after applying the "
+                            "claims of other schedulers"), host_state.host)
+                return False
+            if not locked:
+                LOG.debug(_("Claim on %s is locked by another scheduler, "
+                            "choosing it without recording the claim"),
+                          host_state.host)
+                return True
+
+            now = timeutils.utcnow()
+            ttl = self.ttl
+            claims = [claim for claim in self.client.get(key) or []
+                      if not timeutils.is_older_than(claim[1], ttl)]
+            claim_id = str(uuid.uuid4())
+            claims.append((claim_id, now,
+                           dict((field, instance[field])
+                                for field in self.claim_fields
+                                if field in instance)))
+            self.client.set(key, claims, time=ttl)
+            host_state.claims_applied.add(claim_id)
+            return True
+        finally:
+            if locked:
+                self.client.delete(lock_key)
+
+    def _lock(self, lock_key):
+        for attempt in xrange(LOCK_ATTEMPTS):
+            if attempt:
+                time.sleep(LOCK_RETRY_INTERVAL)
+            if self.client.add(lock_key, '1', time=LOCK_TIMEOUT):
+                return True
+        return False
+
+
+_claim_ledger = None
+
+
+def get_claim_ledger():
+    """Return the ClaimLedger shared by the workers, or None."""
+    global _claim_ledger
+    if not CONF.scheduler_claim_ledger:
+        return None
+    if _claim_ledger is None:
+        _claim_ledger = ClaimLedger()
+    return _claim_ledger
@@ -17,8 +17,13 @@
 Scheduler host weights
 """
 
+import itertools
+import time
+
 from oslo.config import cfg
 
+from nova.scheduler import columnar
+from nova import stats
 from nova import weights
 
 CONF = cfg.CONF
@@ -37,7 +42,16 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    # Set to True in a subclass that implements weigh_columns()
+    vectorized = False
+
+    def weigh_columns(self, columns, weight_properties):
+        """Return an array with the weight of each host of a
+        columnar.HostColumns.  Only used when vectorized is True, and must
+        agree with _weigh_object().
+        """
+        raise NotImplementedError()
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -46,6 +60,65 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_objects(self, weigher_classes, obj_list,
+            weighing_properties):
+        """Return a sorted (descending), normalized list of WeighedHosts."""
+        if not columnar.is_enabled():
+            return super(HostWeightHandler, self).get_weighed_objects(
+                    weigher_classes, obj_list, weighing_properties)
+
+        if not obj_list:
+            return []
+
+        columns = columnar.HostColumns(list(obj_list))
+        totals = columnar.numpy.zeros(len(columns))
+        weighed_objs = None
+        sampled = stats.should_sample()
+        for weigher_cls in weigher_classes:
+            weigher = weigher_cls()
+            if sampled:
+                started = time.time()
+            if weigher.vectorized:
+                weight_values = weigher.weigh_columns(columns,
+                                                      weighing_properties)
+                # Widen minval and maxval to the calculated weights, as
+                # BaseWeigher.weigh_objects() does
+                minval = weight_values.min()
+                maxval = weight_values.max()
+                if weigher.minval is not None:
+                    minval = min(minval, weigher.minval)
+                if weigher.maxval is not None:
+                    maxval = max(maxval, weigher.maxval)
+            else:
+                if weighed_objs is None:
+                    weighed_objs = [self.object_class(obj, 0.0)
+                                    for obj in columns.hosts]
+                weight_values = columnar.numpy.array(
+                        weigher.weigh_objects(weighed_objs,
+                                              weighing_properties),
+                        dtype=columnar.numpy.float64)
+                minval = weigher.minval
+                maxval = weigher.maxval
+            if sampled:
+                stats.record_weigher(weigher_cls.__name__,
+                                     time.time() - started, len(columns))
+
+            # Normalize the weights, as weights.normalize() does
+            minval = float(minval)
+            maxval = float(maxval)
+            if minval == maxval:
+                continue
+            totals += (weigher.weight_multiplier() *
+                       ((weight_values - minval) / (maxval - minval)))
+
+        # A stable sort keeps hosts of equal weight in their original
+        # order, like sorted() does.
+        order = columnar.numpy.argsort(-totals, kind='mergesort')
+        hosts = columns.hosts
+        totals = totals[order].tolist()
+        return [self.object_class(hosts[i], total)
+                for i, total in itertools.izip(order.tolist(), totals)]
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
@@ -29,6 +29,7 @@ in the configuration file as the followings:
 from oslo.config import cfg
 
 from nova import exception
+from nova.scheduler import columnar
 from nova.scheduler import utils
 from nova.scheduler import weights
 
@@ -68,6 +69,8 @@ CONF.register_opts(metrics_weight_opts, group='metrics')
 
 
 class MetricsWeigher(weights.BaseHostWeigher):
+    vectorized = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -102,3 +105,27 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def weigh_columns(self, columns, weight_properties):
+        values = columnar.numpy.zeros(len(columns))
+        unavailable = columnar.numpy.zeros(len(columns), dtype=bool)
+
+        for (name, ratio) in self.setting:
+            metric = columns.metric(name)
+            missing = columnar.numpy.isnan(metric)
+            if missing.any():
+                if CONF.metrics.required:
+                    host_state = columns.hosts[missing.argmax()]
+                    raise exception.ComputeHostMetricNotFound(
+                            host=host_state.host,
+                            node=host_state.nodename,
+                            name=name)
+                # See _weigh_object(), a missing metric only matters if
+                # it has an effect on the weight.
+                if ratio * self.weight_multiplier() != 0:
+                    unavailable |= missing
+            values += columnar.numpy.where(missing, 0.0, metric * ratio)
+
+        return columnar.numpy.where(unavailable,
+                                    CONF.metrics.weight_of_unavailable,
+                                    values)
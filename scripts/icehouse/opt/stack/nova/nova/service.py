@@ -188,7 +188,8 @@ class Service(service.Service):
 
         endpoints = [
             self.manager,
-            baserpc.BaseRPCAPI(self.manager.service_name, self.backdoor_port)
+            baserpc.BaseRPCAPI(self.manager.service_name, self.backdoor_port,
+                               self.manager)
         ]
         endpoints.extend(self.manager.additional_endpoints)
 
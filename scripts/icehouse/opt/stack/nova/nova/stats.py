@@ -0,0 +1,139 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-process statistics of filter and weigher runs.
+
+The filter and weight handlers time a sample of their runs and record how
+many objects each filter was given and how many it kept, so the filters and
+weighers which take the time or reject the hosts can be found on a running
+service.
+"""
+
+import bisect
+import random
+
+from oslo.config import cfg
+
+from nova.openstack.common import timeutils
+
+stats_opts = [
+    cfg.FloatOpt('filter_stats_sample_rate',
+                 default=0.05,
+                 help='Fraction of the filter and weigher runs which are '
+                      'timed and recorded, from 0 (none) to 1 (all).'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(stats_opts)
+
+# Upper bounds, in milliseconds, of the run time histogram buckets.  The
+# last bucket counts the slower runs.
+TIME_BUCKETS = (1, 5, 10, 50, 100, 500, 1000)
+
+# Upper bounds, in percent of the objects rejected, of the rejection
+# histogram buckets.  The first bucket counts the runs which rejected
+# nothing and the last one the runs which rejected everything.
+REJECT_BUCKETS = (0, 25, 50, 75, 99.999)
+
+
+def _time_bucket(elapsed):
+    return bisect.bisect_left(TIME_BUCKETS, elapsed * 1000)
+
+
+def _reject_bucket(num_in, num_out):
+    if not num_in:
+        return 0
+    return bisect.bisect_left(REJECT_BUCKETS,
+                              100.0 * (num_in - num_out) / num_in)
+
+
+class HandlerStats(object):
+    """Run statistics of the filters and weighers of this process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.since = timeutils.utcnow()
+        self.filters = {}
+        self.weighers = {}
+
+    def _record(self, stats, name, elapsed, num_in):
+        entry = stats.get(name)
+        if entry is None:
+            entry = stats[name] = {
+                'runs': 0,
+                'time': 0.0,
+                'max_time': 0.0,
+                'time_histogram': [0] * (len(TIME_BUCKETS) + 1),
+                'objects_in': 0,
+            }
+        entry['runs'] += 1
+        entry['time'] += elapsed
+        entry['max_time'] = max(entry['max_time'], elapsed)
+        entry['time_histogram'][_time_bucket(elapsed)] += 1
+        entry['objects_in'] += num_in
+        return entry
+
+    def record_filter(self, name, elapsed, num_in, num_out):
+        entry = self._record(self.filters, name, elapsed, num_in)
+        if 'objects_out' not in entry:
+            entry['objects_out'] = 0
+            entry['reject_histogram'] = [0] * (len(REJECT_BUCKETS) + 1)
+        entry['objects_out'] += num_out
+        entry['reject_histogram'][_reject_bucket(num_in, num_out)] += 1
+
+    def record_weigher(self, name, elapsed, num_objs):
+        self._record(self.weighers, name, elapsed, num_objs)
+
+    def to_primitive(self):
+        return {'since': timeutils.strtime(self.since),
+                'sample_rate': CONF.filter_stats_sample_rate,
+                'time_buckets': list(TIME_BUCKETS),
+                'reject_buckets': list(REJECT_BUCKETS),
+                'filters': self.filters,
+                'weighers': self.weighers}
+
+
+_STATS = HandlerStats()
+
+
+def should_sample():
+    """Return True if this filter or weigher run should be recorded."""
+    rate = CONF.filter_stats_sample_rate
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def record_filter(name, elapsed, num_in, num_out):
+    """Record a filter run of elapsed seconds keeping num_out of num_in
+    objects.
+    """
+    _STATS.record_filter(name, elapsed, num_in, num_out)
+
+
+def record_weigher(name, elapsed, num_objs):
+    """Record a weigher run of elapsed seconds weighing num_objs objects."""
+    _STATS.record_weigher(name, elapsed, num_objs)
+
+
+def get_stats(reset=False):
+    """Return the recorded statistics as a dict of primitives, starting a
+    new recording period if reset is True.
+    """
+    stats = _STATS.to_primitive()
+    if reset:
+        _STATS.reset()
+    return stats
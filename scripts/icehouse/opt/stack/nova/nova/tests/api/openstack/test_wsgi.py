@@ -17,6 +17,7 @@ from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova import exception
 from nova.openstack.common import gettextutils
+from nova.openstack.common import jsonutils
 from nova import test
 from nova.tests.api.openstack import fakes
 from nova.tests import utils
@@ -239,6 +240,29 @@ class JSONDictSerializerTest(test.NoDBTestCase):
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_json)
 
+    def test_iterserialize(self):
+        self.stubs.Set(wsgi, '_STREAM_CHUNK_SIZE', 10)
+        input_dict = {'servers': [{'id': i, 'name': u'\xe9%d' % i}
+                                  for i in range(5)],
+                      'servers_links': [],
+                      'tuple': (1, None),
+                      'count': 5}
+        serializer = wsgi.JSONDictSerializer()
+        chunks = list(serializer.iterserialize(input_dict))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(serializer.serialize(input_dict), ''.join(chunks))
+        self.assertEqual('{}', ''.join(serializer.iterserialize({})))
+
+    def test_should_stream(self):
+        self.flags(osapi_json_stream_threshold=2)
+        serializer = wsgi.JSONDictSerializer()
+        self.assertTrue(serializer.should_stream({'servers': [1, 2]}))
+        self.assertFalse(serializer.should_stream({'servers': [1]}))
+        self.assertFalse(serializer.should_stream({1: [1, 2]}))
+        self.assertFalse(serializer.should_stream([1, 2]))
+        self.flags(osapi_json_stream_threshold=0)
+        self.assertFalse(serializer.should_stream({'servers': [1, 2]}))
+
 
 class TextDeserializerTest(test.NoDBTestCase):
     def test_dispatch_default(self):
@@ -1208,6 +1232,21 @@ class ResponseObjectTest(test.NoDBTestCase):
             self.assertEqual(response.status_int, 202)
             self.assertEqual(response.body, mtype)
 
+    def test_serialize_streams_json_lists(self):
+        self.flags(osapi_json_stream_threshold=2)
+        request = wsgi.Request.blank('/tests/123')
+        obj = {'servers': [{'id': 1}, {'id': 2}]}
+
+        response = wsgi.ResponseObject(obj).serialize(
+            request, 'application/json', {'json': wsgi.JSONDictSerializer})
+        self.assertIsNone(response.content_length)
+        self.assertEqual(jsonutils.dumps(obj), response.body)
+
+        obj = {'servers': [{'id': 1}]}
+        response = wsgi.ResponseObject(obj).serialize(
+            request, 'application/json', {'json': wsgi.JSONDictSerializer})
+        self.assertEqual(len(response.body), response.content_length)
+
 
 class ValidBodyTest(test.NoDBTestCase):
 
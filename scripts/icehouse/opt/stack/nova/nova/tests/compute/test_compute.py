@@ -609,6 +609,64 @@ class ComputeVolumeTestCase(BaseTestCase):
         self.compute._poll_bandwidth_usage(ctxt)
         self.mox.UnsetStubs()
 
+    def test_poll_bandwidth_usage_batched(self):
+        ctxt = context.get_admin_context()
+        prev_time = datetime.datetime(2014, 1, 1)
+        start_time = datetime.datetime(2014, 1, 2)
+        self.flags(bandwidth_poll_interval=1)
+        self.compute._last_bw_usage_poll = 0
+        counters = [
+            # Usage in the current period, counter wrapped.
+            {'uuid': 'uuid1', 'mac_address': 'mac1',
+             'bw_in': 5, 'bw_out': 300},
+            # Usage in the previous period only.
+            {'uuid': 'uuid2', 'mac_address': 'mac2',
+             'bw_in': 150, 'bw_out': 250},
+            # No usage yet.
+            {'uuid': 'uuid3', 'mac_address': 'mac3',
+             'bw_in': 10, 'bw_out': 20},
+        ]
+        current = [{'uuid': 'uuid1', 'mac': 'mac1', 'bw_in': 1000,
+                    'bw_out': 2000, 'last_ctr_in': 100, 'last_ctr_out': 200}]
+        previous = [{'uuid': 'uuid2', 'mac': 'mac2', 'bw_in': 1000,
+                     'bw_out': 2000, 'last_ctr_in': 100,
+                     'last_ctr_out': 200}]
+
+        def fake_get_many(context, start_period, keys):
+            return current if start_period == start_time else previous
+
+        with contextlib.nested(
+            mock.patch.object(utils, 'last_completed_audit_period',
+                              return_value=(prev_time, start_time)),
+            mock.patch.object(instance_obj.InstanceList, 'get_by_host',
+                              return_value=[]),
+            mock.patch.object(self.compute.driver, 'get_all_bw_counters',
+                              return_value=counters),
+            mock.patch.object(self.compute.conductor_api,
+                              'bw_usage_get_many',
+                              side_effect=fake_get_many),
+            mock.patch.object(self.compute.conductor_api,
+                              'bw_usage_update_many'),
+        ) as (mock_period, mock_get_by_host, mock_counters, mock_get_many,
+              mock_update_many):
+            self.compute._poll_bandwidth_usage(ctxt)
+
+        self.assertEqual([mock.call(ctxt, start_time,
+                                    [('uuid1', 'mac1'), ('uuid2', 'mac2'),
+                                     ('uuid3', 'mac3')]),
+                          mock.call(ctxt, prev_time,
+                                    [('uuid2', 'mac2'), ('uuid3', 'mac3')])],
+                         mock_get_many.call_args_list)
+        usages = [{'uuid': 'uuid1', 'mac': 'mac1', 'bw_in': 1005,
+                   'bw_out': 2100, 'last_ctr_in': 5, 'last_ctr_out': 300},
+                  {'uuid': 'uuid2', 'mac': 'mac2', 'bw_in': 50,
+                   'bw_out': 50, 'last_ctr_in': 150, 'last_ctr_out': 250},
+                  {'uuid': 'uuid3', 'mac': 'mac3', 'bw_in': 0,
+                   'bw_out': 0, 'last_ctr_in': 10, 'last_ctr_out': 20}]
+        mock_update_many.assert_called_once_with(
+            ctxt, start_time, usages, last_refreshed=mock.ANY,
+            update_cells=True)
+
     @mock.patch.object(instance_obj.InstanceList, 'get_by_host')
     @mock.patch.object(block_device_obj.BlockDeviceMappingList,
                        'get_by_instance_uuid')
@@ -671,6 +729,20 @@ class ComputeVolumeTestCase(BaseTestCase):
         self.compute._poll_volume_usage(ctxt)
         self.mox.UnsetStubs()
 
+    def test_update_volume_usage_cache(self):
+        instance = {'uuid': 'fake-uuid'}
+        vol_usages = [{'volume': vol_id, 'rd_req': 1, 'rd_bytes': 10,
+                       'wr_req': 2, 'wr_bytes': 20, 'instance': instance}
+                      for vol_id in (1, 2)]
+        with mock.patch.object(self.compute.conductor_api,
+                               'vol_usage_update_many') as update_many:
+            self.compute._update_volume_usage_cache(self.context,
+                                                    vol_usages)
+            self.compute._update_volume_usage_cache(self.context, [])
+        update_many.assert_called_once_with(self.context, [
+            {'vol_id': vol_id, 'rd_req': 1, 'rd_bytes': 10, 'wr_req': 2,
+             'wr_bytes': 20, 'instance': instance} for vol_id in (1, 2)])
+
     def test_detach_volume_usage(self):
         # Test that detach volume update the volume usage cache table correctly
         instance = self._create_fake_instance()
@@ -3637,6 +3709,23 @@ class ComputeTestCase(BaseTestCase):
         self.compute._delete_instance(self.context, instance, [],
                                       self.none_quotas)
 
+    def test_delete_instance_frees_resources(self):
+        self.flags(reserved_host_disk_mb=0, reserved_host_memory_mb=0)
+        self.rt.update_available_resource(self.context.elevated())
+        filter_properties = {'limits': {'memory_mb': 4096, 'disk_gb': 1000}}
+        params = {"memory_mb": 1024, "root_gb": 128, "ephemeral_gb": 128}
+        instance = self._create_fake_instance_obj(params)
+        self.compute.run_instance(self.context, instance, {},
+                filter_properties, [], None, None, True, None, False)
+        self.assertEqual(1024, self.rt.compute_node['memory_mb_used'])
+
+        self.compute._delete_instance(self.context, instance, [],
+                                      self.none_quotas)
+
+        self.assertEqual(0, self.rt.compute_node['memory_mb_used'])
+        self.assertEqual(0, self.rt.compute_node['local_gb_used'])
+        self.assertNotIn(instance.uuid, self.rt.tracked_instances)
+
     def test_delete_instance_keeps_net_on_power_off_fail(self):
         self.mox.StubOutWithMock(self.compute.driver, 'destroy')
         self.mox.StubOutWithMock(self.compute, '_deallocate_network')
@@ -5939,6 +6028,41 @@ class ComputeTestCase(BaseTestCase):
         # Stays the same because we didn't find anything to process
         self.assertEqual(3, call_info['get_nw_info'])
 
+    def test_heal_instance_info_cache_bulk(self):
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_bulk=True)
+        ctxt = context.get_admin_context()
+        instances = [fake_instance.fake_db_instance(uuid='fake-uuid-%s' % x,
+                                                    host=CONF.host)
+                     for x in xrange(4)]
+        instances[0]['vm_state'] = vm_states.BUILDING
+        instances[1]['task_state'] = task_states.DELETING
+
+        def fake_instance_get_all_by_host(context, host, columns_to_join,
+                                          use_subordinate=False):
+            self.assertEqual(['system_metadata', 'info_cache'],
+                             columns_to_join)
+            self.assertTrue(use_subordinate)
+            return instances
+
+        healed = []
+
+        def fake_heal_instance_info_caches(context, instances):
+            healed.extend(instance['uuid'] for instance in instances)
+            return healed[:1]
+
+        self.stubs.Set(db, 'instance_get_all_by_host',
+                       fake_instance_get_all_by_host)
+        self.stubs.Set(self.compute.network_api, 'heal_instance_info_caches',
+                       fake_heal_instance_info_caches)
+        self.compute._heal_instance_info_cache(ctxt)
+        self.assertEqual(['fake-uuid-2', 'fake-uuid-3'], healed)
+
+        # Errors from the network API are logged and ignored.
+        self.stubs.Set(self.compute.network_api, 'heal_instance_info_caches',
+                       mock.Mock(side_effect=test.TestingException))
+        self.compute._heal_instance_info_cache(ctxt)
+
     def test_poll_rescued_instances(self):
         timed_out_time = timeutils.utcnow() - datetime.timedelta(minutes=5)
         not_timed_out_time = timeutils.utcnow()
@@ -6116,7 +6240,7 @@ class ComputeTestCase(BaseTestCase):
         new_instance.update(filters)
         instances.append(fake_instance.fake_db_instance(**new_instance))
 
-        # need something to return from conductor_api.instance_update
+        # need something to return from conductor_api.instance_update_many
         # that is defined outside the for loop and can be used in the mock
         # context
         fake_instance_ref = {'host': CONF.host, 'node': 'fake'}
@@ -6126,13 +6250,15 @@ class ComputeTestCase(BaseTestCase):
             mock.patch.object(self.compute.db.sqlalchemy.api,
                               'instance_get_all_by_filters',
                               return_value=instances),
-            mock.patch.object(self.compute.conductor_api, 'instance_update',
-                              return_value=fake_instance_ref),
+            mock.patch.object(self.compute.conductor_api,
+                              'instance_update_many',
+                              return_value=[fake_instance_ref] *
+                                           len(old_instances)),
             mock.patch.object(self.compute.driver, 'node_is_available',
                               return_value=False)
         ) as (
             instance_get_all_by_filters,
-            conductor_instance_update,
+            conductor_instance_update_many,
             node_is_available
         ):
             # run the code
@@ -6146,16 +6272,13 @@ class ComputeTestCase(BaseTestCase):
                                             columns_to_join=[],
                                             use_subordinate=True,
                                             limit=None)
-            self.assertThat(conductor_instance_update.mock_calls,
-                            testtools_matchers.HasLength(len(old_instances)))
+            conductor_instance_update_many.assert_called_once_with(
+                ctxt, dict((inst['uuid'], {'vm_state': vm_states.ERROR})
+                           for inst in old_instances))
             self.assertThat(node_is_available.mock_calls,
                             testtools_matchers.HasLength(len(old_instances)))
-            for inst in old_instances:
-                conductor_instance_update.assert_has_calls([
-                    mock.call(ctxt, inst['uuid'],
-                              vm_state=vm_states.ERROR)])
-                node_is_available.assert_has_calls([
-                    mock.call(fake_instance_ref['node'])])
+            node_is_available.assert_has_calls([
+                mock.call(fake_instance_ref['node'])] * len(old_instances))
 
     def test_get_resource_tracker_fail(self):
         self.assertRaises(exception.NovaException,
@@ -6527,9 +6650,13 @@ class ComputeTestCase(BaseTestCase):
         self._create_fake_instance({'host': self.compute.host})
         self._create_fake_instance({'host': self.compute.host})
         self._create_fake_instance({'host': self.compute.host})
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'list_instance_power_states')
         self.mox.StubOutWithMock(self.compute.driver, 'get_info')
         self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
 
+        self.compute.driver.list_instance_power_states().AndRaise(
+            NotImplementedError())
         # Check to make sure task continues on error.
         self.compute.driver.get_info(mox.IgnoreArg()).AndRaise(
             exception.InstanceNotFound(instance_id='fake-uuid'))
@@ -6550,6 +6677,56 @@ class ComputeTestCase(BaseTestCase):
         self.mox.ReplayAll()
         self.compute._sync_power_states(ctxt)
 
+    def test_sync_power_states_bulk(self):
+        ctxt = self.context.elevated()
+        in_sync = self._create_fake_instance(
+            {'host': self.compute.host, 'power_state': power_state.RUNNING})
+        shutdown = self._create_fake_instance(
+            {'host': self.compute.host, 'power_state': power_state.RUNNING})
+        missing = self._create_fake_instance(
+            {'host': self.compute.host, 'power_state': power_state.RUNNING})
+        stopped = self._create_fake_instance(
+            {'host': self.compute.host, 'power_state': power_state.SHUTDOWN,
+             'vm_state': vm_states.STOPPED})
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'list_instance_power_states')
+        self.mox.StubOutWithMock(self.compute.driver, 'get_info')
+
+        self.compute.driver.list_instance_power_states().AndReturn({
+            in_sync['uuid']: power_state.RUNNING,
+            shutdown['uuid']: power_state.SHUTDOWN,
+            stopped['uuid']: power_state.SHUTDOWN})
+        # Only the instances whose states disagree are synced.
+        synced = []
+
+        def fake_sync(ctxt, instance, vm_power_state, use_subordinate=False):
+            synced.append((instance.uuid, vm_power_state))
+
+        self.stubs.Set(self.compute, '_sync_instance_power_state', fake_sync)
+        self.mox.ReplayAll()
+        self.compute._sync_power_states(ctxt)
+        self.assertEqual(sorted([(shutdown['uuid'], power_state.SHUTDOWN),
+                                 (missing['uuid'], power_state.NOSTATE)]),
+                         sorted(synced))
+
+    def test_power_state_in_sync(self):
+        instance = instance_obj.Instance(vm_state=vm_states.ACTIVE,
+                                         power_state=power_state.RUNNING)
+        self.assertTrue(compute_manager._power_state_in_sync(
+            instance, power_state.RUNNING))
+        self.assertFalse(compute_manager._power_state_in_sync(
+            instance, power_state.SHUTDOWN))
+        instance.power_state = power_state.SHUTDOWN
+        # The stop API has to be called.
+        self.assertFalse(compute_manager._power_state_in_sync(
+            instance, power_state.SHUTDOWN))
+        instance.vm_state = vm_states.STOPPED
+        self.assertTrue(compute_manager._power_state_in_sync(
+            instance, power_state.SHUTDOWN))
+        instance.vm_state = vm_states.ERROR
+        self.assertTrue(compute_manager._power_state_in_sync(
+            instance, power_state.SHUTDOWN))
+
     def _test_lifecycle_event(self, lifecycle_event, power_state):
         instance = self._create_fake_instance()
         uuid = instance['uuid']
@@ -7569,6 +7746,23 @@ class ComputeAPITestCase(BaseTestCase):
         db.instance_destroy(c, instance2['uuid'])
         db.instance_destroy(c, instance3['uuid'])
 
+    def test_get_all_brief(self):
+        c = context.get_admin_context()
+        instance = self._create_fake_instance({'metadata': {'foo': 'bar'}})
+
+        instances = self.compute_api.get_all(c, want_objects=True,
+                                             brief=True)
+        self.assertEqual([instance['uuid']],
+                         [inst.uuid for inst in instances])
+        for attr in ('metadata', 'system_metadata', 'info_cache',
+                     'security_groups'):
+            self.assertFalse(instances[0].obj_attr_is_set(attr))
+
+        instances = self.compute_api.get_all(c, want_objects=True)
+        self.assertEqual({'foo': 'bar'}, instances[0].metadata)
+
+        db.instance_destroy(c, instance['uuid'])
+
     @mock.patch('nova.db.network_get')
     @mock.patch('nova.db.fixed_ips_by_virtual_interface')
     def test_get_all_by_multiple_options_at_once(self, fixed_get, network_get):
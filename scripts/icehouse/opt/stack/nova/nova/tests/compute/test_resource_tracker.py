@@ -774,6 +774,72 @@ class InstanceClaimTestCase(BaseTrackerTestCase):
         self.assertEqual(0, self.tracker.compute_node['local_gb_used'])
 
 
+class AuditIntervalTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        super(AuditIntervalTestCase, self).setUp()
+        self.flags(resource_tracker_audit_interval=600)
+        self.updated = False
+
+    def test_update_only_changed_values(self):
+        self.flags(resource_tracker_audit_interval=0)
+        with mock.patch.object(db, 'compute_node_update',
+                               side_effect=self._fake_compute_node_update
+                               ) as update:
+            self.tracker.driver.memory_mb_used = 1
+            self.tracker.update_available_resource(self.context)
+        # The usage is audited from the instances rather than taken from
+        # the hypervisor, so it has not changed.
+        values = update.call_args[0][2]
+        self.assertNotIn('memory_mb_used', values)
+        self.assertNotIn('cpu_info', values)
+        self.assertTrue(self.updated)
+
+    def test_no_audit_before_interval(self):
+        self.mox.StubOutWithMock(self.conductor.db,
+                                 'instance_get_all_by_host_and_node')
+        self.mox.ReplayAll()
+        self.tracker.update_available_resource(self.context)
+        self.assertFalse(self.updated)
+
+    def test_claim_kept_until_audit(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=2,
+                                       ephemeral_gb=0)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        self.updated = False
+        # The instance is not in the database yet.
+        self._instances.clear()
+
+        self.tracker.driver.local_gb = 7
+        self.tracker.update_available_resource(self.context)
+
+        self.assertTrue(self.updated)
+        self._assert(3 + FAKE_VIRT_MEMORY_OVERHEAD, 'memory_mb_used')
+        self._assert(2, 'local_gb_used')
+        self._assert(5, 'free_disk_gb')
+        self._assert(1, 'running_vms')
+
+        self.tracker.last_audit -= 600
+        self.tracker.update_available_resource(self.context)
+
+        self._assert(0, 'memory_mb_used')
+        self._assert(0, 'local_gb_used')
+        self._assert(0, 'running_vms')
+
+    def test_abort_claim_between_audits(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=2,
+                                       ephemeral_gb=0)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        self.tracker.abort_instance_claim(instance)
+        self.updated = False
+
+        self.tracker.update_available_resource(self.context)
+
+        self.assertFalse(self.updated)
+        self._assert(0, 'memory_mb_used')
+        self._assert(0, 'running_vms')
+
+
 class ResizeClaimTestCase(BaseTrackerTestCase):
 
     def setUp(self):
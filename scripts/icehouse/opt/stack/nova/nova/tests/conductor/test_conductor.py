@@ -42,6 +42,7 @@ from nova.objects import migration as migration_obj
 from nova.objects import quotas as quotas_obj
 from nova.openstack.common import jsonutils
 from nova.openstack.common import timeutils
+from nova.openstack.common import uuidutils
 from nova import quota
 from nova import rpc
 from nova.scheduler import utils as scheduler_utils
@@ -121,6 +122,20 @@ class _BaseTestCase(object):
         self.assertEqual(instance['vm_state'], vm_states.STOPPED)
         self.assertEqual(new_inst['vm_state'], instance['vm_state'])
 
+    def test_instance_update_many(self):
+        instances = [self._create_fake_instance() for i in xrange(2)]
+        updates = dict((instance['uuid'], {'vm_state': vm_states.ERROR})
+                       for instance in instances)
+        # Deleted instances are skipped.
+        updates[uuidutils.generate_uuid()] = {'vm_state': vm_states.ERROR}
+        result = self.conductor.instance_update_many(self.context, updates)
+        self.assertEqual(sorted(instance['uuid'] for instance in instances),
+                         sorted(instance['uuid'] for instance in result))
+        for instance in instances:
+            instance = db.instance_get_by_uuid(self.context,
+                                               instance['uuid'])
+            self.assertEqual(vm_states.ERROR, instance['vm_state'])
+
     def test_action_event_start(self):
         self.mox.StubOutWithMock(db, 'action_event_start')
         db.action_event_start(self.context, mox.IgnoreArg())
@@ -213,6 +228,28 @@ class _BaseTestCase(object):
         result = self.conductor.bw_usage_update(*update_args)
         self.assertEqual(result, 'foo')
 
+    def test_bw_usage_get_many(self):
+        self.mox.StubOutWithMock(db, 'bw_usage_get_by_uuids')
+        usages = [{'uuid': 'uuid1', 'mac': 'mac1'},
+                  {'uuid': 'uuid1', 'mac': 'mac2'},
+                  {'uuid': 'uuid2', 'mac': 'mac3'}]
+        db.bw_usage_get_by_uuids(self.context,
+                                 mox.SameElementsAs(['uuid1', 'uuid2']),
+                                 0).AndReturn(usages)
+        self.mox.ReplayAll()
+        result = self.conductor.bw_usage_get_many(
+            self.context, 0, [('uuid1', 'mac1'), ('uuid2', 'mac3')])
+        self.assertEqual([usages[0], usages[2]], result)
+
+    def test_bw_usage_update_many(self):
+        self.mox.StubOutWithMock(db, 'bw_usage_update_many')
+        usages = [{'uuid': 'uuid', 'mac': 'mac', 'bw_in': 10, 'bw_out': 20,
+                   'last_ctr_in': 5, 'last_ctr_out': 10}]
+        db.bw_usage_update_many(self.context, 0, usages, 20,
+                                update_cells=True)
+        self.mox.ReplayAll()
+        self.conductor.bw_usage_update_many(self.context, 0, usages, 20)
+
     def test_provider_fw_rule_get_all(self):
         fake_rules = ['a', 'b', 'c']
         self.mox.StubOutWithMock(db, 'provider_fw_rule_get_all')
@@ -308,6 +345,37 @@ class _BaseTestCase(object):
         self.assertEqual('INFO', msg.priority)
         self.assertEqual('fake-info', msg.payload)
 
+    def test_vol_usage_update_many(self):
+        self.mox.StubOutWithMock(db, 'vol_usage_update_many')
+        self.mox.StubOutWithMock(compute_utils, 'usage_volume_info')
+
+        fake_inst = {'uuid': 'fake-uuid',
+                     'project_id': 'fake-project',
+                     'user_id': 'fake-user',
+                     'availability_zone': 'fake-az',
+                     }
+
+        db.vol_usage_update_many(self.context, [
+            {'id': vol_id, 'rd_req': 22, 'rd_bytes': 33, 'wr_req': 44,
+             'wr_bytes': 55, 'instance_id': fake_inst['uuid'],
+             'project_id': fake_inst['project_id'],
+             'user_id': fake_inst['user_id'],
+             'availability_zone': fake_inst['availability_zone']}
+            for vol_id in ('fake-vol1', 'fake-vol2')],
+            False).AndReturn(['fake-usage1', 'fake-usage2'])
+        compute_utils.usage_volume_info('fake-usage1').AndReturn('fake-info1')
+        compute_utils.usage_volume_info('fake-usage2').AndReturn('fake-info2')
+
+        self.mox.ReplayAll()
+
+        self.conductor.vol_usage_update_many(self.context, [
+            {'vol_id': vol_id, 'rd_req': 22, 'rd_bytes': 33, 'wr_req': 44,
+             'wr_bytes': 55, 'instance': fake_inst}
+            for vol_id in ('fake-vol1', 'fake-vol2')])
+
+        self.assertEqual(['fake-info1', 'fake-info2'],
+                         [msg.payload for msg in fake_notifier.NOTIFICATIONS])
+
     def test_compute_node_create(self):
         self.mox.StubOutWithMock(db, 'compute_node_create')
         db.compute_node_create(self.context, 'fake-values').AndReturn(
@@ -986,6 +1054,42 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor.security_groups_trigger_handler(self.context,
                                                        'event', ['arg'])
 
+    def test_bulk_updates_version_cap(self):
+        # A conductor of 2.0 is sent one call per item.
+        self.flags(conductor='2.0', group='upgrade_levels')
+        conductor = conductor_rpcapi.ConductorAPI()
+        bw_usage = {'uuid': 'uuid', 'mac': 'mac', 'bw_in': 10, 'bw_out': 20,
+                    'last_ctr_in': 5, 'last_ctr_out': 10}
+        vol_usage = {'vol_id': 'fake-vol', 'rd_req': 22, 'rd_bytes': 33,
+                     'wr_req': 44, 'wr_bytes': 55, 'instance': 'fake-inst'}
+        with contextlib.nested(
+            mock.patch.object(conductor, 'instance_update',
+                              side_effect=['fake-inst',
+                                           exc.InstanceNotFound(
+                                               instance_id='fake-uuid2')]),
+            mock.patch.object(conductor, 'bw_usage_update',
+                              side_effect=['fake-usage', None, None]),
+            mock.patch.object(conductor, 'vol_usage_update'),
+        ) as (instance_update, bw_usage_update, vol_usage_update):
+            self.assertEqual(['fake-inst'], conductor.instance_update_many(
+                self.context, {'fake-uuid1': {'vm_state': 'error'},
+                               'fake-uuid2': {'vm_state': 'error'}}))
+            self.assertEqual(['fake-usage'], conductor.bw_usage_get_many(
+                self.context, 0, [('uuid1', 'mac1'), ('uuid2', 'mac2')]))
+            conductor.bw_usage_update_many(self.context, 0, [bw_usage], 20)
+            conductor.vol_usage_update_many(self.context, [vol_usage])
+
+        self.assertEqual(2, instance_update.call_count)
+        self.assertEqual([mock.call(self.context, 'uuid1', 'mac1', 0),
+                          mock.call(self.context, 'uuid2', 'mac2', 0),
+                          mock.call(self.context, 'uuid', 'mac', 0, 10, 20,
+                                    5, 10, last_refreshed=20,
+                                    update_cells=True)],
+                         bw_usage_update.call_args_list)
+        vol_usage_update.assert_called_once_with(
+            self.context, 'fake-vol', 22, 33, 44, 55, 'fake-inst',
+            update_totals=False)
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
@@ -1783,12 +1887,15 @@ class ConductorV2ManagerProxyTestCase(test.NoDBTestCase):
         methods = [
             # (method, number_of_args)
             ('instance_update', 3),
+            ('instance_update_many', 2),
             ('instance_get_by_uuid', 2),
             ('migration_get_in_progress_by_host_and_node', 2),
             ('aggregate_host_add', 2),
             ('aggregate_host_delete', 2),
             ('aggregate_metadata_get_by_host', 2),
             ('bw_usage_update', 9),
+            ('bw_usage_get_many', 2),
+            ('bw_usage_update_many', 4),
             ('provider_fw_rule_get_all', 0),
             ('agent_build_get_by_triple', 3),
             ('block_device_mapping_update_or_create', 2),
@@ -1799,6 +1906,7 @@ class ConductorV2ManagerProxyTestCase(test.NoDBTestCase):
             ('instance_info_cache_delete', 1),
             ('vol_get_usage_by_time', 1),
             ('vol_usage_update', 8),
+            ('vol_usage_update_many', 2),
             ('service_get_all_by', 3),
             ('instance_get_all_by_host', 3),
             ('instance_fault_create', 1),
@@ -1021,6 +1021,201 @@ class ReservationTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                             self.ctxt, 'project1', 'user1'))
 
 
+class QuotaReserveCompareAndSwapTestCase(test.TestCase):
+
+    """Tests for db.api.quota_reserve_compare_and_swap."""
+
+    def setUp(self):
+        super(QuotaReserveCompareAndSwapTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.resources = dict((name, quota.QUOTAS._resources[name])
+                              for name in ('instances', 'cores'))
+        self.quotas = {'instances': 10, 'cores': 20}
+        self.project_quotas = {'instances': 20, 'cores': 40}
+        self.expire = timeutils.utcnow() + datetime.timedelta(days=1)
+
+    def _reserve(self, deltas, user_id='user1', quotas=None):
+        quotas = quotas or self.quotas
+        return db.quota_reserve_compare_and_swap(
+                self.ctxt, self.resources, self.project_quotas, quotas,
+                deltas, self.expire, None, None, 'project1', user_id)
+
+    def _create_usages(self, user_id='user1'):
+        self._reserve({'instances': 0, 'cores': 0}, user_id=user_id)
+
+    def _usages(self, user_id='user1'):
+        usages = db.quota_usage_get_all_by_project_and_user(
+                self.ctxt, 'project1', user_id)
+        return dict((res, (usages[res]['in_use'], usages[res]['reserved']))
+                    for res in self.resources)
+
+    def _project_usage_rows(self):
+        return sqlalchemy_api.model_query(self.ctxt,
+                                          models.ProjectQuotaUsage,
+                                          read_deleted="no").\
+                   filter_by(project_id='project1').\
+                   all()
+
+    def _project_usages(self):
+        return dict((row.resource, (row.in_use, row.reserved))
+                    for row in self._project_usage_rows()
+                    if row.resource in self.resources)
+
+    def test_reserve(self):
+        self._create_usages()
+        self.mox.StubOutWithMock(sqlalchemy_api, 'quota_reserve')
+        self.mox.ReplayAll()
+
+        self._reserve({'instances': 1, 'cores': 2})
+        reservations = self._reserve({'instances': 2, 'cores': 4})
+
+        self.assertEqual(2, len(reservations))
+        self.assertEqual({'instances': (0, 3), 'cores': (0, 6)},
+                         self._usages())
+        self.assertEqual({'instances': (0, 3), 'cores': (0, 6)},
+                         self._project_usages())
+        db.reservation_commit(self.ctxt, reservations, 'project1', 'user1')
+        self.assertEqual({'instances': (2, 1), 'cores': (4, 2)},
+                         self._usages())
+        self.assertEqual({'instances': (2, 1), 'cores': (4, 2)},
+                         self._project_usages())
+
+    def test_reserve_creates_usages(self):
+        reservations = self._reserve({'instances': 1, 'cores': 2})
+
+        self.assertEqual(2, len(reservations))
+        self.assertEqual({'instances': (0, 1), 'cores': (0, 2)},
+                         self._usages())
+        self.assertEqual({'instances': (0, 1), 'cores': (0, 2)},
+                         self._project_usages())
+
+    def test_reserve_over_quota(self):
+        self._create_usages()
+        self._reserve({'instances': 9, 'cores': 2})
+
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                {'instances': 1, 'cores': 19})
+        self.assertEqual(['cores'], exc.kwargs['overs'])
+        self.assertEqual({'instances': (0, 9), 'cores': (0, 2)},
+                         self._usages())
+        self.assertEqual({'instances': (0, 9), 'cores': (0, 2)},
+                         self._project_usages())
+
+    def test_reserve_over_project_quota(self):
+        self._create_usages()
+        self._create_usages(user_id='user2')
+        self.project_quotas = {'instances': 10, 'cores': 20}
+        self.mox.StubOutWithMock(sqlalchemy_api, 'quota_reserve')
+        self.mox.ReplayAll()
+
+        self._reserve({'instances': 6, 'cores': 6}, user_id='user2')
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                {'instances': 5, 'cores': 5})
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+        self._reserve({'instances': 4, 'cores': 4})
+        self.assertEqual({'instances': (0, 4), 'cores': (0, 4)},
+                         self._usages())
+        self.assertEqual({'instances': (0, 6), 'cores': (0, 6)},
+                         self._usages(user_id='user2'))
+        self.assertEqual({'instances': (0, 10), 'cores': (0, 10)},
+                         self._project_usages())
+
+    def test_reserve_release(self):
+        self._create_usages()
+        self._reserve({'instances': 2, 'cores': 2})
+        self.mox.StubOutWithMock(sqlalchemy_api, 'quota_reserve')
+        self.mox.ReplayAll()
+
+        # Releasing usage reserves nothing.
+        reservations = self._reserve({'instances': -1, 'cores': -1})
+        self.assertEqual({'instances': (0, 2), 'cores': (0, 2)},
+                         self._usages())
+        db.reservation_commit(self.ctxt, reservations, 'project1', 'user1')
+        self.assertEqual({'instances': (-1, 2), 'cores': (-1, 2)},
+                         self._project_usages())
+
+    def test_reserve_unlimited(self):
+        self._create_usages()
+        self._reserve({'instances': 1, 'cores': 1})
+
+        self._reserve({'instances': 100, 'cores': 1},
+                      quotas={'instances': -1, 'cores': 20})
+        self.assertEqual({'instances': (0, 101), 'cores': (0, 2)},
+                         self._usages())
+        self.assertEqual({'instances': (0, 101), 'cores': (0, 2)},
+                         self._project_usages())
+
+    def test_reserve_rolls_back_expired_reservations(self):
+        self._create_usages()
+        self._reserve({'instances': 8, 'cores': 8})
+        self.expire = timeutils.utcnow() - datetime.timedelta(seconds=1)
+        expired = self._reserve({'instances': 2, 'cores': 2})
+        self.expire = timeutils.utcnow() + datetime.timedelta(days=1)
+
+        self._reserve({'instances': 2, 'cores': 2})
+
+        # Only the usage at its quota has its expired reservation rolled
+        # back.
+        self.assertEqual({'instances': (0, 10), 'cores': (0, 12)},
+                         self._usages())
+        self.assertEqual({'instances': (0, 10), 'cores': (0, 12)},
+                         self._project_usages())
+        self.assertRaises(exception.ReservationNotFound,
+                          _reservation_get, self.ctxt, expired[0])
+
+    def test_reserve_rolls_back_expired_reservations_of_project(self):
+        self._create_usages()
+        self._create_usages(user_id='user2')
+        self.project_quotas = {'instances': 10, 'cores': 20}
+        self.expire = timeutils.utcnow() - datetime.timedelta(seconds=1)
+        self._reserve({'instances': 6, 'cores': 6}, user_id='user2')
+        self.expire = timeutils.utcnow() + datetime.timedelta(days=1)
+
+        self._reserve({'instances': 6, 'cores': 6})
+
+        self.assertEqual({'instances': (0, 0), 'cores': (0, 6)},
+                         self._usages(user_id='user2'))
+        self.assertEqual({'instances': (0, 6), 'cores': (0, 12)},
+                         self._project_usages())
+
+    def test_project_usages_follow_rollback_and_expire(self):
+        self._create_usages()
+        rolled_back = self._reserve({'instances': 1, 'cores': 2})
+        self.expire = timeutils.utcnow() - datetime.timedelta(seconds=1)
+        self._reserve({'instances': 2, 'cores': 4})
+
+        db.reservation_rollback(self.ctxt, rolled_back, 'project1', 'user1')
+        self.assertEqual({'instances': (0, 2), 'cores': (0, 4)},
+                         self._project_usages())
+        db.reservation_expire(self.ctxt)
+        self.assertEqual({'instances': (0, 0), 'cores': (0, 0)},
+                         self._project_usages())
+
+    def test_reserve_rebuilds_project_usages(self):
+        self._create_usages()
+        self._reserve({'instances': 1, 'cores': 2})
+        db.quota_usage_update(self.ctxt, 'project1', 'user1', 'instances',
+                              in_use=3)
+        self.assertEqual({}, self._project_usages())
+
+        self._reserve({'instances': 1, 'cores': 2})
+        self.assertEqual({'instances': (3, 2), 'cores': (0, 4)},
+                         self._project_usages())
+
+    def test_reserve_drops_duplicate_project_usages(self):
+        self._create_usages()
+        duplicate = models.ProjectQuotaUsage()
+        duplicate.update({'project_id': 'project1', 'resource': 'instances',
+                          'in_use': 0, 'reserved': 0})
+        duplicate.save()
+
+        self._reserve({'instances': 1, 'cores': 2})
+        self.assertEqual(1, len([row for row in self._project_usage_rows()
+                                 if row.resource == 'instances']))
+        self.assertEqual({'instances': (0, 1), 'cores': (0, 2)},
+                         self._project_usages())
+
+
 class SecurityGroupRuleTestCase(test.TestCase, ModelsObjectComparatorMixin):
     def setUp(self):
         super(SecurityGroupRuleTestCase, self).setUp()
@@ -1548,6 +1743,17 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         for row in meta:
             self.assertIn(row['instance_uuid'], uuids)
 
+    def test_instance_metadata_get_multi_batched(self):
+        self.stubs.Set(sqlalchemy_api, '_IN_BATCH_SIZE', 2)
+        uuids = [self.create_instance_with_args()['uuid'] for i in range(3)]
+        meta = sqlalchemy_api._instance_metadata_get_multi(self.ctxt, uuids)
+        self.assertEqual(sorted(uuids * len(self.sample_data['metadata'])),
+                         sorted(row['instance_uuid'] for row in meta))
+        self.assertEqual(self.sample_data['metadata'],
+                         utils.metadata_to_dict(
+                             [row for row in meta
+                              if row['instance_uuid'] == uuids[0]]))
+
     def test_instance_metadata_get_multi_no_uuids(self):
         self.mox.StubOutWithMock(query.Query, 'filter')
         self.mox.ReplayAll()
@@ -1573,6 +1779,40 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                                 {'display_name': 't.*st.'})
         self._assertEqualListsOfInstances(result, [i1, i2])
 
+    def test_instance_get_all_by_filters_regex_prefix(self):
+        i1 = self.create_instance_with_args(display_name='test1')
+        i2 = self.create_instance_with_args(display_name='test12')
+        self.create_instance_with_args(display_name='Test1')
+        self.create_instance_with_args(display_name='atest1')
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^test1'})
+        self._assertEqualListsOfInstances([i1, i2], result)
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^test1$'})
+        self._assertEqualListsOfInstances([i1], result)
+        result = db.instance_get_all_by_filters(self.ctxt,
+                                                {'display_name': '^test\\d$'})
+        self._assertEqualListsOfInstances([i1], result)
+
+    def test_instance_get_all_by_filters_paginate_sort_key(self):
+        for name in ('b', 'a', 'b', 'c', 'a', 'b'):
+            self.create_instance_with_args(display_name=name)
+        for sort_dir in ('asc', 'desc'):
+            expected = db.instance_get_all_by_filters(
+                self.ctxt, {}, sort_key='display_name', sort_dir=sort_dir)
+            result = []
+            marker = None
+            while True:
+                page = db.instance_get_all_by_filters(
+                    self.ctxt, {}, sort_key='display_name',
+                    sort_dir=sort_dir, limit=2, marker=marker)
+                if not page:
+                    break
+                result.extend(page)
+                marker = page[-1]['uuid']
+            self.assertEqual([instance['uuid'] for instance in expected],
+                             [instance['uuid'] for instance in result])
+
     def test_instance_get_all_by_filters_changes_since(self):
         i1 = self.create_instance_with_args(updated_at=
                                             '2013-12-05T15:03:25.000000')
@@ -4218,6 +4458,31 @@ class VolumeUsageDBApiTestCase(test.TestCase):
         for usage in vol_usages:
             _compare(usage, expected_vol_usages[usage.volume_id])
 
+    def test_vol_usage_update_many(self):
+        ctxt = context.get_admin_context()
+        db.vol_usage_update(ctxt, u'1', rd_req=10, rd_bytes=20,
+                            wr_req=30, wr_bytes=40,
+                            instance_id='fake-instance-uuid1',
+                            project_id='fake-project-uuid1',
+                            user_id='fake-user-uuid1',
+                            availability_zone='fake-az')
+
+        usages = [{'id': vol_id, 'rd_req': 100, 'rd_bytes': 200,
+                   'wr_req': 300, 'wr_bytes': 400,
+                   'instance_id': 'fake-instance-uuid1',
+                   'project_id': 'fake-project-uuid1',
+                   'user_id': 'fake-user-uuid1',
+                   'availability_zone': 'fake-az'}
+                  for vol_id in (u'1', u'2')]
+        vol_usages = db.vol_usage_update_many(ctxt, usages)
+
+        self.assertEqual([u'1', u'2'],
+                         [usage['volume_id'] for usage in vol_usages])
+        for usage in vol_usages:
+            self.assertEqual(100, usage['curr_reads'])
+            self.assertEqual(400, usage['curr_write_bytes'])
+            self.assertEqual(0, usage['tot_reads'])
+
     def test_vol_usage_update_totals_update(self):
         ctxt = context.get_admin_context()
         now = datetime.datetime(1, 1, 1, 1, 0, 0)
@@ -5612,6 +5877,34 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualListsOfObjects(expected, result,
                                         ignored_keys=['stats'])
 
+    def test_compute_node_get_all_changed_since(self):
+        before = self.item['created_at'] - datetime.timedelta(seconds=1)
+        after = self.item['created_at'] + datetime.timedelta(seconds=1)
+
+        nodes, services = db.compute_node_get_all_changed_since(self.ctxt,
+                                                                before)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(self.item['id'], nodes[0]['id'])
+        self.assertEqual(self.service['id'], nodes[0]['service']['id'])
+        self.assertEqual([self.service['id']], [s['id'] for s in services])
+
+        nodes, services = db.compute_node_get_all_changed_since(self.ctxt,
+                                                                after)
+        self.assertEqual([], nodes)
+        self.assertEqual(1, len(services))
+
+    def test_compute_node_get_all_changed_since_deleted(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        since = timeutils.utcnow()
+        timeutils.advance_time_seconds(10)
+        db.compute_node_delete(self.ctxt, self.item['id'])
+
+        nodes, services = db.compute_node_get_all_changed_since(self.ctxt,
+                                                                since)
+        self.assertEqual(1, len(nodes))
+        self.assertNotEqual(0, nodes[0]['deleted'])
+
     def test_compute_node_get(self):
         compute_node_id = self.item['id']
         node = db.compute_node_get(self.ctxt, compute_node_id)
@@ -6212,6 +6505,34 @@ class BwUsageTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualObjects(bw_usage, expected_bw_usage,
                                  ignored_keys=self._ignored_keys)
 
+    def test_bw_usage_update_many(self):
+        now = timeutils.utcnow()
+        start_period = now - datetime.timedelta(seconds=10)
+        db.bw_usage_update(self.ctxt, 'fake_uuid1', 'fake_mac1',
+                           start_period, 1, 2, 3, 4)
+
+        usages = [{'uuid': 'fake_uuid1', 'mac': 'fake_mac1',
+                   'bw_in': 100, 'bw_out': 200,
+                   'last_ctr_in': 12345, 'last_ctr_out': 67890},
+                  {'uuid': 'fake_uuid2', 'mac': 'fake_mac2',
+                   'bw_in': 300, 'bw_out': 400,
+                   'last_ctr_in': 22345, 'last_ctr_out': 77890}]
+        db.bw_usage_update_many(self.ctxt, start_period, usages,
+                                update_cells=False)
+
+        bw_usages = db.bw_usage_get_by_uuids(self.ctxt,
+                ['fake_uuid1', 'fake_uuid2'], start_period)
+        self.assertEqual(2, len(bw_usages))
+        for usage in usages:
+            expected = dict(usage, start_period=start_period,
+                            last_refreshed=now)
+            self._assertEqualObjects(expected,
+                                     db.bw_usage_get(self.ctxt,
+                                                     usage['uuid'],
+                                                     start_period,
+                                                     usage['mac']),
+                                     ignored_keys=self._ignored_keys)
+
 
 class Ec2TestCase(test.TestCase):
 
@@ -695,6 +695,51 @@ class TestNovaMigrations(BaseWalkMigrationTestCase, CommonTestsMixIn):
         # confirm compute_node_stats exists
         db_utils.get_table(engine, 'compute_node_stats')
 
+    def _check_235(self, engine, data):
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_deleted_created_at_idx',
+                                ['deleted', 'created_at'])
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_project_id_deleted_created_at_idx',
+                                ['project_id', 'deleted', 'created_at'])
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_deleted_display_name_idx',
+                                ['deleted', 'display_name'])
+        if engine.name != 'mysql':
+            self.assertIndexMembers(
+                engine, 'instance_system_metadata',
+                'instance_system_metadata_instance_uuid_idx',
+                ['instance_uuid'])
+
+    def _post_downgrade_235(self, engine):
+        t = db_utils.get_table(engine, 'instances')
+        index_names = [idx.name for idx in t.indexes]
+        self.assertNotIn('instances_deleted_created_at_idx', index_names)
+        self.assertNotIn('instances_project_id_deleted_created_at_idx',
+                         index_names)
+        self.assertNotIn('instances_deleted_display_name_idx', index_names)
+        t = db_utils.get_table(engine, 'instance_system_metadata')
+        index_names = [idx.name for idx in t.indexes]
+        self.assertNotIn('instance_system_metadata_instance_uuid_idx',
+                         index_names)
+
+    def _check_236(self, engine, data):
+        for table_name in ('project_quota_usages',
+                           'shadow_project_quota_usages'):
+            self.assertColumnExists(engine, table_name, 'project_id')
+            self.assertColumnExists(engine, table_name, 'resource')
+            self.assertColumnExists(engine, table_name, 'in_use')
+            self.assertColumnExists(engine, table_name, 'reserved')
+        self.assertIndexMembers(engine, 'project_quota_usages',
+                                'ix_project_quota_usages_project_id',
+                                ['project_id'])
+
+    def _post_downgrade_236(self, engine):
+        for table_name in ('project_quota_usages',
+                           'shadow_project_quota_usages'):
+            self.assertRaises(sqlalchemy.exc.NoSuchTableError,
+                              db_utils.get_table, engine, table_name)
+
 
 class TestBaremetalMigrations(BaseWalkMigrationTestCase, CommonTestsMixIn):
     """Test sqlalchemy-migrate migrations."""
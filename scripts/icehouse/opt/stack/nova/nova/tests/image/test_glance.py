@@ -16,6 +16,7 @@
 
 import datetime
 import filecmp
+import hashlib
 import os
 import random
 import tempfile
@@ -325,6 +326,70 @@ class TestGlanceImageService(test.NoDBTestCase):
         self.flags(glance_num_retries=1)
         service.download(self.context, image_id, data=writer)
 
+    def _image_data_client(self, chunks, checksum, breaks=0):
+        class MyGlanceStubClient(glance_stubs.StubGlanceClient):
+            """A client that breaks off the transfer a number of times."""
+            data_calls = 0
+
+            def get(self, image_id):
+                return type('FakeImage', (object,), {'checksum': checksum})
+
+            def data(self, image_id):
+                self.data_calls += 1
+                broken = self.data_calls <= breaks
+                for i, chunk in enumerate(chunks):
+                    if broken and i == self.data_calls:
+                        raise IOError('connection reset')
+                    yield chunk
+
+        return MyGlanceStubClient()
+
+    def test_download_to_file_checksum(self):
+        chunks = ['abc', 'def', 'ghi']
+        checksum = hashlib.md5(''.join(chunks)).hexdigest()
+        client = self._image_data_client(chunks, checksum)
+        service = self._create_image_service(client)
+        _, dst_path = self._get_tempfile()
+
+        service.download(self.context, 1, dst_path=dst_path)
+
+        with open(dst_path) as f:
+            self.assertEqual('abcdefghi', f.read())
+        self.assertEqual(1, client.data_calls)
+
+    def test_download_to_file_checksum_mismatch(self):
+        client = self._image_data_client(['abc'], 'bad')
+        service = self._create_image_service(client)
+        _, dst_path = self._get_tempfile()
+
+        self.assertRaises(exception.ImageUnacceptable, service.download,
+                          self.context, 1, dst_path=dst_path)
+
+    def test_download_to_file_resumes(self):
+        chunks = ['abc', 'def', 'ghi']
+        checksum = hashlib.md5(''.join(chunks)).hexdigest()
+        client = self._image_data_client(chunks, checksum, breaks=2)
+        service = self._create_image_service(client)
+        _, dst_path = self._get_tempfile()
+        self.flags(glance_num_retries=2)
+
+        service.download(self.context, 1, dst_path=dst_path)
+
+        with open(dst_path) as f:
+            self.assertEqual('abcdefghi', f.read())
+        self.assertEqual(3, client.data_calls)
+
+    def test_download_to_file_broken_off(self):
+        client = self._image_data_client(['abc', 'def', 'ghi'], None,
+                                         breaks=2)
+        service = self._create_image_service(client)
+        _, dst_path = self._get_tempfile()
+        self.flags(glance_num_retries=1)
+
+        self.assertRaises(IOError, service.download,
+                          self.context, 1, dst_path=dst_path)
+        self.assertEqual(2, client.data_calls)
+
     def test_download_file_url(self):
         self.flags(allowed_direct_url_schemes=['file'])
 
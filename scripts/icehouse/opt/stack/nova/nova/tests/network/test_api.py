@@ -31,6 +31,7 @@ from nova.network import floating_ips
 from nova.network import model as network_model
 from nova.network import rpcapi as network_rpcapi
 from nova.objects import fixed_ip as fixed_ip_obj
+from nova.objects import instance_info_cache as info_cache_obj
 from nova import policy
 from nova import test
 from nova.tests.objects import test_fixed_ip
@@ -375,3 +376,55 @@ class TestUpdateInstanceCache(test.TestCase):
         self.expect_cache_update(self.is_nw_info)
         self.mox.ReplayAll()
         func(self.impl, self.context, self.instance)
+
+    @mock.patch.object(info_cache_obj.InstanceInfoCache,
+                       'get_by_instance_uuid')
+    def test_update_caches_if_changed(self, mock_get):
+        unchanged = {'uuid': 'unchanged-uuid',
+                     'info_cache': {'network_info': self.nw_info.json()}}
+        self.instance['info_cache'] = {'network_info': '[]'}
+        mock_get.return_value = info_cache_obj.InstanceInfoCache(
+            network_info=network_model.NetworkInfo())
+        self.expect_cache_update(self.is_nw_info)
+        self.mox.ReplayAll()
+        updated = api.update_instance_caches_if_changed(
+            self.impl, self.context, [unchanged, self.instance],
+            {'unchanged-uuid': self.nw_info,
+             self.instance['uuid']: self.nw_info})
+        self.assertEqual([self.instance['uuid']], updated)
+        mock_get.assert_called_once_with(self.context, self.instance['uuid'])
+
+    @mock.patch.object(info_cache_obj.InstanceInfoCache,
+                       'get_by_instance_uuid')
+    def test_update_caches_if_changed_failed_save(self, mock_get):
+        failing = {'uuid': 'failing-uuid',
+                   'info_cache': {'network_info': '[]'}}
+        self.instance['info_cache'] = {'network_info': '[]'}
+        mock_get.return_value = info_cache_obj.InstanceInfoCache(
+            network_info=network_model.NetworkInfo())
+        self.mox.StubOutWithMock(db, 'instance_info_cache_update')
+        db.instance_info_cache_update(
+            self.context, 'failing-uuid', mox.IgnoreArg()).AndRaise(
+                test.TestingException())
+        db.instance_info_cache_update(self.context, self.instance['uuid'],
+                                      self.is_nw_info)
+        self.mox.ReplayAll()
+        # The instances after the failed one are still refreshed.
+        updated = api.update_instance_caches_if_changed(
+            self.impl, self.context, [failing, self.instance],
+            {'failing-uuid': self.nw_info,
+             self.instance['uuid']: self.nw_info})
+        self.assertEqual([self.instance['uuid']], updated)
+
+    @mock.patch.object(info_cache_obj.InstanceInfoCache,
+                       'get_by_instance_uuid')
+    def test_update_caches_if_changed_updated_meanwhile(self, mock_get):
+        self.instance['info_cache'] = {'network_info': '[]'}
+        mock_get.return_value = info_cache_obj.InstanceInfoCache(
+            network_info=self.nw_info)
+        self.mox.StubOutWithMock(db, 'instance_info_cache_update')
+        self.mox.ReplayAll()
+        updated = api.update_instance_caches_if_changed(
+            self.impl, self.context, [self.instance],
+            {self.instance['uuid']: self.nw_info})
+        self.assertEqual([], updated)
@@ -1970,6 +1970,49 @@ class CommonNetworkTestCase(test.TestCase):
         self.assertEqual(len(res), 1)
         self.assertEqual(res[0]['instance_uuid'], _vifs[2]['instance_uuid'])
 
+    @mock.patch('nova.objects.virtual_interface.VirtualInterfaceList.get_all')
+    @mock.patch('nova.objects.fixed_ip.FixedIP.get_by_address')
+    def test_get_instance_uuids_by_exact_ip(self, fixed_get, vifs_get):
+        manager = fake_network.FakeNetworkManager(self.stubs)
+        fake_context = context.RequestContext('user', 'project')
+        fixed_get.return_value = fixed_ip_obj.FixedIP(
+            address=netaddr.IPAddress('172.16.0.2'),
+            instance_uuid='fake-uuid', virtual_interface_id=1)
+
+        res = manager.get_instance_uuids_by_ip_filter(
+            fake_context, {'ip': '^172\\.16\\.0\\.2$'})
+        self.assertEqual([{'instance_uuid': 'fake-uuid',
+                           'ip': netaddr.IPAddress('172.16.0.2')}], res)
+        self.assertEqual('172.16.0.2', fixed_get.call_args[0][1])
+        self.assertFalse(vifs_get.called)
+
+    @mock.patch('nova.objects.fixed_ip.FixedIP.get_by_id')
+    @mock.patch('nova.objects.floating_ip.FloatingIP.get_by_address')
+    @mock.patch('nova.objects.fixed_ip.FixedIP.get_by_address')
+    def test_get_instance_uuids_by_exact_floating_ip(self, fixed_get,
+                                                     floating_get, fixed_id):
+        manager = fake_network.FakeNetworkManager(self.stubs)
+        fake_context = context.RequestContext('user', 'project')
+        fixed_get.side_effect = exception.FixedIpNotFoundForAddress(
+            address='10.0.0.2')
+        floating_get.return_value = floating_ip_obj.FloatingIP(
+            address=netaddr.IPAddress('10.0.0.2'), fixed_ip_id=1)
+        fixed_id.return_value = fixed_ip_obj.FixedIP(
+            address=netaddr.IPAddress('172.16.0.2'),
+            instance_uuid='fake-uuid', virtual_interface_id=1)
+
+        res = manager.get_instance_uuids_by_ip_filter(
+            fake_context, {'ip': '^10\\.0\\.0\\.2$'})
+        self.assertEqual([{'instance_uuid': 'fake-uuid',
+                           'ip': netaddr.IPAddress('10.0.0.2')}], res)
+        self.assertEqual(1, fixed_id.call_args[0][1])
+
+        floating_get.side_effect = exception.FloatingIpNotFoundForAddress(
+            address='10.0.0.2')
+        res = manager.get_instance_uuids_by_ip_filter(
+            fake_context, {'ip': '^10\\.0\\.0\\.2$'})
+        self.assertEqual([], res)
+
     @mock.patch('nova.db.network_get_by_uuid')
     def test_get_network(self, get):
         manager = fake_network.FakeNetworkManager()
@@ -505,6 +505,95 @@ class TestNeutronv2(TestNeutronv2Base):
             self.moxed_client)
         self._get_instance_nw_info(2)
 
+    def test_get_instance_nw_info_many(self):
+        # The ports of both instances are looked up together, along with
+        # their networks, subnets, DHCP ports and floating IPs.
+        neutronv2.get_client(mox.IgnoreArg(),
+                             admin=True).MultipleTimes().AndReturn(
+            self.moxed_client)
+        api = neutronapi.API()
+        ports = [dict(port, tenant_id=self.instance['project_id'])
+                 for port in self.port_data2]
+        # A port of another tenant with the same device id is ignored.
+        ports.append(dict(self.port_data2[1], id='other_portid',
+                          tenant_id='other_tenantid'))
+        instances = []
+        for instance, port in ((self.instance, ports[1]),
+                               (self.instance2, ports[0])):
+            instance = copy.copy(instance)
+            instance['info_cache'] = {'network_info': [
+                {'network': {'id': port['network_id']}, 'id': port['id']}]}
+            instances.append(instance)
+
+        self.moxed_client.list_ports(
+            device_id=sorted([self.instance['uuid'],
+                              self.instance2['uuid']])).AndReturn(
+                {'ports': ports})
+        self.moxed_client.list_networks(
+            id=['my_netid1', 'my_netid2']).AndReturn(
+                {'networks': self.nets2})
+        self.moxed_client.list_subnets(
+            id=['my_subid1', 'my_subid2']).AndReturn(
+                {'subnets': self.subnet_data1 + self.subnet_data2})
+        self.moxed_client.list_ports(
+            network_id=['my_netid1', 'my_netid2'],
+            device_owner='network:dhcp').AndReturn(
+                {'ports': self.dhcp_port_data1})
+        self.moxed_client.list_floatingips(
+            port_id=['my_portid1', 'my_portid2']).AndReturn(
+                {'floatingips': self.float_data2})
+        self.mox.ReplayAll()
+
+        nw_infos = api.get_instance_nw_info_many(self.context, instances)
+        self.assertEqual(2, len(nw_infos))
+        self._verify_nw_info(nw_infos[self.instance2['uuid']])
+        self.assertEqual('10.0.1.9', nw_infos[self.instance2['uuid']][0][
+            'network']['subnets'][0].get_meta('dhcp_server'))
+        nw_inf = nw_infos[self.instance['uuid']]
+        self.assertEqual(1, len(nw_inf))
+        self.assertEqual('my_portid2', nw_inf[0]['id'])
+        self.assertEqual('my_netname2', nw_inf[0]['network']['label'])
+        self.assertEqual('10.0.2.0/24',
+                         nw_inf[0]['network']['subnets'][0]['cidr'])
+        self.assertEqual(['172.0.2.2'],
+                         nw_inf.fixed_ips()[0].floating_ip_addresses())
+
+    def test_get_instance_nw_info_many_chunks_ids(self):
+        self.flags(neutron_max_ids_per_query=1)
+        neutronv2.get_client(mox.IgnoreArg(),
+                             admin=True).MultipleTimes().AndReturn(
+            self.moxed_client)
+        api = neutronapi.API()
+        instances = [dict(self.instance, info_cache={'network_info': []}),
+                     dict(self.instance2, info_cache={'network_info': []})]
+        for instance_uuid in sorted([self.instance['uuid'],
+                                     self.instance2['uuid']]):
+            self.moxed_client.list_ports(
+                device_id=[instance_uuid]).AndReturn({'ports': []})
+        self.mox.ReplayAll()
+
+        nw_infos = api.get_instance_nw_info_many(self.context, instances)
+        self.assertEqual({self.instance['uuid']: [],
+                          self.instance2['uuid']: []}, nw_infos)
+
+    def test_heal_instance_info_caches(self):
+        api = neutronapi.API()
+        instances = [self.instance]
+        nw_infos = {self.instance['uuid']: model.NetworkInfo()}
+        self.mox.StubOutWithMock(api, 'get_instance_nw_info_many')
+        self.mox.StubOutWithMock(neutronapi.network_api,
+                                 'update_instance_caches_if_changed')
+        api.get_instance_nw_info_many(self.context,
+                                      instances).AndReturn(nw_infos)
+        neutronapi.network_api.update_instance_caches_if_changed(
+            api, self.context, instances, nw_infos).AndReturn(
+                [self.instance['uuid']])
+        self.mox.ReplayAll()
+        neutronv2.get_client('fake')
+        self.assertEqual([self.instance['uuid']],
+                         api.heal_instance_info_caches(self.context,
+                                                       instances))
+
     def test_get_instance_nw_info_with_nets_add_interface(self):
         # This tests that adding an interface to an instance does not
         # remove the first instance from the instance.
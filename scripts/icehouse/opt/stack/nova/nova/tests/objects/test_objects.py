@@ -795,6 +795,49 @@ class TestObjectListBase(test.TestCase):
         self.assertEqual([x.foo for x in obj],
                          [y.foo for y in obj2])
 
+    def test_compact_serialization(self):
+        class Foo(base.ObjectListBase, base.NovaObject):
+            fields = {'objects': fields.ListOfObjectsField('Bar')}
+
+        class Bar(base.NovaObject):
+            fields = {'foo': fields.Field(fields.String()),
+                      'baz': fields.Field(fields.Integer(), nullable=True)}
+
+        obj = Foo(objects=[Bar(foo=i) for i in 'abc'])
+        obj.obj_reset_changes()
+        for bar in obj.objects:
+            bar.obj_reset_changes()
+        obj.objects[1].baz = None
+
+        compact = jsonutils.loads(jsonutils.dumps(
+            obj.obj_to_compact_primitive()))
+        self.assertEqual('1.1', compact['nova_object.format'])
+        # The class of the unchanged Bars is listed once.
+        self.assertEqual([['Bar', '1.0', ['foo'], '-'],
+                          ['Bar', '1.0', ['baz', 'foo'], '--'],
+                          ['Foo', '1.0', ['objects'], 'l']],
+                         compact['nova_object.classes'])
+        # Only the changed Bar, and the list holding it, have changes.
+        self.assertEqual([2, [[[0, ['a']], [1, [None, 'b'], ['baz']],
+                               [0, ['c']]]], ['objects']],
+                         compact['nova_object.object'])
+
+        primitive = base.obj_from_compact_primitive(compact)
+        self.assertEqual(jsonutils.loads(jsonutils.dumps(
+            obj.obj_to_primitive())), primitive)
+        obj2 = base.NovaObject.obj_from_primitive(primitive)
+        self.assertEqual(['a', 'b', 'c'], [x.foo for x in obj2])
+        self.assertIsNone(obj2.objects[1].baz)
+        self.assertFalse(obj2.objects[0].obj_attr_is_set('baz'))
+        self.assertEqual(set(['baz']), obj2.objects[1].obj_what_changed())
+
+    def test_compact_serialization_unsupported_format(self):
+        self.assertRaises(exception.UnsupportedObjectError,
+                          base.obj_from_compact_primitive,
+                          {'nova_object.format': '2.0',
+                           'nova_object.classes': [],
+                           'nova_object.object': [0, []]})
+
     def _test_object_list_version_mappings(self, list_obj_class):
         # Figure out what sort of object this list is for
         list_field = list_obj_class.fields['objects']
@@ -868,6 +911,18 @@ class TestObjectSerializer(_BaseTestCase):
         self.assertIsInstance(obj2, MyObj)
         self.assertEqual(self.context, obj2._context)
 
+    def test_object_serialization_compact(self):
+        self.flags(object_wire_format='1.1')
+        ser = base.NovaObjectSerializer()
+        obj = MyObj(foo=1, bar='bar')
+        primitive = ser.serialize_entity(self.context, [obj])[0]
+        self.assertEqual('1.1', primitive['nova_object.format'])
+        obj2 = ser.deserialize_entity(self.context, [primitive])[0]
+        self.assertIsInstance(obj2, MyObj)
+        self.assertEqual(self.context, obj2._context)
+        self.assertEqual((1, 'bar'), (obj2.foo, obj2.bar))
+        self.assertEqual(set(['foo', 'bar']), obj2.obj_what_changed())
+
     def test_object_serialization_iterables(self):
         ser = base.NovaObjectSerializer()
         obj = MyObj()
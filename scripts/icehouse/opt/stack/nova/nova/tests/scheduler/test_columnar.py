@@ -0,0 +1,149 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the columnar filtering and weighing engine.
+"""
+
+import copy
+import random
+
+import testtools
+
+from nova import exception
+from nova.scheduler import columnar
+from nova.scheduler import filters
+from nova.scheduler import host_manager
+from nova.scheduler import weights
+from nova import test
+from nova.tests.scheduler import fakes
+
+
+class FakeOddFilter(filters.BaseHostFilter):
+    """A filter without a vectorized form."""
+    def host_passes(self, host_state, filter_properties):
+        return int(host_state.host[4:]) % 2 == 1
+
+
+def _make_hosts(count):
+    gen = random.Random(42)
+    hosts = []
+    for i in xrange(count):
+        total_ram = gen.choice([2048, 4096, 8192])
+        total_disk = gen.choice([20, 40, 80])
+        hosts.append(fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                {'total_usable_ram_mb': total_ram,
+                 'free_ram_mb': gen.randint(-512, total_ram),
+                 'total_usable_disk_gb': total_disk,
+                 'free_disk_mb': gen.randint(0, total_disk * 1024),
+                 'vcpus_total': gen.choice([0, 2, 4, 8]),
+                 'vcpus_used': gen.randint(0, 40),
+                 'num_instances': gen.randint(0, 60),
+                 'num_io_ops': gen.randint(0, 10),
+                 'metrics': dict((name, host_manager.MetricItem(
+                                    value=gen.randint(0, 100),
+                                    timestamp=None, source='fake'))
+                                 for name in ('foo', 'bar')
+                                 if gen.random() > 0.1)}))
+    return hosts
+
+
+@testtools.skipIf(columnar.numpy is None, "numpy is not installed")
+class ColumnarEngineTestCase(test.NoDBTestCase):
+    """Columnar results must match the per-host Python results."""
+
+    def setUp(self):
+        super(ColumnarEngineTestCase, self).setUp()
+        self.filter_handler = filters.HostFilterHandler()
+        self.weight_handler = weights.HostWeightHandler()
+        self.filter_classes = self.filter_handler.get_matching_classes(
+                ['nova.scheduler.filters.ram_filter.RamFilter',
+                 'nova.scheduler.filters.core_filter.CoreFilter',
+                 'nova.scheduler.filters.disk_filter.DiskFilter',
+                 'nova.scheduler.filters.num_instances_filter.'
+                 'NumInstancesFilter',
+                 'nova.scheduler.filters.io_ops_filter.IoOpsFilter'])
+        self.weigher_classes = self.weight_handler.get_matching_classes(
+                ['nova.scheduler.weights.all_weighers'])
+        self.filter_properties = {
+            'instance_type': {'memory_mb': 1024, 'vcpus': 2,
+                              'root_gb': 10, 'ephemeral_gb': 0,
+                              'swap': 512}}
+        self.flags(weight_setting=['foo=1.0', 'bar=-0.5'], required=False,
+                   group='metrics')
+
+    def _filter(self, columnar_engine, filter_classes, hosts):
+        self.flags(scheduler_columnar_engine=columnar_engine)
+        return self.filter_handler.get_filtered_objects(filter_classes,
+                hosts, self.filter_properties)
+
+    def _weigh(self, columnar_engine, hosts):
+        self.flags(scheduler_columnar_engine=columnar_engine)
+        return self.weight_handler.get_weighed_objects(self.weigher_classes,
+                hosts, {})
+
+    def test_filters_match(self):
+        hosts = _make_hosts(500)
+        expected_hosts = copy.deepcopy(hosts)
+
+        result = self._filter(True, self.filter_classes, hosts)
+        expected = self._filter(False, self.filter_classes, expected_hosts)
+
+        self.assertTrue(expected)
+        self.assertEqual([h.host for h in expected], [h.host for h in result])
+        self.assertEqual([h.limits for h in expected_hosts],
+                         [h.limits for h in hosts])
+
+    def test_filters_mixed_with_per_host_filter(self):
+        hosts = _make_hosts(500)
+        filter_classes = [self.filter_classes[0], FakeOddFilter,
+                          self.filter_classes[1]]
+
+        result = self._filter(True, filter_classes, hosts)
+        expected = self._filter(False, filter_classes, hosts)
+
+        self.assertTrue(expected)
+        self.assertEqual([h.host for h in expected], [h.host for h in result])
+
+    def test_filters_without_instance_type(self):
+        self.filter_properties = {}
+        hosts = _make_hosts(10)
+        core_filter = self.filter_classes[1:2]
+        self.assertEqual(hosts, self._filter(True, core_filter, hosts))
+
+    def test_no_hosts_pass(self):
+        self.filter_properties['instance_type']['memory_mb'] = 10 ** 6
+        self.assertEqual([], self._filter(True, self.filter_classes,
+                                          _make_hosts(10)))
+
+    def test_weights_match(self):
+        hosts = _make_hosts(500)
+
+        result = self._weigh(True, hosts)
+        expected = self._weigh(False, hosts)
+
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in result])
+
+    def test_metrics_required(self):
+        self.flags(required=True, group='metrics')
+        self.assertRaises(exception.ComputeHostMetricNotFound,
+                          self._weigh, True, _make_hosts(50))
+
+    def test_numpy_missing_falls_back(self):
+        self.stubs.Set(columnar, 'numpy', None)
+        hosts = _make_hosts(50)
+        result = self._filter(True, self.filter_classes, hosts)
+        expected = self._filter(False, self.filter_classes, hosts)
+        self.assertEqual(expected, result)
@@ -621,3 +621,64 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             request_spec, filter_properties)
         self.assertEqual(filter_properties.get('pci_requests'),
                          requests)
+
+    def _schedule_many(self, num_instances, batch, group_policies=None):
+        self.flags(scheduler_default_filters=['RamFilter',
+                                              'ServerGroupAntiAffinityFilter',
+                                              'ServerGroupAffinityFilter'],
+                   scheduler_batch_placement=batch,
+                   ram_allocation_ratio=1.0)
+        sched = fakes.FakeFilterScheduler()
+        fake_context = context.RequestContext('user', 'project',
+                is_admin=True)
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(mox.IgnoreArg()).AndReturn(
+                fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        instance_properties = {'project_id': 1,
+                               'root_gb': 0,
+                               'memory_mb': 512,
+                               'ephemeral_gb': 0,
+                               'vcpus': 1,
+                               'os_type': 'Linux'}
+        request_spec = dict(instance_properties=instance_properties,
+                            instance_type={'memory_mb': 512},
+                            num_instances=num_instances)
+        filter_properties = {}
+        update_group_hosts = bool(group_policies)
+        if group_policies:
+            filter_properties['group_policies'] = group_policies
+            filter_properties['group_hosts'] = set()
+        self.stubs.Set(sched, '_setup_instance_group',
+                       lambda *args: update_group_hosts)
+        hosts = sched._schedule(fake_context, request_spec,
+                                filter_properties=filter_properties)
+        self.mox.UnsetStubs()
+        self.mox.VerifyAll()
+        return [host.obj.host for host in hosts]
+
+    def test_batch_placement_matches_per_instance(self):
+        # host1 fits 1 instance, host2 2, host3 6 and host4 16.  Weights
+        # are normalized against the bounds of the first pass in batch
+        # mode, so near ties may be placed in a different order.
+        expected = self._schedule_many(30, False)
+        result = self._schedule_many(30, True)
+        self.assertEqual(25, len(result))
+        self.assertEqual(sorted(expected), sorted(result))
+        self.assertEqual(expected[:10], result[:10])
+
+    def test_batch_placement_anti_affinity(self):
+        hosts = self._schedule_many(6, True, ['anti-affinity'])
+        self.assertEqual(['host4', 'host3', 'host2', 'host1'], hosts)
+
+    def test_batch_placement_affinity(self):
+        hosts = self._schedule_many(20, True, ['affinity'])
+        self.assertEqual(['host4'] * 16, hosts)
+
+    def test_batch_placement_no_hosts(self):
+        self.flags(scheduler_batch_placement=True)
+        sched = fakes.FakeFilterScheduler()
+        self.stubs.Set(sched.host_manager, 'get_filtered_hosts',
+                       lambda *args, **kwargs: [])
+        self.assertEqual([], sched._schedule_batch([], {}, {}, 2, False))
@@ -15,6 +15,10 @@
 """
 Tests For HostManager
 """
+import datetime
+
+import mox
+
 from nova.compute import task_states
 from nova.compute import vm_states
 from nova import db
@@ -373,6 +377,122 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(len(host_states_map), 0)
 
 
+class HostManagerIncrementalTestCase(test.NoDBTestCase):
+    """Test case for HostManager with incremental host states."""
+
+    def setUp(self):
+        super(HostManagerIncrementalTestCase, self).setUp()
+        self.flags(scheduler_incremental_host_state=True,
+                   scheduler_host_state_max_staleness=0,
+                   scheduler_host_state_full_sync_interval=600)
+        self.host_manager = host_manager.HostManager()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.context = 'fake_context'
+
+    def _compute_nodes(self, updated_at):
+        nodes = []
+        for node in fakes.COMPUTE_NODES[:4]:
+            node = dict(node, updated_at=updated_at, deleted=0)
+            node['service'] = dict(node['service'])
+            nodes.append(node)
+        return nodes
+
+    def test_changed_nodes_applied_without_full_reload(self):
+        first = timeutils.utcnow()
+        nodes = self._compute_nodes(first)
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(self.context).AndReturn(nodes)
+        changed = dict(nodes[0], free_ram_mb=128,
+                       updated_at=first + datetime.timedelta(seconds=5))
+        db.compute_node_get_all_changed_since(self.context, first).AndReturn(
+                ([changed], [n['service'] for n in nodes]))
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(10)
+        self.host_manager.get_all_host_states(self.context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(4, len(host_states_map))
+        self.assertEqual(128, host_states_map[('host1', 'node1')].free_ram_mb)
+        self.assertEqual(1024,
+                         host_states_map[('host2', 'node2')].free_ram_mb)
+
+    def test_deleted_nodes_and_services_removed(self):
+        first = timeutils.utcnow()
+        nodes = self._compute_nodes(first)
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(self.context).AndReturn(nodes)
+        deleted = dict(nodes[0], deleted=1,
+                       deleted_at=first + datetime.timedelta(seconds=5))
+        # host2's service went away altogether.
+        services = [nodes[0]['service'], nodes[2]['service'],
+                    nodes[3]['service']]
+        db.compute_node_get_all_changed_since(self.context, first).AndReturn(
+                ([deleted], services))
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(10)
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertEqual(set([('host3', 'node3'), ('host4', 'node4')]),
+                         set(self.host_manager.host_state_map.keys()))
+
+    def test_scheduler_claims_survive_older_updates(self):
+        first = timeutils.utcnow()
+        nodes = self._compute_nodes(first)
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(self.context).AndReturn(nodes)
+        db.compute_node_get_all_changed_since(self.context, first).AndReturn(
+                ([nodes[0]], [n['service'] for n in nodes]))
+        self.mox.ReplayAll()
+
+        host_states = list(self.host_manager.get_all_host_states(
+                self.context))
+        timeutils.advance_time_seconds(10)
+        host_state = [h for h in host_states if h.host == 'host1'][0]
+        host_state.consume_from_instance(dict(root_gb=0, ephemeral_gb=0,
+                                              memory_mb=256, vcpus=1))
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertEqual(256, host_state.free_ram_mb)
+
+    def test_staleness_bound_skips_db(self):
+        self.flags(scheduler_host_state_max_staleness=30)
+        nodes = self._compute_nodes(timeutils.utcnow())
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(self.context).AndReturn(nodes)
+        db.compute_node_get_all_changed_since(self.context,
+                mox.IgnoreArg()).AndReturn(([], []))
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(10)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(4, len(self.host_manager.host_state_map))
+        timeutils.advance_time_seconds(30)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(0, len(self.host_manager.host_state_map))
+
+    def test_full_sync_interval(self):
+        nodes = self._compute_nodes(timeutils.utcnow())
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(self.context).AndReturn(nodes)
+        db.compute_node_get_all(self.context).AndReturn(nodes[:1])
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(601)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(1, len(self.host_manager.host_state_map))
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
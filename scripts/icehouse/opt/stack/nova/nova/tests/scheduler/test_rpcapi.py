@@ -38,6 +38,7 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
         expected_version = kwargs.pop('version', None)
         expected_fanout = kwargs.pop('fanout', None)
         expected_kwargs = kwargs.copy()
+        expected_server = expected_kwargs.pop('host', None)
 
         self.mox.StubOutWithMock(rpcapi, 'client')
 
@@ -47,6 +48,8 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
         prepare_kwargs = {}
         if expected_fanout:
             prepare_kwargs['fanout'] = True
+        if 'host' in kwargs:
+            prepare_kwargs['server'] = expected_server
         if expected_version:
             prepare_kwargs['version'] = expected_version
         rpcapi.client.prepare(**prepare_kwargs).AndReturn(rpcapi.client)
@@ -82,3 +85,7 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
         self._test_scheduler_api('select_destinations', rpc_method='call',
                 request_spec='fake_request_spec',
                 filter_properties='fake_prop')
+
+    def test_get_scheduler_stats(self):
+        self._test_scheduler_api('get_scheduler_stats', rpc_method='call',
+                host='fake_host', reset=True, version='3.1')
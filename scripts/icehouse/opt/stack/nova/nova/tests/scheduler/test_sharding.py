@@ -0,0 +1,283 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For coordination between scheduler workers.
+"""
+
+import datetime
+
+from oslo.config import cfg
+
+from nova import context
+from nova.openstack.common.fixture import mockpatch
+from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
+from nova.scheduler import sharding
+from nova import test
+from nova.tests.scheduler import fakes
+
+CONF = cfg.CONF
+CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
+
+
+class HostPartitionerTestCase(test.NoDBTestCase):
+
+    hosts = ['compute%d' % i for i in xrange(1000)]
+
+    def test_invalid_index(self):
+        self.assertRaises(ValueError, sharding.HostPartitioner, 4, 4)
+
+    def test_balanced(self):
+        partitioner = sharding.HostPartitioner(4, 0)
+        counts = [0] * 4
+        for host in self.hosts:
+            counts[partitioner.get_partition(host)] += 1
+        for count in counts:
+            self.assertTrue(150 < count < 350, counts)
+
+    def test_adding_partition_moves_few_hosts(self):
+        before = sharding.HostPartitioner(4, 0)
+        after = sharding.HostPartitioner(5, 0)
+        moved = [host for host in self.hosts
+                 if before.get_partition(host) != after.get_partition(host)]
+        # Only the hosts taken over by the new partition move.
+        self.assertTrue(len(moved) < 350, len(moved))
+        for host in moved:
+            self.assertEqual(4, after.get_partition(host))
+
+    def test_split(self):
+        host_states = [fakes.FakeHostState(host, 'node', {})
+                       for host in self.hosts]
+        owned = set()
+        for index in xrange(3):
+            partitioner = sharding.HostPartitioner(3, index)
+            own, others = partitioner.split(host_states)
+            self.assertEqual(len(host_states), len(own) + len(others))
+            self.assertFalse(owned & set(own))
+            owned.update(own)
+        self.assertEqual(set(host_states), owned)
+
+    def test_unicode_host(self):
+        partitioner = sharding.HostPartitioner(4, 0)
+        self.assertEqual(partitioner.get_partition('compute1'),
+                         partitioner.get_partition(u'compute1'))
+        partitioner.get_partition(u'h\xf4te1')
+
+    def test_get_partitioner(self):
+        self.assertIsNone(sharding.get_partitioner())
+        self.flags(scheduler_shard_count=2, scheduler_shard_index=1)
+        self.assertEqual(1, sharding.get_partitioner().index)
+
+
+class ClaimLedgerTestCase(test.NoDBTestCase):
+
+    instance = {'memory_mb': 512, 'root_gb': 1, 'ephemeral_gb': 0,
+                'vcpus': 1, 'project_id': 'fake', 'uuid': 'fake-uuid'}
+
+    def setUp(self):
+        super(ClaimLedgerTestCase, self).setUp()
+        self.ledger = sharding.ClaimLedger(memorycache.Client(), ttl=60)
+
+    def _host_state(self):
+        return fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1024, 'free_disk_mb': 10240,
+                 'vcpus_used': 0})
+
+    def test_claim_seen_by_other_worker(self):
+        mine = self._host_state()
+        theirs = self._host_state()
+
+        self.assertTrue(self.ledger.claim(mine, self.instance,
+                                          lambda: True))
+        # The caller consumes its own claim.
+        self.ledger.apply_claims(mine)
+        self.assertEqual(1024, mine.free_ram_mb)
+
+        self.ledger.apply_claims(theirs)
+        self.ledger.apply_claims(theirs)
+        self.assertEqual(512, theirs.free_ram_mb)
+        self.assertEqual(9216, theirs.free_disk_mb)
+        self.assertEqual(1, theirs.vcpus_used)
+
+    def test_claim_check_fails(self):
+        host_state = self._host_state()
+        self.assertFalse(self.ledger.claim(host_state, self.instance,
+                                           lambda: False))
+        other = self._host_state()
+        self.ledger.apply_claims(other)
+        self.assertEqual(1024, other.free_ram_mb)
+        # The lock was released.
+        self.assertTrue(self.ledger.claim(host_state, self.instance,
+                                          lambda: True))
+
+    def test_claim_locked(self):
+        sleep = self.useFixture(mockpatch.Patch('time.sleep')).mock
+        host_state = self._host_state()
+        lock_key = self.ledger._key(host_state) + '-lock'
+        self.ledger.client.add(lock_key, '1')
+        # The host is chosen without recording the claim rather than
+        # dropped.
+        self.assertTrue(self.ledger.claim(host_state, self.instance,
+                                          lambda: True))
+        self.assertEqual(sharding.LOCK_ATTEMPTS - 1, sleep.call_count)
+        self.assertEqual(set(), host_state.claims_applied)
+        # The lock of the other worker is left alone.
+        self.assertEqual('1', self.ledger.client.get(lock_key))
+        other = self._host_state()
+        self.ledger.apply_claims(other)
+        self.assertEqual(1024, other.free_ram_mb)
+
+    def test_claim_locked_keeps_concurrent_claim(self):
+        self.useFixture(mockpatch.Patch('time.sleep'))
+        host_state = self._host_state()
+        key = self.ledger._key(host_state)
+        client = self.ledger.client
+        client.add(key + '-lock', '1')
+        set_claims = client.set
+        theirs = ('their-claim', timeutils.utcnow(), self.instance)
+
+        def write_theirs():
+            # The worker holding the lock records its claim.
+            if not client.get(key):
+                set_claims(key, [theirs], time=60)
+
+        def set_after_their_claim(*args, **kwargs):
+            write_theirs()
+            return set_claims(*args, **kwargs)
+
+        self.stubs.Set(client, 'set', set_after_their_claim)
+        self.assertTrue(self.ledger.claim(host_state, self.instance,
+                                          lambda: True))
+        write_theirs()
+
+        self.assertEqual([theirs], client.get(key))
+        other = self._host_state()
+        self.ledger.apply_claims(other)
+        self.assertEqual(512, other.free_ram_mb)
+
+    def test_claim_locked_check_fails(self):
+        self.useFixture(mockpatch.Patch('time.sleep'))
+        host_state = self._host_state()
+        self.ledger.client.add(self.ledger._key(host_state) + '-lock', '1')
+        self.assertFalse(self.ledger.claim(host_state, self.instance,
+                                           lambda: False))
+
+    def test_claim_lock_released_while_waiting(self):
+        host_state = self._host_state()
+        lock_key = self.ledger._key(host_state) + '-lock'
+        self.ledger.client.add(lock_key, '1')
+        self.useFixture(mockpatch.Patch(
+            'time.sleep',
+            side_effect=lambda interval: self.ledger.client.delete(lock_key)))
+        self.assertTrue(self.ledger.claim(host_state, self.instance,
+                                          lambda: True))
+        # The lock taken on the second attempt was released.
+        self.assertIsNone(self.ledger.client.get(lock_key))
+
+    def test_claim_unicode_host(self):
+        host_state = fakes.FakeHostState(u'h\xf4te1', u'n\u0153ud1',
+                {'free_ram_mb': 1024, 'free_disk_mb': 10240,
+                 'vcpus_used': 0})
+        self.assertTrue(self.ledger.claim(host_state, self.instance,
+                                          lambda: True))
+
+    def test_reported_claims_skipped(self):
+        self.assertTrue(self.ledger.claim(self._host_state(), self.instance,
+                                          lambda: True))
+        host_state = self._host_state()
+        host_state.compute_updated = (timeutils.utcnow() +
+                                      datetime.timedelta(seconds=1))
+        self.ledger.apply_claims(host_state)
+        self.assertEqual(1024, host_state.free_ram_mb)
+
+
+class ShardedSchedulerTestCase(test.NoDBTestCase):
+
+    instance_properties = {'project_id': 1,
+                           'root_gb': 0,
+                           'memory_mb': 3000,
+                           'ephemeral_gb': 0,
+                           'vcpus': 1,
+                           'os_type': 'Linux'}
+
+    def setUp(self):
+        super(ShardedSchedulerTestCase, self).setUp()
+        self.useFixture(mockpatch.Patch(
+            'nova.db.compute_node_get_all',
+            return_value=fakes.COMPUTE_NODES))
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   ram_allocation_ratio=1.0)
+        self.context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+
+    def _select(self, sched, num_instances=1, memory_mb=3000):
+        instance_properties = dict(self.instance_properties,
+                                   memory_mb=memory_mb)
+        request_spec = dict(instance_properties=instance_properties,
+                            instance_type={'memory_mb': memory_mb},
+                            num_instances=num_instances)
+        hosts = sched._schedule(self.context, request_spec, {})
+        return [host.obj.host for host in hosts]
+
+    def _schedulers(self, count):
+        # All schedulers read the host states before any of them chooses.
+        schedulers = [fakes.FakeFilterScheduler() for i in xrange(count)]
+        for sched in schedulers:
+            self.stubs.Set(sched, '_get_all_host_states',
+                           lambda ctxt, hosts=list(
+                               sched.host_manager.get_all_host_states(
+                                   self.context)): iter(hosts))
+        return schedulers
+
+    def test_workers_race_without_ledger(self):
+        # host3 and host4 have room for 3000MB, host4 twice.
+        self.assertEqual(['host4', 'host4', 'host4'],
+                         [self._select(sched)[0]
+                          for sched in self._schedulers(3)])
+
+    def test_workers_share_ledger(self):
+        ledger = sharding.ClaimLedger(memorycache.Client())
+        schedulers = self._schedulers(4)
+        for sched in schedulers:
+            sched.claim_ledger = ledger
+        self.assertEqual([['host4'], ['host4'], ['host3'], []],
+                         [self._select(sched) for sched in schedulers])
+
+    def test_get_claim_ledger_shared(self):
+        self.stubs.Set(sharding, '_claim_ledger', None)
+        self.assertIsNone(fakes.FakeFilterScheduler().claim_ledger)
+        self.flags(scheduler_claim_ledger=True)
+        self.assertIs(fakes.FakeFilterScheduler().claim_ledger,
+                      fakes.FakeFilterScheduler().claim_ledger)
+
+    def _partitioned_scheduler(self):
+        # Partition 0 of 2 owns host1 only.
+        sched = fakes.FakeFilterScheduler()
+        sched.host_partitioner = sharding.HostPartitioner(2, 0)
+        return sched
+
+    def test_partition_own_hosts_first(self):
+        sched = self._partitioned_scheduler()
+        self.assertEqual(['host1'], self._select(sched, memory_mb=256))
+
+    def test_partition_falls_back_to_other_hosts(self):
+        sched = self._partitioned_scheduler()
+        # host1 is too small, host4 takes two instances and host3 one.
+        self.assertEqual(['host3', 'host4', 'host4'],
+                         sorted(self._select(sched, num_instances=4)))
+
+    def test_partition_batch_placement(self):
+        self.flags(scheduler_batch_placement=True)
+        self.test_partition_falls_back_to_other_hosts()
@@ -128,6 +128,22 @@ class RamWeigherTestCase(test.NoDBTestCase):
         self.assertEqual(weighed_host.weight, 0)
         self.assertEqual(weighed_host.obj.host, "negative")
 
+    def test_reweigh_uses_first_pass_bounds(self):
+        hostinfo_list = self._get_all_hosts()
+        weighers = [cls() for cls in self.weight_classes]
+        weighed = self.weight_handler.weigh_objects(weighers,
+                                                    hostinfo_list, {})
+        weighed_host = [w for w in weighed if w.obj.host == 'host4'][0]
+        self.assertEqual(1.0, weighed_host.weight)
+
+        # host4: free_ram_mb=8192 -> 1024, now level with host2
+        weighed_host.obj.free_ram_mb = 1024
+        reweighed = self.weight_handler.reweigh_object(weighers,
+                weighed_host.obj, {})
+        self.assertEqual(1024.0 / 8192, reweighed.weight)
+        self.assertEqual(0, weighers[0].minval)
+        self.assertEqual(8192, weighers[0].maxval)
+
 
 class MetricsWeigherTestCase(test.NoDBTestCase):
     def setUp(self):
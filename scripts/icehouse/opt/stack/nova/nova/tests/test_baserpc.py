@@ -48,3 +48,12 @@ class BaseAPITestCase(test.TestCase):
         res = self.base_rpcapi.get_backdoor_port(self.context,
                 self.compute.host)
         self.assertEqual(res, self.compute.backdoor_port)
+
+    def test_get_periodic_task_stats(self):
+        self.compute.periodic_tasks()
+        res = self.base_rpcapi.get_periodic_task_stats(self.context,
+                self.compute.host)
+        self.assertEqual(1, res['update_available_resource']['runs'])
+        self.assertIsNone(res['update_available_resource']['spacing'])
+        self.assertEqual(CONF.heal_instance_info_cache_interval,
+                         res['_heal_instance_info_cache']['spacing'])
@@ -15,6 +15,8 @@
 #    under the License.
 """Unit Tests for network code."""
 
+import fixtures
+
 from nova.network import linux_net
 from nova import test
 
@@ -276,3 +278,89 @@ class IptablesManagerTestCase(test.NoDBTestCase):
                                                self.manager.ipv4['filter'],
                                                'filter')
         self.assertEqual(current_lines, new_lines)
+
+    def _apply_with_fake_execute(self, fail_noflush=False):
+        executes = []
+
+        def fake_execute(*cmd, **kwargs):
+            executes.append((cmd, kwargs.get('process_input')))
+            if fail_noflush and '--noflush' in cmd:
+                raise test.TestingException()
+            if cmd[0].endswith('-save'):
+                return '\n'.join(self.sample_filter + self.sample_nat), ''
+            return '', ''
+
+        self.flags(lock_path=self.useFixture(fixtures.TempDir()).path,
+                   use_ipv6=False)
+        self.manager.execute = fake_execute
+        self.manager.apply()
+        return executes
+
+    def test_first_apply_is_full(self):
+        executes = self._apply_with_fake_execute()
+        self.assertEqual([('iptables-save', '-c'),
+                          ('iptables-restore', '-c')],
+                         [cmd for cmd, process_input in executes])
+
+    def test_apply_changed_chains(self):
+        table = self.manager.ipv4['filter']
+        table.add_chain('inst-0')
+        table.add_rule('inst-0', '-j DROP')
+        table.add_rule('INPUT', '-j $inst-0')
+        self._apply_with_fake_execute()
+        table.add_chain('inst-1')
+        table.add_rule('inst-1', '-s 1.2.3.4/32 -j ACCEPT')
+        table.add_rule('inst-1', '-j DROP')
+        table.add_rule('INPUT', '-j $inst-1', top=True)
+        table.remove_chain('inst-0')
+
+        executes = self._apply_with_fake_execute()
+
+        self.assertEqual(1, len(executes))
+        cmd, process_input = executes[0]
+        self.assertEqual(('iptables-restore', '-c', '--noflush'), cmd)
+        binary_name = self.binary_name
+        self.assertEqual(['*filter',
+                          ':%s-INPUT - [0:0]' % binary_name,
+                          ':%s-inst-0 - [0:0]' % binary_name,
+                          ':%s-inst-1 - [0:0]' % binary_name,
+                          '[0:0] -A %s-INPUT -j %s-inst-1' % (binary_name,
+                                                              binary_name),
+                          '[0:0] -A %s-inst-1 -s 1.2.3.4/32 '
+                          '-j ACCEPT' % binary_name,
+                          '[0:0] -A %s-inst-1 -j DROP' % binary_name,
+                          '-X %s-inst-0' % binary_name,
+                          'COMMIT'],
+                         process_input.split('\n'))
+        self.assertFalse(self.manager.dirty())
+        self.assertEqual(set(), table.changed_chains)
+        self.assertEqual(set(), table.removed_chains)
+
+    def test_apply_unwrapped_change_is_full(self):
+        self._apply_with_fake_execute()
+        self.manager.ipv4['filter'].add_rule('FORWARD', '-j ACCEPT',
+                                             wrap=False)
+        executes = self._apply_with_fake_execute()
+        self.assertEqual([('iptables-save', '-c'),
+                          ('iptables-restore', '-c')],
+                         [cmd for cmd, process_input in executes])
+
+    def test_apply_changed_chains_disabled(self):
+        self.flags(iptables_incremental_apply=False)
+        self._apply_with_fake_execute()
+        self.manager.ipv4['filter'].add_rule('FORWARD', '-j ACCEPT')
+        executes = self._apply_with_fake_execute()
+        self.assertEqual([('iptables-save', '-c'),
+                          ('iptables-restore', '-c')],
+                         [cmd for cmd, process_input in executes])
+
+    def test_apply_changed_chains_failure_is_full(self):
+        self._apply_with_fake_execute()
+        self.manager.ipv4['filter'].add_rule('FORWARD', '-j ACCEPT')
+        executes = self._apply_with_fake_execute(fail_noflush=True)
+        self.assertEqual([('iptables-restore', '-c', '--noflush'),
+                          ('iptables-save', '-c'),
+                          ('iptables-restore', '-c')],
+                         [cmd for cmd, process_input in executes])
+        self.assertIn('[0:0] -A %s-FORWARD -j ACCEPT' % self.binary_name,
+                      executes[-1][1].split('\n'))
@@ -0,0 +1,129 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the in process memcache client.
+"""
+
+from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
+from nova import test
+
+
+class MemorycacheTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(MemorycacheTestCase, self).setUp()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.client = memorycache.Client([], max_entries=0)
+
+    def test_get_set(self):
+        self.assertTrue(self.client.set('foo', 'bar'))
+        self.assertEqual('bar', self.client.get('foo'))
+        self.assertIsNone(self.client.get('missing'))
+
+    def test_expiry(self):
+        self.client.set('short', 1, time=10)
+        self.client.set('long', 2, time=20)
+        self.client.set('forever', 3)
+        timeutils.advance_time_seconds(10)
+        self.assertIsNone(self.client.get('short'))
+        self.assertEqual(2, self.client.get('long'))
+        timeutils.advance_time_seconds(10)
+        self.assertIsNone(self.client.get('long'))
+        self.assertEqual(3, self.client.get('forever'))
+        self.assertEqual(['forever'], self.client.cache.keys())
+
+    def test_expiry_of_key_set_again(self):
+        self.client.set('foo', 1, time=10)
+        timeutils.advance_time_seconds(5)
+        self.client.set('foo', 2, time=10)
+        timeutils.advance_time_seconds(5)
+        self.assertEqual(2, self.client.get('foo'))
+        timeutils.advance_time_seconds(5)
+        self.assertIsNone(self.client.get('foo'))
+
+    def test_stale_timeouts_dropped(self):
+        for i in xrange(1000):
+            self.client.set('foo', i, time=10)
+        self.assertTrue(len(self.client._timeouts) <= 2 + 64)
+        self.assertEqual(999, self.client.get('foo'))
+
+    def test_add(self):
+        self.assertTrue(self.client.add('foo', 'bar'))
+        self.assertFalse(self.client.add('foo', 'baz'))
+        self.assertEqual('bar', self.client.get('foo'))
+
+    def test_add_expired(self):
+        self.client.set('foo', 'bar', time=10)
+        timeutils.advance_time_seconds(10)
+        self.assertTrue(self.client.add('foo', 'baz'))
+        self.assertEqual('baz', self.client.get('foo'))
+
+    def test_add_none(self):
+        self.client.set('foo', None)
+        self.assertTrue(self.client.add('foo', 'bar'))
+        self.assertEqual('bar', self.client.get('foo'))
+
+    def test_incr(self):
+        self.client.set('foo', '1', time=10)
+        self.assertEqual(3, self.client.incr('foo', 2))
+        self.assertEqual('3', self.client.get('foo'))
+        self.assertIsNone(self.client.incr('missing'))
+        timeutils.advance_time_seconds(10)
+        self.assertIsNone(self.client.get('foo'))
+
+    def test_delete(self):
+        self.client.set('foo', 'bar')
+        self.client.delete('foo')
+        self.client.delete('missing')
+        self.assertIsNone(self.client.get('foo'))
+
+    def test_max_entries_evicts_least_recently_used(self):
+        client = memorycache.Client([], max_entries=3)
+        for key in ('a', 'b', 'c'):
+            client.set(key, key)
+        client.get('a')
+        client.set('d', 'd')
+        self.assertEqual(['a', 'c', 'd'], sorted(client.cache))
+        client.set('c', 'c2')
+        client.set('e', 'e')
+        self.assertEqual(['c', 'd', 'e'], sorted(client.cache))
+        self.assertEqual(2, client.evictions)
+
+    def test_max_entries_stale_uses_dropped(self):
+        client = memorycache.Client([], max_entries=2)
+        client.set('a', 'a')
+        client.set('b', 'b')
+        for i in xrange(1000):
+            client.get('a')
+        self.assertTrue(len(client._uses) <= 2 * 2 + 64)
+        client.set('c', 'c')
+        self.assertEqual(['a', 'c'], sorted(client.cache))
+
+    def test_max_entries_from_config(self):
+        self.flags(memorycache_max_entries=5)
+        self.assertEqual(5, memorycache.Client([]).max_entries)
+
+    def test_get_stats(self):
+        client = memorycache.Client([], max_entries=1)
+        client.set('a', 'a', time=10)
+        client.get('a')
+        client.get('b')
+        client.set('b', 'b')
+        self.assertEqual([('memorycache', {'curr_items': 1,
+                                           'get_hits': 1,
+                                           'get_misses': 1,
+                                           'evictions': 1})],
+                         client.get_stats())
@@ -22,6 +22,8 @@ import hmac
 import json
 import re
 
+import mox
+
 try:
     import cPickle as pickle
 except ImportError:
@@ -31,6 +33,7 @@ from oslo.config import cfg
 import webob
 
 from nova.api.metadata import base
+from nova.api.metadata import cache as metadata_cache
 from nova.api.metadata import handler
 from nova.api.metadata import password
 from nova import block_device
@@ -42,6 +45,7 @@ from nova.db.sqlalchemy import api
 from nova import exception
 from nova.network import api as network_api
 from nova.objects import instance as instance_obj
+from nova.openstack.common import memorycache
 from nova import test
 from nova.tests import fake_block_device
 from nova.tests import fake_instance
@@ -344,6 +348,36 @@ class MetadataTestCase(test.TestCase):
         data = md.get_ec2_metadata(version='2009-04-04')
         self.assertEqual(data['meta-data']['local-ipv4'], '')
 
+    def test_get_metadata_by_reservation(self):
+        nw_info = fake_network.fake_get_instance_nw_info(self.stubs,
+                                                         num_networks=2)
+        instances = []
+        for i in range(4):
+            inst = self.instance.obj_clone()
+            inst.uuid = 'uuid-%d' % i
+            inst.info_cache.network_info = nw_info
+            instances.append(inst)
+        self.mox.StubOutWithMock(instance_obj.InstanceList, 'get_by_filters')
+        instance_obj.InstanceList.get_by_filters(
+            mox.IgnoreArg(), {'reservation_id': 'r-xxxxxxxx',
+                              'deleted': False},
+            sort_key='launch_index', sort_dir='asc', limit=3,
+            expected_attrs=['metadata', 'system_metadata', 'info_cache']
+        ).AndReturn(instances)
+        self.mox.ReplayAll()
+
+        built = []
+
+        def fake_instance_metadata(instance, address, conductor_api):
+            built.append((instance.uuid, address))
+            return self.mox.CreateMockAnything()
+
+        self.stubs.Set(base, 'InstanceMetadata', fake_instance_metadata)
+        result = list(base.get_metadata_by_reservation(None, instances[1], 2))
+        self.assertEqual(2, len(result))
+        self.assertEqual([('uuid-0', '192.168.1.100'),
+                          ('uuid-2', '192.168.1.100')], built)
+
 
 class OpenStackMetadataTestCase(test.TestCase):
     def setUp(self):
@@ -492,6 +526,51 @@ class OpenStackMetadataTestCase(test.TestCase):
         mdjson = mdinst.lookup("/openstack/2012-08-10/meta_data.json")
         self.assertNotIn("random_seed", json.loads(mdjson))
 
+    def test_render_cached(self):
+        inst = self.instance.obj_clone()
+        mdinst = fake_InstanceMetadata(self.stubs, inst)
+
+        body, etag = mdinst.render("/openstack/2012-08-10/meta_data.json")
+        self.assertEqual(mdinst.lookup("/openstack/2012-08-10/meta_data.json"),
+                         body)
+        self.assertEqual(hashlib.md5(body).hexdigest(), etag)
+
+        self.mox.StubOutWithMock(mdinst, 'lookup')
+        self.mox.ReplayAll()
+        self.assertEqual((body, etag),
+                         mdinst.render("openstack/2012-08-10/"
+                                       "../2012-08-10/meta_data.json"))
+
+    def test_render_non_ascii(self):
+        inst = self.instance.obj_clone()
+        sgroups = [dict(test_security_group.fake_secgroup, name='default'),
+                   dict(test_security_group.fake_secgroup,
+                        name=u'sg-\xe9t\xe9')]
+        mdinst = fake_InstanceMetadata(self.stubs, inst, sgroups=sgroups)
+
+        body, etag = mdinst.render("/2009-04-04/meta-data/security-groups")
+        self.assertEqual('default\nsg-\xc3\xa9t\xc3\xa9', body)
+        self.assertIsInstance(body, str)
+        self.assertEqual(hashlib.md5(body).hexdigest(), etag)
+
+    def test_render_random_seed_not_cached(self):
+        inst = self.instance.obj_clone()
+        mdinst = fake_InstanceMetadata(self.stubs, inst)
+
+        body1, etag1 = mdinst.render("/openstack/latest/meta_data.json")
+        body2, etag2 = mdinst.render("/openstack/latest/meta_data.json")
+        self.assertNotEqual(json.loads(body1)['random_seed'],
+                            json.loads(body2)['random_seed'])
+        self.assertIsNone(etag1)
+        self.assertIsNone(etag2)
+
+    def test_render_callable(self):
+        inst = self.instance.obj_clone()
+        mdinst = fake_InstanceMetadata(self.stubs, inst)
+
+        self.assertEqual(password.handle_password,
+                         mdinst.render("/openstack/latest/password"))
+
     def test_no_dashes_in_metadata(self):
         # top level entries in meta_data should not contain '-' in their name
         inst = self.instance.obj_clone()
@@ -564,13 +643,45 @@ class MetadataHandlerTestCase(test.TestCase):
             return "foo"
 
         class CallableMD(object):
-            def lookup(self, path_info):
+            def render(self, path_info):
                 return verify
 
         response = fake_request(self.stubs, CallableMD(), "/bar")
         self.assertEqual(response.status_int, 200)
         self.assertEqual(response.body, "foo")
 
+    def test_etag(self):
+        response = fake_request(self.stubs, self.mdinst,
+                                "/2009-04-04/user-data")
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(hashlib.md5(response.body).hexdigest(),
+                         response.etag)
+
+        response = fake_request(self.stubs, self.mdinst,
+                                "/2009-04-04/user-data",
+                                headers={'If-None-Match':
+                                         '"%s"' % response.etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('', response.body)
+
+    def test_etag_non_ascii(self):
+        sgroups = [dict(test_security_group.fake_secgroup,
+                        name=u'sg-\xe9t\xe9')]
+        mdinst = fake_InstanceMetadata(self.stubs, self.instance,
+                                       sgroups=sgroups)
+        response = fake_request(self.stubs, mdinst,
+                                "/2009-04-04/meta-data/security-groups")
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('sg-\xc3\xa9t\xc3\xa9', response.body)
+        self.assertEqual(hashlib.md5(response.body).hexdigest(),
+                         response.etag)
+
+    def test_random_seed_no_etag(self):
+        response = fake_request(self.stubs, self.mdinst,
+                                "/openstack/latest/meta_data.json")
+        self.assertEqual(200, response.status_int)
+        self.assertIsNone(response.etag)
+
     def test_root(self):
         expected = "\n".join(base.VERSIONS) + "\nlatest"
         response = fake_request(self.stubs, self.mdinst, "/")
@@ -753,6 +864,82 @@ class MetadataHandlerTestCase(test.TestCase):
         self.assertEqual(response.status_int, 500)
 
 
+class MetadataCacheTestCase(test.NoDBTestCase):
+    """Test the caching of metadata by the handler."""
+
+    def setUp(self):
+        super(MetadataCacheTestCase, self).setUp()
+        self.stubs.Set(metadata_cache, '_client', memorycache.Client())
+        self.app = handler.MetadataRequestHandler()
+        self.built = []
+        self.stubs.Set(base, 'get_metadata_by_address', self._build)
+
+    def _build(self, conductor_api, address):
+        data = FakeCachedMetadata(INSTANCE['uuid'], address)
+        data.cache_generation = metadata_cache.get_generation(data.uuid)
+        self.built.append(data)
+        return data
+
+    def test_cached(self):
+        data = self.app.get_metadata_by_remote_address('10.0.0.2')
+        self.assertIs(data,
+                      self.app.get_metadata_by_remote_address('10.0.0.2'))
+        self.assertEqual(1, len(self.built))
+
+    def test_cache_disabled(self):
+        self.flags(metadata_cache_expiration=0)
+        self.app.get_metadata_by_remote_address('10.0.0.2')
+        self.app.get_metadata_by_remote_address('10.0.0.2')
+        self.assertEqual(2, len(self.built))
+
+    def test_invalidate(self):
+        data = self.app.get_metadata_by_remote_address('10.0.0.2')
+        metadata_cache.invalidate(INSTANCE['uuid'])
+        rebuilt = self.app.get_metadata_by_remote_address('10.0.0.2')
+        self.assertIsNot(data, rebuilt)
+        self.assertIs(rebuilt,
+                      self.app.get_metadata_by_remote_address('10.0.0.2'))
+
+        metadata_cache.invalidate('other-uuid')
+        self.assertIs(rebuilt,
+                      self.app.get_metadata_by_remote_address('10.0.0.2'))
+
+    def test_prefetch(self):
+        self.flags(metadata_cache_prefetch=10)
+        siblings = [FakeCachedMetadata('uuid-2', '10.0.0.3'),
+                    FakeCachedMetadata('uuid-3', None)]
+        calls = []
+
+        def fake_get_metadata_by_reservation(conductor_api, instance, limit):
+            calls.append((instance['reservation_id'], limit))
+            return iter(siblings)
+
+        self.stubs.Set(base, 'get_metadata_by_reservation',
+                       fake_get_metadata_by_reservation)
+        self.stubs.Set(handler.utils, 'spawn_n',
+                       lambda func, *args: func(*args))
+
+        self.app.get_metadata_by_remote_address('10.0.0.2')
+        self.assertEqual([('r-xxxxxxxx', 10)], calls)
+        self.assertIs(siblings[0],
+                      self.app.get_metadata_by_remote_address('10.0.0.3'))
+        self.assertIs(siblings[1],
+                      self.app.get_metadata_by_instance_id('uuid-3', None))
+        self.assertEqual(1, len(self.built))
+
+        # The other instances of the reservation don't prefetch again.
+        self.app.get_metadata_by_remote_address('10.0.0.4')
+        self.assertEqual(1, len(calls))
+
+
+class FakeCachedMetadata(object):
+    def __init__(self, uuid, address):
+        self.uuid = uuid
+        self.address = address
+        self.instance = INSTANCE
+        self.cache_generation = None
+
+
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
         super(MetadataPasswordTestCase, self).setUp()
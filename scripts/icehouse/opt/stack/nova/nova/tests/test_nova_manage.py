@@ -14,6 +14,7 @@
 #    under the License.
 
 import fixtures
+import mox
 import StringIO
 import sys
 
@@ -407,3 +408,81 @@ class ServiceCommandsTestCase(test.TestCase):
 
     def test_service_disable_invalid_params(self):
         self.assertEqual(2, self.commands.disable('nohost', 'noservice'))
+
+    def test_service_periodic_tasks_invalid_params(self):
+        self.assertEqual(2, self.commands.periodic_tasks('nohost',
+                                                         'noservice'))
+
+    def test_service_periodic_tasks(self):
+        db.service_create(context.get_admin_context(),
+                          {'host': 'host1', 'binary': 'nova-compute',
+                           'topic': 'compute', 'report_count': 0})
+        stats = {'_poll_volume_usage': {
+                     'spacing': 60, 'budget': 60, 'deferred': False,
+                     'runs': 2, 'errors': 1, 'overruns': 0, 'deferrals': 1,
+                     'last_run': '2014-01-01T00:01:00.000000',
+                     'next_run': '2014-01-01T00:02:00.000000',
+                     'last_duration': 0.5, 'max_duration': 1.5,
+                     'total_duration': 2.0},
+                 'update_available_resource': {
+                     'spacing': None, 'budget': 60, 'deferred': False,
+                     'runs': 0, 'errors': 0, 'overruns': 0, 'deferrals': 0,
+                     'last_run': None, 'next_run': None,
+                     'last_duration': None, 'max_duration': 0.0,
+                     'total_duration': 0.0}}
+        self.mox.StubOutWithMock(manage.baserpc.BaseAPI,
+                                 'get_periodic_task_stats')
+        manage.baserpc.BaseAPI.get_periodic_task_stats(
+                mox.IgnoreArg(), 'host1').AndReturn(stats)
+        self.mox.ReplayAll()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+
+        self.commands.periodic_tasks('host1', 'nova-compute')
+
+        lines = [line.split() for line in sys.stdout.getvalue().splitlines()]
+        self.assertEqual(['_poll_volume_usage', '60', '2', '1', '0', '1',
+                          '1.00', '1.50', '2014-01-01T00:02:00.000000'],
+                         lines[1])
+        self.assertEqual(['update_available_resource', '-', '0', '0', '0',
+                          '0', '-', '0.00', 'every', 'pass'], lines[2])
+
+
+class SchedulerCommandsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(SchedulerCommandsTestCase, self).setUp()
+        self.commands = manage.SchedulerCommands()
+
+    def test_stats(self):
+        stats = {'since': '2014-01-01T00:00:00.000000',
+                 'sample_rate': 0.05,
+                 'time_buckets': [1, 10],
+                 'reject_buckets': [0, 50, 99.999],
+                 'filters': {'RamFilter': {
+                     'runs': 2, 'time': 0.004, 'max_time': 0.003,
+                     'time_histogram': [1, 1, 0],
+                     'objects_in': 20, 'objects_out': 5,
+                     'reject_histogram': [0, 0, 2, 0]}},
+                 'weighers': {'RAMWeigher': {
+                     'runs': 1, 'time': 0.001, 'max_time': 0.001,
+                     'time_histogram': [1, 0, 0],
+                     'objects_in': 5}}}
+        self.mox.StubOutWithMock(manage.scheduler_rpcapi.SchedulerAPI,
+                                 'get_scheduler_stats')
+        manage.scheduler_rpcapi.SchedulerAPI.get_scheduler_stats(
+                mox.IgnoreArg(), host='sched1', reset=True).AndReturn(stats)
+        self.mox.ReplayAll()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+
+        self.commands.stats(host='sched1', reset=True)
+
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertIn(['RamFilter', '2', '2.00', '3.00', '10.0', '2.5'],
+                      [line.split() for line in lines])
+        self.assertIn(['RAMWeigher', '1', '1.00', '1.00', '5.0', '-'],
+                      [line.split() for line in lines])
+        self.assertIn(['Hosts', 'rejected', '0%', '<=50%', '<100%', '100%'],
+                      [line.split() for line in lines])
+        self.assertIn(['RamFilter', '0', '0', '2', '0'],
+                      [line.split() for line in lines])
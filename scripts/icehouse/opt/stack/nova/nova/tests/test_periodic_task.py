@@ -0,0 +1,192 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the schedule and statistics of the periodic tasks.
+"""
+
+import datetime
+
+import mock
+
+from nova.openstack.common import periodic_task
+from nova.openstack.common import timeutils
+from nova import test
+
+
+class FakeTasks(periodic_task.PeriodicTasks):
+    def __init__(self, test_case):
+        self.test_case = test_case
+        self.ran = []
+        # Run the tasks in a known order, and keep the last runs of the
+        # class, which running the tasks updates, apart from other tests.
+        self._periodic_tasks = sorted(self._periodic_tasks)
+        self._periodic_last_run = dict(
+            (name, task._periodic_last_run)
+            for name, task in self._periodic_tasks)
+
+    def _run(self, name):
+        self.ran.append(name)
+        self.test_case.advance(self.test_case.durations.get(name, 0))
+        if name in self.test_case.failing:
+            raise test.TestingException(name)
+
+    @periodic_task.periodic_task
+    def a_every_pass(self, context):
+        self._run('a_every_pass')
+
+    @periodic_task.periodic_task(spacing=600, run_immediately=True)
+    def b_immediate(self, context):
+        self._run('b_immediate')
+
+    @periodic_task.periodic_task(spacing=600, run_immediately=True)
+    def c_immediate(self, context):
+        self._run('c_immediate')
+
+    @periodic_task.periodic_task(spacing=600)
+    def d_spaced(self, context):
+        self._run('d_spaced')
+
+    @periodic_task.periodic_task(spacing=600, run_immediately=True,
+                                 budget=1)
+    def e_budgeted(self, context):
+        self._run('e_budgeted')
+
+
+class PeriodicTaskTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(PeriodicTaskTestCase, self).setUp()
+        self.flags(periodic_task_initial_spread=False,
+                   periodic_task_jitter=0,
+                   periodic_task_pass_budget=0)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.started = timeutils.utcnow()
+        self.seconds = 1000.0
+        patcher = mock.patch.object(periodic_task.time, 'time',
+                                    side_effect=lambda: self.seconds)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.durations = {}
+        self.failing = set()
+        self.tasks = FakeTasks(self)
+
+    def advance(self, seconds):
+        timeutils.advance_time_seconds(seconds)
+        self.seconds += seconds
+
+    def _state(self, name):
+        return self.tasks._periodic_task_state()[name]
+
+    def test_initial_spread(self):
+        self.flags(periodic_task_initial_spread=True)
+        with mock.patch.object(periodic_task.random, 'uniform',
+                               return_value=5) as uniform:
+            self.assertEqual(self.started + datetime.timedelta(seconds=5),
+                             self._state('d_spaced')['next_run'])
+        uniform.assert_called_once_with(0, 600)
+        self.assertIsNone(self._state('a_every_pass')['next_run'])
+        self.assertIsNone(self._state('b_immediate')['next_run'])
+
+    def test_no_initial_spread(self):
+        self.assertEqual(FakeTasks.d_spaced._periodic_last_run +
+                         datetime.timedelta(seconds=600),
+                         self._state('d_spaced')['next_run'])
+
+    def test_jitter(self):
+        self.flags(periodic_task_jitter=0.1)
+        with mock.patch.object(periodic_task.random, 'uniform',
+                               return_value=0.05) as uniform:
+            self.tasks.run_periodic_tasks(None)
+        uniform.assert_called_with(-0.1, 0.1)
+        self.assertEqual(self.started + datetime.timedelta(seconds=630),
+                         self._state('b_immediate')['next_run'])
+
+    def test_idle_for(self):
+        self.assertEqual(60, self.tasks.run_periodic_tasks(None))
+        self.assertEqual(['a_every_pass', 'b_immediate', 'c_immediate',
+                          'e_budgeted'], self.tasks.ran)
+        self.assertEqual(1, self._state('b_immediate')['runs'])
+        self.assertEqual(self.started, self._state('b_immediate')['last_run'])
+        self.assertEqual(self.started + datetime.timedelta(seconds=600),
+                         self._state('b_immediate')['next_run'])
+
+    def test_pass_budget_defers_and_resumes(self):
+        self.flags(periodic_task_pass_budget=1)
+        self.durations['a_every_pass'] = 2
+
+        # The every-pass task uses up the budget, the due tasks after it
+        # are left for the next pass.
+        self.assertEqual(0, self.tasks.run_periodic_tasks(None))
+        self.assertEqual(['a_every_pass'], self.tasks.ran)
+        for name in ('b_immediate', 'c_immediate', 'e_budgeted'):
+            self.assertTrue(self._state(name)['deferred'])
+            self.assertEqual(1, self._state(name)['deferrals'])
+            self.assertEqual(0, self._state(name)['runs'])
+        self.assertFalse(self._state('d_spaced')['deferred'])
+        self.assertEqual(0, self._state('d_spaced')['deferrals'])
+
+        # The deferred tasks run first, the every-pass task which ran two
+        # seconds ago is due again in 58 seconds.
+        self.tasks.ran = []
+        self.assertEqual(58, self.tasks.run_periodic_tasks(None))
+        self.assertEqual(['b_immediate', 'c_immediate', 'e_budgeted'],
+                         self.tasks.ran)
+        for name in ('b_immediate', 'c_immediate', 'e_budgeted'):
+            self.assertFalse(self._state(name)['deferred'])
+            self.assertEqual(1, self._state(name)['runs'])
+        self.assertEqual(1, self._state('a_every_pass')['runs'])
+
+        # The next pass is a full one again.
+        self.tasks.ran = []
+        self.assertEqual(60, self.tasks.run_periodic_tasks(None))
+        self.assertEqual(['a_every_pass'], self.tasks.ran)
+
+    def test_overruns(self):
+        self.durations['e_budgeted'] = 2
+        self.durations['b_immediate'] = 0.5
+        self.tasks.run_periodic_tasks(None)
+        state = self._state('e_budgeted')
+        self.assertEqual(1, state['overruns'])
+        self.assertEqual(2, state['last_duration'])
+        self.assertEqual(2, state['max_duration'])
+        self.assertEqual(2, state['total_duration'])
+        self.assertEqual(0, self._state('b_immediate')['overruns'])
+        self.assertEqual(0.5, self._state('b_immediate')['last_duration'])
+
+    def test_errors(self):
+        self.failing.add('b_immediate')
+        self.tasks.run_periodic_tasks(None)
+        self.assertEqual(['a_every_pass', 'b_immediate', 'c_immediate',
+                          'e_budgeted'], self.tasks.ran)
+        self.assertEqual(1, self._state('b_immediate')['errors'])
+        self.assertEqual(1, self._state('b_immediate')['runs'])
+        self.assertEqual(0, self._state('c_immediate')['errors'])
+
+    def test_errors_raised(self):
+        self.failing.add('b_immediate')
+        self.assertRaises(test.TestingException,
+                          self.tasks.run_periodic_tasks, None,
+                          raise_on_error=True)
+        self.assertEqual(['a_every_pass', 'b_immediate'], self.tasks.ran)
+        self.assertEqual(1, self._state('b_immediate')['errors'])
+        self.assertEqual(1, self._state('b_immediate')['runs'])
+
+    def test_get_periodic_task_stats(self):
+        self.tasks.run_periodic_tasks(None)
+        stats = self.tasks.get_periodic_task_stats()
+        self.assertEqual(timeutils.strtime(self.started),
+                         stats['b_immediate']['last_run'])
+        self.assertIsNone(stats['d_spaced']['last_run'])
+        self.assertEqual(1, stats['a_every_pass']['runs'])
@@ -1966,6 +1966,29 @@ class DbQuotaDriverTestCase(test.TestCase):
                 ])
         self.assertEqual(result, ['resv-1', 'resv-2', 'resv-3'])
 
+    def test_reserve_compare_and_swap(self):
+        def fake_quota_reserve(context, resources, quotas, user_quotas, deltas,
+                               expire, until_refresh, max_age, project_id=None,
+                               user_id=None):
+            self.calls.append(('quota_reserve_compare_and_swap', expire,
+                               until_refresh, max_age))
+            return ['resv-1']
+        self.stubs.Set(db, 'quota_reserve_compare_and_swap',
+                       fake_quota_reserve)
+        self._stub_get_project_quotas()
+        self._stub_quota_reserve()
+        self.flags(quota_compare_and_swap=True)
+        expire = timeutils.utcnow() + datetime.timedelta(seconds=120)
+        result = self.driver.reserve(FakeContext('test_project', 'test_class'),
+                                     quota.QUOTAS._resources,
+                                     dict(instances=2), expire=expire)
+
+        self.assertEqual(self.calls, [
+                'get_project_quotas',
+                ('quota_reserve_compare_and_swap', expire, 0, 0),
+                ])
+        self.assertEqual(result, ['resv-1'])
+
     def test_usage_reset(self):
         calls = []
 
@@ -2120,6 +2143,8 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                        fake_get_project_user_quota_usages)
         self.stubs.Set(sqa_api, '_quota_usage_create', fake_quota_usage_create)
         self.stubs.Set(sqa_api, '_reservation_create', fake_reservation_create)
+        self.stubs.Set(sqa_api, '_project_quota_usages_sync',
+                       lambda context, session, project_id: None)
 
         self.useFixture(test.TimeOverride())
 
@@ -0,0 +1,92 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For filter and weigher statistics.
+"""
+
+from nova.scheduler import filters
+from nova.scheduler import weights
+from nova import stats
+from nova import test
+
+
+class OddFilter(filters.BaseHostFilter):
+    def host_passes(self, host_state, filter_properties):
+        return host_state % 2 == 1
+
+
+class NoneFilter(filters.BaseHostFilter):
+    def host_passes(self, host_state, filter_properties):
+        return False
+
+
+class IdentityWeigher(weights.BaseHostWeigher):
+    def _weigh_object(self, host_state, weight_properties):
+        return host_state
+
+
+class StatsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(StatsTestCase, self).setUp()
+        self.stubs.Set(stats, '_STATS', stats.HandlerStats())
+        self.flags(filter_stats_sample_rate=1)
+
+    def test_should_sample(self):
+        self.assertTrue(stats.should_sample())
+        self.flags(filter_stats_sample_rate=0)
+        self.assertFalse(stats.should_sample())
+
+    def test_histograms(self):
+        stats.record_filter('Fake', 0.0005, 10, 10)
+        stats.record_filter('Fake', 0.003, 10, 9)
+        stats.record_filter('Fake', 0.08, 10, 1)
+        stats.record_filter('Fake', 2, 10, 0)
+        entry = stats.get_stats()['filters']['Fake']
+        self.assertEqual(4, entry['runs'])
+        self.assertEqual(40, entry['objects_in'])
+        self.assertEqual(20, entry['objects_out'])
+        self.assertEqual(2, entry['max_time'])
+        self.assertEqual([1, 1, 0, 0, 1, 0, 0, 1], entry['time_histogram'])
+        self.assertEqual([1, 1, 0, 0, 1, 1], entry['reject_histogram'])
+
+    def test_reset(self):
+        stats.record_weigher('Fake', 0.001, 10)
+        self.assertIn('Fake', stats.get_stats(reset=True)['weighers'])
+        self.assertEqual({}, stats.get_stats()['weighers'])
+
+    def test_filter_handler_records(self):
+        handler = filters.HostFilterHandler()
+        self.assertEqual([], handler.get_filtered_objects(
+                [OddFilter, NoneFilter, OddFilter], range(4), {}))
+        result = stats.get_stats()['filters']
+        self.assertEqual(['NoneFilter', 'OddFilter'], sorted(result))
+        self.assertEqual(4, result['OddFilter']['objects_in'])
+        self.assertEqual(2, result['OddFilter']['objects_out'])
+        self.assertEqual(2, result['NoneFilter']['objects_in'])
+        self.assertEqual(0, result['NoneFilter']['objects_out'])
+
+    def test_filter_handler_not_sampled(self):
+        self.flags(filter_stats_sample_rate=0)
+        handler = filters.HostFilterHandler()
+        handler.get_filtered_objects([OddFilter], range(4), {})
+        self.assertEqual({}, stats.get_stats()['filters'])
+
+    def test_weight_handler_records(self):
+        handler = weights.HostWeightHandler()
+        handler.get_weighed_objects([IdentityWeigher], range(5), {})
+        entry = stats.get_stats()['weighers']['IdentityWeigher']
+        self.assertEqual(1, entry['runs'])
+        self.assertEqual(5, entry['objects_in'])
+        self.assertNotIn('objects_out', entry)
@@ -636,6 +636,24 @@ class IntLikeTestCase(test.NoDBTestCase):
         self.assertFalse(utils.is_int_like("a1"))
 
 
+class RegexPrefixTestCase(test.NoDBTestCase):
+
+    def test_regex_prefix(self):
+        self.assertEqual(('web', False), utils.regex_prefix('^web'))
+        self.assertEqual(('web-1', True), utils.regex_prefix('^web-1$'))
+        self.assertEqual(('10.0.0.2', True),
+                         utils.regex_prefix('^10\\.0\\.0\\.2$'))
+
+        self.assertIsNone(utils.regex_prefix(None))
+        self.assertIsNone(utils.regex_prefix('web'))
+        self.assertIsNone(utils.regex_prefix('^'))
+        self.assertIsNone(utils.regex_prefix('^w.b'))
+        self.assertIsNone(utils.regex_prefix('^web\\d'))
+        self.assertIsNone(utils.regex_prefix('^webs?'))
+        self.assertIsNone(utils.regex_prefix('^a$b'))
+        self.assertIsNone(utils.regex_prefix('^a|b'))
+
+
 class MetadataToDictTestCase(test.NoDBTestCase):
     def test_metadata_to_dict(self):
         self.assertEqual(utils.metadata_to_dict(
@@ -21,6 +21,7 @@ import json
 import os
 import time
 
+import mock
 from oslo.config import cfg
 
 from nova import conductor
@@ -880,3 +881,63 @@ class VerifyChecksumTestCase(test.NoDBTestCase):
             # Checksum requests for a file with no checksum now have the
             # side effect of creating the checksum
             self.assertTrue(os.path.exists(info_fname))
+
+    def _verify_twice(self, tmpdir, change_file=False):
+        self.flags(checksum_interval_seconds=0, group='libvirt')
+        image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+        self.assertTrue(image_cache_manager._verify_checksum(self.img, fname))
+        if change_file:
+            with open(fname, 'a') as f:
+                f.write('corrupt')
+
+        hashed = []
+
+        def fake_hash_file(filename, max_bytes_per_second=0):
+            hashed.append(filename)
+            return 'changed'
+
+        self.stubs.Set(imagecache, '_hash_file', fake_hash_file)
+        return image_cache_manager._verify_checksum(self.img, fname), hashed
+
+    def test_verify_checksum_unchanged_not_read(self):
+        with utils.tempdir() as tmpdir:
+            res, hashed = self._verify_twice(tmpdir)
+            self.assertTrue(res)
+            self.assertEqual([], hashed)
+
+    def test_verify_checksum_changed_read(self):
+        with utils.tempdir() as tmpdir:
+            res, hashed = self._verify_twice(tmpdir, change_file=True)
+            self.assertFalse(res)
+            self.assertEqual(1, len(hashed))
+
+    def test_verify_checksum_unchanged_read(self):
+        self.flags(checksum_unchanged_base_images=True, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            res, hashed = self._verify_twice(tmpdir)
+            self.assertFalse(res)
+            self.assertEqual(1, len(hashed))
+
+    def test_verify_checksums(self):
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            missing = os.path.join(tmpdir, 'bbb')
+            image_cache_manager._verify_checksums([('42', fname),
+                                                   ('43', missing)])
+            self.assertEqual({fname: True},
+                             image_cache_manager.checksum_results)
+
+            # The image is not checksummed again when it is handled.
+            self.stubs.Set(image_cache_manager, '_verify_checksum', None)
+            image_cache_manager._handle_base_image('42', fname)
+            self.assertEqual([], image_cache_manager.corrupt_base_files)
+
+    def test_hash_file_max_rate(self):
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            with mock.patch.object(imagecache.native_time, 'sleep') as sleep:
+                checksum = imagecache._hash_file(fname, 10)
+            self.assertEqual(hashlib.sha1(open(fname).read()).hexdigest(),
+                             checksum)
+            self.assertTrue(sleep.called)
+            self.assertTrue(7 < sleep.call_args[0][0] <= 8)
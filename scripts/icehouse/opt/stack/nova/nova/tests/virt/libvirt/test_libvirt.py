@@ -2476,6 +2476,42 @@ class LibvirtConnTestCase(test.TestCase):
         # Only one should be listed, since domain with ID 0 must be skipped
         self.assertEqual(len(instances), 1)
 
+    def test_list_instance_power_states(self):
+        def fake_domain(domain_id, uuid, state):
+            domain = mock.Mock()
+            domain.ID.return_value = domain_id
+            domain.UUIDString.return_value = uuid
+            domain.info.return_value = [state, 0, 0, 1, 0]
+            return domain
+
+        deleted = fake_domain(3, 'deleted', libvirt_driver.VIR_DOMAIN_RUNNING)
+        deleted.info.side_effect = libvirt.libvirtError('deleted')
+        domains = [fake_domain(0, 'hypervisor',
+                               libvirt_driver.VIR_DOMAIN_RUNNING),
+                   fake_domain(1, 'running',
+                               libvirt_driver.VIR_DOMAIN_BLOCKED),
+                   fake_domain(-1, 'defined',
+                               libvirt_driver.VIR_DOMAIN_SHUTOFF),
+                   deleted]
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        with contextlib.nested(
+                mock.patch.object(conn, 'has_min_version', return_value=True),
+                mock.patch.object(libvirt_driver.LibvirtDriver, '_conn'),
+                mock.patch.object(libvirt.libvirtError, 'get_error_code',
+                                  return_value=libvirt.VIR_ERR_NO_DOMAIN)
+        ) as (has_min_version, fake_conn, get_error_code):
+            fake_conn.listAllDomains.return_value = domains
+            self.assertEqual({'running': power_state.RUNNING,
+                              'defined': power_state.SHUTDOWN},
+                             conn.list_instance_power_states())
+            fake_conn.listAllDomains.assert_called_once_with(0)
+
+    def test_list_instance_power_states_old_libvirt(self):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.stubs.Set(conn, 'has_min_version', lambda ver: False)
+        self.assertRaises(NotImplementedError,
+                          conn.list_instance_power_states)
+
     def test_list_defined_instances(self):
         self.mox.StubOutWithMock(libvirt_driver.LibvirtDriver, '_conn')
         libvirt_driver.LibvirtDriver._conn.lookupByID = self.fake_lookup
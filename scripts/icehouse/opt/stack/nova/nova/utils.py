@@ -495,6 +495,39 @@ def is_int_like(val):
         return False
 
 
+def regex_prefix(pattern):
+    """Return a (prefix, exact) tuple if the regular expression pattern only
+    matches strings starting with a literal prefix, None otherwise.
+
+    Only patterns anchored with ^ and made of literal characters, escaped
+    or not, are recognized.  exact is True when the pattern is anchored
+    with $ as well and so only matches the prefix itself.
+    """
+    if not isinstance(pattern, six.string_types) or pattern[:1] != '^':
+        return None
+    prefix = []
+    exact = False
+    i = 1
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 1
+            # Escaped letters and digits are classes or back references.
+            if i == len(pattern) or pattern[i].isalnum():
+                return None
+            prefix.append(pattern[i])
+        elif char == '$' and i == len(pattern) - 1:
+            exact = True
+        elif char in '.^$*+?{}[]|()':
+            return None
+        else:
+            prefix.append(char)
+        i += 1
+    if not prefix:
+        return None
+    return ''.join(prefix), exact
+
+
 def is_valid_ipv4(address):
     """Verify that address represents a valid IPv4 address."""
     try:
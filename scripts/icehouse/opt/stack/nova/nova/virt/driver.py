@@ -229,6 +229,18 @@ class ComputeDriver(object):
         """
         raise NotImplementedError()
 
+    def list_instance_power_states(self):
+        """Return the power states of all the instances known to the
+        virtualization layer.
+
+        Drivers which can list all their instances with their state in one
+        call should implement this, so the compute manager does not have to
+        call get_info() for every instance.
+
+        :returns: a dict of instance UUID to power_state code
+        """
+        raise NotImplementedError()
+
     def rebuild(self, context, instance, image_meta, injected_files,
                 admin_password, bdms, detach_block_devices,
                 attach_block_devices, network_info=None,
@@ -343,6 +343,8 @@ MIN_QEMU_LIVESNAPSHOT_VERSION = (1, 3, 0)
 MIN_LIBVIRT_BLOCKIO_VERSION = (0, 10, 2)
 # BlockJobInfo management requirement
 MIN_LIBVIRT_BLOCKJOBINFO_VERSION = (1, 1, 1)
+# listAllDomains requirement
+MIN_LIBVIRT_LIST_ALL_DOMAINS_VERSION = (0, 9, 13)
 
 
 def libvirt_error_handler(context, err):
@@ -855,6 +857,25 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return list(uuids)
 
+    def list_instance_power_states(self):
+        if not self.has_min_version(MIN_LIBVIRT_LIST_ALL_DOMAINS_VERSION):
+            raise NotImplementedError()
+        states = {}
+        # One call lists the running and the defined domains.
+        for domain in self._conn.listAllDomains(0):
+            # We skip domains with ID 0 (hypervisors).
+            if domain.ID() == 0:
+                continue
+            try:
+                state = domain.info()[0]
+            except libvirt.libvirtError as ex:
+                if ex.get_error_code() == libvirt.VIR_ERR_NO_DOMAIN:
+                    # Ignore deleted instance while listing
+                    continue
+                raise
+            states[domain.UUIDString()] = LIBVIRT_POWER_STATE[state]
+        return states
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         for vif in network_info:
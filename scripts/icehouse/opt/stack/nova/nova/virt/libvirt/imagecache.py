@@ -26,6 +26,9 @@ import os
 import re
 import time
 
+from eventlet import greenpool
+from eventlet import patcher
+from eventlet import tpool
 from oslo.config import cfg
 
 from nova.openstack.common import fileutils
@@ -33,6 +36,7 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import processutils
+from nova.openstack.common import units
 from nova import utils
 from nova.virt import imagecache
 from nova.virt.libvirt import utils as virtutils
@@ -66,6 +70,21 @@ imagecache_opts = [
                default=3600,
                help='How frequently to checksum base images',
                deprecated_group='DEFAULT'),
+    cfg.BoolOpt('checksum_unchanged_base_images',
+                default=False,
+                help='Also checksum the base images which have kept the '
+                     'size and inode they had when their checksum was last '
+                     'verified, every checksum_interval_seconds.  Only this '
+                     'detects corruption of the data on disk, but it reads '
+                     'every base image again.'),
+    cfg.IntOpt('checksum_threads',
+               default=2,
+               help='Number of base images checksummed at the same time'),
+    cfg.IntOpt('checksum_max_mb_per_second',
+               default=0,
+               help='Maximum rate in MB per second at which base images are '
+                    'read to checksum them, shared by the checksum threads.  '
+                    '0 means no limit.'),
     ]
 
 CONF = cfg.CONF
@@ -73,6 +92,8 @@ CONF.register_opts(imagecache_opts, 'libvirt')
 CONF.import_opt('instances_path', 'nova.compute.manager')
 CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
 
+native_time = patcher.original('time')
+
 
 def get_cache_fname(images, key):
     """Return a filename based on the SHA1 hash of a given image ID.
@@ -214,15 +235,38 @@ def write_stored_info(target, field=None, value=None):
     write_file(info_file, field, value)
 
 
-def _hash_file(filename):
-    """Generate a hash for the contents of a file."""
+def _hash_file(filename, max_bytes_per_second=0):
+    """Generate a hash for the contents of a file.
+
+    If max_bytes_per_second is set, the file is read no faster than that.
+    This sleeps in the calling thread, which must be a native one.
+    """
     checksum = hashlib.sha1()
+    started = native_time.time()
+    read = 0
     with open(filename) as f:
         for chunk in iter(lambda: f.read(32768), b''):
             checksum.update(chunk)
+            if max_bytes_per_second:
+                read += len(chunk)
+                delay = (float(read) / max_bytes_per_second -
+                         (native_time.time() - started))
+                if delay > 0:
+                    native_time.sleep(delay)
     return checksum.hexdigest()
 
 
+def _file_identity(filename):
+    """Return what tells whether a base file has changed since it was
+    checksummed.
+
+    The modification time does not, as in-use base images are touched on
+    every pass of the image cache manager to age them.
+    """
+    st = os.stat(filename)
+    return [st.st_size, st.st_ino]
+
+
 def read_stored_checksum(target, timestamped=True):
     """Read the checksum.
 
@@ -254,6 +298,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.originals = []
         self.removable_base_files = []
         self.unexplained_images = []
+        self.checksum_results = {}
 
     def _store_image(self, base_dir, ent, original=False):
         """Store a base image for later examination."""
@@ -287,6 +332,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def _list_backing_images(self):
         """List the backing images currently in use."""
         inuse_images = []
+        seen = set()
         for ent in os.listdir(CONF.instances_path):
             if ent in self.instance_names:
                 LOG.debug(_('%s is a valid instance name'), ent)
@@ -314,7 +360,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                             CONF.instances_path,
                             CONF.image_cache_subdirectory_name,
                             backing_file)
-                        if backing_path not in inuse_images:
+                        if backing_path not in seen:
+                            seen.add(backing_path)
                             inuse_images.append(backing_path)
 
                         if backing_path in self.unexplained_images:
@@ -388,7 +435,11 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     write_stored_info(base_file, field='sha1',
                                       value=stored_checksum)
 
-                current_checksum = _hash_file(base_file)
+                identity = _file_identity(base_file)
+                if self._verified_unchanged(base_file, identity):
+                    return True
+
+                current_checksum = self._hash_file(base_file)
 
                 if current_checksum != stored_checksum:
                     LOG.error(_('image %(id)s at (%(base_file)s): image '
@@ -398,6 +449,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     return False
 
                 else:
+                    write_stored_info(base_file, field='sha1-verified',
+                                      value=identity)
                     return True
 
             else:
@@ -413,12 +466,52 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     LOG.info(_('%(id)s (%(base_file)s): generating checksum'),
                              {'id': img_id,
                               'base_file': base_file})
-                    write_stored_checksum(base_file)
+                    identity = _file_identity(base_file)
+                    write_stored_info(base_file, field='sha1',
+                                      value=self._hash_file(base_file))
+                    write_stored_info(base_file, field='sha1-verified',
+                                      value=identity)
 
                 return None
 
         return inner_verify_checksum()
 
+    def _verified_unchanged(self, base_file, identity):
+        """Return True if the base file has not changed since its checksum
+        was last verified, and does not need to be checksummed again.
+        """
+        verified, verified_timestamp = read_stored_info(
+            base_file, field='sha1-verified', timestamped=True)
+        if verified != identity:
+            return False
+        return (not CONF.libvirt.checksum_unchanged_base_images or
+                (verified_timestamp and
+                 time.time() - verified_timestamp <
+                    CONF.libvirt.checksum_interval_seconds))
+
+    def _hash_file(self, base_file):
+        """Checksum a base file in a native thread, so that the other
+        greenthreads keep running, at the configured rate.
+        """
+        threads = max(1, CONF.libvirt.checksum_threads)
+        rate = CONF.libvirt.checksum_max_mb_per_second * units.Mi / threads
+        return tpool.execute(_hash_file, base_file, rate)
+
+    def _verify_checksums(self, images):
+        """Verify the checksums of a list of (image id, base file), a few
+        base files at a time, and keep the results for _handle_base_image.
+        """
+        if not CONF.libvirt.checksum_base_images:
+            return
+        images = [(img_id, base_file) for img_id, base_file in images
+                  if os.path.isfile(base_file)]
+        pool = greenpool.GreenPool(max(1, CONF.libvirt.checksum_threads))
+        results = pool.imap(self._verify_checksum,
+                            [img_id for img_id, base_file in images],
+                            [base_file for img_id, base_file in images])
+        for (img_id, base_file), result in zip(images, results):
+            self.checksum_results[base_file] = result
+
     def _remove_base_file(self, base_file):
         """Remove a single base file if it is old enough.
 
@@ -469,7 +562,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 and os.path.isfile(base_file)):
             # _verify_checksum returns True if the checksum is ok, and None if
             # there is no checksum file
-            checksum_result = self._verify_checksum(img_id, base_file)
+            if base_file in self.checksum_results:
+                checksum_result = self.checksum_results[base_file]
+            else:
+                checksum_result = self._verify_checksum(img_id, base_file)
             if checksum_result is not None:
                 image_bad = not checksum_result
 
@@ -524,17 +620,26 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def _age_and_verify_cached_images(self, context, all_instances, base_dir):
         LOG.debug(_('Verify base images'))
         # Determine what images are on disk because they're in use
+        found = []
         for img in self.used_images:
             fingerprint = hashlib.sha1(img).hexdigest()
             LOG.debug(_('Image id %(id)s yields fingerprint %(fingerprint)s'),
                       {'id': img,
                        'fingerprint': fingerprint})
             for result in self._find_base_file(base_dir, fingerprint):
-                base_file, image_small, image_resized = result
-                self._handle_base_image(img, base_file)
-
-                if not image_small and not image_resized:
-                    self.originals.append(base_file)
+                # A base file is explained as soon as it is found, as it
+                # was when it was handled right away.
+                if result[0] in self.unexplained_images:
+                    self.unexplained_images.remove(result[0])
+                found.append((img, result))
+
+        self._verify_checksums([(img, base_file)
+                                for img, (base_file, small, resized) in found])
+        for img, (base_file, image_small, image_resized) in found:
+            self._handle_base_image(img, base_file)
+
+            if not image_small and not image_resized:
+                self.originals.append(base_file)
 
         # Elements remaining in unexplained_images might be in use
         inuse_backing_images = self._list_backing_images()
@@ -18,10 +18,12 @@ Pluggable Weighing support
 """
 
 import abc
+import time
 
 import six
 
 from nova import loadables
+from nova import stats
 
 
 def normalize(weight_list, minval=None, maxval=None):
@@ -128,10 +130,26 @@ class BaseWeightHandler(loadables.BaseLoader):
         if not obj_list:
             return []
 
+        weighers = [weigher_cls() for weigher_cls in weigher_classes]
+        weighed_objs = self.weigh_objects(weighers, obj_list,
+                                          weighing_properties)
+        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def weigh_objects(self, weighers, obj_list, weighing_properties):
+        """Return an unsorted, normalized list of WeighedObjects.
+
+        The weighers keep the minval and maxval they normalized with, so
+        they can be passed to reweigh_object() afterwards.
+        """
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
-        for weigher_cls in weigher_classes:
-            weigher = weigher_cls()
+        sampled = stats.should_sample()
+        for weigher in weighers:
+            if sampled:
+                started = time.time()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+            if sampled:
+                stats.record_weigher(weigher.__class__.__name__,
+                                     time.time() - started, len(weighed_objs))
 
             # Normalize the weights
             weights = normalize(weights,
@@ -142,4 +160,23 @@ class BaseWeightHandler(loadables.BaseLoader):
                 obj = weighed_objs[i]
                 obj.weight += weigher.weight_multiplier() * weight
 
-        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+        return weighed_objs
+
+    def reweigh_object(self, weighers, obj, weighing_properties):
+        """Return a new WeighedObject for an object which changed since
+        weigh_objects() weighed it with weighers.
+
+        The weight is normalized against the bounds the weighers recorded
+        then, so it stays comparable with the other objects' weights.
+        """
+        weighed_obj = self.object_class(obj, 0.0)
+        for weigher in weighers:
+            minval, maxval = weigher.minval, weigher.maxval
+            weights = weigher.weigh_objects([weighed_obj],
+                                            weighing_properties)
+            weigher.minval, weigher.maxval = minval, maxval
+
+            for weight in normalize(weights, minval=minval, maxval=maxval):
+                weighed_obj.weight += weigher.weight_multiplier() * weight
+
+        return weighed_obj
@@ -0,0 +1,165 @@
+"""
+Benchmark of the conductor calls made by the periodic tasks of a compute
+host.
+
+A conductor service is run in this process over the fake messaging driver,
+with a generated SQLite database, and the periodic tasks of a compute
+manager which poll bandwidth and volume usage and time out instance builds
+are run against it for a host with the given number of instances.  Each
+instance has one network interface and one volume.  The number of calls
+sent to the conductor and the time they took are reported per task.
+
+With --version-cap 2.0 the compute manager talks to the conductor the way
+it does to an Icehouse conductor, one call per instance or volume.
+
+Examples:
+
+    python tools/conductor_rpc_bench.py --instances 200
+    python tools/conductor_rpc_bench.py --instances 200 --version-cap 2.0
+"""
+import eventlet
+eventlet.monkey_patch(os=False)
+
+import argparse
+import collections
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+from oslo import messaging
+from oslo.messaging._drivers import impl_fake
+from oslo.messaging import conffixture as messaging_conffixture
+
+from nova.compute import manager as compute_manager
+from nova.compute import vm_states
+from nova.conductor import manager as conductor_manager
+from nova import context
+from nova import db
+from nova.db import migration
+from nova.openstack.common import jsonutils
+from nova.openstack.common import timeutils
+from nova import rpc
+
+CONF = cfg.CONF
+CONF.import_opt('compute_driver', 'nova.virt.driver')
+CONF.import_opt('topic', 'nova.conductor.api', group='conductor')
+
+
+def start_conductor():
+    manager = conductor_manager.ConductorManager()
+    target = messaging.Target(topic=CONF.conductor.topic, server=CONF.host)
+    server = rpc.get_server(target, [manager] + manager.additional_endpoints)
+    server.start()
+    return server
+
+
+def count_calls(calls):
+    """Count the messages sent by their method name."""
+    send = impl_fake.FakeDriver._send
+    # NOTE: Messages are serialized with jsonutils by the real drivers,
+    # which also take the datetimes some conductor calls are given.
+    impl_fake.FakeDriver._check_serialize = staticmethod(jsonutils.dumps)
+
+    def counting_send(self, target, ctxt, message, *args, **kwargs):
+        calls[message['method']] += 1
+        return send(self, target, ctxt, message, *args, **kwargs)
+
+    impl_fake.FakeDriver._send = counting_send
+
+
+def make_instances(ctxt, args):
+    created_at = timeutils.utcnow() - datetime.timedelta(hours=1)
+    instances = []
+    for i in xrange(args.instances):
+        instances.append(db.instance_create(ctxt, {
+            'host': CONF.host, 'node': CONF.host, 'project_id': 'bench',
+            'user_id': 'bench', 'vm_state': vm_states.BUILDING,
+            'availability_zone': 'nova', 'created_at': created_at}))
+    return instances
+
+
+def run(args):
+    ctxt = context.get_admin_context()
+    instances = make_instances(ctxt, args)
+    compute = compute_manager.ComputeManager()
+
+    # A driver which reports bandwidth and volume usage.
+    def get_all_bw_counters(instances):
+        return [{'uuid': instance['uuid'], 'mac_address': 'mac-%d' % i,
+                 'bw_in': 1000, 'bw_out': 1000}
+                for i, instance in enumerate(instances)]
+
+    def get_all_volume_usage(context, compute_host_bdms):
+        return [{'volume': 'vol-%d' % i, 'instance': instance,
+                 'rd_req': 1, 'rd_bytes': 512, 'wr_req': 1, 'wr_bytes': 512}
+                for i, instance in enumerate(instances)]
+
+    compute.driver.get_all_bw_counters = get_all_bw_counters
+    compute.driver.get_all_volume_usage = get_all_volume_usage
+    compute._get_host_volume_bdms = lambda context: instances
+
+    def poll_bandwidth_usage():
+        compute._last_bw_usage_poll = 0
+        compute._poll_bandwidth_usage(ctxt)
+
+    tasks = [
+        ('_poll_bandwidth_usage', poll_bandwidth_usage),
+        ('_poll_volume_usage', lambda: compute._poll_volume_usage(ctxt)),
+        ('_check_instance_build_time',
+         lambda: compute._check_instance_build_time(ctxt)),
+    ]
+
+    calls = collections.Counter()
+    count_calls(calls)
+    print('%d instances, conductor version cap %s' % (
+          args.instances, args.version_cap or 'none'))
+    for name, task in tasks:
+        calls.clear()
+        started = time.time()
+        task()
+        elapsed = time.time() - started
+        print('%-28s %5d calls %8.1f ms  %s' % (
+              name, sum(calls.values()), elapsed * 1000,
+              ', '.join('%s %d' % (method, count)
+                        for method, count in sorted(calls.iteritems()))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--instances', type=int, default=200)
+    parser.add_argument('--version-cap', default=None,
+                        help='Conductor RPC version cap, e.g. 2.0')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    messaging_conf = messaging_conffixture.ConfFixture(CONF)
+    messaging_conf.transport_driver = 'fake'
+    messaging_conf.setUp()
+    rpc.init(CONF)
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    CONF.set_override('connection', 'sqlite:///%s' % db_file,
+                      group='database')
+    CONF.set_override('sqlite_synchronous', False, group='database')
+    CONF.set_override('host', 'bench-host')
+    CONF.set_override('compute_driver', 'fake.FakeDriver')
+    CONF.set_override('bandwidth_poll_interval', 1)
+    CONF.set_override('volume_usage_poll_interval', 1)
+    CONF.set_override('instance_build_timeout', 60)
+    if args.version_cap:
+        CONF.set_override('conductor', args.version_cap,
+                          group='upgrade_levels')
+    try:
+        migration.db_sync()
+        server = start_conductor()
+        run(args)
+        server.stop()
+    finally:
+        os.unlink(db_file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
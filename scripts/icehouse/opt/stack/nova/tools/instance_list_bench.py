@@ -0,0 +1,201 @@
+"""
+Benchmark of instance_get_all_by_filters on a generated SQLite database.
+
+The database is created with the nova migrations and filled with instances
+spread over a number of projects, a few percent of them deleted, each with
+an info cache, a security group, metadata and the system metadata of its
+flavor and image.  Each query is run a few times and the best time is
+reported.  The detail lists also report how many model objects the
+database API built for them.
+
+Examples:
+
+    python tools/instance_list_bench.py --db /tmp/instances.db
+    python tools/instance_list_bench.py --db /tmp/instances.db --version 234
+"""
+import argparse
+import collections
+import datetime
+import os
+import random
+import sys
+import time
+import uuid
+
+from oslo.config import cfg
+import sqlalchemy
+from sqlalchemy import orm
+
+from nova import context
+from nova import db
+from nova.db import migration
+from nova.objects import instance as instance_obj
+
+CONF = cfg.CONF
+
+SYSTEM_METADATA = ['image_base_image_ref', 'image_min_disk', 'image_min_ram',
+                   'image_disk_format', 'image_container_format',
+                   'instance_type_id', 'instance_type_name',
+                   'instance_type_memory_mb', 'instance_type_vcpus',
+                   'instance_type_root_gb', 'instance_type_ephemeral_gb',
+                   'instance_type_flavorid', 'instance_type_swap',
+                   'instance_type_rxtx_factor', 'instance_type_vcpu_weight']
+METADATA = ['role', 'owner']
+
+
+def populate(engine, args):
+    gen = random.Random(args.seed)
+    meta = sqlalchemy.MetaData(engine)
+    tables = dict((name, sqlalchemy.Table(name, meta, autoload=True))
+                  for name in ('instances', 'instance_info_caches',
+                               'instance_metadata', 'instance_system_metadata',
+                               'security_groups',
+                               'security_group_instance_association'))
+    engine.execute(tables['security_groups'].insert(),
+                   [dict(id=project + 1, name='default', description='',
+                         deleted=0, user_id='user',
+                         project_id='project-%d' % project)
+                    for project in xrange(args.projects)])
+    start = datetime.datetime(2013, 1, 1)
+    batch = 10000
+    for first in xrange(0, args.instances, batch):
+        rows = collections.defaultdict(list)
+        for i in xrange(first, min(first + batch, args.instances)):
+            instance_uuid = str(uuid.UUID(int=gen.getrandbits(128)))
+            created_at = start + datetime.timedelta(seconds=i * 60)
+            deleted = i + 1 if gen.random() < 0.05 else 0
+            project = gen.randrange(args.projects)
+            rows['instances'].append(dict(
+                id=i + 1, uuid=instance_uuid, created_at=created_at,
+                updated_at=created_at, deleted=deleted,
+                project_id='project-%d' % project, user_id='user',
+                display_name='web-%d' % i, hostname='web-%d' % i,
+                host='compute%d' % gen.randrange(1000),
+                vm_state='active', memory_mb=2048, vcpus=1, root_gb=20,
+                ephemeral_gb=0))
+            rows['instance_info_caches'].append(dict(
+                created_at=created_at, deleted=0,
+                instance_uuid=instance_uuid, network_info='[]'))
+            rows['security_group_instance_association'].append(dict(
+                created_at=created_at, deleted=0,
+                instance_uuid=instance_uuid, security_group_id=project + 1))
+            for key in SYSTEM_METADATA:
+                rows['instance_system_metadata'].append(dict(
+                    created_at=created_at, deleted=0,
+                    instance_uuid=instance_uuid, key=key, value='1'))
+            for key in METADATA:
+                rows['instance_metadata'].append(dict(
+                    created_at=created_at, deleted=0,
+                    instance_uuid=instance_uuid, key=key, value='web'))
+        for name, table_rows in rows.iteritems():
+            engine.execute(tables[name].insert(), table_rows)
+    engine.execute('ANALYZE')
+
+
+def best_time(func, repeat):
+    best = None
+    for i in xrange(repeat):
+        started = time.time()
+        result = func()
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(args):
+    admin = context.get_admin_context()
+    project = context.RequestContext('user', 'project-0', is_admin=False)
+    not_deleted = {'deleted': False}
+
+    def list_page(ctxt, filters, marker=None, sort_key='created_at'):
+        return db.instance_get_all_by_filters(ctxt, dict(filters),
+                                              sort_key, 'desc',
+                                              limit=args.limit,
+                                              marker=marker)
+
+    queries = [
+        ('admin, first page', lambda: list_page(admin, not_deleted)),
+        ('project, first page', lambda: list_page(project, not_deleted)),
+        ('name prefix ^web-1234', lambda: list_page(
+            admin, dict(not_deleted, display_name='^web-1234'))),
+        ('name exact ^web-12345$', lambda: list_page(
+            admin, dict(not_deleted, display_name='^web-12345$'))),
+        ('name regex web-12345', lambda: list_page(
+            admin, dict(not_deleted, display_name='web-12345'))),
+    ]
+    for name, func in queries:
+        elapsed, result = best_time(func, args.repeat)
+        print('%-30s %8.1f ms  %d rows' % (name, elapsed * 1000,
+                                            len(result)))
+
+    # Walk pages with markers, the way API clients list everything.
+    marker = None
+    started = time.time()
+    for page in xrange(args.pages):
+        result = list_page(admin, not_deleted, marker=marker)
+        if not result:
+            break
+        marker = result[-1]['uuid']
+    elapsed = time.time() - started
+    print('%-30s %8.1f ms  per page over %d pages' % (
+          'admin, marker pages', elapsed * 1000 / (page + 1), page + 1))
+
+    # The instance objects of servers/detail and of servers.
+    loaded = collections.Counter()
+
+    def count_load(target, ctxt):
+        loaded[type(target).__name__] += 1
+
+    sqlalchemy.event.listen(orm.Mapper, 'load', count_load)
+    lists = [
+        ('detail list', ['metadata', 'system_metadata', 'info_cache',
+                         'security_groups']),
+        ('brief list', []),
+    ]
+    for name, expected_attrs in lists:
+        elapsed, result = best_time(
+            lambda: instance_obj.InstanceList.get_by_filters(
+                project, dict(not_deleted), limit=args.limit,
+                expected_attrs=list(expected_attrs)), args.repeat)
+        print('%-30s %8.1f ms  %d rows, %d model objects: %s' % (
+              name, elapsed * 1000, len(result),
+              sum(loaded.values()) / args.repeat,
+              ', '.join('%s %d' % (model, count / args.repeat)
+                        for model, count in sorted(loaded.iteritems()))))
+        loaded.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', default='/tmp/nova_instances_bench.db',
+                        help='SQLite database, generated if missing')
+    parser.add_argument('--instances', type=int, default=500000)
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--version', type=int, default=None,
+                        help='Migrate the database to this version first, '
+                             'e.g. 234 to compare without the indexes of '
+                             'migration 235')
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('connection', 'sqlite:///%s' % args.db,
+                      group='database')
+    CONF.set_override('sqlite_synchronous', False, group='database')
+    exists = os.path.exists(args.db)
+    migration.db_sync()
+    if not exists:
+        engine = sqlalchemy.create_engine('sqlite:///%s' % args.db)
+        populate(engine, args)
+    if args.version is not None:
+        migration.db_sync(args.version)
+    print('schema version %s, %d instances' % (migration.db_version(),
+                                               args.instances))
+    run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
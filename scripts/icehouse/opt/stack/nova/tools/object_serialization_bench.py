@@ -0,0 +1,128 @@
+"""
+Benchmark of the RPC serialization of an InstanceList.
+
+A generated SQLite database is filled with instances, each with an info
+cache, a security group, metadata and the system metadata of its flavor,
+and they are loaded as the InstanceList of a detailed server list.  The
+list is then serialized and deserialized by the NovaObjectSerializer in
+each wire format, JSON encoding included, the way an RPC call carries it.
+The best time of a few runs and the size of the message are reported.
+
+Examples:
+
+    python tools/object_serialization_bench.py --instances 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from nova import context
+from nova import db
+from nova.db import migration
+from nova.network import model as network_model
+from nova.objects import base as objects_base
+from nova.objects import instance as instance_obj
+from nova.openstack.common import jsonutils
+
+CONF = cfg.CONF
+
+SYSTEM_METADATA = ['image_base_image_ref', 'image_min_disk', 'image_min_ram',
+                   'image_disk_format', 'image_container_format',
+                   'instance_type_id', 'instance_type_name',
+                   'instance_type_memory_mb', 'instance_type_vcpus',
+                   'instance_type_root_gb', 'instance_type_ephemeral_gb',
+                   'instance_type_flavorid', 'instance_type_swap',
+                   'instance_type_rxtx_factor', 'instance_type_vcpu_weight']
+EXPECTED_ATTRS = ['metadata', 'system_metadata', 'info_cache',
+                  'security_groups']
+
+
+def make_network_info(i):
+    subnet = network_model.Subnet(
+        cidr='10.0.0.0/16',
+        gateway=network_model.IP(address='10.0.0.1', type='gateway'),
+        ips=[network_model.FixedIP(address='10.0.%d.%d' % (i / 250,
+                                                           i % 250 + 2))])
+    network = network_model.Network(id='net-1', bridge='br100',
+                                    label='private', subnets=[subnet])
+    return network_model.NetworkInfo([network_model.VIF(
+        id='port-%d' % i, address='fa:16:3e:00:%02x:%02x' % (i / 256,
+                                                             i % 256),
+        network=network, type='ovs', devname='tap-%d' % i)])
+
+
+def make_instances(ctxt, args):
+    for i in xrange(args.instances):
+        instance = db.instance_create(ctxt, {
+            'host': 'compute1', 'node': 'compute1', 'project_id': 'bench',
+            'user_id': 'bench', 'vm_state': 'active', 'power_state': 1,
+            'display_name': 'web-%d' % i, 'hostname': 'web-%d' % i,
+            'image_ref': 'cirros', 'memory_mb': 2048, 'vcpus': 1,
+            'root_gb': 20, 'availability_zone': 'nova',
+            'metadata': {'role': 'web', 'owner': 'bench'},
+            'system_metadata': dict((key, '1') for key in SYSTEM_METADATA),
+            'security_groups': ['default']})
+        db.instance_info_cache_update(ctxt, instance['uuid'], {
+            'network_info': make_network_info(i).json()})
+
+
+def best_time(func, repeat):
+    best = None
+    for i in xrange(repeat):
+        started = time.time()
+        result = func()
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(args):
+    ctxt = context.RequestContext('bench', 'bench', is_admin=True)
+    make_instances(ctxt, args)
+    instances = instance_obj.InstanceList.get_by_filters(
+        ctxt, {'deleted': False}, expected_attrs=EXPECTED_ATTRS)
+    serializer = objects_base.NovaObjectSerializer()
+
+    def serialize():
+        return jsonutils.dumps(serializer.serialize_entity(ctxt, instances))
+
+    print('%d instances with %s' % (len(instances),
+                                    ', '.join(EXPECTED_ATTRS)))
+    for wire_format in (objects_base.WIRE_FORMAT_VERSION,
+                        objects_base.COMPACT_WIRE_FORMAT_VERSION):
+        CONF.set_override('object_wire_format', wire_format)
+        to_time, message = best_time(serialize, args.repeat)
+        from_time, result = best_time(
+            lambda: serializer.deserialize_entity(ctxt,
+                                                  jsonutils.loads(message)),
+            args.repeat)
+        assert len(result) == len(instances)
+        print('wire format %s  %9d bytes  serialize %8.1f ms  '
+              'deserialize %8.1f ms' % (wire_format, len(message),
+                                        to_time * 1000, from_time * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--instances', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    CONF.set_override('connection', 'sqlite:///%s' % db_file,
+                      group='database')
+    CONF.set_override('sqlite_synchronous', False, group='database')
+    try:
+        migration.db_sync()
+        run(args)
+    finally:
+        os.unlink(db_file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
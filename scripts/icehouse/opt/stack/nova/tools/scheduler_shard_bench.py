@@ -0,0 +1,196 @@
+"""
+Benchmark of several nova-scheduler workers placing instances side by side.
+
+Every round each worker reads the same snapshot of a fake compute_nodes
+table and places one instance with select_destinations().  The placements
+are then claimed against the real free resources of the hosts in order, the
+way ResourceTracker.instance_claim does it, and a placement on a host which
+is full by then counts as a retry and is scheduled again in a later round.
+
+Workers run one after the other in this process, so the reported rate
+assumes they run in parallel: placements divided by the busiest worker's
+scheduling time.
+
+Examples:
+
+    python tools/scheduler_shard_bench.py --mode none
+    python tools/scheduler_shard_bench.py --mode partition
+    python tools/scheduler_shard_bench.py --mode ledger
+"""
+import argparse
+import random
+import sys
+import time
+
+from oslo.config import cfg
+from oslo.messaging import conffixture as messaging_conffixture
+
+from nova import context
+from nova import db
+from nova import exception
+from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
+from nova import rpc
+from nova.scheduler import filter_scheduler
+from nova.scheduler import sharding
+
+CONF = cfg.CONF
+CONF.import_opt('cpu_allocation_ratio', 'nova.scheduler.filters.core_filter')
+CONF.import_opt('disk_allocation_ratio', 'nova.scheduler.filters.disk_filter')
+CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
+CONF.import_opt('ram_weight_multiplier', 'nova.scheduler.weights.ram')
+CONF.import_opt('scheduler_default_filters', 'nova.scheduler.host_manager')
+
+FLAVORS = [
+    # memory_mb, root_gb, vcpus
+    (512, 1, 1),
+    (2048, 20, 1),
+    (4096, 40, 2),
+    (8192, 80, 4),
+]
+
+
+def make_compute_nodes(num_hosts, gen):
+    nodes = {}
+    for i in xrange(num_hosts):
+        memory_mb = gen.choice([16384, 32768, 65536])
+        local_gb = gen.choice([500, 1000, 2000])
+        vcpus = gen.choice([8, 16, 32])
+        nodes[i] = dict(id=i, memory_mb=memory_mb, free_ram_mb=memory_mb,
+                        local_gb=local_gb, free_disk_gb=local_gb,
+                        local_gb_used=0, disk_available_least=None,
+                        vcpus=vcpus, vcpus_used=0,
+                        updated_at=timeutils.utcnow(),
+                        service=dict(host='compute%d' % i, disabled=False),
+                        hypervisor_hostname='compute%d' % i,
+                        host_ip='127.0.0.1', hypervisor_version=0)
+    return nodes
+
+
+def instance_claim(nodes, by_host, host, memory_mb, root_gb, vcpus):
+    """Claim the instance on the compute host, False if it doesn't fit
+    within the limits the scheduler filters use.
+    """
+    node = nodes[by_host[host]]
+    ram_used = node['memory_mb'] - node['free_ram_mb']
+    if ram_used + memory_mb > node['memory_mb'] * CONF.ram_allocation_ratio:
+        return False
+    disk_used = node['local_gb'] - node['free_disk_gb']
+    if disk_used + root_gb > node['local_gb'] * CONF.disk_allocation_ratio:
+        return False
+    if node['vcpus_used'] + vcpus > node['vcpus'] * CONF.cpu_allocation_ratio:
+        return False
+    node['free_ram_mb'] -= memory_mb
+    node['free_disk_gb'] -= root_gb
+    node['local_gb_used'] += root_gb
+    node['vcpus_used'] += vcpus
+    node['updated_at'] = timeutils.utcnow()
+    return True
+
+
+def make_schedulers(args):
+    ledger = None
+    if args.mode == 'ledger':
+        ledger = sharding.ClaimLedger(memorycache.Client())
+    schedulers = []
+    for index in xrange(args.workers):
+        sched = filter_scheduler.FilterScheduler()
+        if args.mode == 'partition':
+            sched.host_partitioner = sharding.HostPartitioner(args.workers,
+                                                              index)
+        sched.claim_ledger = ledger
+        schedulers.append(sched)
+    return schedulers
+
+
+def run(args):
+    gen = random.Random(args.seed)
+    random.seed(args.seed)
+    nodes = make_compute_nodes(args.hosts, gen)
+    by_host = dict((node['service']['host'], node_id)
+                   for node_id, node in nodes.iteritems())
+    snapshot = []
+    db.compute_node_get_all = lambda ctxt: snapshot
+
+    schedulers = make_schedulers(args)
+    busy = [0.0] * len(schedulers)
+    ctxt = context.get_admin_context()
+    pending = [gen.choice(FLAVORS) for i in xrange(args.requests)]
+    placed = attempts = retries = 0
+
+    while pending:
+        # Every worker starts the round from the same view of the hosts.
+        snapshot[:] = [dict(node) for node in nodes.itervalues()]
+        requests, pending = (pending[:len(schedulers)],
+                             pending[len(schedulers):])
+        placements = []
+        for index, flavor in enumerate(requests):
+            memory_mb, root_gb, vcpus = flavor
+            instance = {'memory_mb': memory_mb, 'root_gb': root_gb,
+                        'ephemeral_gb': 0, 'vcpus': vcpus,
+                        'project_id': 'bench', 'os_type': 'linux'}
+            request_spec = {'instance_properties': instance,
+                            'instance_type': dict(instance, swap=0),
+                            'num_instances': 1}
+            started = time.time()
+            try:
+                dest = schedulers[index].select_destinations(ctxt,
+                        request_spec, {})[0]
+            except exception.NoValidHost:
+                dest = None
+            busy[index] += time.time() - started
+            placements.append((dest, flavor))
+
+        for dest, flavor in placements:
+            if dest is None:
+                continue
+            attempts += 1
+            if instance_claim(nodes, by_host, dest['host'], *flavor):
+                placed += 1
+            else:
+                retries += 1
+                pending.append(flavor)
+
+        if not any(dest for dest, flavor in placements):
+            # The cloud is full.
+            break
+
+    elapsed = max(busy)
+    print('mode=%s hosts=%d workers=%d' % (args.mode, args.hosts,
+                                           args.workers))
+    print('placed %d instances, %d retries of %d claims '
+          '(retry rate %.1f%%)' % (placed, retries, attempts,
+                                   100.0 * retries / max(attempts, 1)))
+    print('%.1f placements/s (busiest worker scheduled for %.2fs, '
+          'all workers %.2fs)' % (placed / elapsed, elapsed, sum(busy)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mode', choices=['none', 'partition', 'ledger'],
+                        default='none',
+                        help='How the workers coordinate')
+    parser.add_argument('--hosts', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--ram-weight-multiplier', type=float, default=None,
+                        help='Negative values stack instances instead of '
+                             'spreading them')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    messaging_conf = messaging_conffixture.ConfFixture(CONF)
+    messaging_conf.transport_driver = 'fake'
+    messaging_conf.setUp()
+    rpc.init(CONF)
+    CONF.set_override('scheduler_default_filters',
+                      ['RamFilter', 'CoreFilter', 'DiskFilter'])
+    if args.ram_weight_multiplier is not None:
+        CONF.set_override('ram_weight_multiplier',
+                          args.ram_weight_multiplier)
+    run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())